@@ -17,6 +17,7 @@ from bluesky_stomp.models import Broker
 from click.core import Context, Parameter
 from click.exceptions import ClickException
 from click.types import ParamType
+from event_model import unpack_event_page
 from observability_utils.tracing import setup_tracing
 
 from blueapi import __version__, config
@@ -28,6 +29,7 @@ from blueapi.client.rest import (
     InvalidParametersError,
     NonJsonResponseError,
     ServiceUnavailableError,
+    TooManyRequestsError,
     UnauthorisedAccessError,
     UnknownPlanError,
 )
@@ -40,7 +42,7 @@ from blueapi.log import set_up_logging
 from blueapi.service.authentication import SessionCacheManager, SessionManager
 from blueapi.service.model import DeviceResponse, PlanResponse, SourceInfo, TaskRequest
 from blueapi.worker import ProgressEvent, WorkerEvent
-from blueapi.worker.event import TaskError, TaskResult
+from blueapi.worker.event import StoredResult, TaskError, TaskResult
 
 from .scratch import setup_scratch
 from .updates import CliEventRenderer
@@ -385,6 +387,9 @@ def run_plan(
             def on_event(event: AnyEvent) -> None:
                 if isinstance(event, ProgressEvent):
                     progress_bar.on_progress_event(event)
+                elif isinstance(event, DataEvent) and event.name == "event_page":
+                    for doc in unpack_event_page(event.doc):  # type: ignore
+                        callback("event", doc)
                 elif isinstance(event, DataEvent):
                     callback(event.name, event.doc)
 
@@ -398,6 +403,11 @@ def run_plan(
             match resp.result:
                 case TaskResult(result=None, type="NoneType"):
                     print("Plan succeeded")
+                case TaskResult(stored=StoredResult(size=size)):
+                    print(
+                        f"Plan succeeded: result of {size} bytes stored by the "
+                        f"server, see /api/v1/tasks/{resp.task_id}/result"
+                    )
                 case TaskResult(result=None, type=t):
                     print(f"Plan returned unserializable result of type '{t}'")
                 case TaskResult(result=r):
@@ -413,6 +423,8 @@ def run_plan(
         raise ClickException(f"Plan '{name}' was not recognised") from up
     except InvalidParametersError as ip:
         raise ClickException(ip.message()) from ip
+    except TooManyRequestsError as tm:
+        raise ClickException("Too many requests, try again later") from tm
     except BlueskyStreamingError as se:
         raise ClickException(f"Streaming error: {se}") from se
     except BlueskyRemoteControlError as e:
@@ -3,7 +3,7 @@ from collections.abc import Mapping
 
 from tqdm import tqdm
 
-from blueapi.worker import ProgressEvent, StatusView, WorkerEvent
+from blueapi.worker import ProgressEvent, ProgressView, StatusView, WorkerEvent
 
 _BAR_FMT = "{desc}: |{bar}| {percentage:3.0f}% [{elapsed}/{remaining}]"
 
@@ -44,6 +44,7 @@ class ProgressBarRenderer:
 
 class CliEventRenderer:
     _pbar_renderer: ProgressBarRenderer
+    _progress: ProgressView
 
     def __init__(
         self,
@@ -52,9 +53,13 @@ class CliEventRenderer:
         if pbar_renderer is None:
             pbar_renderer = ProgressBarRenderer()
         self._pbar_renderer = pbar_renderer
+        self._progress = ProgressView()
 
     def on_progress_event(self, event: ProgressEvent) -> None:
-        self._pbar_renderer.update(event.statuses)
+        # Delta encoded events only hold what changed, so track the full view
+        full_event = self._progress.apply(event)
+        if full_event is not None:
+            self._pbar_renderer.update(full_event.statuses)
 
     def on_worker_event(self, event: WorkerEvent) -> None:
         print(str(event.state))
@@ -38,8 +38,14 @@ from blueapi.service.model import (
     WorkerTask,
 )
 from blueapi.utils import deprecated
-from blueapi.worker import WorkerEvent, WorkerState
-from blueapi.worker.event import ProgressEvent, TaskError, TaskResult, TaskStatus
+from blueapi.worker import ProgressView, WorkerEvent, WorkerState
+from blueapi.worker.event import (
+    ProgressEvent,
+    StoredResult,
+    TaskError,
+    TaskResult,
+    TaskStatus,
+)
 from blueapi.worker.task_worker import TrackableTask
 
 from .event_bus import AnyEvent, EventBusClient, OnAnyEvent
@@ -154,6 +160,9 @@ class Plan:
             instrument_session=self._client.instrument_session,
         )
         match self._client.run_task(req):
+            case TaskStatus(task_id=task_id, result=TaskResult(stored=StoredResult())):
+                # Too large to be sent with the task
+                return self._client.get_task_result(task_id)
             case TaskStatus(result=TaskResult(result=res)):
                 return res
             case TaskStatus(result=TaskError(type=typ, message=msg)):
@@ -421,6 +430,21 @@ class BlueapiClient:
         assert task_id, "Task ID not provided!"
         return self._rest.get_task(task_id)
 
+    @start_as_current_span(TRACER, "task_id")
+    def get_task_result(self, task_id: str) -> Any:
+        """
+        Get the result of a task's plan, including results too large to be
+        sent with the task
+
+        Args:
+            task_id: Unique ID for the task
+
+        Returns:
+            Any: The serialized result
+        """
+        assert task_id, "Task ID not provided!"
+        return self._rest.get_task_result(task_id)
+
     @start_as_current_span(TRACER)
     @deprecated("rest client")
     def get_all_tasks(self) -> TasksListResponse:
@@ -463,7 +487,14 @@ class BlueapiClient:
     def run_blocking(
         self, request: TaskRequest, on_event: OnAnyEvent | None = None
     ) -> TaskStatus:
+        progress = ProgressView()
         for event in self._rest.run_blocking(request):
+            if isinstance(event, ProgressEvent):
+                # Callbacks always see every status, even if progress is
+                # delta encoded
+                event = progress.apply(event)
+                if event is None:
+                    continue
             if on_event is not None:
                 on_event(event)
             for cb in self._callbacks.values():
@@ -510,6 +541,7 @@ class BlueapiClient:
         task_id = task_response.task_id
 
         complete: Future[TaskStatus] = Future()
+        progress = ProgressView()
 
         def inner_on_event(event: AnyEvent, ctx: MessageContext) -> None:
             match event:
@@ -521,6 +553,13 @@ class BlueapiClient:
                     relates_to_task = True
                 case _:
                     relates_to_task = False
+            if relates_to_task and isinstance(event, ProgressEvent):
+                # Callbacks always see every status, even if progress is
+                # delta encoded
+                full_event = progress.apply(event)
+                if full_event is None:
+                    return
+                event = full_event
             if relates_to_task:
                 if on_event is not None:
                     on_event(event)
@@ -575,6 +614,24 @@ class BlueapiClient:
                 f"but {worker_response.task_id} was started instead"
             )
 
+    @start_as_current_span(TRACER, "task")
+    def create_and_queue_task(self, task: TaskRequest) -> TaskResponse:
+        """
+        Create a new task and add it to the worker's run queue, behind every
+        queued task of the same or higher priority. The worker will start it
+        automatically once the tasks ahead of it have finished.
+
+        Args:
+            task: Request object for task to create on the worker
+
+        Returns:
+            TaskResponse: Acknowledgement of request
+        """
+
+        response = self._rest.create_task(task)
+        self._rest.enqueue_task(WorkerTask(task_id=response.task_id))
+        return response
+
     @start_as_current_span(TRACER, "task")
     @deprecated("rest client")
     def create_task(self, task: TaskRequest) -> TaskResponse:
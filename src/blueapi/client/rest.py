@@ -10,7 +10,7 @@ from observability_utils.tracing import (
     get_tracer,
     start_as_current_span,
 )
-from pydantic import BaseModel, TypeAdapter, ValidationError
+from pydantic import BaseModel, ValidationError
 from pydantic_core import PydanticSerializationError
 from websockets.exceptions import InvalidStatus
 from websockets.sync.client import connect
@@ -28,7 +28,12 @@ from blueapi.service.model import (
     PlanModel,
     PlanResponse,
     PythonEnvironmentResponse,
+    QueueOrderRequest,
+    QueueResponse,
+    QueueStatsResponse,
     SourceInfo,
+    SweepRequest,
+    SweepResponse,
     TaskRequest,
     TaskResponse,
     TasksListResponse,
@@ -38,13 +43,16 @@ from blueapi.service.protocol import (
     ControlResponse,
     InvalidArgs,
     PlanNotFound,
+    RateLimited,
     ServerBusy,
     Submit,
     Unauthorized,
     Update,
 )
+from blueapi.utils import type_adapter
 from blueapi.worker import TrackableTask, WorkerState
 from blueapi.worker.event import ProgressEvent, WorkerEvent
+from blueapi.worker.profiling import TaskProfile
 
 T = TypeVar("T")
 
@@ -74,6 +82,12 @@ class NotFoundError(BlueskyRequestError):
     pass
 
 
+class TooManyRequestsError(BlueskyRequestError):
+    """Request was turned away by the server's admission control (429)."""
+
+    pass
+
+
 class UnknownPlanError(BlueskyRequestError):
     """Plan '{name}' was not recognised"""
 
@@ -171,11 +185,13 @@ def _create_task_exceptions(response: requests.Response) -> Exception | None:
         return UnauthorisedAccessError(code, response.text)
     elif code == 404:
         return UnknownPlanError(code, response.text)
+    elif code == 429:
+        return TooManyRequestsError(code, response.text)
     elif code == 422:
         try:
             content = _response_json(response)
             return InvalidParametersError(
-                TypeAdapter(list[ParameterError]).validate_python(
+                type_adapter(list[ParameterError]).validate_python(
                     content.get("detail", [])
                 )
             )
@@ -246,6 +262,14 @@ class BlueapiRestClient:
     def get_task(self, task_id: str) -> TrackableTask:
         return self._request_and_deserialize(f"/tasks/{task_id}", TrackableTask)
 
+    def get_task_profile(self, task_id: str) -> TaskProfile:
+        return self._request_and_deserialize(
+            f"/api/v1/tasks/{task_id}/profile", TaskProfile
+        )
+
+    def get_task_result(self, task_id: str) -> Any:
+        return self._request_and_deserialize(f"/api/v1/tasks/{task_id}/result", object)
+
     def get_all_tasks(self) -> TasksListResponse:
         return self._request_and_deserialize("/tasks", TasksListResponse)
 
@@ -258,7 +282,11 @@ class BlueapiRestClient:
             TaskResponse,
             method="POST",
             get_exception=_create_task_exceptions,
-            data=task.model_dump(mode="json", fallback=_task_model_fallback),
+            # Fields left unset are omitted so that servers that predate them
+            # still accept the request
+            data=task.model_dump(
+                mode="json", fallback=_task_model_fallback, exclude_unset=True
+            ),
         )
 
     def clear_task(self, task_id: str) -> TaskResponse:
@@ -274,6 +302,42 @@ class BlueapiRestClient:
             data=task.model_dump(),
         )
 
+    def get_queue(self) -> QueueResponse:
+        return self._request_and_deserialize("/api/v1/queue", QueueResponse)
+
+    def get_queue_stats(self) -> QueueStatsResponse:
+        return self._request_and_deserialize("/api/v1/queue/stats", QueueStatsResponse)
+
+    def enqueue_task(self, task: WorkerTask) -> WorkerTask:
+        return self._request_and_deserialize(
+            "/api/v1/queue",
+            WorkerTask,
+            method="POST",
+            data=task.model_dump(),
+        )
+
+    def submit_sweep(self, sweep: SweepRequest) -> SweepResponse:
+        return self._request_and_deserialize(
+            "/api/v1/queue/sweep",
+            SweepResponse,
+            method="POST",
+            get_exception=_create_task_exceptions,
+            data=sweep.model_dump(mode="json", fallback=_task_model_fallback),
+        )
+
+    def reorder_queue(self, task_ids: list[str]) -> QueueResponse:
+        return self._request_and_deserialize(
+            "/api/v1/queue",
+            QueueResponse,
+            method="PUT",
+            data=QueueOrderRequest(task_ids=task_ids).model_dump(),
+        )
+
+    def dequeue_task(self, task_id: str) -> TaskResponse:
+        return self._request_and_deserialize(
+            f"/api/v1/queue/{task_id}", TaskResponse, method="DELETE"
+        )
+
     def cancel_current_task(
         self,
         state: Literal[WorkerState.ABORTING, WorkerState.STOPPING],
@@ -351,7 +415,7 @@ class BlueapiRestClient:
                     f"but client version is {client_version}. "
                     f"Some features may not work as expected."
                 )
-        deserialized = TypeAdapter(target_type).validate_python(
+        deserialized = type_adapter(target_type).validate_python(
             _response_json(response)
         )
         return deserialized
@@ -389,6 +453,12 @@ class BlueapiRestClient:
                             raise UnknownPlanError(message=name)
                         case ServerBusy():
                             raise BlueskyRemoteControlError(409, "Server is busy")
+                        case RateLimited(reason=reason, retry_after=retry_after):
+                            raise TooManyRequestsError(
+                                429,
+                                f"Too many requests ({reason}), "
+                                f"retry in {retry_after:.1f}s",
+                            )
                         case Unauthorized():
                             raise UnauthorisedAccessError(
                                 403, "Not authorized to submit task"
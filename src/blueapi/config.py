@@ -123,12 +123,255 @@ class TiledConfig(BlueapiBaseModel):
     )
 
 
+class EventDropPolicy(StrEnum):
+    """
+    What to do with events when a subscriber falls too far behind
+    """
+
+    #: Hold up the worker until the subscriber catches up
+    BLOCK = "block"
+    #: Discard the oldest events the subscriber has not yet received
+    DROP_OLDEST = "drop_oldest"
+    #: Discard the oldest progress events, hold up the worker for other events
+    DROP_PROGRESS = "drop_progress"
+
+
 class WorkerEventConfig(BlueapiBaseModel):
     """
     Config for event broadcasting via the message bus
     """
 
     broadcast_status_events: bool = True
+    max_progress_rate: float | None = Field(
+        description="Maximum number of progress events to publish per second for "
+        "a task, status updates in between are merged. Unlimited if unset",
+        default=None,
+        gt=0,
+    )
+    progress_deltas: bool = Field(
+        description="Publish only the statuses added, changed or removed since the "
+        "previous progress event of a task, rather than every status",
+        default=False,
+    )
+    progress_snapshot_interval: int = Field(
+        description="When progress_deltas is enabled, every nth progress event of a "
+        "task holds every status so that late subscribers can resynchronise",
+        default=10,
+        gt=0,
+    )
+    asynchronous_dispatch: bool = Field(
+        description="Deliver events to each subscriber, such as the message bus, "
+        "from its own thread so that slow subscribers do not hold up plans",
+        default=False,
+    )
+    subscriber_queue_size: int = Field(
+        description="When asynchronous_dispatch is enabled, maximum number of "
+        "events waiting to be delivered to each subscriber",
+        default=1000,
+        gt=0,
+    )
+    drop_policy: EventDropPolicy = Field(
+        description="When asynchronous_dispatch is enabled, what to do with new "
+        "events when a subscriber's queue is full",
+        default=EventDropPolicy.BLOCK,
+    )
+    event_page_size: int | None = Field(
+        description="Publish consecutive event documents from the same descriptor "
+        "as event_page documents of up to this many events. Each event is "
+        "published on its own if unset",
+        default=None,
+        gt=1,
+    )
+    event_page_max_delay: float = Field(
+        description="Maximum number of seconds to hold back an event document while "
+        "its page fills up",
+        default=0.5,
+        gt=0,
+    )
+
+
+class TaskRetentionConfig(BlueapiBaseModel):
+    """
+    Limits on how many completed tasks the worker keeps in memory. When any
+    limit is exceeded the least recently used tasks are evicted first.
+    """
+
+    max_count: int | None = Field(
+        description="Maximum number of completed tasks to retain, unlimited if unset",
+        default=None,
+        gt=0,
+    )
+    max_age: float | None = Field(
+        description="Seconds after completion before a task is evicted, "
+        "unlimited if unset",
+        default=None,
+        gt=0,
+    )
+    max_bytes: int | None = Field(
+        description="Maximum total serialized size in bytes of retained tasks, "
+        "unlimited if unset",
+        default=None,
+        gt=0,
+    )
+    eviction_interval: float = Field(
+        description="Seconds between periodic checks for expired tasks",
+        default=60.0,
+        gt=0,
+    )
+
+
+class ResultStoreConfig(BlueapiBaseModel):
+    """
+    Where plan results too large to include in their tasks are stored. Stored
+    results are only referenced from the task and its events, and can be
+    retrieved from the task's result endpoint.
+    """
+
+    directory: Path | None = Field(
+        description="Directory to store large results in, in a blueapi-results "
+        "subdirectory whose contents are removed on start-up. Every result is "
+        "included in its task if unset",
+        default=None,
+    )
+    threshold: int = Field(
+        description="Size in bytes of a serialized result above which it is stored",
+        default=65536,
+        ge=0,
+    )
+
+
+class EstimationConfig(BlueapiBaseModel):
+    """
+    Config for estimating how long each submitted task will take, by iterating
+    its plan against mocked devices without a RunEngine and timing the messages
+    of earlier tasks
+    """
+
+    enabled: bool = Field(
+        description="Whether the duration of each submitted task is estimated",
+        default=False,
+    )
+    max_messages: int = Field(
+        description="Number of messages after which a plan is abandoned, and its "
+        "duration left unestimated",
+        default=100000,
+        gt=0,
+    )
+
+
+class SchedulingConfig(BlueapiBaseModel):
+    """
+    How the worker chooses which queued task to run next
+    """
+
+    preemption: bool = Field(
+        description="Whether a queued task may pause a running task with a lower "
+        "priority at its next checkpoint, run, and then resume it",
+        default=False,
+    )
+    fair_share: bool = Field(
+        description="Whether queued tasks of the same priority are run in the "
+        "order that shares the worker fairly between instrument sessions, and "
+        "between the users of each session, rather than in the order they were "
+        "queued",
+        default=False,
+    )
+    session_weights: dict[str, Annotated[float, Field(gt=0)]] = Field(
+        description="Relative share of the worker for each instrument session "
+        "under fair share scheduling, sessions not listed have a weight of 1",
+        default_factory=dict,
+    )
+    session_quotas: dict[str, Annotated[float, Field(gt=0)]] = Field(
+        description="Seconds of run time each instrument session may use in each "
+        "quota period under fair share scheduling. Once a session has used its "
+        "quota, its tasks only run ahead of those of sessions within their quotas "
+        "if they have a higher priority. Sessions not listed have no quota",
+        default_factory=dict,
+    )
+    quota_period: float = Field(
+        description="Length in seconds of each period that session quotas apply to",
+        default=3600.0,
+        gt=0,
+    )
+    lookahead: bool = Field(
+        description="Whether the next queued task is prepared while the current "
+        "one runs, revalidating its parameters if plans or devices have changed, "
+        "reserving a scan number for its first run and building its Tiled writer, "
+        "so that it starts as soon as the worker is free",
+        default=False,
+    )
+
+
+class WatchdogConfig(BlueapiBaseModel):
+    """
+    Config for the watchdog that notices plans stuck on one message, such as a
+    wait for a device that never finishes
+    """
+
+    message_warning: float | None = Field(
+        description="Seconds the RunEngine may spend on one message before a "
+        "warning is published, unchecked if unset",
+        default=None,
+        gt=0,
+    )
+    status_warning: float | None = Field(
+        description="Seconds a device status may be outstanding before a warning "
+        "is published, unchecked if unset",
+        default=None,
+        gt=0,
+    )
+    abort_after: float | None = Field(
+        description="Seconds the RunEngine may spend on one message, or a device "
+        "status may be outstanding, before the task is aborted, never aborted if "
+        "unset",
+        default=None,
+        gt=0,
+    )
+    interval: float = Field(description="Seconds between checks", default=1.0, gt=0)
+
+    @property
+    def enabled(self) -> bool:
+        return any(
+            limit is not None
+            for limit in (self.message_warning, self.status_warning, self.abort_after)
+        )
+
+
+class DocumentSpanMode(StrEnum):
+    """
+    Which bluesky documents are traced with their own span
+    """
+
+    #: Every document
+    ALL = "all"
+    #: Every document other than events, and every nth event
+    SAMPLED = "sampled"
+    #: Only run start and stop documents
+    RUN_BOUNDARIES = "run_boundaries"
+    #: No documents
+    OFF = "off"
+
+
+class DocumentSpanConfig(BlueapiBaseModel):
+    """
+    Config for the tracing spans recorded for the documents a plan emits
+    """
+
+    mode: DocumentSpanMode = Field(
+        description="Which documents are traced with their own span",
+        default=DocumentSpanMode.ALL,
+    )
+    event_sample_interval: int = Field(
+        description="In sampled mode, trace every nth event document of a task",
+        default=100,
+        gt=0,
+    )
+    max_attribute_length: int | None = Field(
+        description="Maximum number of characters of a document to record on its "
+        "span, unlimited if unset",
+        default=4096,
+        gt=0,
+    )
 
 
 class MetadataConfig(BlueapiBaseModel):
@@ -147,7 +390,38 @@ class EnvironmentConfig(BlueapiBaseModel):
         ]
     ] = Field(default=[])
     events: WorkerEventConfig = Field(default_factory=WorkerEventConfig)
+    retention: TaskRetentionConfig = Field(default_factory=TaskRetentionConfig)
+    results: ResultStoreConfig = Field(default_factory=ResultStoreConfig)
+    document_spans: DocumentSpanConfig = Field(default_factory=DocumentSpanConfig)
+    scheduling: SchedulingConfig = Field(default_factory=SchedulingConfig)
+    watchdog: WatchdogConfig = Field(default_factory=WatchdogConfig)
+    estimation: EstimationConfig = Field(default_factory=EstimationConfig)
     metadata: MetadataConfig | None = Field(default=None)
+    parallel_run_engines: int = Field(
+        default=0,
+        ge=0,
+        description=(
+            "Number of extra RunEngines that run queued tasks alongside the main "
+            "one. Tasks only run at the same time if they use none of the same "
+            "devices."
+        ),
+    )
+    profile_messages: bool = Field(
+        default=False,
+        description=(
+            "Whether to time every message each task's plan sends to the "
+            "RunEngine, so that a profile of each task can be retrieved"
+        ),
+    )
+    concurrent_sources: int = Field(
+        default=4,
+        ge=1,
+        description=(
+            "Number of device managers that may build and connect their devices "
+            "at once when the environment is loaded. Plan modules are imported "
+            "while devices connect."
+        ),
+    )
 
 
 class GraylogConfig(BlueapiBaseModel):
@@ -167,9 +441,53 @@ class CORSConfig(BlueapiBaseModel):
     allow_headers: list[str] = ["*"]
 
 
+class AdmissionConfig(BlueapiBaseModel):
+    """
+    Limits on task submissions, checked by the REST API before anything is sent
+    to the worker. Requests over a limit get a 429 response.
+    """
+
+    rate: float | None = Field(
+        description="Task submissions per second accepted from all users "
+        "together, unlimited if unset",
+        default=None,
+        gt=0,
+    )
+    user_rate: float | None = Field(
+        description="Task submissions per second accepted from each user, "
+        "unlimited if unset",
+        default=None,
+        gt=0,
+    )
+    burst: int = Field(
+        description="Submissions accepted at once after a quiet period, before "
+        "the rates apply",
+        default=10,
+        ge=1,
+    )
+    max_pending_per_user: int | None = Field(
+        description="Tasks each user may have waiting to run, unlimited if unset",
+        default=None,
+        ge=1,
+    )
+    refresh_interval: float = Field(
+        description="Seconds between asking the worker how many tasks a user "
+        "still has waiting, once they appear to have reached their limit",
+        default=1.0,
+        gt=0,
+    )
+    user_expiry: float = Field(
+        description="Seconds after which a user who has submitted nothing is "
+        "forgotten, their pending tasks being counted afresh",
+        default=3600.0,
+        gt=0,
+    )
+
+
 class RestConfig(BlueapiBaseModel):
     url: HttpUrl = HttpUrl("http://localhost:8000")
     cors: CORSConfig | None = None
+    admission: AdmissionConfig = AdmissionConfig()
 
     @property
     def ws_address(self) -> WebsocketUrl:
@@ -335,7 +653,7 @@ class ApplicationConfig(BlueapiBaseModel):
     """
 
     #: API version to publish in OpenAPI schema
-    REST_API_VERSION: ClassVar[str] = "1.5.0"
+    REST_API_VERSION: ClassVar[str] = "1.20.3"
 
     LICENSE_INFO: ClassVar[dict[str, str]] = {
         "name": "Apache 2.0",
@@ -1,9 +1,13 @@
+import asyncio
 import logging
 import sys
-from collections.abc import Callable
+from collections.abc import Callable, Mapping
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AbstractContextManager, nullcontext
 from dataclasses import InitVar, dataclass, field, fields, is_dataclass
 from importlib import import_module, metadata
 from inspect import Parameter, isclass, signature
+from threading import Lock
 from types import ModuleType, NoneType, UnionType
 from typing import Any, Generic, TypeVar, Union, get_args, get_origin, get_type_hints
 
@@ -29,7 +33,7 @@ from blueapi.config import (
     ServiceAccount,
     TiledConfig,
 )
-from blueapi.core.protocols import DeviceManager
+from blueapi.core.protocols import DeviceConnectResult, DeviceManager
 from blueapi.utils import (
     BlueapiPlanModelConfig,
     NumtrackerClient,
@@ -37,6 +41,7 @@ from blueapi.utils import (
     load_module_all,
 )
 from blueapi.utils.invalid_config_error import InvalidConfigError
+from blueapi.utils.numtracker import NumtrackerScanMutationResponse
 from blueapi.utils.path_provider import StartDocumentPathProvider
 
 from .bluesky_types import (
@@ -130,6 +135,34 @@ class BlueskyContext:
     plans: dict[str, Plan] = field(default_factory=dict)
     devices: dict[str, Device] = field(default_factory=dict)
     plan_functions: dict[str, PlanGenerator] = field(default_factory=dict)
+    #: Incremented whenever plans or devices are registered or removed, so that
+    #: anything validated against the context can tell if it is out of date
+    generation: int = field(default=0, init=False)
+
+    #: Template for the names of detector files, if numtracker is configured
+    _detector_file_template: str | None = field(default=None, init=False, repr=False)
+    #: Scans created ahead of time by the ID of the task they were created for,
+    #: each used by the first run of that task to open
+    _reserved_scans: dict[str, NumtrackerScanMutationResponse] = field(
+        default_factory=dict, init=False, repr=False
+    )
+    #: Headers for numtracker by the ID of the task whose scans they create, such
+    #: as those of the user that submitted it
+    _scan_headers: dict[str, Mapping[str, str]] = field(
+        default_factory=dict, init=False, repr=False
+    )
+    _reserved_scans_lock: Lock = field(default_factory=Lock, init=False, repr=False)
+
+    #: Device managers the devices were built by, so they can be built again
+    #: with their connections mocked
+    _device_managers: list[DeviceManager] = field(
+        default_factory=list, init=False, repr=False
+    )
+    #: Context with mocked devices, and the generation it was built for
+    _mock_context: "tuple[int, BlueskyContext] | None" = field(
+        default=None, init=False, repr=False
+    )
+    _mock_context_lock: Lock = field(default_factory=Lock, init=False, repr=False)
 
     _reference_cache: dict[type, type] = field(default_factory=dict)
 
@@ -151,20 +184,8 @@ class BlueskyContext:
             self.run_engine.subscribe(path_provider.run_start, "start")
             self.run_engine.subscribe(path_provider.run_stop, "stop")
             self.path_provider = path_provider
-
-            # local reference so it's available in _update_scan_num
-            numtracker = self.numtracker
-
-            async def _update_scan_num(md: dict[str, Any]) -> int:
-                scan = await numtracker.create_scan(
-                    md["instrument_session"], md["instrument"]
-                )
-                md["data_session_directory"] = str(scan.scan.directory.path)
-                md["detector_file_template"] = nt_conf.detector_file_template
-                md["scan_file"] = scan.scan.scan_file
-                return scan.scan.scan_number
-
-            self.run_engine.scan_id_source = _update_scan_num
+            self._detector_file_template = nt_conf.detector_file_template
+            self.use_scans_of(self.run_engine, None)
 
         self.with_config(configuration.env)
 
@@ -183,6 +204,122 @@ class BlueskyContext:
                 tiled_conf.authentication.token_url = configuration.oidc.token_endpoint
             self.tiled_conf = tiled_conf
 
+    def use_scans_of(self, run_engine: RunEngine, task_id: str | None) -> None:
+        """
+        Have the runs a RunEngine opens numbered by numtracker on behalf of a
+        task. The first run uses the scan reserved for the task, if its session
+        and instrument match, and later runs create new scans with the task's
+        headers. Does nothing without numtracker.
+
+        Args:
+            run_engine: RunEngine that will run the task
+            task_id: ID of the task, or None if the runs belong to no task
+        """
+        if (numtracker := self.numtracker) is None:
+            return
+        template = self._detector_file_template
+
+        async def _update_scan_num(md: dict[str, Any]) -> int:
+            key = (md["instrument_session"], md["instrument"])
+            scan = self._take_reserved_scan(task_id, key)
+            if scan is None:
+                scan = await numtracker.create_scan(*key, self._headers_of(task_id))
+            md["data_session_directory"] = str(scan.scan.directory.path)
+            md["detector_file_template"] = template
+            md["scan_file"] = scan.scan.scan_file
+            return scan.scan.scan_number
+
+        run_engine.scan_id_source = _update_scan_num
+
+    def paths_from(self, run_engine: RunEngine) -> AbstractContextManager[None]:
+        """
+        Have devices find where to write files from the runs of a RunEngine
+        other than the main one, while the calling thread runs a plan in it.
+        Does nothing if paths do not come from start documents.
+
+        Args:
+            run_engine: RunEngine the calling thread will run a plan in
+        """
+        if isinstance(self.path_provider, StartDocumentPathProvider):
+            return self.path_provider.runs_of(run_engine)
+        return nullcontext()
+
+    def _headers_of(self, task_id: str | None) -> Mapping[str, str] | None:
+        if task_id is None:
+            return None
+        with self._reserved_scans_lock:
+            return self._scan_headers.get(task_id)
+
+    def set_scan_headers(self, task_id: str, headers: Mapping[str, str]) -> None:
+        """
+        Set the HTTP headers numtracker is sent when creating the scans of a
+        task, rather than those of the client, which is shared by every task
+
+        Args:
+            task_id: ID of the task the scans are for
+            headers: HTTP headers for numtracker, such as those of the user
+                that submitted the task
+        """
+        with self._reserved_scans_lock:
+            self._scan_headers[task_id] = headers
+
+    def _take_reserved_scan(
+        self, task_id: str | None, key: tuple[str, str]
+    ) -> NumtrackerScanMutationResponse | None:
+        if task_id is None:
+            return None
+        with self._reserved_scans_lock:
+            scan = self._reserved_scans.pop(task_id, None)
+        if scan is None:
+            return None
+        directory = scan.scan.directory
+        if (directory.instrument_session, directory.instrument) != key:
+            LOGGER.info(f"Scan reserved for task {task_id} is for another session")
+            return None
+        return scan
+
+    def reserve_scan(
+        self,
+        task_id: str,
+        instrument_session: str,
+        headers: Mapping[str, str] | None = None,
+    ) -> None:
+        """
+        Create the first scan of a task with numtracker ahead of time, so that
+        opening its first run does not wait for numtracker. Numtracker cannot
+        take a scan number back, so the scan is skipped if the task never opens
+        a run. Does nothing without numtracker or if the task already has a
+        reservation. Must not be called from the RunEngine's event loop, which
+        creates the scan.
+
+        Args:
+            task_id: ID of the task the scan is for
+            instrument_session: Session the task's runs will belong to
+            headers: HTTP headers for numtracker, such as those of the user
+                that submitted the task
+        """
+        instrument = self.run_engine.md.get("instrument")
+        if self.numtracker is None or instrument is None:
+            return
+        with self._reserved_scans_lock:
+            if task_id in self._reserved_scans:
+                return
+        scan = asyncio.run_coroutine_threadsafe(
+            self.numtracker.create_scan(instrument_session, instrument, headers),
+            self.run_engine.loop,
+        ).result()
+        with self._reserved_scans_lock:
+            self._reserved_scans.setdefault(task_id, scan)
+
+    def release_scan(self, task_id: str) -> None:
+        """
+        Forget the scan reserved for a task, if it has one, and the headers of
+        its scans, because the task will not run or has finished
+        """
+        with self._reserved_scans_lock:
+            self._reserved_scans.pop(task_id, None)
+            self._scan_headers.pop(task_id, None)
+
     def find_device(self, addr: str | list[str]) -> Device | None:
         """
         Find a device in this context, allows for recursive search.
@@ -212,25 +349,40 @@ class BlueskyContext:
                 version = metadata.version(root_pkg[0])
                 LOGGER.info("Using package %s[%s]", root_pkg[0], version)
 
-        for source in config.sources:
-            mod = import_module(source.module)
-
-            match source:
-                case PlanSource():
+        device_sources = [
+            source
+            for source in config.sources
+            if isinstance(source, DeviceManagerSource)
+        ]
+        # Source modules are all imported by this thread, in order, so imports
+        # with side effects behave as they always have. Building and connecting
+        # devices, mostly waiting on the network, is done concurrently.
+        managers = [self._device_manager(source) for source in device_sources]
+        with ThreadPoolExecutor(
+            max_workers=config.concurrent_sources, thread_name_prefix="device-manager"
+        ) as executor:
+            connecting = [
+                executor.submit(self._build_and_connect, manager, source.mock)
+                for source, manager in zip(device_sources, managers, strict=True)
+            ]
+            for source in config.sources:
+                if isinstance(source, PlanSource):
                     LOGGER.info("Including plans from %s", source.module)
-                    self.with_plan_module(mod)
-                case DeviceManagerSource(mock=mock, name=name):
-                    LOGGER.info(
-                        "Including devices from 'deviceManager' source %s:%s",
-                        source.module,
-                        name,
-                    )
-                    manager = getattr(mod, name)
-                    if not isinstance(manager, DeviceManager):
+                    self.with_plan_module(import_module(source.module))
+            # Devices are registered in the order of their sources, however long
+            # each took to connect
+            providers: dict[str, DeviceManagerSource] = {}
+            for source, result in zip(device_sources, connecting, strict=True):
+                build_result = result.result()
+                for name in build_result.devices:
+                    if (provider := providers.setdefault(name, source)) is not source:
                         raise ValueError(
-                            f"{name} in module {mod} is not a device manager"
+                            f"Device {name!r} is provided by both "
+                            f"{provider.module}:{provider.name} and "
+                            f"{source.module}:{source.name}"
                         )
-                    self.with_device_manager(manager, mock)
+                self._add_devices(build_result, source.mock)
+        self._device_managers.extend(managers)
         if not self.devices:
             LOGGER.warning(
                 "Context had no devices after loading environment - are all modules "
@@ -272,9 +424,56 @@ class BlueskyContext:
                 self.register_plan(obj)
 
     def with_device_manager(self, manager: DeviceManager, mock: bool = False):
+        devices = self._add_devices(self._build_and_connect(manager, mock), mock)
+        self._device_managers.append(manager)
+        return devices
+
+    def mock_context(self) -> "BlueskyContext":
+        """
+        A context with the same plans as this one, but with every device built
+        again by its device manager with its connections mocked, so that plans
+        can be built and iterated without touching hardware. Devices registered
+        directly rather than built by a device manager are left out, so plans
+        that use them cannot be built. Built again whenever plans or devices
+        change.
+
+        Returns:
+            BlueskyContext: Context with mocked devices, sharing this context's
+                RunEngine, which it must not be used to run
+        """
+        with self._mock_context_lock:
+            generation = self.generation
+            if self._mock_context is not None and self._mock_context[0] == generation:
+                return self._mock_context[1]
+            mock = BlueskyContext(
+                run_engine=self.run_engine, path_provider=self.path_provider
+            )
+            for plan in self.plan_functions.values():
+                mock.register_plan(plan)
+            for manager in self._device_managers:
+                mock._add_devices(mock._build_and_connect(manager, True), True)
+            self._mock_context = (generation, mock)
+            return mock
+
+    def _device_manager(self, source: DeviceManagerSource) -> DeviceManager:
+        LOGGER.info(
+            "Including devices from 'deviceManager' source %s:%s",
+            source.module,
+            source.name,
+        )
+        mod = import_module(source.module)
+        manager = getattr(mod, source.name)
+        if not isinstance(manager, DeviceManager):
+            raise ValueError(f"{source.name} in module {mod} is not a device manager")
+        return manager
+
+    def _build_and_connect(
+        self, manager: DeviceManager, mock: bool
+    ) -> DeviceConnectResult:
         fixtures = {"path_provider": self.path_provider} if self.path_provider else {}
-        build_result = manager.build_and_connect(mock=mock, fixtures=fixtures)
+        return manager.build_and_connect(mock=mock, fixtures=fixtures)
 
+    def _add_devices(self, build_result: DeviceConnectResult, mock: bool):
         for device in build_result.devices.values():
             self.register_device(device)
 
@@ -331,6 +530,7 @@ class BlueskyContext:
             name=plan.__name__, model=model, description=plan.__doc__
         )
         self.plan_functions[plan.__name__] = plan
+        self.generation += 1
         return plan
 
     def register_device(self, device: Device, name: str | None = None) -> None:
@@ -359,10 +559,13 @@ class BlueskyContext:
                 raise KeyError(f"Must supply a name for this device: {device}")
 
         self.devices[name] = device
+        self.generation += 1
 
     def unregister_all_devices(self):
         """Unregister all devices from the context."""
         self.devices.clear()
+        self._device_managers.clear()
+        self.generation += 1
 
     def _reference(self, target: type) -> type:
         """
@@ -1,9 +1,16 @@
 import itertools
 import logging
+import threading
+import time
 from abc import ABC, abstractmethod
 from collections.abc import Callable
+from dataclasses import dataclass, field
+from enum import StrEnum
+from queue import Empty, Full, Queue
 from typing import Generic, TypeVar
 
+from opentelemetry.metrics import get_meter
+
 #: Event type
 E = TypeVar("E")
 
@@ -12,6 +19,17 @@ S = TypeVar("S")
 
 LOGGER = logging.getLogger(__name__)
 
+METER = get_meter("event_publisher")
+
+QUEUED_EVENTS = METER.create_up_down_counter(
+    "blueapi.events.queued",
+    description="Events waiting to be delivered to asynchronous subscribers",
+)
+DROPPED_EVENTS = METER.create_counter(
+    "blueapi.events.dropped",
+    description="Events discarded because a subscriber was falling behind",
+)
+
 
 class EventStream(ABC, Generic[E, S]):
     """
@@ -19,12 +37,19 @@ class EventStream(ABC, Generic[E, S]):
     """
 
     @abstractmethod
-    def subscribe(self, __callback: Callable[[E, str | None], None]) -> S:
+    def subscribe(
+        self,
+        __callback: Callable[[E, str | None], None],
+        synchronous: bool = False,
+    ) -> S:
         """
         Subscribe to new events with a callback
 
         Args:
             __callback: What to do with each event, optionally takes a correlation id
+            synchronous: Call the callback from the publishing thread even if the
+                stream normally delivers events asynchronously, for subscribers
+                that must see an event before the publisher carries on
 
         Returns:
             S: A unique token representing the subscription
@@ -46,28 +71,195 @@ class EventStream(ABC, Generic[E, S]):
         """
 
 
+class OverflowPolicy(StrEnum):
+    """
+    What an asynchronous publisher does when a subscriber's queue is full
+    """
+
+    #: Wait for the subscriber to make room, applying back-pressure
+    BLOCK = "block"
+    #: Discard the oldest queued event to make room for the new one
+    DROP_OLDEST = "drop_oldest"
+
+
+@dataclass
+class SubscriptionStats:
+    """
+    Delivery statistics of a subscription to an asynchronous publisher
+    """
+
+    #: Number of events queued but not yet delivered
+    lag: int = 0
+    #: Number of events discarded because the queue was full
+    dropped: int = 0
+    #: Number of events delivered to the subscriber
+    delivered: int = 0
+
+
+_STOP = object()
+
+
+@dataclass
+class _Subscription(Generic[E]):
+    callback: Callable[[E, str | None], None]
+    queue: Queue = field(default_factory=Queue)
+    thread: threading.Thread | None = None
+    closed: bool = False
+    dropped: int = 0
+    delivered: int = 0
+    #: Attributes of the metrics recorded for this subscription
+    attributes: dict[str, str] = field(default_factory=dict)
+
+    def run(self) -> None:
+        while True:
+            item = self.queue.get()
+            try:
+                if item is _STOP:
+                    return
+                QUEUED_EVENTS.add(-1, self.attributes)
+                if self.closed:
+                    # Whatever is still queued will never be delivered
+                    QUEUED_EVENTS.add(-self.queue.qsize(), self.attributes)
+                    return
+                event, correlation_id = item
+                try:
+                    self.callback(event, correlation_id)
+                except Exception:
+                    LOGGER.exception(f"Error delivering event: {event}")
+                self.delivered += 1
+            finally:
+                self.queue.task_done()
+
+    def wait_until_delivered(self, deadline: float | None) -> bool:
+        """
+        Wait until everything queued so far has been delivered, or until a
+        time from time.monotonic, returning whether it was all delivered
+        """
+        queue = self.queue
+        with queue.all_tasks_done:
+            while queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self) -> None:
+        # Deliver what is already queued, unless that would mean waiting
+        try:
+            self.queue.put_nowait(_STOP)
+        except Full:
+            self.closed = True
+
+
 class EventPublisher(EventStream[E, int]):
     """
     Simple Observable that can be fed values to publish
+
+    By default subscribers are called synchronously by whichever thread publishes
+    the event. An asynchronous publisher instead gives each subscription a bounded
+    queue and its own dispatch thread, so a slow subscriber cannot hold up the
+    publisher.
+
+    Args:
+        asynchronous: Deliver events to each subscriber from its own thread
+        max_queue_size: Maximum number of events waiting to be delivered to each
+            subscriber of an asynchronous publisher
+        overflow: What to do when a subscriber's queue is full
+        name: Name of the stream, recorded with the metrics of an asynchronous
+            publisher
     """
 
     _subscriptions: dict[int, Callable[[E, str | None], None]]
     _count: itertools.count
+    _asynchronous: bool
+    _max_queue_size: int
+    _overflow: OverflowPolicy
+    _name: str | None
+    _dispatchers: dict[int, _Subscription[E]]
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        asynchronous: bool = False,
+        max_queue_size: int = 1000,
+        overflow: OverflowPolicy = OverflowPolicy.BLOCK,
+        name: str | None = None,
+    ) -> None:
         self._subscriptions = {}
         self._count = itertools.count()
+        self._asynchronous = asynchronous
+        self._max_queue_size = max_queue_size
+        self._overflow = overflow
+        self._name = name
+        self._dispatchers = {}
 
-    def subscribe(self, callback: Callable[[E, str | None], None]) -> int:
+    def subscribe(
+        self,
+        callback: Callable[[E, str | None], None],
+        synchronous: bool = False,
+    ) -> int:
         sub_id = next(self._count)
+        if self._asynchronous and not synchronous:
+            subscription = _Subscription(
+                callback,
+                queue=Queue(maxsize=self._max_queue_size),
+                attributes={"stream": self._name} if self._name else {},
+            )
+            subscription.thread = threading.Thread(
+                target=subscription.run,
+                name=f"event-dispatch-{sub_id}",
+                daemon=True,
+            )
+            subscription.thread.start()
+            self._dispatchers[sub_id] = subscription
+            callback = self._enqueuer(subscription)
         self._subscriptions[sub_id] = callback
         return sub_id
 
     def unsubscribe(self, subscription: int) -> None:
         del self._subscriptions[subscription]
+        if (dispatcher := self._dispatchers.pop(subscription, None)) is not None:
+            dispatcher.close()
 
     def unsubscribe_all(self) -> None:
         self._subscriptions = {}
+        dispatchers, self._dispatchers = self._dispatchers, {}
+        for dispatcher in dispatchers.values():
+            dispatcher.close()
+
+    def subscription_stats(self) -> dict[int, SubscriptionStats]:
+        """
+        Delivery statistics of each subscription, only populated for an
+        asynchronous publisher.
+
+        Returns:
+            dict[int, SubscriptionStats]: Statistics keyed by subscription token
+        """
+        return {
+            sub_id: SubscriptionStats(
+                lag=dispatcher.queue.qsize(),
+                dropped=dispatcher.dropped,
+                delivered=dispatcher.delivered,
+            )
+            for sub_id, dispatcher in list(self._dispatchers.items())
+        }
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """
+        Wait until every event published so far has been delivered to the
+        subscribers of an asynchronous publisher.
+
+        Args:
+            timeout: Seconds to wait at most, waits as long as it takes if None
+
+        Returns:
+            bool: Whether every event was delivered in time
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        return all(
+            dispatcher.wait_until_delivered(deadline)
+            for dispatcher in list(self._dispatchers.values())
+        )
 
     def publish(self, event: E, correlation_id: str | None = None) -> None:
         """
@@ -86,3 +278,33 @@ class EventPublisher(EventStream[E, int]):
                 errs.append(e)
         if errs:
             raise ExceptionGroup(f"Error(s) publishing event: {event}", errs)
+
+    def _enqueuer(
+        self, subscription: _Subscription[E]
+    ) -> Callable[[E, str | None], None]:
+        def enqueue(event: E, correlation_id: str | None) -> None:
+            attributes = subscription.attributes
+            if self._overflow is OverflowPolicy.BLOCK:
+                subscription.queue.put((event, correlation_id))
+                QUEUED_EVENTS.add(1, attributes)
+                return
+            while True:
+                try:
+                    subscription.queue.put_nowait((event, correlation_id))
+                    QUEUED_EVENTS.add(1, attributes)
+                    return
+                except Full:
+                    try:
+                        subscription.queue.get_nowait()
+                    except Empty:
+                        continue
+                    subscription.queue.task_done()
+                    QUEUED_EVENTS.add(-1, attributes)
+                    DROPPED_EVENTS.add(1, attributes)
+                    if subscription.dropped == 0:
+                        LOGGER.warning(
+                            "Event subscriber is falling behind, dropping events"
+                        )
+                    subscription.dropped += 1
+
+        return enqueue
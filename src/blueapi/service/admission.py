@@ -0,0 +1,266 @@
+import math
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from threading import Lock
+
+from opentelemetry.metrics import get_meter
+
+from blueapi.config import AdmissionConfig
+
+METER = get_meter("admission_control")
+
+REJECTIONS = METER.create_counter(
+    "blueapi.admission.rejections",
+    description="Task submissions turned away by admission control",
+)
+
+
+class AdmissionRejectedError(Exception):
+    """
+    A submission was turned away before reaching the worker
+
+    Args:
+        reason: Which limit was reached, one of "rate", "user_rate" or "pending"
+        retry_after: Seconds after which the submission may succeed
+    """
+
+    def __init__(self, reason: str, retry_after: float) -> None:
+        super().__init__(f"Too many requests ({reason}), retry in {retry_after:.1f}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        """Value of the Retry-After header, which only allows whole seconds"""
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class TokenBucket:
+    """
+    Allows a steady rate of events with bursts of up to a fixed size. Not
+    thread-safe.
+
+    Args:
+        rate: Events allowed per second
+        burst: Events allowed at once after a quiet period
+        now: Current time in seconds
+    """
+
+    _rate: float
+    _burst: float
+    _tokens: float
+    _updated: float
+
+    def __init__(self, rate: float, burst: float, now: float) -> None:
+        self._rate = rate
+        self._burst = burst
+        self._tokens = burst
+        self._updated = now
+
+    def take(self, now: float) -> float:
+        """
+        Take a token if one is available
+
+        Returns:
+            float: 0 if a token was taken, otherwise seconds until one will be
+                available
+        """
+        self._tokens = min(
+            self._burst, self._tokens + (now - self._updated) * self._rate
+        )
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self._rate
+
+    def give_back(self) -> None:
+        """
+        Return a token that was taken for an event that did not happen
+        """
+        self._tokens = min(self._burst, self._tokens + 1)
+
+    def is_full(self, now: float) -> bool:
+        """
+        Whether the bucket has refilled, so is no different to a new one
+        """
+        return self._tokens + (now - self._updated) * self._rate >= self._burst
+
+
+@dataclass
+class _Pending:
+    #: Tasks the user is thought to have pending, an upper bound between checks
+    count: int
+    #: When the count was last checked with the worker
+    checked: float
+    #: When tasks were last admitted for the user
+    admitted: float
+
+
+class AdmissionController:
+    """
+    Decides in the API process whether to accept task submissions, so that a
+    flood of requests is turned away without reaching the worker. Rates are
+    limited with token buckets, overall and for each user. Pending tasks are
+    counted as they are admitted and only checked with the worker once a user
+    appears to have reached their limit, and then at most once every refresh
+    interval, so most submissions are decided without a call to the worker.
+    Rejected requests use up none of the limits, and requests that fail once
+    admitted, such as those with invalid parameters, are refunded, so that only
+    submitted tasks count toward the limits. Users
+    are forgotten once their rate limit has refilled and they have submitted
+    nothing for the configured expiry. Thread-safe.
+
+    Args:
+        config: Limits to apply, all of which are off by default
+        clock: Source of the current time in seconds
+    """
+
+    _config: AdmissionConfig
+    _clock: Callable[[], float]
+    _lock: Lock
+    _global: TokenBucket | None
+    _users: dict[str | None, TokenBucket]
+    _pending: dict[str | None, _Pending]
+    _forgotten: float
+
+    def __init__(
+        self, config: AdmissionConfig, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self._config = config
+        self._clock = clock
+        self._lock = Lock()
+        self._global = (
+            TokenBucket(config.rate, config.burst, clock())
+            if config.rate is not None
+            else None
+        )
+        self._users = {}
+        self._pending = {}
+        self._forgotten = clock()
+
+    def admit(
+        self,
+        user: str | None,
+        tasks: int = 1,
+        count_pending: Callable[[], int] | None = None,
+    ) -> None:
+        """
+        Admit a request that submits tasks for a user, or reject it
+
+        Args:
+            user: Who submitted the request, None if unauthenticated
+            tasks: Number of tasks the request submits
+            count_pending: Asks the worker how many tasks the user has pending,
+                only called when the user appears to be at their limit
+
+        Throws:
+            AdmissionRejectedError: If the request would break one of the limits
+        """
+        try:
+            self._check_rates(user)
+            try:
+                self._check_pending(user, tasks, count_pending)
+            except AdmissionRejectedError:
+                # Rejected requests do not use up the rates
+                with self._lock:
+                    self._give_back_rates(user)
+                raise
+        except AdmissionRejectedError as rejection:
+            REJECTIONS.add(1, {"reason": rejection.reason})
+            raise
+
+    def refund(self, user: str | None, tasks: int = 1) -> None:
+        """
+        Take back what an admitted request was charged, because it did not
+        submit its tasks after all
+
+        Args:
+            user: Who submitted the request, None if unauthenticated
+            tasks: Number of tasks the request was admitted for
+        """
+        with self._lock:
+            self._give_back_rates(user)
+            if (pending := self._pending.get(user)) is not None:
+                pending.count = max(0, pending.count - tasks)
+
+    def _give_back_rates(self, user: str | None) -> None:
+        """
+        Give back the rate tokens taken for a request. Must be called with the
+        lock held.
+        """
+        if self._global:
+            self._global.give_back()
+        if (bucket := self._users.get(user)) is not None:
+            bucket.give_back()
+
+    def _check_rates(self, user: str | None) -> None:
+        config = self._config
+        with self._lock:
+            now = self._clock()
+            self._forget_idle_users(now)
+            if self._global and (wait := self._global.take(now)):
+                raise AdmissionRejectedError("rate", wait)
+            if config.user_rate is not None:
+                bucket = self._users.get(user)
+                if bucket is None:
+                    bucket = TokenBucket(config.user_rate, config.burst, now)
+                    self._users[user] = bucket
+                if wait := bucket.take(now):
+                    if self._global:
+                        self._global.give_back()
+                    raise AdmissionRejectedError("user_rate", wait)
+
+    def _forget_idle_users(self, now: float) -> None:
+        """
+        Drop the rate limits of users that have refilled, which are no different
+        to new ones, and the pending counts of users who have submitted nothing
+        for the expiry, at most once every expiry. Must be called with the lock
+        held.
+        """
+        expiry = self._config.user_expiry
+        if now - self._forgotten < expiry:
+            return
+        self._forgotten = now
+        self._users = {
+            user: bucket
+            for user, bucket in self._users.items()
+            if not bucket.is_full(now)
+        }
+        self._pending = {
+            user: pending
+            for user, pending in self._pending.items()
+            if now - pending.admitted < expiry
+        }
+
+    def _check_pending(
+        self,
+        user: str | None,
+        tasks: int,
+        count_pending: Callable[[], int] | None,
+    ) -> None:
+        limit = self._config.max_pending_per_user
+        if limit is None:
+            return
+        interval = self._config.refresh_interval
+        with self._lock:
+            now = self._clock()
+            pending = self._pending.setdefault(user, _Pending(0, -math.inf, now))
+            if pending.count + tasks <= limit:
+                pending.count += tasks
+                pending.admitted = now
+                return
+            stale = now - pending.checked >= interval
+        if count_pending is None or not stale:
+            raise AdmissionRejectedError("pending", interval)
+        # Ask the worker without holding the lock so other users are not held
+        # up, tasks admitted meanwhile may go uncounted until the next check
+        count = count_pending()
+        with self._lock:
+            pending.count = count
+            pending.checked = self._clock()
+            if pending.count + tasks > limit:
+                raise AdmissionRejectedError("pending", interval)
+            pending.count += tasks
+            pending.admitted = pending.checked
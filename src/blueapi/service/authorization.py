@@ -10,7 +10,7 @@ from starlette.status import HTTP_401_UNAUTHORIZED, HTTP_403_FORBIDDEN
 
 from blueapi.config import OIDCConfig, OpaConfig, ServiceAccount
 from blueapi.service.authentication import TiledAuth, unchecked_bearer_token
-from blueapi.service.model import TaskRequest
+from blueapi.service.model import SweepRequest, TaskRequest
 from blueapi.utils import INSTRUMENT_SESSION_RE
 
 LOGGER = logging.getLogger(__name__)
@@ -89,7 +89,7 @@ class OpaUserClient:
         self.client = client
         self.token = token
 
-    async def can_submit_task(self, task: TaskRequest):
+    async def can_submit_task(self, task: TaskRequest | SweepRequest):
         LOGGER.info("Checking permissions to run task")
         await self.client.require_submit_task(task.instrument_session, self.token)
 
@@ -133,3 +133,11 @@ async def submit_permission(
 ):
     if opa:
         await opa.can_submit_task(task_request)
+
+
+async def sweep_permission(
+    opa: Annotated[OpaUserClient | None, Depends(opa)],
+    sweep_request: SweepRequest,
+):
+    if opa:
+        await opa.can_submit_task(sweep_request)
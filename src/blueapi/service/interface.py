@@ -1,13 +1,20 @@
 import logging
+import uuid
 from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from functools import cache
 from multiprocessing.connection import Connection
+from multiprocessing.reduction import ForkingPickler
+from pathlib import Path
+from threading import Lock
 from typing import Any
 
 from bluesky.callbacks.tiled_writer import TiledWriter
 from bluesky_stomp.messaging import StompClient
-from bluesky_stomp.models import Broker, DestinationBase, MessageTopic
+from bluesky_stomp.models import DestinationBase, MessageTopic
+from bluesky_stomp.serdes import serialize_message
+from stomp.connect import StompConnection11
 from tiled.client import from_uri
 
 from blueapi.cli.scratch import get_python_environment
@@ -19,14 +26,28 @@ from blueapi.log import set_up_logging
 from blueapi.service.authentication import TiledAuth
 from blueapi.service.model import (
     DeviceModel,
+    PartyQueueStats,
     PlanModel,
+    PriorityQueueStats,
     PythonEnvironmentResponse,
+    QueueStatsResponse,
+    QueueWaitTimes,
     SourceInfo,
+    SweepRequest,
+    SweepResponse,
+    TaskQuery,
     TaskRequest,
     WorkerTask,
 )
 from blueapi.utils.serialization import access_blob
-from blueapi.worker.event import ProgressEvent, TaskStatusEnum, WorkerEvent, WorkerState
+from blueapi.worker.event import (
+    ProgressEvent,
+    TaskStatus,
+    TaskStatusEnum,
+    WorkerEvent,
+    WorkerState,
+)
+from blueapi.worker.profiling import TaskProfile
 from blueapi.worker.task import Task
 from blueapi.worker.task_worker import TaskWorker, TrackableTask
 
@@ -36,6 +57,18 @@ context and worker"""
 LOGGER = logging.getLogger(__name__)
 _CONFIG: ApplicationConfig = ApplicationConfig()
 
+# Headers to pass through to numtracker/tiled for tasks waiting in the run queue
+_QUEUED_TASK_HEADERS: dict[str, Mapping[str, str]] = {}
+
+# Tiled writer prepared for the next queued task while the current one runs
+_STAGED_WRITERS: dict[str, TiledWriter] = {}
+_STAGED_WRITERS_LOCK = Lock()
+
+# Bytes published for each task and sink since the last worker event, added to
+# the tasks in one batch when the next worker event is published
+_UNACCOUNTED_BYTES: dict[tuple[str, str], int] = {}
+_UNACCOUNTED_BYTES_LOCK = Lock()
+
 
 def config() -> ApplicationConfig:
     return _CONFIG
@@ -58,23 +91,51 @@ def worker() -> TaskWorker:
     worker = TaskWorker(
         context(),
         broadcast_statuses=config().env.events.broadcast_status_events,
+        retention=config().env.retention,
+        max_progress_rate=config().env.events.max_progress_rate,
+        progress_deltas=config().env.events.progress_deltas,
+        progress_snapshot_interval=config().env.events.progress_snapshot_interval,
+        asynchronous_events=config().env.events.asynchronous_dispatch,
+        event_queue_size=config().env.events.subscriber_queue_size,
+        event_drop_policy=config().env.events.drop_policy,
+        document_spans=config().env.document_spans,
+        event_page_size=config().env.events.event_page_size,
+        event_page_max_delay=config().env.events.event_page_max_delay,
+        parallel_run_engines=config().env.parallel_run_engines,
+        preemption=config().env.scheduling.preemption,
+        fair_share=config().env.scheduling.fair_share,
+        session_weights=config().env.scheduling.session_weights,
+        session_quotas=config().env.scheduling.session_quotas,
+        quota_period=config().env.scheduling.quota_period,
+        profile_messages=config().env.profile_messages,
+        watchdog=config().env.watchdog,
+        results=config().env.results,
+        estimation=config().env.estimation,
     )
+    # Sinks must be connected before the task emits any documents
+    worker.worker_events.subscribe(_on_queued_task_started, synchronous=True)
     worker.start()
     return worker
 
 
+@cache
+def _staging_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="task-staging")
+
+
 @cache
 def stomp_client() -> StompClient | None:
     stomp_config: StompConfig = config().stomp
     if stomp_config.enabled:
         assert stomp_config.url.host is not None, "Stomp URL missing host"
         assert stomp_config.url.port is not None, "Stomp URL missing port"
-        client = StompClient.for_broker(
-            broker=Broker(
-                host=stomp_config.url.host,
-                port=stomp_config.url.port,
-                auth=stomp_config.auth,
-            )
+        client = StompClient(
+            StompConnection11(
+                [(stomp_config.url.host, stomp_config.url.port)],
+                auto_content_length=False,
+            ),
+            authentication=stomp_config.auth,
+            serializer=_serialize_and_account,
         )
 
         task_worker = worker()
@@ -109,9 +170,58 @@ def teardown() -> None:
         stomp_client_ref.disconnect()
     context.cache_clear()
     worker.cache_clear()
+    _QUEUED_TASK_HEADERS.clear()
+    _staging_executor().shutdown(wait=False, cancel_futures=True)
+    _staging_executor.cache_clear()
+    with _STAGED_WRITERS_LOCK:
+        _STAGED_WRITERS.clear()
+    with _UNACCOUNTED_BYTES_LOCK:
+        _UNACCOUNTED_BYTES.clear()
     stomp_client.cache_clear()
 
 
+def _serialize_and_account(message: Any) -> bytes:
+    """Serialize a message for the message bus, adding its size to the
+    resources used by the task it belongs to"""
+    serialized = serialize_message(message)
+    _account_in_batch(message, "stomp", len(serialized))
+    return serialized
+
+
+def _account_in_batch(message: Any, sink: str, size: int) -> None:
+    """Add the size of a published message to the current batch, adding the
+    whole batch to the resources of its tasks if the message is a worker event,
+    so that the worker is updated once per batch rather than for every document
+    """
+    if (task_id := _task_id_of(message)) is None:
+        return
+    with _UNACCOUNTED_BYTES_LOCK:
+        key = (task_id, sink)
+        _UNACCOUNTED_BYTES[key] = _UNACCOUNTED_BYTES.get(key, 0) + size
+        if not isinstance(message, WorkerEvent):
+            return
+        batch = dict(_UNACCOUNTED_BYTES)
+        _UNACCOUNTED_BYTES.clear()
+    for (task_id, sink), published in batch.items():
+        account_published(task_id, sink, published)
+
+
+def _task_id_of(message: Any) -> str | None:
+    match message:
+        case (
+            DataEvent(task_id=task_id)
+            | ProgressEvent(task_id=task_id)
+            | WorkerEvent(task_status=TaskStatus(task_id=task_id))
+        ):
+            return task_id
+    return None
+
+
+def account_published(task_id: str, sink: str, size: int) -> None:
+    """Add bytes published to a sink to the resources used by a task"""
+    worker().account_published(task_id, sink, size)
+
+
 def _publish_event_streams(
     streams_to_destinations: Mapping[EventStream, DestinationBase],
 ) -> None:
@@ -172,13 +282,55 @@ def submit_task(
         name=task_request.name,
         params=task_request.params,
         metadata=metadata,
+        priority=task_request.priority,
+        steps=[Task(name=step.name, params=step.params) for step in task_request.steps],
+        stop_on_failure=task_request.stop_on_failure,
     )
     return worker().submit_task(task)
 
 
+def submit_sweep(
+    sweep_request: SweepRequest,
+    metadata: dict[str, Any] | None = None,
+    pass_through_headers: Mapping[str, str] | None = None,
+) -> SweepResponse:
+    """Submit a task for each point of a sweep and add them all to the run queue.
+    No task is queued unless every point is valid and can be queued."""
+    sweep_id = str(uuid.uuid4())
+    task_ids: list[str] = []
+    queued: list[str] = []
+    try:
+        for index, params in enumerate(sweep_request.points()):
+            task_request = TaskRequest(
+                name=sweep_request.name,
+                params=params,
+                instrument_session=sweep_request.instrument_session,
+                priority=sweep_request.priority,
+            )
+            sweep_metadata = {
+                **(metadata or {}),
+                "sweep_id": sweep_id,
+                "sweep_index": index,
+            }
+            task_ids.append(submit_task(task_request, sweep_metadata))
+        for task_id in task_ids:
+            enqueue_task(WorkerTask(task_id=task_id), pass_through_headers)
+            queued.append(task_id)
+    except:
+        for task_id in queued:
+            dequeue_task(task_id)
+        for task_id in task_ids:
+            clear_task(task_id)
+        raise
+    return SweepResponse(sweep_id=sweep_id, task_ids=task_ids)
+
+
 def clear_task(task_id: str) -> str:
     """Remove a task from the worker"""
-    return worker().clear_task(task_id)
+    cleared = worker().clear_task(task_id)
+    _QUEUED_TASK_HEADERS.pop(task_id, None)
+    _unstage(task_id)
+    return cleared
 
 
 def begin_task(
@@ -187,54 +339,184 @@ def begin_task(
     """Trigger a task. Will fail if the worker is busy"""
 
     active_worker = worker()
-    active_context = context()
-    if nt := active_context.numtracker:
-        nt.set_headers(pass_through_headers or {})
+    subscribers = _subscribe_task_sinks(task.task_id, pass_through_headers)
+    if task.task_id is not None:
+        try:
+            active_worker.begin_task(task.task_id)
+        except:
+            for channel, token in subscribers:
+                channel.unsubscribe(token)
+            context().release_scan(task.task_id)
+            raise
+    return task
 
-    subscribers = []
-    if tiled_config := active_context.tiled_conf:
-        # Tiled queries the root node, so must create an authorized client
-        if isinstance(tiled_config.authentication, ServiceAccount):
-            tiled_client = from_uri(
-                str(tiled_config.url),
-                auth=TiledAuth(tiled_auth=tiled_config.authentication),
-            )
-        else:
-            tiled_client = from_uri(
-                str(tiled_config.url),
-                api_key=tiled_config.authentication,
-                headers=pass_through_headers,
+
+def enqueue_task(
+    task: WorkerTask, pass_through_headers: Mapping[str, str] | None = None
+) -> WorkerTask:
+    """Add a task to the run queue, it will be started when the worker is free"""
+
+    if task.task_id is not None:
+        # Sinks are only connected once the task starts, so that they do not
+        # receive documents from the tasks ahead of it in the queue
+        _QUEUED_TASK_HEADERS[task.task_id] = pass_through_headers or {}
+        try:
+            worker().enqueue_task(task.task_id)
+        except:
+            _QUEUED_TASK_HEADERS.pop(task.task_id, None)
+            raise
+        _stage_next_task()
+    return task
+
+
+def dequeue_task(task_id: str) -> str:
+    """Remove a task from the run queue, leaving it pending"""
+    removed = worker().dequeue_task(task_id)
+    _QUEUED_TASK_HEADERS.pop(task_id, None)
+    _unstage(task_id)
+    _stage_next_task()
+    return removed
+
+
+def reorder_queue(task_ids: list[str]) -> list[str]:
+    """Set the order in which queued tasks will be run"""
+    order = worker().reorder_queue(task_ids)
+    _stage_next_task()
+    return order
+
+
+def get_queue() -> list[TrackableTask]:
+    """Tasks waiting in the run queue, in the order they will be run"""
+    return worker().get_queue()
+
+
+def get_queue_stats() -> QueueStatsResponse:
+    """How long queued tasks have waited and how the worker has been shared"""
+    return QueueStatsResponse(
+        priorities=[
+            PriorityQueueStats(
+                priority=priority, waits=QueueWaitTimes.from_stats(stats)
             )
+            for priority, stats in worker().queue_wait_stats().items()
+        ],
+        parties=[
+            PartyQueueStats.from_share(share) for share in worker().party_shares()
+        ],
+    )
+
 
-        tiled_writer_token = active_context.run_engine.subscribe(
-            TiledWriter(tiled_client, batch_size=1)
+def _on_queued_task_started(event: WorkerEvent, _: str | None) -> None:
+    if (task_id := event.task_id) is None:
+        return
+    if (headers := _QUEUED_TASK_HEADERS.pop(task_id, None)) is not None:
+        if event.task_status and not event.task_status.task_complete:
+            _subscribe_task_sinks(task_id, headers)
+            _stage_next_task()
+
+
+def _stage_next_task() -> None:
+    """Prepare the next queued task in the background, if lookahead is enabled"""
+    if config().env.scheduling.lookahead:
+        _staging_executor().submit(_prepare_next_task)
+
+
+def _prepare_next_task() -> None:
+    """Validate the parameters of the next queued task, reserve a scan number for
+    its session and build its Tiled writer, so none of them delay it when it
+    starts"""
+    try:
+        if (task := worker().stage_next_task()) is None:
+            return
+        headers = _QUEUED_TASK_HEADERS.get(task.task_id)
+        if instrument_session := task.task.metadata.get("instrument_session"):
+            context().reserve_scan(task.task_id, instrument_session, headers or {})
+        with _STAGED_WRITERS_LOCK:
+            if task.task_id in _STAGED_WRITERS:
+                return
+        if (writer := _tiled_writer(headers)) is not None:
+            with _STAGED_WRITERS_LOCK:
+                # Only the next task is staged, an earlier guess is out of date
+                _STAGED_WRITERS.clear()
+                _STAGED_WRITERS[task.task_id] = writer
+    except Exception:
+        LOGGER.exception("Failed to prepare the next queued task")
+
+
+def _unstage(task_id: str) -> None:
+    with _STAGED_WRITERS_LOCK:
+        _STAGED_WRITERS.pop(task_id, None)
+    context().release_scan(task_id)
+
+
+def _tiled_writer(
+    pass_through_headers: Mapping[str, str] | None,
+) -> TiledWriter | None:
+    """Build a writer that sends a task's documents to Tiled, if it is configured"""
+    if (tiled_config := context().tiled_conf) is None:
+        return None
+    # Tiled queries the root node, so must create an authorized client
+    if isinstance(tiled_config.authentication, ServiceAccount):
+        tiled_client = from_uri(
+            str(tiled_config.url),
+            auth=TiledAuth(tiled_auth=tiled_config.authentication),
+        )
+    else:
+        tiled_client = from_uri(
+            str(tiled_config.url),
+            api_key=tiled_config.authentication,
+            headers=pass_through_headers,
         )
-        subscribers.append((active_context.run_engine, tiled_writer_token))
+    return TiledWriter(tiled_client, batch_size=1)
+
+
+def _subscribe_task_sinks(
+    task_id: str | None, pass_through_headers: Mapping[str, str] | None
+) -> list[tuple[Any, int]]:
+    """Prepare the per-task data sinks and numtracker headers for a task.
+
+    Returns the subscriptions that were made so they can be cancelled if the
+    task fails to start. Otherwise they are removed when the task completes.
+    """
+    active_worker = worker()
+    if task_id is not None:
+        # Set per task, as tasks may run at the same time for different users
+        context().set_scan_headers(task_id, pass_through_headers or {})
+
+    subscribers = []
+    with _STAGED_WRITERS_LOCK:
+        writer = _STAGED_WRITERS.pop(task_id, None) if task_id is not None else None
+    if writer is None:
+        writer = _tiled_writer(pass_through_headers)
+    if writer is not None:
+        tiled_writer = writer
+
+        # Documents come from whichever RunEngine runs the task, so are taken
+        # from the worker rather than the main RunEngine
+        def write_task_documents(event: DataEvent, _: str | None) -> None:
+            if event.task_id == task_id:
+                tiled_writer(event.name, event.doc)
+
+        tiled_writer_token = active_worker.data_events.subscribe(
+            write_task_documents, synchronous=True
+        )
+        subscribers.append((active_worker.data_events, tiled_writer_token))
 
         def remove_callback_when_task_finished(
             event: WorkerEvent, correlation_id: str | None
         ) -> None:
             if (
                 event.task_status
-                and event.task_status.task_id == task.task_id
+                and event.task_status.task_id == task_id
                 and event.task_status.task_complete
             ):
                 for channel, token in subscribers:
                     channel.unsubscribe(token)
 
         remove_callback = active_worker.worker_events.subscribe(
-            remove_callback_when_task_finished
+            remove_callback_when_task_finished, synchronous=True
         )
         subscribers.append((active_worker.worker_events, remove_callback))
-
-    if task.task_id is not None:
-        try:
-            active_worker.begin_task(task.task_id)
-        except:
-            for channel, token in subscribers:
-                channel.unsubscribe(token)
-            raise
-    return task
+    return subscribers
 
 
 def get_active_task() -> TrackableTask | None:
@@ -257,16 +539,50 @@ def resume_worker() -> None:
     worker().resume()
 
 
-def cancel_active_task(failure: bool, reason: str | None) -> str:
-    """Remove the currently active task from the worker if there is one
-    Returns the task_id of the active task"""
-    return worker().cancel_active_task(failure, reason)
+def cancel_active_task(
+    failure: bool, reason: str | None, task_id: str | None = None
+) -> str:
+    """Remove the currently active tasks from the worker if there are any, or
+    only the one with the given ID. Returns the task_id of the active task"""
+    return worker().cancel_active_task(failure, reason, task_id)
+
 
+def get_tasks(
+    status: TaskStatusEnum | None = None,
+    user: str | None = None,
+    plan: str | None = None,
+    instrument_session: str | None = None,
+) -> list[TrackableTask]:
+    """Retrieve a list of tasks based on their status, user, plan and instrument
+    session. Filters that are None are not applied"""
+    return worker().get_tasks(status, user, plan, instrument_session)
 
-def get_tasks(status: TaskStatusEnum | None = None) -> list[TrackableTask]:
-    """Retrieve a list of tasks based on their status.
-    Return a list of all tasks on the worker if status is None"""
-    return worker().get_tasks(status)
+
+@dataclass
+class TaskPage:
+    tasks: list[dict[str, Any]]
+    next_cursor: int | None
+
+
+def get_task_page(query: TaskQuery) -> TaskPage:
+    """Retrieve a page of tasks matching a query. Tasks are serialized here,
+    keeping only the requested fields, so that heavy fields such as params
+    and outcomes are not sent to the caller unless needed"""
+    tasks, next_cursor = worker().get_task_page(
+        limit=query.limit,
+        after=query.after,
+        status=query.task_status,
+        user=query.user,
+        plan=query.plan,
+        instrument_session=query.instrument_session,
+        submitted_after=query.submitted_after,
+        submitted_before=query.submitted_before,
+    )
+    include = query.projection()
+    return TaskPage(
+        tasks=[task.model_dump(mode="json", include=include) for task in tasks],
+        next_cursor=next_cursor,
+    )
 
 
 def get_task_by_id(task_id: str) -> TrackableTask | None:
@@ -275,6 +591,30 @@ def get_task_by_id(task_id: str) -> TrackableTask | None:
     return worker().get_task_by_id(task_id)
 
 
+def get_task_profile(task_id: str) -> TaskProfile | None:
+    """Returns the profile of a task's plan, if the task has finished and its
+    messages were profiled"""
+    return worker().get_task_profile(task_id)
+
+
+def get_stored_result(task_id: str) -> Path | None:
+    """Returns where the result of a task is stored, if it was too large to be
+    included in the task"""
+    return worker().get_stored_result(task_id)
+
+
+def count_pending_tasks(user: str | None) -> int:
+    """Number of tasks submitted by a user that have not started yet, or by
+    anyone if user is None"""
+    return len(worker().get_tasks(TaskStatusEnum.PENDING, user=user))
+
+
+def get_task_owner(task_id: str) -> str | None:
+    """Returns the user that submitted a task, raising a KeyError if the
+    worker does not know of it"""
+    return worker().get_task_owner(task_id)
+
+
 def get_oidc_config() -> OIDCConfig | None:
     return config().oidc
 
@@ -296,16 +636,23 @@ class SubHandles:
 
 def pipe_events(sender: Connection) -> SubHandles:
     tw = worker()
+    # Each stream may deliver events from a thread of its own
+    sending = Lock()
 
     def handler(
         worker_event: WorkerEvent | DataEvent | ProgressEvent,
         _cor_id: str | None,
     ) -> None:
 
+        # Pickle here rather than in send so the size of each event is known
+        serialized = ForkingPickler.dumps(worker_event)
         try:
-            sender.send(worker_event)
+            with sending:
+                sender.send_bytes(serialized)
         except BrokenPipeError:
             LOGGER.warning("Sending event to broken pipe")
+            return
+        _account_in_batch(worker_event, "pipe", len(serialized))
 
     w = tw.worker_events.subscribe(handler)
     d = tw.data_events.subscribe(handler)
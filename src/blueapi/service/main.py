@@ -1,8 +1,9 @@
 import logging
 import urllib.parse
-from collections.abc import Awaitable, Callable
-from contextlib import asynccontextmanager
-from typing import Annotated
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime
+from typing import Annotated, Any
 
 import jwt
 from bluesky._vendor.super_state_machine.errors import TransitionError
@@ -13,6 +14,7 @@ from fastapi import (
     Depends,
     FastAPI,
     HTTPException,
+    Query,
     Request,
     Response,
     WebSocket,
@@ -22,7 +24,7 @@ from fastapi import (
 from fastapi.datastructures import Address
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.requests import HTTPConnection
-from fastapi.responses import RedirectResponse, StreamingResponse
+from fastapi.responses import FileResponse, RedirectResponse, StreamingResponse
 from observability_utils.tracing import (
     add_span_attributes,
     get_tracer,
@@ -37,6 +39,7 @@ from starlette.status import WS_1007_INVALID_FRAME_PAYLOAD_DATA, WS_1013_TRY_AGA
 from blueapi.config import ApplicationConfig, OIDCConfig, Tag
 from blueapi.core.bluesky_types import DataEvent
 from blueapi.service import interface, protocol
+from blueapi.service.admission import AdmissionController, AdmissionRejectedError
 from blueapi.service.authentication import (
     Fedid,
     build_access_token_check,
@@ -50,13 +53,15 @@ from blueapi.service.middleware import (
 from blueapi.service.protocol import (
     InvalidArgs,
     PlanNotFound,
+    RateLimited,
     ServerBusy,
     Submit,
     Unauthorized,
     Update,
 )
 from blueapi.worker import TrackableTask, WorkerState
-from blueapi.worker.event import ProgressEvent, TaskStatusEnum, WorkerEvent
+from blueapi.worker.event import ProgressEvent, TaskResult, TaskStatusEnum, WorkerEvent
+from blueapi.worker.profiling import TaskProfile
 from blueapi.worker.worker_errors import WorkerBusyError
 
 from .authorization import (
@@ -64,6 +69,7 @@ from .authorization import (
     OpaUserClient,
     opa,
     submit_permission,
+    sweep_permission,
     validate_tiled_config,
 )
 from .model import (
@@ -75,11 +81,18 @@ from .model import (
     PlanModel,
     PlanResponse,
     PythonEnvironmentResponse,
+    QueueOrderRequest,
+    QueueResponse,
+    QueueStatsResponse,
     SourceInfo,
     StateChangeRequest,
+    SweepRequest,
+    SweepResponse,
+    TaskField,
+    TaskPageResponse,
+    TaskQuery,
     TaskRequest,
     TaskResponse,
-    TasksListResponse,
     WorkerTask,
 )
 from .runner import WorkerDispatcher
@@ -100,6 +113,11 @@ def _runner() -> WorkerDispatcher:
     return RUNNER
 
 
+def admission(connection: HTTPConnection) -> AdmissionController:
+    """Intended to be used only with FastAPI Depends"""
+    return connection.app.state.admission
+
+
 def setup_runner(
     config: ApplicationConfig | None = None,
     runner: WorkerDispatcher | None = None,
@@ -156,6 +174,7 @@ def get_app(config: ApplicationConfig):
         app.swagger_ui_init_oauth = {
             "clientId": "NOT_SUPPORTED",
         }
+    app.state.admission = AdmissionController(config.api.admission)
     app.include_router(open_router)
     app.include_router(secure_router_v1, dependencies=dependencies)
     app.include_router(secure_router_v2, dependencies=dependencies)
@@ -188,13 +207,9 @@ async def access_task_permission(
     fedid: Fedid,
     runner: Annotated[WorkerDispatcher, Depends(_runner)],
 ):
-    task = runner.run(interface.get_task_by_id, task_id)
+    owner = runner.run(interface.get_task_owner, task_id)
 
-    if (
-        opa
-        and not await opa.admin()
-        and (task and fedid != task.task.metadata.get("user"))
-    ):
+    if opa and not await opa.admin() and fedid != owner:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
 
 
@@ -325,8 +340,18 @@ example_task_request = TaskRequest(
 )
 
 
-@secure_router_v1.post("/tasks", status_code=status.HTTP_201_CREATED, tags=[Tag.TASK])
-@secure_router.post("/tasks", status_code=status.HTTP_201_CREATED, tags=[Tag.TASK])
+@secure_router_v1.post(
+    "/tasks",
+    status_code=status.HTTP_201_CREATED,
+    responses={status.HTTP_429_TOO_MANY_REQUESTS: {}},
+    tags=[Tag.TASK],
+)
+@secure_router.post(
+    "/tasks",
+    status_code=status.HTTP_201_CREATED,
+    responses={status.HTTP_429_TOO_MANY_REQUESTS: {}},
+    tags=[Tag.TASK],
+)
 @start_as_current_span(
     TRACER,
     "request",
@@ -340,32 +365,65 @@ def submit_task(
     task_request: Annotated[TaskRequest, Body(..., examples=[example_task_request])],
     _: Annotated[None, Depends(submit_permission)],
     runner: Annotated[WorkerDispatcher, Depends(_runner)],
+    admission: Annotated[AdmissionController, Depends(admission)],
     fedid: Fedid,
 ) -> TaskResponse:
     """Submit a task to the worker."""
+    with _admitted(admission, runner, fedid):
+        try:
+            task_id: str = runner.run(
+                interface.submit_task, task_request, {"user": fedid}
+            )
+            response.headers["Location"] = f"{request.url}/{task_id}"
+            return TaskResponse(task_id=task_id)
+        except ValidationError as e:
+            LOGGER.info("Error submitting task: %s - %s", task_request, e)
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+                detail=_parameter_errors(e),
+            ) from e
+
+
+@contextmanager
+def _admitted(
+    admission: AdmissionController,
+    runner: WorkerDispatcher,
+    user: str | None,
+    tasks: int = 1,
+) -> Iterator[None]:
+    """Admit a request that submits tasks, refunding it if it fails to submit
+    them, such as when its parameters are invalid"""
     try:
-        task_id: str = runner.run(interface.submit_task, task_request, {"user": fedid})
-        response.headers["Location"] = f"{request.url}/{task_id}"
-        return TaskResponse(task_id=task_id)
-    except ValidationError as e:
-        # Add body/params context to location and ensure that all required
-        # fields defined in the generated schema are present
-        errors = [
-            {
-                "loc": ["body", "params", *err.get("loc", [])],
-                "msg": err.get("msg", None),
-                "type": err.get("type", None),
-                # Input is not listed as required but is useful to have if available
-                "input": err.get("input", None),
-            }
-            for err in e.errors()
-        ]
-
-        LOGGER.info("Error submitting task: %s - %s", task_request, e)
+        admission.admit(
+            user, tasks, lambda: runner.run(interface.count_pending_tasks, user)
+        )
+    except AdmissionRejectedError as e:
+        LOGGER.info("Rejected submission from %s: %s", user, e)
         raise HTTPException(
-            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
-            detail=errors,
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e),
+            headers={"Retry-After": e.retry_after_header},
         ) from e
+    try:
+        yield
+    except BaseException:
+        admission.refund(user, tasks)
+        raise
+
+
+def _parameter_errors(e: ValidationError) -> list[dict[str, Any]]:
+    # Add body/params context to location and ensure that all required
+    # fields defined in the generated schema are present
+    return [
+        {
+            "loc": ["body", "params", *err.get("loc", [])],
+            "msg": err.get("msg", None),
+            "type": err.get("type", None),
+            # Input is not listed as required but is useful to have if available
+            "input": err.get("input", None),
+        }
+        for err in e.errors()
+    ]
 
 
 @secure_router_v1.delete(
@@ -383,25 +441,60 @@ def delete_submitted_task(
     return TaskResponse(task_id=runner.run(interface.clear_task, task_id))
 
 
-@secure_router_v1.get("/tasks", status_code=status.HTTP_200_OK, tags=[Tag.TASK])
-@secure_router.get("/tasks", status_code=status.HTTP_200_OK, tags=[Tag.TASK])
+@secure_router_v1.get(
+    "/tasks",
+    status_code=status.HTTP_200_OK,
+    response_model=TaskPageResponse,
+    tags=[Tag.TASK],
+)
+@secure_router.get(
+    "/tasks",
+    status_code=status.HTTP_200_OK,
+    response_model=TaskPageResponse,
+    tags=[Tag.TASK],
+)
 @start_as_current_span(TRACER)
 async def get_tasks(
     fedid: Fedid,
     runner: Annotated[WorkerDispatcher, Depends(_runner)],
     opa: Annotated[OpaUserClient, Depends(opa)],
     task_status: TaskStatusEnum | None = None,
-) -> TasksListResponse:
+    plan: str | None = None,
+    instrument_session: str | None = None,
+    user: str | None = None,
+    submitted_after: datetime | None = None,
+    submitted_before: datetime | None = None,
+    limit: Annotated[int | None, Query(ge=1)] = None,
+    after: int | None = None,
+    fields: Annotated[list[TaskField] | None, Query()] = None,
+) -> Response:
     """
-    Retrieve tasks based on their status.
-    The status of a newly created task is PENDING.
+    Retrieve tasks based on their status, plan, user, instrument session and
+    submission time. The status of a newly created task is PENDING.
+    - If limit is set, at most that many tasks are returned, in the order they
+    were submitted. Pass next_cursor from the response as after to get the
+    next page.
+    - If fields are set, only those fields of each task are returned.
     """
-    tasks = runner.run(interface.get_tasks, task_status)
-
     if opa and not await opa.admin():
-        tasks = [t for t in tasks if t.task.metadata.get("user") == fedid]
+        if user is not None and user != fedid:
+            return JSONResponse(content={"tasks": [], "next_cursor": None})
+        user = fedid
+    query = TaskQuery(
+        task_status=task_status,
+        user=user,
+        plan=plan,
+        instrument_session=instrument_session,
+        submitted_after=submitted_after,
+        submitted_before=submitted_before,
+        limit=limit,
+        after=after,
+        fields=fields,
+    )
+    page = runner.run(interface.get_task_page, query)
 
-    return TasksListResponse(tasks=tasks)
+    # Tasks have already been serialized, and possibly projected, by the worker
+    return JSONResponse(content={"tasks": page.tasks, "next_cursor": page.next_cursor})
 
 
 @secure_router_v1.put(
@@ -436,6 +529,158 @@ def set_active_task(
     return task
 
 
+@secure_router_v1.get("/queue", tags=[Tag.TASK])
+@start_as_current_span(TRACER)
+async def get_queue(
+    fedid: Fedid,
+    runner: Annotated[WorkerDispatcher, Depends(_runner)],
+    opa: Annotated[OpaUserClient, Depends(opa)],
+) -> QueueResponse:
+    """Retrieve the tasks waiting in the run queue, in the order they will be run."""
+    tasks = runner.run(interface.get_queue)
+
+    if opa and not await opa.admin():
+        tasks = [t for t in tasks if t.task.metadata.get("user") == fedid]
+
+    return QueueResponse(tasks=tasks)
+
+
+@secure_router_v1.get("/queue/stats", tags=[Tag.TASK])
+@start_as_current_span(TRACER)
+async def get_queue_stats(
+    fedid: Fedid,
+    runner: Annotated[WorkerDispatcher, Depends(_runner)],
+    opa: Annotated[OpaUserClient, Depends(opa)],
+) -> QueueStatsResponse:
+    """Retrieve how long queued tasks have waited for each priority, and how much
+    of the worker each user of each instrument session has had."""
+    stats = runner.run(interface.get_queue_stats)
+
+    if opa and not await opa.admin():
+        stats.parties = [party for party in stats.parties if party.user == fedid]
+
+    return stats
+
+
+@secure_router_v1.post(
+    "/queue",
+    status_code=status.HTTP_202_ACCEPTED,
+    responses={status.HTTP_409_CONFLICT: {}},
+    tags=[Tag.TASK],
+)
+@start_as_current_span(TRACER, "task.task_id")
+def enqueue_task(
+    request: Request,
+    task: WorkerTask,
+    _: Annotated[None, Depends(start_task_permission)],
+    runner: Annotated[WorkerDispatcher, Depends(_runner)],
+) -> WorkerTask:
+    """Add a pending task to the run queue, behind every queued task of the same or
+    higher priority. Queued tasks are started automatically, in order, as soon as
+    the worker is idle. If fair share scheduling is enabled, tasks of the same
+    priority are started in the order that shares the worker fairly between
+    instrument sessions and users."""
+    try:
+        return runner.run(
+            interface.enqueue_task,
+            task=task,
+            pass_through_headers=get_passthrough_headers(request),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e)) from e
+
+
+example_sweep_request = SweepRequest(
+    name="count",
+    params={"detectors": ["x"]},
+    sweep={"num": [1, 2, 3]},
+    instrument_session="cm12345-1",
+)
+
+
+@secure_router_v1.post(
+    "/queue/sweep",
+    status_code=status.HTTP_202_ACCEPTED,
+    responses={status.HTTP_429_TOO_MANY_REQUESTS: {}},
+    tags=[Tag.TASK],
+)
+@start_as_current_span(
+    TRACER,
+    "sweep_request.name",
+    "sweep_request.mode",
+    "sweep_request.instrument_session",
+)
+def submit_sweep(
+    request: Request,
+    sweep_request: Annotated[SweepRequest, Body(..., examples=[example_sweep_request])],
+    _: Annotated[None, Depends(sweep_permission)],
+    runner: Annotated[WorkerDispatcher, Depends(_runner)],
+    admission: Annotated[AdmissionController, Depends(admission)],
+    fedid: Fedid,
+) -> SweepResponse:
+    """Submit a task for each point of a parameter sweep and add them all to the
+    run queue, in order. The value lists of the swept parameters are either
+    combined in every possible way or zipped together, and each point overrides
+    the base parameters. Every point is validated before any task is queued, so
+    either the whole sweep is queued or none of it is. Sweeps of more than
+    10000 points are rejected."""
+    with _admitted(admission, runner, fedid, sweep_request.num_points()):
+        try:
+            return runner.run(
+                interface.submit_sweep,
+                sweep_request,
+                {"user": fedid},
+                get_passthrough_headers(request),
+            )
+        except ValidationError as e:
+            LOGGER.info("Error submitting sweep: %s - %s", sweep_request, e)
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+                detail=_parameter_errors(e),
+            ) from e
+
+
+@secure_router_v1.put(
+    "/queue",
+    responses={status.HTTP_400_BAD_REQUEST: {}},
+    tags=[Tag.TASK],
+)
+@start_as_current_span(TRACER, "order.task_ids")
+async def reorder_queue(
+    order: QueueOrderRequest,
+    opa: Annotated[OpaUserClient, Depends(opa)],
+    runner: Annotated[WorkerDispatcher, Depends(_runner)],
+) -> QueueResponse:
+    """Change the order of the run queue. The request must list every queued task
+    exactly once, and keep each task behind those with a higher priority. Under
+    fair share scheduling the tasks run in the order given, ahead of tasks queued
+    later. Only administrators may reorder the queue when authorization is
+    enabled."""
+    if opa and not await opa.admin():
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to reorder the queue",
+        )
+    try:
+        runner.run(interface.reorder_queue, order.task_ids)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
+        ) from e
+    return QueueResponse(tasks=runner.run(interface.get_queue))
+
+
+@secure_router_v1.delete("/queue/{task_id}", tags=[Tag.TASK])
+@start_as_current_span(TRACER, "task_id")
+def dequeue_task(
+    task_id: str,
+    _: Annotated[None, Depends(access_task_permission)],
+    runner: Annotated[WorkerDispatcher, Depends(_runner)],
+) -> TaskResponse:
+    """Remove a task from the run queue. The task remains pending."""
+    return TaskResponse(task_id=runner.run(interface.dequeue_task, task_id))
+
+
 def get_passthrough_headers(request: HTTPConnection) -> dict[str, str]:
     return {
         key: value
@@ -459,6 +704,77 @@ def get_task(
     return task
 
 
+@secure_router_v1.get(
+    "/tasks/{task_id}/result",
+    tags=[Tag.TASK],
+    responses={
+        status.HTTP_200_OK: {
+            "description": "The result of the task's plan",
+            "content": {"application/json": {}},
+        },
+        status.HTTP_404_NOT_FOUND: {},
+        status.HTTP_409_CONFLICT: {},
+    },
+)
+@start_as_current_span(TRACER, "task_id")
+def get_task_result(
+    task_id: str,
+    _: Annotated[None, Depends(access_task_permission)],
+    runner: Annotated[WorkerDispatcher, Depends(_runner)],
+) -> Response:
+    """Retrieve the result of a task's plan, once it has succeeded. Results too
+    large to be included in the task are streamed from where they are stored.
+    Conflicts if the task has not finished, and is not found if it failed."""
+    path = runner.run(interface.get_stored_result, task_id)
+    if path is not None:
+        return FileResponse(path, media_type="application/json")
+    task = runner.run(interface.get_task_by_id, task_id)
+    if task is None:
+        raise KeyError
+    if not task.is_complete:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Task {task_id} has not finished, so has no result yet",
+        )
+    if not isinstance(task.outcome, TaskResult):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Task {task_id} failed, so it has no result",
+        )
+    return JSONResponse(task.outcome.result)
+
+
+@secure_router_v1.get(
+    "/tasks/{task_id}/profile",
+    tags=[Tag.TASK],
+    responses={status.HTTP_404_NOT_FOUND: {}, status.HTTP_409_CONFLICT: {}},
+)
+@start_as_current_span(TRACER, "task_id")
+def get_task_profile(
+    task_id: str,
+    _: Annotated[None, Depends(access_task_permission)],
+    runner: Annotated[WorkerDispatcher, Depends(_runner)],
+) -> TaskProfile:
+    """Retrieve where the time went while a task's plan ran, by command and by
+    device. Only available once the task has finished, and only if the server
+    profiles messages."""
+    profile = runner.run(interface.get_task_profile, task_id)
+    if profile is not None:
+        return profile
+    task = runner.run(interface.get_task_by_id, task_id)
+    if task is None:
+        raise KeyError
+    if not task.is_complete:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Task {task_id} has not finished, so has no profile yet",
+        )
+    raise HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail=f"Task {task_id} was not profiled",
+    )
+
+
 @secure_router_v1.get(
     "/worker/task",
     tags=[Tag.TASK],
@@ -568,26 +884,26 @@ async def set_state(
                 detail="Not authorized to set worker state",
             )
 
-        if new_state == WorkerState.PAUSED:
-            runner.run(interface.pause_worker, state_change_request.defer)
-        elif new_state == WorkerState.RUNNING:
-            runner.run(interface.resume_worker)
-        elif new_state in {WorkerState.ABORTING, WorkerState.STOPPING}:
-            try:
+        try:
+            if new_state == WorkerState.PAUSED:
+                runner.run(interface.pause_worker, state_change_request.defer)
+            elif new_state == WorkerState.RUNNING:
+                runner.run(interface.resume_worker)
+            elif new_state in {WorkerState.ABORTING, WorkerState.STOPPING}:
                 runner.run(
                     interface.cancel_active_task,
                     state_change_request.new_state is WorkerState.ABORTING,
                     state_change_request.reason,
                 )
-            except TransitionError as e:
-                suffix = f" - {e}" if str(e) else ""
-                raise HTTPException(
-                    status.HTTP_400_BAD_REQUEST,
-                    detail=(
-                        f"Error while transitioning from {current_state} "
-                        f"to {new_state}{suffix}"
-                    ),
-                ) from e
+        except TransitionError as e:
+            suffix = f" - {e}" if str(e) else ""
+            raise HTTPException(
+                status.HTTP_400_BAD_REQUEST,
+                detail=(
+                    f"Error while transitioning from {current_state} "
+                    f"to {new_state}{suffix}"
+                ),
+            ) from e
     else:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -639,6 +955,7 @@ async def run_plan(
     runner: Annotated[WorkerDispatcher, Depends(_runner)],
     user: Fedid,
     opa: Annotated[OpaUserClient | None, Depends(opa)],
+    admission: Annotated[AdmissionController, Depends(admission)],
 ):
     LOGGER.info("Starting WS plan as %s", user)
     await ws.accept()
@@ -664,6 +981,18 @@ async def run_plan(
             await ws.close(code=protocol.AUTHZ_ERROR, reason="Unauthorized")
             return
 
+    try:
+        admission.admit(
+            user, count_pending=lambda: runner.run(interface.count_pending_tasks, user)
+        )
+    except AdmissionRejectedError as e:
+        LOGGER.info("Rejected plan from %s: %s", user, e)
+        await ws.send_text(
+            RateLimited(reason=e.reason, retry_after=e.retry_after).model_dump_json()
+        )
+        await ws.close(code=WS_1013_TRY_AGAIN_LATER, reason="Too many requests")
+        return
+
     try:
         task_id: str = runner.run(
             interface.submit_task, task_request.task, {"user": user}
@@ -671,15 +1000,18 @@ async def run_plan(
         LOGGER.info("Task ID: %s", task_id)
     except ValidationError as ve:
         LOGGER.info("Plan args not valid: %s - %s", task_request, ve)
+        admission.refund(user)
         await ws.send_text(InvalidArgs.from_validation_error(ve).model_dump_json())
         await ws.close(code=protocol.INVALID_ARGS, reason="Invalid Args")
         return
     except KeyError as ke:
         LOGGER.info("Plan %r not recognised", ke.args[0])
+        admission.refund(user)
         await ws.send_text(PlanNotFound(plan_name=ke.args[0]).model_dump_json())
         await ws.close(code=protocol.UNKNOWN_PLAN, reason="Unknown Plan")
         return
 
+    published = 0
     try:
         with runner.event_pipe() as events:
             active_task = runner.run(interface.get_active_task)
@@ -694,7 +1026,9 @@ async def run_plan(
                 if evt.task_id != task_id:
                     continue
                 LOGGER.debug("Event: %s", evt)
-                await ws.send_text(Update(data=evt).model_dump_json())
+                message = Update(data=evt).model_dump_json()
+                await ws.send_text(message)
+                published += len(message.encode())
                 if isinstance(evt, WorkerEvent) and evt.is_complete():
                     LOGGER.debug("End of stream")
                     break
@@ -705,11 +1039,18 @@ async def run_plan(
     except WebSocketDisconnect:
         LOGGER.info("Client disconnected")
         runner.run(
-            interface.cancel_active_task, failure=True, reason="Client disconnected"
+            interface.cancel_active_task,
+            failure=True,
+            reason="Client disconnected",
+            task_id=task_id,
         )
     else:
         LOGGER.info("Plan complete")
         await ws.close()
+    finally:
+        # Accounted once per stream to avoid a call to the worker for each event
+        if published:
+            runner.run(interface.account_published, task_id, "websocket", published)
 
 
 @start_as_current_span(TRACER, "config")
@@ -1,18 +1,29 @@
 import uuid
 from collections.abc import Iterable, Mapping
+from datetime import UTC, datetime
 from enum import StrEnum
-from typing import Annotated, Any
+from itertools import product
+from math import prod
+from typing import Annotated, Any, Self
 
 from bluesky.protocols import HasName
-from pydantic import Field
+from pydantic import Field, field_validator, model_validator
 from pydantic.json_schema import SkipJsonSchema
 
 from blueapi.config import OIDCConfig
 from blueapi.core import BLUESKY_PROTOCOLS, Device, Plan
 from blueapi.core.context import generic_bounds
 from blueapi.utils import BlueapiBaseModel
-from blueapi.worker import WorkerState
-from blueapi.worker.task_worker import TaskWorker, TrackableTask
+from blueapi.worker import PartyShare, QueueWaitStats, WorkerState
+from blueapi.worker.estimation import DurationEstimate
+from blueapi.worker.event import TaskError, TaskResult, TaskStatusEnum
+from blueapi.worker.task import StepStatus, Task
+from blueapi.worker.task_worker import (
+    TaskResources,
+    TaskTimeline,
+    TaskWorker,
+    TrackableTask,
+)
 
 _UNKNOWN_NAME = "UNKNOWN"
 
@@ -56,6 +67,217 @@ class TasksListResponse(BlueapiBaseModel):
     """
 
     tasks: list[TrackableTask] = Field(description="List of tasks")
+    next_cursor: int | None = Field(
+        description="Cursor to request the next page of tasks with, "
+        "None if there are no more tasks",
+        default=None,
+    )
+
+
+class PartialTask(BlueapiBaseModel):
+    """
+    The task run by a listed task, only including the requested fields if any
+    """
+
+    name: str | SkipJsonSchema[None] = None
+    params: Mapping[str, Any] | SkipJsonSchema[None] = None
+    metadata: dict[str, Any] | SkipJsonSchema[None] = None
+    priority: int | SkipJsonSchema[None] = None
+    steps: list[Task] | SkipJsonSchema[None] = None
+    stop_on_failure: bool | SkipJsonSchema[None] = None
+
+
+class PartialTrackableTask(BlueapiBaseModel):
+    """
+    A listed task, only including the requested fields if any. Each field is
+    the same as in TrackableTask.
+    """
+
+    task_id: str | SkipJsonSchema[None] = None
+    task: PartialTask | SkipJsonSchema[None] = None
+    request_id: str | SkipJsonSchema[None] = None
+    is_complete: bool | SkipJsonSchema[None] = None
+    is_pending: bool | SkipJsonSchema[None] = None
+    errors: list[str] | SkipJsonSchema[None] = None
+    outcome: TaskResult | TaskError | None = None
+    timeline: TaskTimeline | SkipJsonSchema[None] = None
+    resources: TaskResources | SkipJsonSchema[None] = None
+    steps: list[StepStatus] | SkipJsonSchema[None] = None
+    estimate: DurationEstimate | None = None
+
+
+class TaskPageResponse(BlueapiBaseModel):
+    """
+    A page of tasks, in the order they were submitted
+    """
+
+    tasks: list[PartialTrackableTask] = Field(
+        description="List of tasks, only including the requested fields if any"
+    )
+    next_cursor: int | None = Field(
+        description="Cursor to request the next page of tasks with, "
+        "None if there are no more tasks",
+        default=None,
+    )
+
+
+class TaskField(StrEnum):
+    """
+    Fields of a task that can be requested when listing tasks
+    """
+
+    TASK_ID = "task_id"
+    REQUEST_ID = "request_id"
+    TASK = "task"
+    TASK_NAME = "task.name"
+    TASK_PARAMS = "task.params"
+    TASK_METADATA = "task.metadata"
+    IS_COMPLETE = "is_complete"
+    IS_PENDING = "is_pending"
+    ERRORS = "errors"
+    OUTCOME = "outcome"
+    TIMELINE = "timeline"
+    RESOURCES = "resources"
+    STEPS = "steps"
+    ESTIMATE = "estimate"
+
+
+class TaskQuery(BlueapiBaseModel):
+    """
+    Filters, pagination and projection to apply when listing tasks
+    """
+
+    task_status: TaskStatusEnum | None = None
+    user: str | None = None
+    plan: str | None = None
+    instrument_session: str | None = None
+    submitted_after: datetime | None = None
+    submitted_before: datetime | None = None
+    limit: int | None = Field(default=None, ge=1)
+    after: int | None = None
+    fields: list[TaskField] | None = None
+
+    @field_validator("submitted_after", "submitted_before")
+    @classmethod
+    def assume_utc(cls, value: datetime | None) -> datetime | None:
+        if value is not None and value.tzinfo is None:
+            return value.replace(tzinfo=UTC)
+        return value
+
+    def projection(self) -> dict[str, Any] | None:
+        """
+        The include argument for model_dump that keeps only the requested
+        fields of a TrackableTask, None if all fields are wanted
+        """
+        if self.fields is None:
+            return None
+        include: dict[str, Any] = {}
+        for field in self.fields:
+            name, _, nested = field.partition(".")
+            if not nested:
+                include[name] = True
+            elif include.get(name) is not True:
+                include.setdefault(name, {})[nested] = True
+        return include
+
+
+class QueueResponse(BlueapiBaseModel):
+    """
+    Tasks waiting in the worker's run queue
+    """
+
+    tasks: list[TrackableTask] = Field(
+        description="Queued tasks, in the order they will be run"
+    )
+
+
+class QueueWaitTimes(BlueapiBaseModel):
+    """
+    How long tasks waited in the run queue before they started
+    """
+
+    count: int = Field(description="Number of tasks that have started")
+    mean: float = Field(description="Average wait in seconds")
+    max: float = Field(description="Longest wait in seconds")
+
+    @classmethod
+    def from_stats(cls, stats: QueueWaitStats) -> "QueueWaitTimes":
+        return cls(count=stats.count, mean=stats.mean, max=stats.max)
+
+
+class PriorityQueueStats(BlueapiBaseModel):
+    """
+    Queue waits of the tasks with one priority
+    """
+
+    priority: int = Field(description="Priority of the tasks")
+    waits: QueueWaitTimes = Field(description="How long the tasks waited")
+
+
+class PartyQueueStats(BlueapiBaseModel):
+    """
+    How much of the worker one user of an instrument session has had
+    """
+
+    instrument_session: str | None = Field(
+        description="Instrument session the tasks were submitted for, if known"
+    )
+    user: str | None = Field(description="User that submitted the tasks, if known")
+    weight: float = Field(
+        description="Relative share of the worker given to the instrument session"
+    )
+    queued: int = Field(description="Number of tasks waiting in the run queue")
+    run_time: float = Field(description="Total number of seconds the tasks have run")
+    share: float = Field(
+        description="Fraction of the run time of all tasks that was this party's"
+    )
+    waits: QueueWaitTimes = Field(description="How long the tasks waited")
+
+    @classmethod
+    def from_share(cls, share: PartyShare) -> "PartyQueueStats":
+        return cls(
+            instrument_session=share.instrument_session,
+            user=share.user,
+            weight=share.weight,
+            queued=share.queued,
+            run_time=share.run_time,
+            share=share.share,
+            waits=QueueWaitTimes.from_stats(share.waits),
+        )
+
+
+class QueueStatsResponse(BlueapiBaseModel):
+    """
+    How the worker's run queue has been shared out
+    """
+
+    priorities: list[PriorityQueueStats] = Field(
+        description="Queue waits for each priority, highest priority first"
+    )
+    parties: list[PartyQueueStats] = Field(
+        description="Share of the worker for each user of each instrument session"
+    )
+
+
+class QueueOrderRequest(BlueapiBaseModel):
+    """
+    Request to change the order of the worker's run queue
+    """
+
+    task_ids: list[str] = Field(
+        description="IDs of all queued tasks, in the order they should be run"
+    )
+
+
+class StepRequest(BlueapiBaseModel):
+    """
+    Plan to run as one step of a bundle
+    """
+
+    name: str = Field(description="Name of plan to run")
+    params: Mapping[str, Any] = Field(
+        description="Values for parameters to plan, if any", default_factory=dict
+    )
 
 
 class TaskRequest(BlueapiBaseModel):
@@ -63,13 +285,137 @@ class TaskRequest(BlueapiBaseModel):
     Request to run a task with related info
     """
 
-    name: str = Field(description="Name of plan to run")
+    name: str = Field(description="Name of plan to run, or of the bundle")
     params: Mapping[str, Any] = Field(
         description="Values for parameters to plan, if any", default_factory=dict
     )
     instrument_session: str = Field(
         description="Instrument session associated with this task",
     )
+    priority: int = Field(
+        description=(
+            "Queued tasks with higher priorities are run first, and may preempt "
+            "a running task with a lower priority if the server allows it"
+        ),
+        default=0,
+    )
+    steps: list[StepRequest] = Field(
+        description=(
+            "Plans to run one after another in place of a single plan, without "
+            "the worker becoming idle between them, making the task a bundle"
+        ),
+        default_factory=list,
+    )
+    stop_on_failure: bool = Field(
+        description="Whether the remaining steps of a bundle are skipped once "
+        "one of them fails",
+        default=True,
+    )
+
+
+class SweepMode(StrEnum):
+    """
+    How the value lists of a parameter sweep are combined into points
+    """
+
+    #: Every combination of values, the last parameter varying fastest
+    CARTESIAN = "cartesian"
+    #: The nth value of every list together, all lists being the same length
+    ZIP = "zip"
+
+
+#: Most points a single sweep may queue tasks for
+MAX_SWEEP_POINTS = 10_000
+
+
+class SweepRequest(BlueapiBaseModel):
+    """
+    Request to run a plan once for each point of a parameter sweep
+    """
+
+    name: str = Field(description="Name of plan to run at each point")
+    params: Mapping[str, Any] = Field(
+        description="Values for parameters that are the same at every point",
+        default_factory=dict,
+    )
+    sweep: dict[str, list[Any]] = Field(
+        description="Values to take at successive points, for each swept "
+        f"parameter, overriding those in params. At most {MAX_SWEEP_POINTS} "
+        "points may be swept",
+        min_length=1,
+    )
+    mode: SweepMode = Field(
+        description="How the values of the swept parameters are combined",
+        default=SweepMode.CARTESIAN,
+    )
+    instrument_session: str = Field(
+        description="Instrument session associated with every task of the sweep",
+    )
+    priority: int = Field(description="Priority of every task of the sweep", default=0)
+
+    @field_validator("sweep")
+    @classmethod
+    def _check_sweep(cls, sweep: dict[str, list[Any]]) -> dict[str, list[Any]]:
+        if empty := [name for name, values in sweep.items() if not values]:
+            raise ValueError(f"No values to sweep for {', '.join(empty)}")
+        return sweep
+
+    @model_validator(mode="after")
+    def _check_zip_lengths(self) -> Self:
+        if self.mode is SweepMode.ZIP:
+            lengths = {name: len(values) for name, values in self.sweep.items()}
+            if len(set(lengths.values())) > 1:
+                raise ValueError(
+                    f"Zipped parameters must have the same number of values: {lengths}"
+                )
+        return self
+
+    @model_validator(mode="after")
+    def _check_num_points(self) -> Self:
+        if (num_points := self.num_points()) > MAX_SWEEP_POINTS:
+            raise ValueError(
+                f"Sweep has {num_points} points, more than the maximum of "
+                f"{MAX_SWEEP_POINTS}"
+            )
+        return self
+
+    def num_points(self) -> int:
+        """
+        Number of points in the sweep, counted without expanding it
+        """
+        lengths = [len(values) for values in self.sweep.values()]
+        if self.mode is SweepMode.ZIP:
+            return min(lengths, default=0)
+        return prod(lengths)
+
+    def points(self) -> list[dict[str, Any]]:
+        """
+        Expand the sweep into the parameters of the plan at each point, in the
+        order they will be queued
+        """
+        names = list(self.sweep)
+        if self.mode is SweepMode.ZIP:
+            combinations = zip(*self.sweep.values(), strict=True)
+        else:
+            combinations = product(*self.sweep.values())
+        return [
+            {**self.params, **dict(zip(names, values, strict=True))}
+            for values in combinations
+        ]
+
+
+class SweepResponse(BlueapiBaseModel):
+    """
+    Acknowledgement that the tasks of a sweep have been queued
+    """
+
+    sweep_id: str = Field(
+        description="Unique identifier shared by the tasks of the sweep, "
+        "included in their metadata"
+    )
+    task_ids: list[str] = Field(
+        description="IDs of the tasks of the sweep, one for each point in order"
+    )
 
 
 class DeviceRequest(BlueapiBaseModel):
@@ -13,6 +13,7 @@ client when running plans via websockets
 # * Plan not found
 # * Args not valid
 # * Server busy
+# * Rate limited
 # * Event update
 
 from typing import Annotated, Any, Literal, Self
@@ -86,6 +87,12 @@ class ServerBusy(BaseModel):
     kind: Literal["busy"] = "busy"
 
 
+class RateLimited(BaseModel):
+    kind: Literal["rate_limited"] = "rate_limited"
+    reason: str
+    retry_after: float
+
+
 class Unauthorized(BaseModel):
     kind: Literal["unauthorized"] = "unauthorized"
 
@@ -97,7 +104,7 @@ class Update(BaseModel):
 
 ControlResponse = TypeAdapter(
     Annotated[
-        PlanNotFound | InvalidArgs | ServerBusy | Unauthorized | Update,
+        PlanNotFound | InvalidArgs | ServerBusy | RateLimited | Unauthorized | Update,
         Field(discriminator="kind"),
     ]
 )
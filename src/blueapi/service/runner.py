@@ -17,13 +17,13 @@ from observability_utils.tracing import (
 )
 from opentelemetry.context import attach
 from opentelemetry.propagate import get_global_textmap
-from pydantic import TypeAdapter
 
 from blueapi.config import ApplicationConfig
 from blueapi.core.bluesky_types import DataEvent
 from blueapi.service import interface
 from blueapi.service.interface import SubHandles, setup, teardown
 from blueapi.service.model import EnvironmentResponse
+from blueapi.utils import type_adapter
 from blueapi.worker.event import ProgressEvent, WorkerEvent
 
 # The default multiprocessing start method is fork
@@ -232,7 +232,7 @@ def _valid_return(value: Any, expected_type: type[T] | None = None) -> T:
     if expected_type is None:
         return value
     else:
-        return TypeAdapter(expected_type).validate_python(value)
+        return type_adapter(expected_type).validate_python(value)
 
 
 def _validate_function(func: Any, function_name: str) -> Callable:
@@ -11,6 +11,12 @@ from .modules import is_function_sourced_from_module, load_module_all
 from .numtracker import NumtrackerClient
 from .serialization import serialize
 from .thread_exception import handle_all_exceptions
+from .type_adapters import (
+    TYPE_ADAPTERS,
+    TypeAdapterRegistry,
+    TypeAdapterStats,
+    type_adapter,
+)
 
 __all__ = [
     "handle_all_exceptions",
@@ -26,6 +32,10 @@ __all__ = [
     "get_owner_gid",
     "is_function_sourced_from_module",
     "deprecated",
+    "type_adapter",
+    "TypeAdapterRegistry",
+    "TypeAdapterStats",
+    "TYPE_ADAPTERS",
 ]
 
 Args = ParamSpec("Args")
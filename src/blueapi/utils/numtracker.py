@@ -63,7 +63,10 @@ class NumtrackerClient:
         self._headers = headers
 
     async def create_scan(
-        self, instrument_session: str, instrument: str
+        self,
+        instrument_session: str,
+        instrument: str,
+        headers: Mapping[str, str] | None = None,
     ) -> NumtrackerScanMutationResponse:
         """
         Create a new scan with numtracker.
@@ -73,6 +76,8 @@ class NumtrackerClient:
             e.g. cm12345-1
 
             instrument: The instrument to write data on e.g. i22
+
+            headers: HTTP headers to use instead of the default ones
         """
 
         query = {
@@ -97,7 +102,7 @@ class NumtrackerClient:
         async with httpx.AsyncClient() as client:
             response = await client.post(
                 self._url.unicode_string(),
-                headers=self._headers,
+                headers=self._headers if headers is None else headers,
                 json=query,
             )
 
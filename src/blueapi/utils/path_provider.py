@@ -1,5 +1,10 @@
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
 from pathlib import Path
 
+from bluesky.run_engine import RunEngine
 from event_model import RunStart, RunStop
 from ophyd_async.core import PathInfo, PathProvider
 
@@ -14,21 +19,48 @@ class StartDocumentPathProvider(PathProvider):
     """
 
     def __init__(self) -> None:
-        self._docs: list[RunStart] = []
+        self._main_docs: list[RunStart] = []
+        # Start documents of the runs of another RunEngine, if the plan being
+        # run is running in one
+        self._other_docs: ContextVar[list[RunStart] | None] = ContextVar(
+            "start_documents", default=None
+        )
+
+    @property
+    def _docs(self) -> list[RunStart]:
+        docs = self._other_docs.get()
+        return self._main_docs if docs is None else docs
 
     def run_start(self, name: str, start_document: RunStart) -> None:
-        if name == "start":
-            self._docs.append(start_document)
+        _run_start(self._main_docs, name, start_document)
 
     def run_stop(self, name: str, stop_document: RunStop) -> None:
-        if name == "stop":
-            if stop_document.get("run_start") == self._docs[-1]["uid"]:
-                self._docs.pop()
-            else:
-                raise BlueskyRunStructureError(
-                    "Close run called, but not for the inner most run. "
-                    "This is not supported. If you need to do this speak to core DAQ."
-                )
+        _run_stop(self._main_docs, name, stop_document)
+
+    @contextmanager
+    def runs_of(self, run_engine: RunEngine) -> Iterator[None]:
+        """Source paths from the runs of another RunEngine, rather than the one
+        run_start and run_stop are subscribed to, while the calling thread runs
+        a plan in it. Its runs are kept apart from those of other RunEngines
+        running at the same time, as they all share an event loop.
+
+        Args:
+            run_engine: RunEngine the calling thread will run a plan in
+        """
+        docs: list[RunStart] = []
+        subscriptions = [
+            run_engine.subscribe(partial(_run_start, docs), "start"),
+            run_engine.subscribe(partial(_run_stop, docs), "stop"),
+        ]
+        # Copied into the tasks the RunEngine runs the plan in, which are
+        # created from the calling thread
+        token = self._other_docs.set(docs)
+        try:
+            yield
+        finally:
+            self._other_docs.reset(token)
+            for subscription in subscriptions:
+                run_engine.unsubscribe(subscription)
 
     def __call__(self, device_name: str | None = None) -> PathInfo:
         """Returns the directory path and filename for a given data_session.
@@ -56,6 +88,22 @@ class StartDocumentPathProvider(PathProvider):
             return PathInfo(directory_path=data_session_directory, filename=sub_path)
 
 
+def _run_start(docs: list[RunStart], name: str, start_document: RunStart) -> None:
+    if name == "start":
+        docs.append(start_document)
+
+
+def _run_stop(docs: list[RunStart], name: str, stop_document: RunStop) -> None:
+    if name == "stop":
+        if stop_document.get("run_start") == docs[-1]["uid"]:
+            docs.pop()
+        else:
+            raise BlueskyRunStructureError(
+                "Close run called, but not for the inner most run. "
+                "This is not supported. If you need to do this speak to core DAQ."
+            )
+
+
 class BlueskyRunStructureError(Exception):
     def __init__(self, message):
         super().__init__(message)
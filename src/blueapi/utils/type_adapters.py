@@ -0,0 +1,126 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any
+
+from opentelemetry.metrics import get_meter
+from pydantic import TypeAdapter
+
+METER = get_meter("type_adapters")
+
+LOOKUPS = METER.create_counter(
+    "blueapi.type_adapters.lookups",
+    description="Type adapter lookups, labelled with whether an adapter was reused",
+)
+
+
+@dataclass(frozen=True)
+class TypeAdapterStats:
+    """
+    How effective a TypeAdapterRegistry has been
+    """
+
+    #: Number of lookups served by an existing adapter
+    hits: int
+    #: Number of lookups that had to build a new adapter
+    misses: int
+    #: Number of adapters currently held
+    size: int
+
+
+class TypeAdapterRegistry:
+    """
+    Bounded cache of pydantic TypeAdapters keyed by type. Building an adapter
+    compiles a validator and serializer for the type, which is far more expensive
+    than using one, so adapters for types that are validated repeatedly should
+    be looked up here rather than constructed. When full, the least recently used
+    adapter is discarded.
+
+    Args:
+        max_size: Maximum number of adapters to hold
+    """
+
+    _max_size: int
+    _adapters: OrderedDict[Any, TypeAdapter]
+    _lock: Lock
+    _hits: int
+    _misses: int
+
+    def __init__(self, max_size: int = 256) -> None:
+        self._max_size = max_size
+        self._adapters = OrderedDict()
+        self._lock = Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, target_type: Any) -> TypeAdapter[Any]:
+        """
+        Get an adapter for a type, building it if there is not one already.
+
+        Args:
+            target_type: The type to validate and serialize, any type pydantic
+                understands including special forms such as Annotated
+
+        Returns:
+            TypeAdapter[Any]: Adapter for the type
+        """
+        try:
+            with self._lock:
+                adapter = self._adapters.get(target_type)
+                if adapter is not None:
+                    self._adapters.move_to_end(target_type)
+                    self._hits += 1
+                    LOOKUPS.add(1, {"result": "hit"})
+                    return adapter
+                self._misses += 1
+        except TypeError:
+            # Unhashable, e.g. Annotated with unhashable metadata
+            with self._lock:
+                self._misses += 1
+            LOOKUPS.add(1, {"result": "miss"})
+            return TypeAdapter(target_type)
+        LOOKUPS.add(1, {"result": "miss"})
+
+        # Built outside the lock, racing lookups may both build the same adapter
+        adapter = TypeAdapter(target_type)
+        with self._lock:
+            self._adapters[target_type] = adapter
+            self._adapters.move_to_end(target_type)
+            while len(self._adapters) > self._max_size:
+                self._adapters.popitem(last=False)
+        return adapter
+
+    def stats(self) -> TypeAdapterStats:
+        """
+        :return: hit and miss counts since the registry was created or cleared
+        """
+        with self._lock:
+            return TypeAdapterStats(
+                hits=self._hits, misses=self._misses, size=len(self._adapters)
+            )
+
+    def clear(self) -> None:
+        """
+        Discard every adapter and reset the statistics
+        """
+        with self._lock:
+            self._adapters.clear()
+            self._hits = 0
+            self._misses = 0
+
+
+#: Registry shared by the whole application
+TYPE_ADAPTERS = TypeAdapterRegistry()
+
+
+def type_adapter(target_type: Any) -> TypeAdapter[Any]:
+    """
+    Get a shared adapter for a type from the application-wide registry.
+
+    Args:
+        target_type: The type to validate and serialize
+
+    Returns:
+        TypeAdapter[Any]: Adapter for the type
+    """
+    return TYPE_ADAPTERS.get(target_type)
@@ -1,4 +1,6 @@
 from .event import ProgressEvent, StatusView, TaskStatus, WorkerEvent, WorkerState
+from .progress import ProgressView
+from .scheduling import PartyShare, QueueWaitStats
 from .task import Task
 from .task_worker import TaskWorker, TrackableTask
 from .worker_errors import WorkerAlreadyStartedError, WorkerBusyError
@@ -10,6 +12,9 @@ __all__ = [
     "WorkerState",
     "StatusView",
     "ProgressEvent",
+    "ProgressView",
+    "PartyShare",
+    "QueueWaitStats",
     "TaskStatus",
     "TrackableTask",
     "WorkerBusyError",
@@ -0,0 +1,88 @@
+import gc
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    # Not available on Windows, peak memory is not measured there
+    resource = None
+
+
+@dataclass(frozen=True)
+class ResourceSnapshot:
+    """
+    Resources the worker's process had used at one moment, so that the usage of
+    a task can be found by comparing the snapshots from when it started and
+    finished
+    """
+
+    #: CPU seconds used by every thread of the process
+    cpu_time: float
+    #: Largest resident set size the process has had, in bytes
+    peak_rss: int
+    #: Seconds spent in garbage collection
+    gc_pause_time: float
+
+
+class GcPauseTimer:
+    """
+    Measures how long the interpreter has spent in garbage collection, from
+    whichever thread triggered it, while installed.
+    """
+
+    _total: float
+    _started_at: float | None
+    _installed: bool
+
+    def __init__(self) -> None:
+        self._total = 0.0
+        self._started_at = None
+        self._installed = False
+
+    @property
+    def total(self) -> float:
+        """
+        :return: number of seconds spent in garbage collection while installed
+        """
+        return self._total
+
+    def install(self) -> None:
+        if not self._installed:
+            gc.callbacks.append(self._on_gc)
+            self._installed = True
+
+    def uninstall(self) -> None:
+        if self._installed:
+            gc.callbacks.remove(self._on_gc)
+            self._installed = False
+            self._started_at = None
+
+    def _on_gc(self, phase: str, _: dict[str, Any]) -> None:
+        if phase == "start":
+            self._started_at = time.perf_counter()
+        elif self._started_at is not None:
+            self._total += time.perf_counter() - self._started_at
+            self._started_at = None
+
+
+def peak_rss() -> int:
+    """
+    :return: largest resident set size the process has had in bytes, 0 if it
+        cannot be measured on this platform
+    """
+    if resource is None:  # pragma: no cover
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kibibytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def take_snapshot(gc_pauses: GcPauseTimer) -> ResourceSnapshot:
+    return ResourceSnapshot(
+        cpu_time=time.process_time(),
+        peak_rss=peak_rss(),
+        gc_pause_time=gc_pauses.total,
+    )
@@ -0,0 +1,190 @@
+from collections import Counter
+from concurrent.futures import Future
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any
+
+from bluesky import Msg
+from bluesky.utils import MsgGenerator
+from pydantic import Field
+
+from blueapi.utils import BlueapiBaseModel
+
+from .message_timing import DeviceGroups, device_name
+
+#: Command of a message and the name of the device it is addressed to, or for
+#: a wait the names of the devices whose operations it waits for, joined by
+#: commas. Timings are learned and looked up by this key.
+MessageKey = tuple[str, str | None]
+
+
+class DurationEstimate(BlueapiBaseModel):
+    """
+    How long a task's plan is expected to take, from the messages it sent when
+    run without a RunEngine and how long those messages took in earlier tasks
+    """
+
+    duration: float = Field(description="Estimated number of seconds")
+    messages: int = Field(description="Number of messages the plan sent")
+    unmodelled: int = Field(
+        description="Number of messages with no earlier timings, taken to be "
+        "instantaneous"
+    )
+
+
+@dataclass(frozen=True)
+class DryRun:
+    """
+    Messages a plan sent when iterated without a RunEngine
+    """
+
+    #: Number of messages with each key, other than sleeps
+    counts: Counter[MessageKey]
+    #: Seconds the plan asked to sleep for
+    sleep: float
+
+    @classmethod
+    def of(cls, plan: MsgGenerator, max_messages: int) -> "DryRun":
+        """
+        Iterate a plan, replying to every message with None as bluesky's
+        simulators do, so its messages touch no device. Waits for awaitables get
+        finished futures holding None instead. Plans whose control flow depends
+        on what they read may fail or take a different path than they would in
+        a RunEngine.
+
+        Args:
+            plan: Generator of the plan
+            max_messages: Number of messages after which the plan is abandoned
+
+        Returns:
+            DryRun: Summary of the messages the plan sent
+
+        Throws:
+            ValueError: If the plan sent more than max_messages messages
+        """
+        counts: Counter[MessageKey] = Counter()
+        sleep = 0.0
+        keys = _MessageKeys()
+        sent = 0
+        try:
+            msg = next(plan)
+            while True:
+                sent += 1
+                if sent > max_messages:
+                    raise ValueError(
+                        f"Plan sent more than {max_messages} messages in a dry run"
+                    )
+                if msg.command == "sleep" and msg.args:
+                    sleep += float(msg.args[0])
+                else:
+                    counts[keys.key(msg)] += 1
+                msg = plan.send(_reply(msg))
+        except StopIteration:
+            pass
+        finally:
+            plan.close()
+        return cls(counts, sleep)
+
+    @property
+    def messages(self) -> int:
+        return sum(self.counts.values())
+
+
+@dataclass
+class _Timing:
+    count: int = 0
+    mean: float = 0.0
+
+    def add(self, elapsed: float) -> None:
+        self.count += 1
+        self.mean += (elapsed - self.mean) / self.count
+
+
+class TimingModel:
+    """
+    Mean time taken by messages with each key in the tasks run so far, and by
+    each command whatever its device, used when a key has not been seen.
+    Thread-safe.
+    """
+
+    _lock: Lock
+    _by_key: dict[MessageKey, _Timing]
+    _by_command: dict[str, _Timing]
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._by_key = {}
+        self._by_command = {}
+
+    def record(self, key: MessageKey, elapsed: float) -> None:
+        with self._lock:
+            self._by_key.setdefault(key, _Timing()).add(elapsed)
+            self._by_command.setdefault(key[0], _Timing()).add(elapsed)
+
+    def estimate(self, dry_run: DryRun) -> DurationEstimate:
+        duration = dry_run.sleep
+        unmodelled = 0
+        with self._lock:
+            for key, count in dry_run.counts.items():
+                timing = self._by_key.get(key) or self._by_command.get(key[0])
+                if timing is None:
+                    unmodelled += count
+                else:
+                    duration += timing.mean * count
+        return DurationEstimate(
+            duration=duration, messages=dry_run.messages, unmodelled=unmodelled
+        )
+
+
+class MessageTimer:
+    """
+    Records the time each message a plan sends to the RunEngine takes in a
+    timing model, as an observer of a MessageClock
+
+    Args:
+        model: Where to record the times
+    """
+
+    _model: TimingModel
+    _keys: "_MessageKeys"
+
+    def __init__(self, model: TimingModel) -> None:
+        self._model = model
+        self._keys = _MessageKeys()
+
+    def message_started(self, msg: Msg, now: float) -> None: ...
+
+    def message_finished(self, msg: Msg, started: float, now: float) -> None:
+        # Sleeps are estimated from their argument, not learned
+        if msg.command != "sleep":
+            self._model.record(self._keys.key(msg), now - started)
+
+
+def _reply(msg: Msg) -> Any:
+    if msg.command == "wait_for":
+        futures = []
+        for _ in msg.args[0] if msg.args else ():
+            future: Future[None] = Future()
+            future.set_result(None)
+            futures.append(future)
+        return futures
+    return None
+
+
+class _MessageKeys:
+    """
+    Works out the key of each message of one plan, remembering which devices
+    were started in each group so that waits for the group can be told apart
+    """
+
+    _groups: DeviceGroups
+
+    def __init__(self) -> None:
+        self._groups = DeviceGroups()
+
+    def key(self, msg: Msg) -> MessageKey:
+        if msg.command == "wait":
+            names = self._groups.waited_for(msg)
+            return (msg.command, ",".join(sorted(names)) if names else None)
+        self._groups.add(msg)
+        return (msg.command, device_name(msg))
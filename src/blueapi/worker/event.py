@@ -4,10 +4,12 @@ from typing import Any, Literal, Self
 
 from bluesky._vendor.super_state_machine.extras import PropertyMachine, ProxyString
 from bluesky.run_engine import RunEngineStateMachine
-from pydantic import Field, PydanticSchemaGenerationError, TypeAdapter
-from pydantic_core import PydanticSerializationError
+from pydantic import Field, PydanticSchemaGenerationError
+from pydantic_core import PydanticSerializationError, to_json
 
-from blueapi.utils import BlueapiBaseModel
+from blueapi.utils import BlueapiBaseModel, type_adapter
+
+from .results import ResultStore
 
 # The RunEngine can return any of these three types as its state
 # RawRunEngineState = type[PropertyMachine | ProxyString | str]
@@ -54,30 +56,50 @@ class WorkerState(StrEnum):
         return WorkerState(str(bluesky_state).upper())
 
 
+class StoredResult(BlueapiBaseModel):
+    """Reference to a result too large to be included in its task"""
+
+    digest: str
+    """SHA-256 hash of the serialized result"""
+    size: int
+    """Size of the serialized result in bytes"""
+
+
 class TaskResult(BlueapiBaseModel):
     """
     Serializable wrapper around the result of a plan
 
     If the result is not serializable, the result will be None but the type
     will be the name of the type. If the result is actually None, the type will
-    be 'NoneType'.
+    be 'NoneType'. If the result was too large to include, the result will be
+    None and it can be retrieved from the task's result endpoint.
     """
 
     outcome: Literal["success"] = "success"
     """Discriminant for serialization"""
-    result: Any = Field(None)
-    """The serialized result (or None if it is not serializable)"""
+    result: Any = Field(default=None)
+    """The serialized result (or None if it is not serializable or stored)"""
     type: str
     """The type of the result"""
+    stored: StoredResult | None = None
+    """Reference to the result if it was stored rather than included"""
 
     @classmethod
-    def from_result(cls, result: Any) -> Self:
+    def from_result(cls, result: Any, store: ResultStore | None = None) -> Self:
         type_str = type(result).__name__
         try:
-            value = TypeAdapter(type(result)).dump_python(result, mode="json")
+            adapter = type_adapter(type(result))
+            serialized = adapter.dump_python(result, mode="json")
         except (PydanticSchemaGenerationError, PydanticSerializationError):
-            value = None
-        return cls(result=value, type=type_str)
+            return cls(result=None, type=type_str)
+        if store is None:
+            return cls(result=serialized, type=type_str)
+        # Already JSON compatible, so only needs encoding to find its size
+        data = to_json(serialized)
+        if len(data) > store.threshold:
+            stored = StoredResult(digest=store.put(data), size=len(data))
+            return cls(result=None, type=type_str, stored=stored)
+        return cls(result=serialized, type=type_str)
 
 
 class TaskError(BlueapiBaseModel):
@@ -142,6 +164,25 @@ class ProgressEvent(BlueapiBaseModel):
 
     task_id: str
     statuses: Mapping[str, StatusView] = Field(default_factory=dict)
+    # The fields used by delta encoding are left out when they hold their
+    # defaults, so events are unchanged unless deltas are enabled
+    sequence: int | None = Field(
+        description="Position of this event in the progress of its task, only set "
+        "when progress events are delta encoded",
+        default=None,
+        exclude_if=lambda sequence: sequence is None,
+    )
+    snapshot: bool = Field(
+        description="Whether statuses holds every status being watched, otherwise "
+        "it holds only those added or changed since the previous event",
+        default=True,
+        exclude_if=lambda snapshot: snapshot,
+    )
+    removed: list[str] = Field(
+        description="Statuses no longer being watched since the previous event",
+        default_factory=list,
+        exclude_if=lambda removed: not removed,
+    )
 
 
 class TaskStatus(BlueapiBaseModel):
@@ -0,0 +1,81 @@
+from collections.abc import Callable, Mapping
+from threading import RLock, Timer
+from typing import Any
+
+from event_model import pack_event_page
+
+
+class EventPageBatcher:
+    """
+    Packs consecutive event documents from the same descriptor into event_page
+    documents, so that each page is published as a single message. A page is
+    published when it is full, when it has been held for the maximum delay, or
+    when any other document arrives, so documents are never reordered.
+
+    Args:
+        publish: Called with the name and contents of each document to publish
+        max_events: Maximum number of events in a page
+        max_delay: Maximum number of seconds to hold an event before its page is
+            published, if None pages are only published when full or interrupted
+    """
+
+    _publish: Callable[[str, Mapping[str, Any]], None]
+    _max_events: int
+    _max_delay: float | None
+    _lock: RLock
+    _events: list[Mapping[str, Any]]
+    _timer: Timer | None
+
+    def __init__(
+        self,
+        publish: Callable[[str, Mapping[str, Any]], None],
+        max_events: int,
+        max_delay: float | None = None,
+    ) -> None:
+        self._publish = publish
+        self._max_events = max_events
+        self._max_delay = max_delay
+        self._lock = RLock()
+        self._events = []
+        self._timer = None
+
+    def add(self, name: str, document: Mapping[str, Any]) -> None:
+        """
+        Publish a document, holding it back if it is an event that may be
+        added to a page.
+
+        Args:
+            name: Name of the document, e.g. "start" or "event"
+            document: The document itself
+        """
+        with self._lock:
+            if name != "event":
+                self.flush()
+                self._publish(name, document)
+                return
+            if self._events and (
+                self._events[0]["descriptor"] != document["descriptor"]
+            ):
+                self.flush()
+            self._events.append(document)
+            if len(self._events) >= self._max_events:
+                self.flush()
+            elif self._timer is None and self._max_delay is not None:
+                self._timer = Timer(self._max_delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self) -> None:
+        """
+        Publish any events being held back, without waiting.
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            events, self._events = self._events, []
+            if len(events) == 1:
+                # A page of one is no smaller, keep the original document
+                self._publish("event", events[0])
+            elif events:
+                self._publish("event_page", pack_event_page(*events))  # type: ignore
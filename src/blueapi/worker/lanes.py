@@ -0,0 +1,108 @@
+import logging
+from collections.abc import Callable
+from queue import Queue
+from threading import Lock, Thread
+from typing import Generic, TypeVar
+
+from bluesky.run_engine import RunEngine
+
+LOGGER = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class RunEngineLane(Generic[T]):
+    """
+    A RunEngine with a thread of its own, running tasks one at a time alongside
+    the worker's main RunEngine. Every lane shares the main RunEngine's event
+    loop, so devices are only ever accessed from that loop.
+
+    Args:
+        name: Name of the lane's thread
+        run_engine: RunEngine the lane's tasks are run in
+        run_task: Called from the lane's thread to run each task
+        on_idle: Called from the lane's thread whenever it finishes a task and
+            can accept another
+    """
+
+    _name: str
+    _run_engine: RunEngine
+    _run_task: Callable[[RunEngine, T], None]
+    _on_idle: Callable[[], None]
+    _tasks: Queue  # type: ignore
+    _lock: Lock
+    _busy: bool
+    _thread: Thread | None
+
+    def __init__(
+        self,
+        name: str,
+        run_engine: RunEngine,
+        run_task: Callable[[RunEngine, T], None],
+        on_idle: Callable[[], None],
+    ) -> None:
+        self._name = name
+        self._run_engine = run_engine
+        self._run_task = run_task
+        self._on_idle = on_idle
+        self._tasks = Queue()
+        self._lock = Lock()
+        self._busy = False
+        self._thread = None
+
+    @property
+    def busy(self) -> bool:
+        """
+        :return: whether the lane has a task it has not finished yet
+        """
+        return self._busy
+
+    @property
+    def run_engine(self) -> RunEngine:
+        return self._run_engine
+
+    def try_submit(self, task: T) -> bool:
+        """
+        Hand a task to the lane if it is not already busy.
+
+        Args:
+            task: The task to run
+
+        Returns:
+            bool: True if the lane accepted the task
+        """
+        with self._lock:
+            if self._busy or self._thread is None:
+                return False
+            self._busy = True
+            self._tasks.put(task)
+            return True
+
+    def start(self) -> None:
+        self._thread = Thread(target=self._run, name=self._name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float | None = None) -> None:
+        """
+        Stop accepting tasks and wait for the current one, if any, to finish.
+
+        Args:
+            timeout: Maximum number of seconds to wait, forever if None
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._tasks.put(None)
+            thread.join(timeout)
+            if thread.is_alive():
+                LOGGER.warning(f"{self._name} did not stop within {timeout} seconds")
+
+    def _run(self) -> None:
+        while (task := self._tasks.get()) is not None:
+            try:
+                self._run_task(self._run_engine, task)
+            except Exception:
+                LOGGER.exception(f"{self._name} failed to run task")
+            with self._lock:
+                self._busy = False
+            self._on_idle()
@@ -0,0 +1,201 @@
+import dataclasses
+from collections.abc import Iterable, Mapping
+from enum import Enum
+from inspect import isclass, signature
+from threading import Lock
+from types import NoneType
+from typing import Annotated, Any, Literal, get_args, get_origin, get_type_hints
+
+from blueapi.core import BlueskyContext
+
+
+class DeviceLeaseManager:
+    """
+    Grants running tasks exclusive use of devices, so that tasks running at the
+    same time on different RunEngines never drive the same hardware. A task
+    either leases every device it asks for or none of them.
+    """
+
+    _lock: Lock
+    _holders: dict[str, str]
+    _leases: dict[str, frozenset[str]]
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._holders = {}
+        self._leases = {}
+
+    def try_acquire(self, task_id: str, devices: Iterable[str]) -> bool:
+        """
+        Lease devices to a task if none of them are leased to another task.
+
+        Args:
+            task_id: ID of the task that will use the devices
+            devices: Names of the devices
+
+        Returns:
+            bool: True if the task now holds every device, False if any were
+                already held by another task, in which case none are leased
+        """
+        wanted = frozenset(devices)
+        with self._lock:
+            if any(self._holders.get(device, task_id) != task_id for device in wanted):
+                return False
+            for device in wanted:
+                self._holders[device] = task_id
+            self._leases[task_id] = self._leases.get(task_id, frozenset()) | wanted
+            return True
+
+    def release(self, task_id: str) -> None:
+        """
+        Return every device leased to a task. Does nothing if it holds none.
+
+        Args:
+            task_id: ID of the task
+        """
+        with self._lock:
+            for device in self._leases.pop(task_id, frozenset()):
+                del self._holders[device]
+
+    def conflicts(self, task_id: str, devices: Iterable[str]) -> dict[str, str]:
+        """
+        Find which of the given devices are leased to other tasks.
+
+        Args:
+            task_id: ID of the task that wants the devices
+            devices: Names of the devices
+
+        Returns:
+            dict[str, str]: ID of the task holding each unavailable device
+        """
+        with self._lock:
+            return {
+                device: holder
+                for device in devices
+                if (holder := self._holders.get(device, task_id)) != task_id
+            }
+
+    def leases(self) -> dict[str, frozenset[str]]:
+        """
+        :return: devices leased to each task
+        """
+        with self._lock:
+            return dict(self._leases)
+
+
+def devices_of_plan(
+    ctx: BlueskyContext, plan_name: str, params: Mapping[str, Any]
+) -> frozenset[str]:
+    """
+    Find the devices of a context that a plan may use when run with validated
+    parameters. These are the devices its parameters refer to, including those
+    injected as defaults, and the devices its module refers to by name.
+    Parameters whose types cannot hold a device, such as arrays of numbers,
+    are not searched.
+
+    Args:
+        ctx: Context the parameters were validated against
+        plan_name: Name of the plan
+        params: Validated parameters of the plan, including defaults
+
+    Returns:
+        frozenset[str]: Names of the registered devices used
+    """
+    function = ctx.plan_functions[plan_name]
+    try:
+        hints = get_type_hints(function)
+    except (NameError, TypeError):
+        hints = {}
+    found = set(
+        devices_in_params(
+            ctx,
+            {
+                name: value
+                for name, value in params.items()
+                if _may_hold_device(hints.get(name, Any))
+            },
+        )
+    )
+    for name, parameter in signature(function).parameters.items():
+        # Devices injected by name into parameters not typed as devices
+        default = parameter.default
+        if isinstance(default, str) and default in ctx.devices:
+            if params.get(name, default) == default:
+                found.add(default)
+    registered = {id(device): name for name, device in ctx.devices.items()}
+    module = getattr(function, "__globals__", {})
+    code = getattr(function, "__code__", None)
+    for name in code.co_names if code is not None else ():
+        if name in module:
+            if (device := _registered_ancestor(module[name], registered)) is not None:
+                found.add(device)
+    return frozenset(found)
+
+
+def devices_in_params(ctx: BlueskyContext, params: Mapping[str, Any]) -> frozenset[str]:
+    """
+    Find the devices of a context that validated plan parameters refer to. A
+    child of a registered device counts as its top-level device, as does a
+    device nested in a collection or composite parameter.
+
+    Args:
+        ctx: Context the parameters were validated against
+        params: Validated parameters of a plan
+
+    Returns:
+        frozenset[str]: Names of the registered devices used
+    """
+    registered = {id(device): name for name, device in ctx.devices.items()}
+    found: set[str] = set()
+    seen: set[int] = set()
+
+    def visit(value: Any) -> None:
+        if id(value) in seen or isinstance(value, str | bytes | int | float):
+            return
+        seen.add(id(value))
+        if (name := _registered_ancestor(value, registered)) is not None:
+            found.add(name)
+        elif hasattr(value, "__array__"):
+            # Arrays hold numbers, not devices
+            return
+        elif isinstance(value, Mapping):
+            for item in value.values():
+                visit(item)
+        elif isinstance(value, Iterable):
+            for item in value:
+                visit(item)
+        elif dataclasses.is_dataclass(value) and not isinstance(value, type):
+            for field in dataclasses.fields(value):
+                visit(getattr(value, field.name))
+
+    for value in params.values():
+        visit(value)
+    return frozenset(found)
+
+
+def _may_hold_device(annotation: Any) -> bool:
+    if annotation in (str, bytes, int, float, bool, complex, NoneType):
+        return False
+    origin = get_origin(annotation)
+    if origin is Literal:
+        return False
+    if origin is Annotated:
+        return _may_hold_device(get_args(annotation)[0])
+    if isclass(origin or annotation):
+        cls = origin or annotation
+        if issubclass(cls, Enum) or hasattr(cls, "__array__"):
+            return False
+    if origin is not None and (args := get_args(annotation)):
+        return any(_may_hold_device(arg) for arg in args if arg is not Ellipsis)
+    return True
+
+
+def _registered_ancestor(value: Any, registered: dict[int, str]) -> str | None:
+    # Devices know their parents, so a child resolves to its registered root
+    depth = 0
+    while value is not None and depth < 32:
+        if (name := registered.get(id(value))) is not None:
+            return name
+        value = getattr(value, "parent", None)
+        depth += 1
+    return None
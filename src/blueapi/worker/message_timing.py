@@ -0,0 +1,117 @@
+import time
+from collections.abc import Callable, Hashable, Sequence
+from typing import Protocol
+
+from bluesky import Msg
+
+
+class MessageObserver(Protocol):
+    """
+    Something told when each message of a plan starts and finishes by a
+    MessageClock
+    """
+
+    def message_started(self, msg: Msg, now: float) -> None:
+        """
+        Note that the RunEngine has started processing a message.
+
+        Args:
+            msg: The message
+            now: When it started, from the clock of the MessageClock
+        """
+
+    def message_finished(self, msg: Msg, started: float, now: float) -> None:
+        """
+        Note that the RunEngine has finished processing a message.
+
+        Args:
+            msg: The message
+            started: When it started, from the clock of the MessageClock
+            now: When it finished
+        """
+
+
+class MessageClock:
+    """
+    Times each message a plan sends to the RunEngine, for use as its msg_hook,
+    and tells each of its observers when a message starts and finishes. The hook
+    is called just before each message is processed, so a message is taken to
+    have lasted until the next one arrives, or until finish is called.
+
+    Args:
+        observers: What to tell about each message, in order
+        clock: Source of the current time in seconds
+    """
+
+    _observers: Sequence[MessageObserver]
+    _clock: Callable[[], float]
+    _current: Msg | None
+    _started: float
+
+    def __init__(
+        self,
+        observers: Sequence[MessageObserver],
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._observers = observers
+        self._clock = clock
+        self._current = None
+        self._started = 0.0
+
+    def on_msg(self, msg: Msg) -> None:
+        now = self._clock()
+        self._finish(now)
+        self._current = msg
+        self._started = now
+        for observer in self._observers:
+            observer.message_started(msg, now)
+
+    def finish(self) -> None:
+        """
+        Finish timing the last message, if it has not been already.
+        """
+        if self._current is not None:
+            self._finish(self._clock())
+
+    def _finish(self, now: float) -> None:
+        if (msg := self._current) is None:
+            return
+        self._current = None
+        for observer in self._observers:
+            observer.message_finished(msg, self._started, now)
+
+
+class DeviceGroups:
+    """
+    Remembers which devices were started in each group of one plan, so that
+    the wait for a group can be put down to the devices it waited for
+    """
+
+    _groups: dict[Hashable, set[str]]
+
+    def __init__(self) -> None:
+        self._groups = {}
+
+    def add(self, msg: Msg) -> None:
+        """
+        Remember the device a message was addressed to, if it was started in a
+        group.
+        """
+        if msg.command != "wait" and "group" in msg.kwargs:
+            if (name := device_name(msg)) is not None:
+                self._groups.setdefault(msg.kwargs["group"], set()).add(name)
+
+    def waited_for(self, msg: Msg) -> set[str]:
+        """
+        Forget the group a wait message waits for.
+
+        Returns:
+            set[str]: Names of the devices started in the group
+        """
+        return self._groups.pop(msg.kwargs.get("group"), set())
+
+
+def device_name(msg: Msg) -> str | None:
+    """The name of the device a message is addressed to, if it has one"""
+    name = getattr(msg.obj, "name", None)
+    return name if isinstance(name, str) else None
@@ -0,0 +1,153 @@
+from bisect import bisect_left
+from dataclasses import dataclass, field
+
+from bluesky import Msg
+from pydantic import Field
+
+from blueapi.utils import BlueapiBaseModel
+
+from .message_timing import DeviceGroups, device_name
+
+#: Upper bounds in seconds of each bucket of the latency histograms, the last
+#: bucket holds every message that took longer
+LATENCY_BUCKETS: tuple[float, ...] = (0.001, 0.01, 0.1, 1.0, 10.0)
+
+
+class CommandProfile(BlueapiBaseModel):
+    """
+    How long the RunEngine took to process messages with one command
+    """
+
+    count: int = Field(description="Number of messages")
+    total: float = Field(description="Total number of seconds taken")
+    max: float = Field(description="Longest time taken by one message in seconds")
+    histogram: list[int] = Field(
+        description="Number of messages whose time fell in each latency bucket"
+    )
+
+
+class DeviceProfile(BlueapiBaseModel):
+    """
+    How long messages addressed to one device took, and how long the plan
+    waited for the device's operations to finish
+    """
+
+    name: str = Field(description="Name of the device")
+    messages: int = Field(description="Number of messages addressed to the device")
+    time: float = Field(description="Seconds taken by messages addressed to it")
+    wait_time: float = Field(
+        description="Seconds spent waiting for groups that included the device"
+    )
+
+
+class TaskProfile(BlueapiBaseModel):
+    """
+    Where the time went while a task's plan ran, message by message
+    """
+
+    total_time: float = Field(description="Seconds between the first and last message")
+    bucket_bounds: list[float] = Field(
+        description="Upper bounds in seconds of the latency buckets, the last "
+        "bucket holds every message that took longer"
+    )
+    commands: dict[str, CommandProfile] = Field(
+        description="Profile of each command sent by the plan"
+    )
+    devices: list[DeviceProfile] = Field(
+        description="Profile of each device, longest wait time first"
+    )
+
+
+@dataclass
+class _CommandTimes:
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+    histogram: list[int] = field(
+        default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1)
+    )
+
+
+@dataclass
+class _DeviceTimes:
+    messages: int = 0
+    time: float = 0.0
+    wait_time: float = 0.0
+
+
+class MsgProfiler:
+    """
+    Times each message a plan sends to the RunEngine, as an observer of a
+    MessageClock. The time spent in a wait message is also charged to every
+    device whose operations it waited for.
+    """
+
+    _commands: dict[str, _CommandTimes]
+    _devices: dict[str, _DeviceTimes]
+    _groups: DeviceGroups
+    _first_started: float | None
+    _last_finished: float | None
+
+    def __init__(self) -> None:
+        self._commands = {}
+        self._devices = {}
+        self._groups = DeviceGroups()
+        self._first_started = None
+        self._last_finished = None
+
+    def message_started(self, msg: Msg, now: float) -> None:
+        if self._first_started is None:
+            self._first_started = now
+        self._groups.add(msg)
+
+    def message_finished(self, msg: Msg, started: float, now: float) -> None:
+        self._last_finished = now
+        elapsed = now - started
+        command = self._commands.setdefault(msg.command, _CommandTimes())
+        command.count += 1
+        command.total += elapsed
+        command.max = max(command.max, elapsed)
+        command.histogram[bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+        if (name := device_name(msg)) is not None:
+            device = self._devices.setdefault(name, _DeviceTimes())
+            device.messages += 1
+            device.time += elapsed
+        if msg.command == "wait":
+            for name in self._groups.waited_for(msg):
+                self._devices.setdefault(name, _DeviceTimes()).wait_time += elapsed
+
+    def summary(self) -> TaskProfile:
+        """
+        Summarise every message that has finished.
+
+        Returns:
+            TaskProfile: Times by command and by device
+        """
+        return TaskProfile(
+            total_time=(
+                self._last_finished - self._first_started
+                if self._first_started is not None and self._last_finished is not None
+                else 0.0
+            ),
+            bucket_bounds=list(LATENCY_BUCKETS),
+            commands={
+                command: CommandProfile(
+                    count=times.count,
+                    total=times.total,
+                    max=times.max,
+                    histogram=list(times.histogram),
+                )
+                for command, times in self._commands.items()
+            },
+            devices=[
+                DeviceProfile(
+                    name=name,
+                    messages=times.messages,
+                    time=times.time,
+                    wait_time=times.wait_time,
+                )
+                for name, times in sorted(
+                    self._devices.items(), key=lambda item: -item[1].wait_time
+                )
+            ],
+        )
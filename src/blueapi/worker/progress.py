@@ -0,0 +1,176 @@
+import logging
+import time
+from collections.abc import Callable, Mapping
+from threading import Lock, Timer
+
+from .event import ProgressEvent, StatusView
+
+LOGGER = logging.getLogger(__name__)
+
+
+class ProgressThrottle:
+    """
+    Limits how often progress is published. An update arriving sooner than the
+    minimum interval after the last publication is held back and merged with
+    any that follow it, so that only the most recent state is published once the
+    interval has passed. The latest state is never lost, only intermediate ones.
+
+    Args:
+        publish: Called to publish the current progress
+        max_rate: Maximum number of publications per second, if None every
+            update is published immediately
+    """
+
+    _publish: Callable[[], None]
+    _min_interval: float
+    _lock: Lock
+    _last_published: float
+    _timer: Timer | None
+    _pending: bool
+    _merged: int
+    _published: int
+
+    def __init__(
+        self,
+        publish: Callable[[], None],
+        max_rate: float | None = None,
+    ) -> None:
+        self._publish = publish
+        self._min_interval = 1.0 / max_rate if max_rate else 0.0
+        self._lock = Lock()
+        self._last_published = float("-inf")
+        self._timer = None
+        self._pending = False
+        self._merged = 0
+        self._published = 0
+
+    @property
+    def merged_count(self) -> int:
+        """
+        :return: number of updates that were merged into a later one
+        """
+        return self._merged
+
+    @property
+    def published_count(self) -> int:
+        """
+        :return: number of times progress has been published
+        """
+        return self._published
+
+    def update(self, final: bool = False) -> None:
+        """
+        Notify the throttle that progress has changed.
+
+        Args:
+            final: Publish immediately regardless of the rate limit, for example
+                because an operation has completed
+        """
+        with self._lock:
+            now = time.monotonic()
+            if final or now - self._last_published >= self._min_interval:
+                if self._pending:
+                    self._merged += 1
+                self._publish_now(now)
+            elif self._pending:
+                # The pending update is superseded by this one
+                self._merged += 1
+            else:
+                self._pending = True
+                self._timer = Timer(
+                    self._min_interval - (now - self._last_published),
+                    self._publish_pending,
+                )
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self) -> None:
+        """
+        Publish any update that is being held back, without waiting.
+        """
+        with self._lock:
+            if self._pending:
+                self._publish_now(time.monotonic())
+
+    def _publish_pending(self) -> None:
+        with self._lock:
+            if self._pending:
+                self._publish_now(time.monotonic())
+
+    def _publish_now(self, now: float) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._pending = False
+        self._last_published = now
+        self._published += 1
+        try:
+            self._publish()
+        except Exception:
+            LOGGER.exception("Failed to publish progress")
+
+
+class ProgressView:
+    """
+    Rebuilds the full set of statuses for each task from its progress events,
+    whether they are delta encoded or not. If an event is missed the view of that
+    task is out of date until the next full snapshot arrives.
+    """
+
+    _statuses: dict[str, dict[str, StatusView]]
+    _sequences: dict[str, int]
+
+    def __init__(self) -> None:
+        self._statuses = {}
+        self._sequences = {}
+
+    def statuses(self, task_id: str) -> Mapping[str, StatusView]:
+        """
+        :return: every status of the task known to be watched
+        """
+        return dict(self._statuses.get(task_id, {}))
+
+    def apply(self, event: ProgressEvent) -> ProgressEvent | None:
+        """
+        Update the view of a task from one of its progress events.
+
+        Args:
+            event: Progress event, either a full snapshot or a delta
+
+        Returns:
+            ProgressEvent | None: Full snapshot of the task's statuses, or None
+                if earlier deltas were missed and the view cannot be rebuilt yet
+        """
+        task_id = event.task_id
+        if event.snapshot:
+            self._statuses[task_id] = dict(event.statuses)
+        else:
+            previous = self._sequences.get(task_id)
+            if (
+                task_id not in self._statuses
+                or previous is None
+                or event.sequence is None
+                or event.sequence != previous + 1
+            ):
+                # Missed an event, wait for the next snapshot to resynchronise
+                self._statuses.pop(task_id, None)
+                self._sequences.pop(task_id, None)
+                return None
+            statuses = self._statuses[task_id]
+            for status_id in event.removed:
+                statuses.pop(status_id, None)
+            statuses.update(event.statuses)
+        if event.sequence is not None:
+            self._sequences[task_id] = event.sequence
+        return ProgressEvent(
+            task_id=task_id,
+            statuses=dict(self._statuses[task_id]),
+            sequence=event.sequence,
+        )
+
+    def forget(self, task_id: str) -> None:
+        """
+        Stop tracking the statuses of a task, e.g. because it has finished.
+        """
+        self._statuses.pop(task_id, None)
+        self._sequences.pop(task_id, None)
@@ -0,0 +1,82 @@
+import hashlib
+import logging
+import os
+import re
+import tempfile
+from pathlib import Path
+
+LOGGER = logging.getLogger(__name__)
+
+_STORED_NAME = re.compile(r"^[0-9a-f]{64}\.json$")
+
+#: Subdirectory of the configured directory that the store owns
+SUBDIRECTORY = "blueapi-results"
+
+
+class ResultStore:
+    """
+    Directory of plan results too large to be included in the task, each in a
+    file named after the SHA-256 hash of its content, so that identical results
+    are only stored once. Results are kept in a subdirectory of their own, and
+    results left there by a previous worker are removed when the store is
+    created, so nothing else in the directory is ever deleted.
+
+    Args:
+        directory: Where to store results, in a subdirectory created if it
+            does not exist
+        threshold: Size in bytes of the serialized result above which a
+            result is stored rather than included in the task
+    """
+
+    _directory: Path
+    _threshold: int
+
+    def __init__(self, directory: Path, threshold: int) -> None:
+        self._directory = directory / SUBDIRECTORY
+        self._threshold = threshold
+        self._directory.mkdir(parents=True, exist_ok=True)
+        for path in self._directory.iterdir():
+            if _STORED_NAME.match(path.name):
+                path.unlink(missing_ok=True)
+
+    @property
+    def threshold(self) -> int:
+        """
+        :return: size in bytes above which a serialized result is stored
+        """
+        return self._threshold
+
+    def put(self, data: bytes) -> str:
+        """
+        Store a serialized result, unless an identical one is already stored.
+
+        Args:
+            data: The result serialized as JSON
+
+        Returns:
+            str: SHA-256 hash of the result, which identifies it in the store
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if not path.exists():
+            # Written under a temporary name so a partial result is never read
+            fd, temporary = tempfile.mkstemp(dir=self._directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as stream:
+                stream.write(data)
+            os.replace(temporary, path)
+        return digest
+
+    def path(self, digest: str) -> Path:
+        """
+        :return: path of the file that holds the result with a hash
+        """
+        return self._directory / f"{digest}.json"
+
+    def remove(self, digest: str) -> None:
+        """
+        Delete a stored result, if it is still there.
+        """
+        try:
+            self.path(digest).unlink(missing_ok=True)
+        except OSError:
+            LOGGER.exception(f"Failed to remove stored result {digest}")
@@ -0,0 +1,335 @@
+import heapq
+import time
+from collections.abc import Callable, Hashable, Mapping, Sequence
+from dataclasses import dataclass
+from threading import Lock
+from typing import Generic, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+
+#: Instrument session and user that submitted a task, either may be unknown
+Party = tuple[str | None, str | None]
+
+
+@dataclass(frozen=True)
+class QueueWaitStats:
+    """
+    How long tasks waited in the run queue before starting
+    """
+
+    #: Number of tasks that have started
+    count: int
+    #: Total number of seconds waited
+    total: float
+    #: Longest wait in seconds
+    max: float
+
+    @property
+    def mean(self) -> float:
+        """
+        :return: average wait in seconds
+        """
+        return self.total / self.count if self.count else 0.0
+
+
+class QueueWaitRecorder(Generic[K]):
+    """
+    Thread-safe record of how long tasks waited in the queue, grouped by a key
+    such as their priority
+    """
+
+    _lock: Lock
+    _stats: dict[K, QueueWaitStats]
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._stats = {}
+
+    def record(self, key: K, wait: float) -> None:
+        """
+        Record that a task left the queue and started.
+
+        Args:
+            key: Group the task belongs to
+            wait: Number of seconds it spent in the queue
+        """
+        with self._lock:
+            previous = self._stats.get(key, QueueWaitStats(0, 0.0, 0.0))
+            self._stats[key] = QueueWaitStats(
+                count=previous.count + 1,
+                total=previous.total + wait,
+                max=max(previous.max, wait),
+            )
+
+    def stats(self) -> dict[K, QueueWaitStats]:
+        """
+        :return: waits recorded so far for each key
+        """
+        with self._lock:
+            return dict(self._stats)
+
+
+@dataclass(frozen=True)
+class PartyShare:
+    """
+    How much of the worker one user of an instrument session has had
+    """
+
+    instrument_session: str | None
+    user: str | None
+    #: Relative share of the worker given to the instrument session
+    weight: float
+    #: Number of tasks waiting in the run queue
+    queued: int
+    #: Total number of seconds the party's tasks have run for
+    run_time: float
+    #: Fraction of the run time of all tasks that was the party's
+    share: float
+    #: How long the party's tasks waited in the run queue
+    waits: QueueWaitStats
+
+
+def queue_position(priorities: list[int], priority: int) -> int:
+    """
+    Where a task should join a queue ordered by descending priority, so that it
+    runs after every queued task of the same or higher priority.
+
+    Args:
+        priorities: Priorities of the queued tasks, in queue order
+        priority: Priority of the task joining the queue
+
+    Returns:
+        int: Index to insert the task at
+    """
+    for position, queued in enumerate(priorities):
+        if queued < priority:
+            return position
+    return len(priorities)
+
+
+class FairShareScheduler:
+    """
+    Decides the order in which tasks of the same priority should run so that
+    instrument sessions share the worker in proportion to their weights, and the
+    users of each session share its portion equally.
+
+    Each session keeps a virtual time, the seconds its tasks have run divided by
+    its weight, and each user the seconds their tasks have run. The session with
+    the least virtual time goes next, then its user with the least run time.
+    When a session or user starts a task its time is first brought level with
+    the most recently started one, so a party that has been idle cannot claim
+    the worker for itself to catch up.
+
+    A session may also be given a quota, the seconds its tasks may run for in
+    each quota period. Once it has used its quota its tasks go behind those of
+    every session that has not, so they only run when the worker would
+    otherwise be left idle, until the next period starts.
+
+    Args:
+        session_weights: Relative share of the worker for each session
+        default_weight: Weight of sessions not listed
+        session_quotas: Seconds each listed session's tasks may run for in each
+            quota period, sessions not listed are not limited
+        quota_period: Length of each quota period in seconds
+        clock: Source of the current time in seconds
+    """
+
+    _session_weights: Mapping[str, float]
+    _default_weight: float
+    _session_quotas: Mapping[str, float]
+    _quota_period: float
+    _clock: Callable[[], float]
+    _lock: Lock
+    _session_times: dict[str | None, float]
+    _user_times: dict[Party, float]
+    _session_clock: float
+    _user_clocks: dict[str | None, float]
+    _run_times: dict[Party, float]
+    _run_counts: dict[Party, int]
+    # Seconds each session's tasks have run for in the current quota period
+    _period_start: float
+    _period_usage: dict[str | None, float]
+
+    def __init__(
+        self,
+        session_weights: Mapping[str, float] | None = None,
+        default_weight: float = 1.0,
+        session_quotas: Mapping[str, float] | None = None,
+        quota_period: float = 3600.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._session_weights = dict(session_weights or {})
+        self._default_weight = default_weight
+        self._session_quotas = dict(session_quotas or {})
+        self._quota_period = quota_period
+        self._clock = clock
+        self._lock = Lock()
+        self._session_times = {}
+        self._user_times = {}
+        self._session_clock = 0.0
+        self._user_clocks = {}
+        self._run_times = {}
+        self._run_counts = {}
+        self._period_start = clock()
+        self._period_usage = {}
+
+    def weight(self, session: str | None) -> float:
+        """
+        :return: relative share of the worker given to a session
+        """
+        if session is None:
+            return self._default_weight
+        return self._session_weights.get(session, self._default_weight)
+
+    def remaining_quota(self, session: str | None) -> float | None:
+        """
+        :return: seconds a session's tasks may still run for in the current
+            quota period before it is over its quota, None if it has no quota
+        """
+        with self._lock:
+            return self._remaining_quota(session)
+
+    def started(self, party: Party) -> None:
+        """
+        Note that a task has left the queue and started.
+
+        Args:
+            party: Session and user the task belongs to
+        """
+        session, _ = party
+        with self._lock:
+            session_time = max(
+                self._session_times.get(session, 0.0), self._session_clock
+            )
+            self._session_times[session] = self._session_clock = session_time
+            user_time = max(
+                self._user_times.get(party, 0.0), self._user_clocks.get(session, 0.0)
+            )
+            self._user_times[party] = self._user_clocks[session] = user_time
+
+    def charge(self, party: Party, seconds: float) -> None:
+        """
+        Account for the time a task ran for.
+
+        Args:
+            party: Session and user the task belongs to
+            seconds: How long the task ran
+        """
+        session, _ = party
+        with self._lock:
+            self._session_times[session] = self._session_times.get(
+                session, 0.0
+            ) + seconds / self.weight(session)
+            self._user_times[party] = self._user_times.get(party, 0.0) + seconds
+            self._run_times[party] = self._run_times.get(party, 0.0) + seconds
+            self._run_counts[party] = self._run_counts.get(party, 0) + 1
+            if session in self._session_quotas:
+                self._start_period()
+                self._period_usage[session] = (
+                    self._period_usage.get(session, 0.0) + seconds
+                )
+
+    def run_times(self) -> dict[Party, float]:
+        """
+        :return: total seconds that each party's tasks have run for
+        """
+        with self._lock:
+            return dict(self._run_times)
+
+    def order(self, tasks: Sequence[tuple[str, Party]]) -> list[str]:
+        """
+        Put tasks of the same priority in the order they should run. Each task
+        is assumed to take as long as the average of its party's previous tasks,
+        and the order is what scheduling them one at a time would produce,
+        including sessions using up their quotas. Each party's own tasks keep
+        their relative order.
+
+        Args:
+            tasks: ID and party of each task, in queue order
+
+        Returns:
+            list[str]: IDs of the tasks in the order they should run
+        """
+        with self._lock:
+            run_times = dict(self._run_times)
+            run_counts = dict(self._run_counts)
+            total_count = sum(run_counts.values())
+            mean = sum(run_times.values()) / total_count if total_count else 1.0
+            session_times = {
+                session: max(self._session_times.get(session, 0.0), self._session_clock)
+                for (_, (session, _)) in tasks
+            }
+            user_times = {
+                party: max(
+                    self._user_times.get(party, 0.0),
+                    self._user_clocks.get(party[0], 0.0),
+                )
+                for (_, party) in tasks
+            }
+            quotas = {
+                session: self._remaining_quota(session) for session in session_times
+            }
+
+        backlog: dict[Party, list[str]] = {}
+        for task_id, party in tasks:
+            backlog.setdefault(party, []).append(task_id)
+        first_seen = {party: index for index, party in enumerate(backlog)}
+
+        def estimate(party: Party) -> float:
+            count = run_counts.get(party, 0)
+            return run_times[party] / count if count else mean
+
+        def over_quota(session: str | None) -> bool:
+            remaining = quotas[session]
+            return remaining is not None and remaining <= 0
+
+        ordered: list[str] = []
+        sessions = [
+            (
+                over_quota(session),
+                virtual_time,
+                min(first_seen[p] for p in backlog if p[0] == session),
+                session,
+            )
+            for session, virtual_time in session_times.items()
+        ]
+        heapq.heapify(sessions)
+        while sessions:
+            _, virtual_time, position, session = heapq.heappop(sessions)
+            party = min(
+                (p for p in backlog if p[0] == session and backlog[p]),
+                key=lambda p: (user_times[p], first_seen[p]),
+            )
+            ordered.append(backlog[party].pop(0))
+            cost = estimate(party)
+            user_times[party] += cost
+            if (remaining := quotas[session]) is not None:
+                quotas[session] = remaining - cost
+            if any(backlog[p] for p in backlog if p[0] == session):
+                heapq.heappush(
+                    sessions,
+                    (
+                        over_quota(session),
+                        virtual_time + cost / self.weight(session),
+                        position,
+                        session,
+                    ),
+                )
+        return ordered
+
+    def _remaining_quota(self, session: str | None) -> float | None:
+        # Must be called with the lock held
+        if session is None or (quota := self._session_quotas.get(session)) is None:
+            return None
+        self._start_period()
+        return quota - self._period_usage.get(session, 0.0)
+
+    def _start_period(self) -> None:
+        """
+        Forget what sessions used in the last quota period if it has ended. Must
+        be called with the lock held.
+        """
+        elapsed = self._clock() - self._period_start
+        if elapsed >= self._quota_period:
+            self._period_start += elapsed - elapsed % self._quota_period
+            self._period_usage.clear()
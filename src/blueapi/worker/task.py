@@ -1,8 +1,12 @@
 import logging
-from collections.abc import Mapping
-from typing import Any
+from collections.abc import Callable, Mapping, Sequence
+from enum import StrEnum
+from typing import Any, Self
 
-from pydantic import BaseModel, Field, TypeAdapter
+from bluesky.preprocessors import inject_md_wrapper
+from bluesky.run_engine import RunEngine
+from bluesky.utils import MsgGenerator, RunEngineControlException
+from pydantic import BaseModel, Field, model_validator
 
 from blueapi.core import BlueskyContext
 from blueapi.utils import BlueapiBaseModel
@@ -10,12 +14,42 @@ from blueapi.utils import BlueapiBaseModel
 LOGGER = logging.getLogger(__name__)
 
 
+class StepState(StrEnum):
+    """
+    How far one step of a bundle has got
+    """
+
+    PENDING = "PENDING"
+    RUNNING = "RUNNING"
+    SUCCEEDED = "SUCCEEDED"
+    FAILED = "FAILED"
+    #: Not run because an earlier step failed
+    SKIPPED = "SKIPPED"
+
+
+class StepStatus(BlueapiBaseModel):
+    """
+    Status of one step of a bundle
+    """
+
+    name: str = Field(description="Name of the step's plan")
+    state: StepState = Field(
+        description="How far the step has got", default=StepState.PENDING
+    )
+    error: str | None = Field(description="Why the step failed", default=None)
+
+
+#: Called with the index of a step of a bundle, its new state and, if it
+#: failed, why
+OnStep = Callable[[int, StepState, str | None], None]
+
+
 class Task(BlueapiBaseModel):
     """
     Task that will run a plan
     """
 
-    name: str = Field(description="Name of plan to run")
+    name: str = Field(description="Name of plan to run, or of the bundle")
     params: Mapping[str, Any] = Field(
         description="Values for parameters to plan, if any", default_factory=dict
     )
@@ -23,27 +57,133 @@ class Task(BlueapiBaseModel):
         description="Any metadata to apply to all runs within this task",
         default_factory=dict,
     )
+    priority: int = Field(
+        description="Queued tasks with higher priorities are run first",
+        default=0,
+    )
+    steps: list["Task"] = Field(
+        description="Tasks to run one after another in place of a plan, without "
+        "the worker becoming idle between them, making this task a bundle. "
+        "The priority of each step is ignored.",
+        default_factory=list,
+    )
+    stop_on_failure: bool = Field(
+        description="Whether the remaining steps of a bundle are skipped once "
+        "one of them fails",
+        default=True,
+    )
+
+    @model_validator(mode="after")
+    def _check_bundle(self) -> Self:
+        if self.steps and self.params:
+            raise ValueError("The steps of a bundle have parameters, not the bundle")
+        if any(step.steps for step in self.steps):
+            raise ValueError("Bundles cannot be nested")
+        return self
+
+    @property
+    def is_bundle(self) -> bool:
+        return bool(self.steps)
 
     def prepare_params(self, ctx: BlueskyContext) -> Mapping[str, Any]:
+        if self.is_bundle:
+            return {"steps": [step.prepare_params(ctx) for step in self.steps]}
         model = _lookup_params(ctx, self)
         # Re-create dict manually to avoid nesting in model_dump output
         return {field: getattr(model, field) for field in model.__pydantic_fields__}
 
-    def do_task(self, ctx: BlueskyContext) -> None:
+    def do_task(
+        self,
+        ctx: BlueskyContext,
+        prepared_params: Mapping[str, Any] | None = None,
+        run_engine: RunEngine | None = None,
+        on_step: OnStep | None = None,
+    ) -> None:
+        """
+        Run the plan in the context's RunEngine
+
+        Args:
+            ctx: Context holding the plan, devices and RunEngine
+            prepared_params: Parameters already validated by prepare_params
+                against the current state of the context, validated again if None
+            run_engine: RunEngine to run the plan in instead of the context's
+            on_step: Called whenever a step of a bundle starts or finishes
+        """
         LOGGER.info(
             f"Asked to run plan {self.name} with {self.params} and "
             f"metadata {self.metadata} for all runs"
         )
 
-        func = ctx.plan_functions[self.name]
-        prepared_params = self.prepare_params(ctx)
-        ctx.run_engine.md.update(self.metadata)
-        result = ctx.run_engine(func(**prepared_params))
+        plan = self.build_plan(ctx, prepared_params, on_step)
+        engine = run_engine if run_engine is not None else ctx.run_engine
+        engine.md.update(self.metadata)
+        result = engine(plan)
         if isinstance(result, tuple):  # pragma: no cover
             # this is never true if the run_engine is configured correctly
             return None
         return result.plan_result
 
+    def build_plan(
+        self,
+        ctx: BlueskyContext,
+        prepared_params: Mapping[str, Any] | None = None,
+        on_step: OnStep | None = None,
+    ) -> MsgGenerator:
+        """
+        Create the generator of the plan, or of the steps of a bundle, without
+        running it
+
+        Args:
+            ctx: Context holding the plan and devices
+            prepared_params: Parameters already validated by prepare_params
+                against the current state of the context, validated again if None
+            on_step: Called whenever a step of a bundle starts or finishes
+        """
+        if prepared_params is None:
+            prepared_params = self.prepare_params(ctx)
+        if self.is_bundle:
+            return self._run_steps(ctx, prepared_params["steps"], on_step)
+        return ctx.plan_functions[self.name](**prepared_params)
+
+    def _run_steps(
+        self,
+        ctx: BlueskyContext,
+        prepared_steps: Sequence[Mapping[str, Any]],
+        on_step: OnStep | None,
+    ) -> MsgGenerator[list[Any]]:
+        """
+        Plan that runs the plan of each step of a bundle in turn, returning
+        their results. Failed steps have None as their result.
+        """
+
+        def report(index: int, state: StepState, error: str | None = None) -> None:
+            if on_step is not None:
+                on_step(index, state, error)
+
+        results: list[Any] = []
+        for index, (step, params) in enumerate(
+            zip(self.steps, prepared_steps, strict=True)
+        ):
+            LOGGER.info(f"Running step {index} of {self.name}: {step.name}")
+            report(index, StepState.RUNNING)
+            try:
+                plan = ctx.plan_functions[step.name](**params)
+                if step.metadata:
+                    plan = inject_md_wrapper(plan, step.metadata)
+                result = yield from plan
+            except RunEngineControlException:
+                # The whole bundle is being stopped or aborted
+                raise
+            except Exception as e:
+                report(index, StepState.FAILED, str(e))
+                if self.stop_on_failure:
+                    raise
+                results.append(None)
+                continue
+            report(index, StepState.SUCCEEDED)
+            results.append(result)
+        return results
+
 
 def _lookup_params(ctx: BlueskyContext, task: Task) -> BaseModel:
     """
@@ -59,6 +199,4 @@ def _lookup_params(ctx: BlueskyContext, task: Task) -> BaseModel:
     """
 
     plan = ctx.plans[task.name]
-    model = plan.model
-    adapter = TypeAdapter(model)
-    return adapter.validate_python(task.params)
+    return plan.model.model_validate(task.params)
@@ -1,15 +1,22 @@
+import itertools
 import logging
+import time
 import uuid
 from collections.abc import Iterable, Mapping
 from concurrent.futures import Future, ThreadPoolExecutor
-from dataclasses import dataclass
+from contextlib import suppress
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
 from functools import partial
+from pathlib import Path
 from queue import Full, Queue
-from threading import Event, RLock
+from threading import Event, RLock, Thread
 from typing import Any, TypeVar
 
 from bluesky._vendor.super_state_machine.errors import TransitionError
 from bluesky.protocols import Status
+from bluesky.run_engine import RunEngine
+from bluesky.utils import RunEngineInterrupted
 from observability_utils.tracing import (
     add_span_attributes,
     get_tracer,
@@ -18,10 +25,20 @@ from observability_utils.tracing import (
 )
 from opentelemetry.baggage import get_baggage
 from opentelemetry.context import Context, get_current
-from opentelemetry.trace import SpanKind
+from opentelemetry.metrics import get_meter
+from opentelemetry.trace import SpanKind, get_current_span
 from pydantic import Field
 from pydantic.json_schema import SkipJsonSchema
 
+from blueapi.config import (
+    DocumentSpanConfig,
+    DocumentSpanMode,
+    EstimationConfig,
+    EventDropPolicy,
+    ResultStoreConfig,
+    TaskRetentionConfig,
+    WatchdogConfig,
+)
 from blueapi.core import (
     OTLP_EXPORT_ENABLED,
     BlueskyContext,
@@ -31,10 +48,13 @@ from blueapi.core import (
     WatchableStatus,
 )
 from blueapi.core.bluesky_event_loop import configure_bluesky_event_loop
+from blueapi.core.event import OverflowPolicy, SubscriptionStats
 from blueapi.log import plan_tag_filter_context
 from blueapi.utils.base_model import BlueapiBaseModel
 from blueapi.utils.thread_exception import handle_all_exceptions
 
+from .accounting import GcPauseTimer, ResourceSnapshot, take_snapshot
+from .estimation import DryRun, DurationEstimate, MessageTimer, TimingModel
 from .event import (
     ProgressEvent,
     RawRunEngineState,
@@ -46,7 +66,23 @@ from .event import (
     WorkerEvent,
     WorkerState,
 )
-from .task import Task
+from .event_pages import EventPageBatcher
+from .lanes import RunEngineLane
+from .leases import DeviceLeaseManager, devices_of_plan
+from .message_timing import MessageClock, MessageObserver
+from .profiling import MsgProfiler, TaskProfile
+from .progress import ProgressThrottle
+from .results import ResultStore
+from .scheduling import (
+    FairShareScheduler,
+    Party,
+    PartyShare,
+    QueueWaitRecorder,
+    QueueWaitStats,
+    queue_position,
+)
+from .task import StepState, StepStatus, Task
+from .watchdog import Stall, StallWatchdog
 from .worker_errors import WorkerAlreadyStartedError, WorkerBusyError
 
 LOGGER = logging.getLogger(__name__)
@@ -54,12 +90,88 @@ LOGGER = logging.getLogger(__name__)
 TRACER = get_tracer("task_worker")
 """ Initialise a Tracer for this module provided by the app's global TracerProvider. """
 
+METER = get_meter("task_worker")
+
+EVICTED_TASKS = METER.create_counter(
+    "blueapi.tasks.evicted",
+    description="Completed tasks evicted by the retention policy",
+)
+RETAINED_TASKS = METER.create_gauge(
+    "blueapi.tasks.retained",
+    description="Completed tasks held by the worker after each eviction",
+)
+
 DEFAULT_START_STOP_TIMEOUT: float = 30.0
 WORKER_THREAD_STATE = "worker thread state"
 
+#: Seconds to wait for a task's data and progress events to be delivered to
+#: asynchronous subscribers before publishing that it is complete
+_DELIVERY_TIMEOUT = 5.0
+
 T = TypeVar("T")
 
 
+class TaskTimeline(BlueapiBaseModel):
+    """
+    When a task reached each phase of its life, as seconds on the worker's
+    monotonic clock. Only the differences between them are meaningful.
+    """
+
+    submitted: float | None = Field(
+        description="When the task was submitted", default=None
+    )
+    validated: float | None = Field(
+        description="When the task's parameters had been validated", default=None
+    )
+    dispatched: float | None = Field(
+        description="When the task was handed to a RunEngine", default=None
+    )
+    run_engine_started: float | None = Field(
+        description="When the RunEngine started running the task's plan",
+        default=None,
+    )
+    first_document: float | None = Field(
+        description="When the task emitted its first document", default=None
+    )
+    last_document: float | None = Field(
+        description="When the task emitted its last document", default=None
+    )
+    completed: float | None = Field(description="When the task completed", default=None)
+
+
+class TaskResources(BlueapiBaseModel):
+    """
+    Resources used while a task ran. CPU, memory and garbage collection are
+    measured for the worker's whole process, so include anything else that ran
+    at the same time, such as tasks in parallel RunEngines.
+    """
+
+    cpu_time: float = Field(
+        description="CPU seconds used by the worker's process while the task ran",
+        default=0.0,
+    )
+    peak_rss_increase: int = Field(
+        description="Bytes by which the worker's peak resident memory grew while "
+        "the task ran",
+        default=0,
+    )
+    gc_pause_time: float = Field(
+        description="Seconds spent in garbage collection while the task ran",
+        default=0.0,
+    )
+    documents: dict[str, int] = Field(
+        description="Number of documents the task emitted of each type",
+        default_factory=dict,
+    )
+    published_bytes: dict[str, int] = Field(
+        description="Number of bytes of the task's events published to each sink",
+        default_factory=dict,
+    )
+    progress_updates: int = Field(
+        description="Number of progress events published for the task", default=0
+    )
+
+
 class TrackableTask(BlueapiBaseModel):
     """
     A representation of a task that the worker recognizes
@@ -72,13 +184,318 @@ class TrackableTask(BlueapiBaseModel):
     is_pending: bool = True
     errors: list[str] = Field(default_factory=list)
     outcome: TaskResult | TaskError | None = None
+    timeline: TaskTimeline = Field(default_factory=TaskTimeline)
+    resources: TaskResources = Field(default_factory=TaskResources)
+    steps: list[StepStatus] = Field(
+        description="Status of each step, if the task is a bundle",
+        default_factory=list,
+    )
+    estimate: DurationEstimate | None = Field(
+        description="How long the task was expected to take as of when it "
+        "started, or is expected to take if it is pending, if its duration could "
+        "be estimated",
+        default=None,
+    )
 
-    def set_result(self, result: Any):
-        self.outcome = TaskResult.from_result(result)
+    def set_result(self, result: Any, store: ResultStore | None = None):
+        self.outcome = TaskResult.from_result(result, store)
 
     def set_exception(self, err: Exception):
         self.outcome = TaskError.from_exception(err)
 
+    @property
+    def status(self) -> TaskStatusEnum:
+        if self.is_complete:
+            return TaskStatusEnum.COMPLETE
+        if self.is_pending:
+            return TaskStatusEnum.PENDING
+        return TaskStatusEnum.RUNNING
+
+
+class TaskStore:
+    """
+    Thread-safe collection of the tasks known to a worker, with secondary
+    indexes by status, user, plan name and instrument session so that filtered
+    lookups cost O(result) rather than O(all tasks). Completed tasks are kept in
+    least recently used order. Each task is also given a position, increasing in
+    the order tasks were added, which is used as a stable pagination cursor.
+    """
+
+    _STATUSES = (
+        TaskStatusEnum.PENDING,
+        TaskStatusEnum.RUNNING,
+        TaskStatusEnum.COMPLETE,
+    )
+
+    def __init__(self) -> None:
+        self._lock = RLock()
+        self._tasks: dict[str, TrackableTask] = {}
+        # Each index maps a key to an insertion-ordered set of task IDs
+        self._by_status: dict[TaskStatusEnum, dict[str, None]] = {
+            status: {} for status in self._STATUSES
+        }
+        self._by_user: dict[str, dict[str, None]] = {}
+        self._by_plan: dict[str, dict[str, None]] = {}
+        self._by_instrument_session: dict[str, dict[str, None]] = {}
+        self._positions: dict[str, int] = {}
+        self._submitted_at: dict[str, datetime] = {}
+        self._next_position = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def __contains__(self, task_id: str) -> bool:
+        return task_id in self._tasks
+
+    def add(self, task: TrackableTask) -> None:
+        """
+        Add a task to the store, replacing any existing task with the same ID
+        """
+        with self._lock:
+            if task.task_id in self._tasks:
+                self.remove(task.task_id)
+            self._tasks[task.task_id] = task
+            self._positions[task.task_id] = next(self._next_position)
+            self._submitted_at[task.task_id] = datetime.now(UTC)
+            self._by_status[task.status][task.task_id] = None
+            for index, key in self._secondary_keys(task):
+                index.setdefault(key, {})[task.task_id] = None
+
+    def get(self, task_id: str) -> TrackableTask | None:
+        """
+        Look up a task by ID, marking it as recently used if it is complete
+        """
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is not None and task.is_complete:
+                completed = self._by_status[TaskStatusEnum.COMPLETE]
+                completed[task_id] = completed.pop(task_id)
+            return task
+
+    def peek(self, task_id: str) -> TrackableTask | None:
+        """
+        Look up a task by ID without marking it as recently used
+        """
+        return self._tasks.get(task_id)
+
+    def remove(self, task_id: str) -> TrackableTask:
+        """
+        Remove a task from the store
+        Throws:
+            KeyError: If the task ID does not exist
+        """
+        with self._lock:
+            task = self._tasks.pop(task_id)
+            del self._positions[task_id]
+            del self._submitted_at[task_id]
+            for ids in self._by_status.values():
+                ids.pop(task_id, None)
+            for index, key in self._secondary_keys(task):
+                ids = index[key]
+                del ids[task_id]
+                if not ids:
+                    del index[key]
+            return task
+
+    def set_status(self, task: TrackableTask, status: TaskStatusEnum) -> None:
+        """
+        Update the flags of a task to match the given status and re-index it.
+        Tasks that have since been removed from the store are only updated.
+        """
+        if status not in self._STATUSES:
+            raise ValueError(f"Tasks cannot be set to {status}")
+        with self._lock:
+            previous = task.status
+            task.is_pending = status is TaskStatusEnum.PENDING
+            task.is_complete = status is TaskStatusEnum.COMPLETE
+            if self._tasks.get(task.task_id) is task:
+                self._by_status[previous].pop(task.task_id, None)
+                self._by_status[status][task.task_id] = None
+
+    def get_user(self, task_id: str) -> str | None:
+        """
+        The user that submitted a task, if recorded in its metadata
+        Throws:
+            KeyError: If the task ID does not exist
+        """
+        return self._tasks[task_id].task.metadata.get("user")
+
+    def count(self, status: TaskStatusEnum) -> int:
+        return len(self._by_status.get(status, {}))
+
+    def submitted_at(self, task_id: str) -> datetime:
+        """
+        When a task was added to the store
+        Throws:
+            KeyError: If the task ID does not exist
+        """
+        return self._submitted_at[task_id]
+
+    def find(
+        self,
+        status: TaskStatusEnum | None = None,
+        user: str | None = None,
+        plan: str | None = None,
+        instrument_session: str | None = None,
+        submitted_after: datetime | None = None,
+        submitted_before: datetime | None = None,
+    ) -> list[TrackableTask]:
+        """
+        Retrieve the tasks matching all of the given filters. The smallest
+        matching index is scanned and checked against the others.
+        Returns:
+            list[TrackableTask]: Matching tasks. Completed tasks are ordered
+                from least to most recently used.
+        """
+        with self._lock:
+            tasks = self._find_indexed(status, user, plan, instrument_session)
+            if submitted_after is not None or submitted_before is not None:
+                tasks = [
+                    task
+                    for task in tasks
+                    if (
+                        submitted_after is None
+                        or self._submitted_at[task.task_id] > submitted_after
+                    )
+                    and (
+                        submitted_before is None
+                        or self._submitted_at[task.task_id] < submitted_before
+                    )
+                ]
+            return tasks
+
+    def page(
+        self,
+        limit: int | None = None,
+        after: int | None = None,
+        status: TaskStatusEnum | None = None,
+        user: str | None = None,
+        plan: str | None = None,
+        instrument_session: str | None = None,
+        submitted_after: datetime | None = None,
+        submitted_before: datetime | None = None,
+    ) -> tuple[list[TrackableTask], int | None]:
+        """
+        Retrieve a page of the tasks matching all of the given filters, in the
+        order they were added.
+        Args:
+            limit: Maximum number of tasks to return, all if None
+            after: Only return tasks after this cursor
+        Returns:
+            tuple[list[TrackableTask], int | None]: The matching tasks and the
+                cursor for the next page, None if this is the last page.
+        """
+        with self._lock:
+            tasks = sorted(
+                self.find(
+                    status,
+                    user,
+                    plan,
+                    instrument_session,
+                    submitted_after,
+                    submitted_before,
+                ),
+                key=lambda task: self._positions[task.task_id],
+            )
+            if after is not None:
+                tasks = [
+                    task for task in tasks if self._positions[task.task_id] > after
+                ]
+            if limit is None or len(tasks) <= limit:
+                return tasks, None
+            tasks = tasks[:limit]
+            return tasks, self._positions[tasks[-1].task_id]
+
+    def _find_indexed(
+        self,
+        status: TaskStatusEnum | None,
+        user: str | None,
+        plan: str | None,
+        instrument_session: str | None,
+    ) -> list[TrackableTask]:
+        with self._lock:
+            candidates: list[dict[str, None]] = []
+            if status is not None:
+                candidates.append(self._by_status.get(status, {}))
+            if user is not None:
+                candidates.append(self._by_user.get(user, {}))
+            if plan is not None:
+                candidates.append(self._by_plan.get(plan, {}))
+            if instrument_session is not None:
+                candidates.append(
+                    self._by_instrument_session.get(instrument_session, {})
+                )
+            if not candidates:
+                return [
+                    self._tasks[task_id]
+                    for status in (
+                        TaskStatusEnum.RUNNING,
+                        TaskStatusEnum.PENDING,
+                        TaskStatusEnum.COMPLETE,
+                    )
+                    for task_id in self._by_status[status]
+                ]
+            candidates.sort(key=len)
+            smallest, others = candidates[0], candidates[1:]
+            return [
+                self._tasks[task_id]
+                for task_id in smallest
+                if all(task_id in ids for ids in others)
+            ]
+
+    def _secondary_keys(
+        self, task: TrackableTask
+    ) -> list[tuple[dict[str, dict[str, None]], str]]:
+        metadata = task.task.metadata
+        keys = [(self._by_plan, task.task.name)]
+        if isinstance(user := metadata.get("user"), str):
+            keys.append((self._by_user, user))
+        if isinstance(session := metadata.get("instrument_session"), str):
+            keys.append((self._by_instrument_session, session))
+        return keys
+
+
+def _devices_of(
+    ctx: BlueskyContext, task: Task, params: Mapping[str, Any]
+) -> frozenset[str]:
+    if task.is_bundle:
+        return frozenset().union(
+            *(
+                _devices_of(ctx, step, step_params)
+                for step, step_params in zip(task.steps, params["steps"], strict=True)
+            )
+        )
+    return devices_of_plan(ctx, task.name, params)
+
+
+def _party(task: TrackableTask) -> Party:
+    """The instrument session and user a task was submitted by, if known"""
+    metadata = task.task.metadata
+    session = metadata.get("instrument_session")
+    user = metadata.get("user")
+    return (
+        session if isinstance(session, str) else None,
+        user if isinstance(user, str) else None,
+    )
+
+
+@dataclass
+class _ParallelRun:
+    """
+    A task running in a RunEngine other than the main one, either one of the
+    parallel RunEngines or the one used while the main RunEngine is preempted
+    """
+
+    task: TrackableTask
+    run_engine: RunEngine
+    watchdog: StallWatchdog
+    #: Trace context the task was queued under, if any
+    otel_context: Context | None = None
+    #: Set to let the task carry on once its paused RunEngine has been resumed,
+    #: stopped or aborted
+    wake: Event = field(default_factory=Event)
+    warnings: list[str] = field(default_factory=list)
+
 
 class TaskWorker:
     """
@@ -88,13 +505,73 @@ class TaskWorker:
         ctx: Context to work with
         stop_timeout: If the worker is told to stop, number of seconds to wait for
             graceful shutdown before raising an exception. Defaults to 30.0.
+        broadcast_statuses: Whether to publish device status updates as events
+        max_progress_rate: Maximum number of progress events to publish per
+            second, updates in between are merged. Unlimited if None.
+        progress_deltas: Whether progress events should only hold the statuses
+            that changed since the previous event of the same task
+        progress_snapshot_interval: When progress is delta encoded, publish
+            every status in every nth event so late subscribers can catch up
+        asynchronous_events: Whether to deliver events to each subscriber from its
+            own thread rather than the thread running the plan
+        event_queue_size: Maximum number of events waiting to be delivered to
+            each subscriber when events are asynchronous
+        event_drop_policy: What to do with events when a subscriber's queue is full
+        document_spans: Which documents are traced and how much of each is
+            recorded, by default every document is traced
+        event_page_size: Publish consecutive events from the same descriptor as
+            event pages of up to this many events. Each event is published on its
+            own if None.
+        event_page_max_delay: Maximum number of seconds to hold back an event
+            while its page fills up
+        retention: Limits on the completed tasks kept in memory, by default
+            all completed tasks are kept until they are cleared.
+        parallel_run_engines: Number of extra RunEngines that run queued tasks
+            alongside the main one, each in its own thread. Tasks only run at the
+            same time if none of the devices in their parameters are shared.
+        preemption: Whether a queued task may pause the running task at its
+            next checkpoint if it has a higher priority. The queued task and any
+            others that outrank the paused one are run before it is resumed.
+        fair_share: Whether queued tasks of the same priority are run in the
+            order that shares the worker fairly between instrument sessions, and
+            between the users of each session, rather than in queue order
+        session_weights: Relative share of the worker for each instrument
+            session under fair share scheduling, sessions not listed have 1.0
+        session_quotas: Seconds each listed instrument session's tasks may run
+            for in each quota period under fair share scheduling, after which
+            its tasks run after those of sessions within their quotas
+        quota_period: Length of each quota period in seconds
+        profile_messages: Whether to time every message each task's plan sends
+            to its RunEngine, so that a profile of each task can be retrieved
+        watchdog: Thresholds above which a message of a running task, or a
+            device status of the task in the main RunEngine, is reported as
+            stalled, and the task aborted. Nothing is checked by default.
+        results: Where to store results too large to include in their tasks, by
+            default every result is included
     """
 
     _ctx: BlueskyContext
     _start_stop_timeout: float
 
-    _pending_tasks: dict[str, TrackableTask]
-    _completed_tasks: dict[str, TrackableTask]
+    _tasks: TaskStore
+
+    # Parameters of pending tasks as validated on submission, alongside the
+    # context generation they were validated against
+    _prepared_params: dict[str, tuple[int, Mapping[str, Any]]]
+
+    # Completed tasks are retained alongside when they completed and (lazily
+    # measured) how large they are. Eviction runs on its own thread so
+    # measuring tasks never delays the next plan.
+    _completed_lock: RLock
+    _completion_times: dict[str, float]
+    _completed_task_sizes: dict[str, int]
+    # Results too large to keep in their tasks, and the hash of the result of
+    # each task that has one stored, so it can be removed with the task
+    _results: ResultStore | None
+    _stored_results: dict[str, str]
+    _retention: TaskRetentionConfig
+    _evicted_task_count: int
+    _eviction_requested: Event
 
     _state: WorkerState
     _errors: list[str]
@@ -108,10 +585,90 @@ class TaskWorker:
     # So the calling thread can only ever submit one plan at a time.
 
     _task_channel: Queue  # type: ignore
+
+    # The run queue holds the IDs of pending tasks that should be dispatched,
+    # in order, whenever the worker becomes idle. Tasks are queued behind every
+    # task of the same or higher priority. Each entry keeps the trace context it
+    # was queued under so the task is traced as part of that request, and when
+    # it was queued so the wait can be measured.
+    _queue: list[str]
+    _queue_otel_contexts: dict[str, Context]
+    # Queued tasks whose order was set explicitly, which fair share leaves
+    # ahead of other tasks of the same priority in that order
+    _ordered_explicitly: set[str]
+    _enqueued_at: dict[str, float]
+    _queue_waits: QueueWaitRecorder[int]
+    _queue_lock: RLock
+    # How much of the worker each instrument session and user has had, and
+    # when each running task started, so it can be charged when it finishes.
+    # Queued tasks are only ordered by their share if fair share is enabled.
+    _fair_share: bool
+    _usage: FairShareScheduler
+    _party_waits: QueueWaitRecorder[Party]
+    _run_started_at: dict[str, float]
+    # What the process had used when each running task started, so the
+    # resources it used can be attached to it when it finishes
+    _gc_pauses: GcPauseTimer
+    _resource_baselines: dict[str, ResourceSnapshot]
+    # Profilers hooked into the RunEngines of running tasks, and the profiles
+    # of tasks that have finished, kept for as long as the tasks are
+    _profile_messages: bool
+    _profilers: dict[str, MsgProfiler]
+    _profiles: dict[str, TaskProfile]
+    # Notices the task in the main RunEngine getting stuck, checked on its own
+    # thread while the worker runs if any thresholds are configured. Tasks in
+    # other RunEngines have watchdogs of their own.
+    _watchdog: WatchdogConfig
+    _stall_watchdog: StallWatchdog
+    _watchdog_stopping: Event
+    # Messages each pending task's plan sent when iterated without a RunEngine,
+    # so its estimate can be updated as the timings of other tasks are learned.
+    # Plans are iterated on a thread of their own so submission does not wait.
+    _estimation: EstimationConfig
+    _estimator: ThreadPoolExecutor
+    _timing_model: TimingModel
+    _dry_runs: dict[str, DryRun]
+    # Single msg_hook of the RunEngine of each running task, timing messages
+    # for the profiler, watchdog and timing model
+    _message_clocks: dict[str, MessageClock]
+    # Whether a task has been handed to the worker thread that it has not
+    # finished yet, it may not have been picked up so may not be current
+    _main_claimed: bool
     _current: TrackableTask | None
     _status_lock: RLock
     _status_snapshot: dict[str, StatusView]
     _completed_statuses: set[str]
+    _progress_throttle: ProgressThrottle
+    # When delta encoding progress, the statuses as of the last progress event
+    # of the current task and how many events that task has published
+    _progress_deltas: bool
+    _progress_snapshot_interval: int
+    _progress_sequence: int
+    _published_statuses: dict[str, StatusView]
+    _document_spans: DocumentSpanConfig
+    # Event documents of each running task held back to be sent in pages
+    _event_page_size: int | None
+    _event_page_max_delay: float | None
+    _event_pages: dict[str, EventPageBatcher]
+    # Extra RunEngines for running queued tasks in parallel, only present while
+    # the worker is running, and the devices leased to each running task
+    _parallel_run_engines: int
+    _lanes: list[RunEngineLane[TrackableTask]]
+    _leases: DeviceLeaseManager
+    # The main RunEngine is paused at a checkpoint while higher priority tasks
+    # run in a RunEngine of their own, created when first needed
+    _preemption: bool
+    _preemption_requested: Event
+    # Set when the main RunEngine starts running, so that a single thread can
+    # check whether any queued task should preempt it
+    _preemption_check: Event
+    _preempted: TrackableTask | None
+    _preemption_run_engine: RunEngine | None
+    # Tasks running outside the main RunEngine, so that they can be paused,
+    # stopped and watched along with it, and the trace contexts of tasks
+    # dispatched to a parallel RunEngine that have not started yet
+    _parallel_runs: dict[str, _ParallelRun]
+    _parallel_otel_contexts: dict[str, Context | None]
     _worker_events: EventPublisher[WorkerEvent]
     _progress_events: EventPublisher[ProgressEvent]
     _data_events: EventPublisher[DataEvent]
@@ -125,12 +682,45 @@ class TaskWorker:
         ctx: BlueskyContext,
         start_stop_timeout: float = DEFAULT_START_STOP_TIMEOUT,
         broadcast_statuses: bool = True,
+        retention: TaskRetentionConfig | None = None,
+        max_progress_rate: float | None = None,
+        progress_deltas: bool = False,
+        progress_snapshot_interval: int = 10,
+        asynchronous_events: bool = False,
+        event_queue_size: int = 1000,
+        event_drop_policy: EventDropPolicy = EventDropPolicy.BLOCK,
+        document_spans: DocumentSpanConfig | None = None,
+        event_page_size: int | None = None,
+        event_page_max_delay: float | None = 0.5,
+        parallel_run_engines: int = 0,
+        preemption: bool = False,
+        fair_share: bool = False,
+        session_weights: Mapping[str, float] | None = None,
+        session_quotas: Mapping[str, float] | None = None,
+        quota_period: float = 3600.0,
+        profile_messages: bool = False,
+        watchdog: WatchdogConfig | None = None,
+        results: ResultStoreConfig | None = None,
+        estimation: EstimationConfig | None = None,
     ) -> None:
         self._ctx = ctx
         self._start_stop_timeout = start_stop_timeout
 
-        self._pending_tasks = {}
-        self._completed_tasks = {}
+        self._tasks = TaskStore()
+        self._prepared_params = {}
+        self._completed_lock = RLock()
+        self._completion_times = {}
+        self._completed_task_sizes = {}
+        results = results or ResultStoreConfig()
+        self._results = (
+            ResultStore(results.directory, results.threshold)
+            if results.directory is not None
+            else None
+        )
+        self._stored_results = {}
+        self._retention = retention or TaskRetentionConfig()
+        self._evicted_task_count = 0
+        self._eviction_requested = Event()
 
         assert ctx.run_engine.state is not None, "RunEngine state is not set"
         state: RawRunEngineState = str(ctx.run_engine.state)
@@ -138,13 +728,79 @@ class TaskWorker:
         self._errors = []
         self._warnings = []
         self._task_channel = Queue(maxsize=1)
+        self._queue = []
+        self._queue_otel_contexts = {}
+        self._ordered_explicitly = set()
+        self._enqueued_at = {}
+        self._queue_waits = QueueWaitRecorder()
+        self._queue_lock = RLock()
+        self._fair_share = fair_share
+        self._usage = FairShareScheduler(
+            session_weights, session_quotas=session_quotas, quota_period=quota_period
+        )
+        self._party_waits = QueueWaitRecorder()
+        self._run_started_at = {}
+        self._gc_pauses = GcPauseTimer()
+        self._resource_baselines = {}
+        self._profile_messages = profile_messages
+        self._profilers = {}
+        self._profiles = {}
+        self._watchdog = watchdog or WatchdogConfig()
+        self._stall_watchdog = self._new_stall_watchdog()
+        self._watchdog_stopping = Event()
+        self._estimation = estimation or EstimationConfig()
+        self._estimator = ThreadPoolExecutor(1, "task-estimation")
+        self._timing_model = TimingModel()
+        self._dry_runs = {}
+        self._message_clocks = {}
+        self._main_claimed = False
         self._current = None
-        self._worker_events = EventPublisher()
-        self._progress_events = EventPublisher()
-        self._data_events = EventPublisher()
+        # Progress is superseded by the next progress event, so it may be dropped
+        # when other events may not
+        drops_progress = event_drop_policy is not EventDropPolicy.BLOCK
+        drops_others = event_drop_policy is EventDropPolicy.DROP_OLDEST
+        self._worker_events = EventPublisher(
+            asynchronous_events,
+            event_queue_size,
+            OverflowPolicy.DROP_OLDEST if drops_others else OverflowPolicy.BLOCK,
+            name="worker",
+        )
+        self._progress_events = EventPublisher(
+            asynchronous_events,
+            event_queue_size,
+            OverflowPolicy.DROP_OLDEST if drops_progress else OverflowPolicy.BLOCK,
+            name="progress",
+        )
+        self._data_events = EventPublisher(
+            asynchronous_events,
+            event_queue_size,
+            OverflowPolicy.DROP_OLDEST if drops_others else OverflowPolicy.BLOCK,
+            name="data",
+        )
         self._status_lock = RLock()
         self._status_snapshot = {}
         self._completed_statuses = set()
+        self._progress_throttle = ProgressThrottle(
+            self._publish_status_snapshot, max_progress_rate
+        )
+        self._progress_deltas = progress_deltas
+        self._progress_snapshot_interval = progress_snapshot_interval
+        self._progress_sequence = 0
+        self._published_statuses = {}
+        self._document_spans = document_spans or DocumentSpanConfig()
+        self._event_page_size = event_page_size
+        self._event_page_max_delay = event_page_max_delay
+        self._event_pages = {}
+        self._parallel_run_engines = parallel_run_engines
+        self._lanes = []
+        self._leases = DeviceLeaseManager()
+        self._preemption = preemption
+        self._preemption_requested = Event()
+        self._preemption_check = Event()
+        self._preempted = None
+        self._preemption_run_engine = None
+        self._parallel_runs = {}
+        self._parallel_otel_contexts = {}
         self._started = Event()
         self._stopping = Event()
         self._stopped = Event()
@@ -162,8 +818,13 @@ class TaskWorker:
         Returns:
             task_id of the removed task
         """
-        pending = self._pending_tasks.pop(task_id, None)
-        task = pending or self._completed_tasks.pop(task_id)
+        with self._queue_lock:
+            if task_id in self._queue:
+                self._remove_from_queue(task_id)
+            task = self._tasks.remove(task_id)
+        self._prepared_params.pop(task_id, None)
+        self._dry_runs.pop(task_id, None)
+        self._forget_completed_task(task_id)
         return task.task_id
 
     @start_as_current_span(TRACER)
@@ -171,28 +832,62 @@ class TaskWorker:
         self,
         failure: bool = False,
         reason: str | None = None,
+        task_id: str | None = None,
     ) -> str:
         """
-        Remove the currently active task from the worker if there is one
+        Remove the currently active tasks from the worker if there are any,
+        including those running in parallel RunEngines
         Args:
             failure: Flag cancellation as error
             reason: Reason for cancellation
+            task_id: Only cancel the task with this ID
         Returns:
-            The task_id of the active task
+            The task_id of the active task, the one in the main RunEngine if
+                there is one
         """
-        if self._current is None:
-            # Persuades type checker that self._current is not None
-            # We only allow this method to be called if a Plan is active
+        running = self._running_tasks(task_id)
+        if not running:
             raise TransitionError("Attempted to cancel while no active Task")
         if failure:
             default_reason = "Task failed for unknown reason"
-            self._ctx.run_engine.abort(reason or default_reason)
             add_span_attributes({"Task aborted": reason or default_reason})
         else:
-            self._ctx.run_engine.stop()
             default_reason = "Cancellation successful: Task stopped without error"
             add_span_attributes({"Task stopped": reason or default_reason})
-        return self._current.task_id
+        # The main RunEngine's task is cancelled last, so that failing to cancel
+        # it does not leave the others running
+        for task, run_engine in reversed(running):
+            run = self._parallel_runs.get(task.task_id)
+            try:
+                if failure:
+                    run_engine.abort(reason or default_reason)
+                else:
+                    run_engine.stop()
+            except TransitionError:
+                # Tasks in other RunEngines may finish at any moment
+                if run is None:
+                    raise
+            if run is not None:
+                run.wake.set()
+        return running[0][0].task_id
+
+    def _running_tasks(
+        self, task_id: str | None = None
+    ) -> list[tuple[TrackableTask, RunEngine]]:
+        """
+        Tasks that are running, or paused, and the RunEngines running them, the
+        main RunEngine's task first. Only the task with the given ID if one is
+        given.
+        """
+        running: list[tuple[TrackableTask, RunEngine]] = []
+        if self._current is not None and not self._current.is_complete:
+            running.append((self._current, self._ctx.run_engine))
+        running.extend(
+            (run.task, run.run_engine) for run in list(self._parallel_runs.values())
+        )
+        if task_id is not None:
+            running = [entry for entry in running if entry[0].task_id == task_id]
+        return running
 
     @start_as_current_span(TRACER, "task_id")
     def get_task_by_id(self, task_id: str) -> TrackableTask | None:
@@ -205,33 +900,294 @@ class TaskWorker:
             Optional[TrackableTask[T]]: The task matching the ID,
                 None if the task ID is unknown to the worker.
         """
-        return self._pending_tasks.get(task_id, None) or self._completed_tasks[task_id]
+        task = self._tasks.get(task_id)
+        if task is None:
+            raise KeyError(task_id)
+        return task
+
+    @start_as_current_span(TRACER, "task_id")
+    def get_task_owner(self, task_id: str) -> str | None:
+        """
+        Returns the user that submitted a task, if it was recorded.
+        Args:
+            task_id: The ID of the task
+        Returns:
+            Optional[str]: The user from the task's metadata
+        Throws:
+            KeyError: If the task ID does not exist
+        """
+        return self._tasks.get_user(task_id)
 
     @start_as_current_span(TRACER)
-    def get_tasks(self, status: TaskStatusEnum | None = None) -> list[TrackableTask]:
+    def get_tasks(
+        self,
+        status: TaskStatusEnum | None = None,
+        user: str | None = None,
+        plan: str | None = None,
+        instrument_session: str | None = None,
+    ) -> list[TrackableTask]:
         """
-        Retrieve a list of tasks based on their status.
+        Retrieve a list of tasks based on their status and who/what they are for.
         Args:
            status Optional[TaskStatusEnum]: The status to filter tasks by.
-           If status is None return all tasks.
+           user Optional[str]: Only return tasks submitted by this user.
+           plan Optional[str]: Only return tasks running this plan.
+           instrument_session Optional[str]: Only return tasks for this session.
+           Filters that are None are not applied.
         Returns:
-          list[TrackableTask]: A list of tasks that match the given status.
+          list[TrackableTask]: A list of tasks that match all the given filters.
         """
-        if status == TaskStatusEnum.RUNNING:
-            return [
-                task
-                for task in self._pending_tasks.values()
-                if not task.is_pending and not task.is_complete
+        return self._tasks.find(status, user, plan, instrument_session)
+
+    @start_as_current_span(TRACER)
+    def get_task_page(
+        self,
+        limit: int | None = None,
+        after: int | None = None,
+        status: TaskStatusEnum | None = None,
+        user: str | None = None,
+        plan: str | None = None,
+        instrument_session: str | None = None,
+        submitted_after: datetime | None = None,
+        submitted_before: datetime | None = None,
+    ) -> tuple[list[TrackableTask], int | None]:
+        """
+        Retrieve a page of tasks matching all of the given filters, in the order
+        they were submitted.
+        Args:
+           limit Optional[int]: Maximum number of tasks to return.
+           after Optional[int]: Cursor returned with the previous page.
+           submitted_after Optional[datetime]: Only tasks submitted after this.
+           submitted_before Optional[datetime]: Only tasks submitted before this.
+           Other filters are as for get_tasks. Filters that are None are not
+           applied.
+        Returns:
+          tuple[list[TrackableTask], int | None]: The tasks on this page and the
+            cursor for the next page, None if there are no more tasks.
+        """
+        return self._tasks.page(
+            limit,
+            after,
+            status,
+            user,
+            plan,
+            instrument_session,
+            submitted_after,
+            submitted_before,
+        )
+
+    @property
+    def retained_task_count(self) -> int:
+        """
+        :return: number of completed tasks currently held by the worker
+        """
+        return self._tasks.count(TaskStatusEnum.COMPLETE)
+
+    @property
+    def progress_events_published(self) -> int:
+        """
+        :return: number of progress events published
+        """
+        return self._progress_throttle.published_count
+
+    @property
+    def progress_updates_merged(self) -> int:
+        """
+        :return: number of status updates merged into a later progress event
+            rather than being published on their own
+        """
+        return self._progress_throttle.merged_count
+
+    @property
+    def evicted_task_count(self) -> int:
+        """
+        :return: number of completed tasks evicted by the retention policy
+        """
+        return self._evicted_task_count
+
+    @start_as_current_span(TRACER)
+    def evict_completed_tasks(self) -> list[str]:
+        """
+        Evict completed tasks that exceed the retention limits, least recently
+        used first. Called periodically from the eviction thread.
+        Returns:
+            list[str]: The IDs of the evicted tasks
+        """
+        retention = self._retention
+        if retention.max_bytes is not None:
+            self._measure_completed_tasks()
+        now = time.monotonic()
+        evicted: list[str] = []
+        with self._completed_lock:
+            completed = [
+                task.task_id for task in self._tasks.find(TaskStatusEnum.COMPLETE)
             ]
-        elif status == TaskStatusEnum.PENDING:
-            return [task for task in self._pending_tasks.values() if task.is_pending]
-        elif status == TaskStatusEnum.COMPLETE:
-            return list(self._completed_tasks.values())
-        elif status is None:
-            return list(self._pending_tasks.values()) + list(
-                self._completed_tasks.values()
+            retained = len(completed)
+            total_bytes = sum(
+                self._completed_task_sizes.get(task_id, 0) for task_id in completed
             )
-        return []
+            for task_id in completed:
+                age = now - self._completion_times.get(task_id, now)
+                if (
+                    (retention.max_age is not None and age > retention.max_age)
+                    or (
+                        retention.max_count is not None
+                        and retained > retention.max_count
+                    )
+                    or (
+                        retention.max_bytes is not None
+                        and total_bytes > retention.max_bytes
+                    )
+                ):
+                    total_bytes -= self._completed_task_sizes.get(task_id, 0)
+                    retained -= 1
+                    with suppress(KeyError):
+                        # The task may have been cleared in the meantime
+                        self._tasks.remove(task_id)
+                        evicted.append(task_id)
+                    self._forget_completed_task(task_id)
+            self._evicted_task_count += len(evicted)
+        if evicted:
+            LOGGER.info("Evicted %d completed task(s)", len(evicted))
+            EVICTED_TASKS.add(len(evicted))
+        RETAINED_TASKS.set(self.retained_task_count)
+        add_span_attributes(
+            {
+                "evicted_tasks": len(evicted),
+                "retained_tasks": self.retained_task_count,
+            }
+        )
+        return evicted
+
+    def _measure_completed_tasks(self) -> None:
+        # Serialize outside the lock so API requests are not held up
+        with self._completed_lock:
+            unmeasured = [
+                task
+                for task in self._tasks.find(TaskStatusEnum.COMPLETE)
+                if task.task_id not in self._completed_task_sizes
+            ]
+        sizes = {task.task_id: len(task.model_dump_json()) for task in unmeasured}
+        with self._completed_lock:
+            for task_id, size in sizes.items():
+                if task_id in self._tasks:
+                    self._completed_task_sizes[task_id] = size
+
+    def _forget_completed_task(self, task_id: str) -> None:
+        with self._completed_lock:
+            self._completion_times.pop(task_id, None)
+            self._completed_task_sizes.pop(task_id, None)
+            self._profiles.pop(task_id, None)
+            digest = self._stored_results.pop(task_id, None)
+            # Identical results are stored once, so may belong to other tasks
+            if digest is not None and digest not in self._stored_results.values():
+                assert self._results is not None
+                self._results.remove(digest)
+
+    def _run_eviction(self) -> None:
+        interval = (
+            self._retention.eviction_interval
+            if self._retention.max_age is not None
+            else None
+        )
+        while self._started.is_set():
+            self._eviction_requested.wait(timeout=interval)
+            self._eviction_requested.clear()
+            if not self._started.is_set():
+                break
+            try:
+                self.evict_completed_tasks()
+            except Exception:
+                LOGGER.exception("Failed to evict completed tasks")
+
+    def _new_stall_watchdog(self) -> StallWatchdog:
+        return StallWatchdog(
+            self._watchdog.message_warning,
+            self._watchdog.status_warning,
+            self._watchdog.abort_after,
+        )
+
+    def _run_preemption_checks(self) -> None:
+        while True:
+            self._preemption_check.wait()
+            self._preemption_check.clear()
+            if not self._started.is_set():
+                break
+            try:
+                self._dispatch_next_queued_task()
+            except Exception:
+                LOGGER.exception("Failed to check for preempting tasks")
+
+    def _run_watchdog(self) -> None:
+        while not self._watchdog_stopping.wait(timeout=self._watchdog.interval):
+            try:
+                self._check_for_stalls()
+            except Exception:
+                LOGGER.exception("Failed to check for stalled tasks")
+
+    def _check_for_stalls(self) -> None:
+        # A paused plan is not stuck, and is reported as paused anyway
+        if self._state is WorkerState.RUNNING:
+            stalls = self._stall_watchdog.check()
+            if stalls:
+                self._warnings.extend(self._warn_of(stalls))
+                self._report_status()
+                if self._current is not None:
+                    self._abort_if_fatal(self._current, stalls)
+        for run in list(self._parallel_runs.values()):
+            if run.run_engine.state != "running":
+                continue
+            stalls = run.watchdog.check()
+            if stalls:
+                run.warnings.extend(self._warn_of(stalls))
+                self._report_task_status(run.task)
+                self._abort_if_fatal(run.task, stalls)
+
+    def _warn_of(self, stalls: list[Stall]) -> list[str]:
+        warnings = [self._describe_stall(stall) for stall in stalls]
+        for warning in warnings:
+            LOGGER.warning(warning)
+        return warnings
+
+    def _abort_if_fatal(self, task: TrackableTask, stalls: list[Stall]) -> None:
+        fatal = next((stall for stall in stalls if stall.fatal), None)
+        if fatal is not None:
+            # The RunEngine may have finished the task since it was checked
+            with suppress(TransitionError):
+                self.cancel_active_task(
+                    failure=True,
+                    reason=f"Aborted by watchdog: {self._describe_stall(fatal)}",
+                    task_id=task.task_id,
+                )
+
+    @start_as_current_span(TRACER, "task_id")
+    def get_task_profile(self, task_id: str) -> TaskProfile | None:
+        """
+        Where the time went while a task's plan ran, if messages were profiled.
+        Args:
+            task_id: The ID of the task
+        Returns:
+            TaskProfile | None: Profile of the task if it has finished and was
+                profiled, otherwise None
+        """
+        with self._completed_lock:
+            return self._profiles.get(task_id)
+
+    @start_as_current_span(TRACER, "task_id")
+    def get_stored_result(self, task_id: str) -> Path | None:
+        """
+        Where the result of a task is stored, if it was too large to include.
+        Args:
+            task_id: The ID of the task
+        Returns:
+            Path | None: Path of the file holding the serialized result, None if
+                the task has no stored result
+        """
+        with self._completed_lock:
+            digest = self._stored_results.get(task_id)
+        if digest is None or self._results is None:
+            return None
+        return self._results.path(digest)
 
     @start_as_current_span(TRACER)
     def get_active_task(self) -> TrackableTask | None:
@@ -255,12 +1211,361 @@ class TaskWorker:
         Throws:
             KeyError: If the task ID does not exist
         """
-        task = self._pending_tasks.get(task_id)
-        if task is None:
+        task = self._tasks.get(task_id)
+        if task is None or task.is_complete:
             raise KeyError(f"No pending task with ID {task_id}")
-        else:
+        with self._queue_lock:
+            # A queued task that is started directly gives up its place in the
+            # queue, unless it cannot be started
+            position = self._queue.index(task_id) if task_id in self._queue else None
+            queued_context = self._queue_otel_contexts.get(task_id)
+            queued_at = self._enqueued_at.get(task_id)
+            if position is not None:
+                self._remove_from_queue(task_id)
+        try:
             with plan_tag_filter_context(task.task.name, LOGGER):
                 self._submit_trackable_task(task)
+        except WorkerBusyError:
+            if position is not None and queued_context is not None:
+                with self._queue_lock:
+                    self._queue.insert(position, task_id)
+                    self._queue_otel_contexts[task_id] = queued_context
+                    if queued_at is not None:
+                        self._enqueued_at[task_id] = queued_at
+            raise
+
+    @start_as_current_span(TRACER, "task_id")
+    def enqueue_task(self, task_id: str) -> None:
+        """
+        Add a pending task to the run queue, behind every queued task with the
+        same or a higher priority. Queued tasks are started automatically, in
+        order, as soon as the worker is idle.
+        Args:
+            task_id: The ID of the task to be queued
+        Throws:
+            KeyError: If the task ID does not exist
+            ValueError: If the task is already queued or has already started
+        """
+        task = self._tasks.get(task_id)
+        if task is None or task.is_complete:
+            raise KeyError(f"No pending task with ID {task_id}")
+        with self._queue_lock:
+            if task_id in self._queue:
+                raise ValueError(f"Task {task_id} is already queued")
+            if not task.is_pending:
+                raise ValueError(f"Task {task_id} has already been started")
+            position = queue_position(
+                [self._queued_priority(queued) for queued in self._queue],
+                task.task.priority,
+            )
+            self._queue.insert(position, task_id)
+            self._queue_otel_contexts[task_id] = get_current()
+            self._enqueued_at[task_id] = time.monotonic()
+            add_span_attributes({"queue_position": position})
+        self._dispatch_next_queued_task()
+
+    @start_as_current_span(TRACER, "task_id")
+    def dequeue_task(self, task_id: str) -> str:
+        """
+        Remove a task from the run queue. The task remains pending and can be
+        queued again or started directly.
+        Args:
+            task_id: The ID of the task to be removed from the queue
+        Returns:
+            task_id of the removed task
+        Throws:
+            KeyError: If the task is not in the queue
+        """
+        with self._queue_lock:
+            if task_id not in self._queue:
+                raise KeyError(f"No queued task with ID {task_id}")
+            self._remove_from_queue(task_id)
+        return task_id
+
+    @start_as_current_span(TRACER, "task_ids")
+    def reorder_queue(self, task_ids: list[str]) -> list[str]:
+        """
+        Change the order in which queued tasks will be run. Tasks may only be
+        reordered among those of the same priority. Under fair share scheduling
+        the reordered tasks run in the given order, ahead of tasks of the same
+        priority queued after them.
+        Args:
+            task_ids: The IDs of all currently queued tasks, in their new order
+        Returns:
+            The IDs of the queued tasks in their new order
+        Throws:
+            ValueError: If task_ids is not a reordering of the current queue, or
+                puts a task ahead of one with a higher priority
+        """
+        with self._queue_lock:
+            if len(task_ids) != len(self._queue) or set(task_ids) != set(self._queue):
+                raise ValueError(
+                    "New queue order must contain each queued task exactly once"
+                )
+            priorities = [self._queued_priority(task_id) for task_id in task_ids]
+            if any(ahead < behind for ahead, behind in itertools.pairwise(priorities)):
+                raise ValueError(
+                    "New queue order must keep each task behind those with a "
+                    "higher priority"
+                )
+            self._queue = list(task_ids)
+            self._ordered_explicitly = set(task_ids)
+            return list(self._queue)
+
+    @start_as_current_span(TRACER)
+    def get_queue(self) -> list[TrackableTask]:
+        """
+        Retrieve the tasks waiting in the run queue.
+        Returns:
+            list[TrackableTask]: Queued tasks, in the order they will be run
+        """
+        with self._queue_lock:
+            return [
+                task
+                for task_id in self._dispatch_order()
+                if (task := self._tasks.get(task_id)) is not None
+            ]
+
+    @start_as_current_span(TRACER)
+    def stage_next_task(self) -> TrackableTask | None:
+        """
+        Prepare the task at the front of the run queue so that it can start as
+        soon as the worker is free, validating its parameters again now if plans
+        or devices have changed since it was submitted.
+        Returns:
+            TrackableTask | None: The task that will be run next, or None if the
+                queue is empty
+        """
+        with self._queue_lock:
+            order = self._dispatch_order()
+            task = self._tasks.get(order[0]) if order else None
+        if task is None:
+            return None
+        add_span_attributes({"task_id": task.task_id})
+        # Validated without holding the queue up, so the task may be dispatched
+        # meanwhile, in which case it validates its own parameters
+        try:
+            self._prepared_params_for(task)
+        except Exception:
+            # Reported properly when the task starts
+            LOGGER.info(f"Parameters of queued task {task.task_id} are invalid")
+        if not task.is_pending:
+            # Started before its parameters were kept, so they will not be used
+            self._prepared_params.pop(task.task_id, None)
+        return task
+
+    @start_as_current_span(TRACER)
+    def queue_wait_stats(self) -> dict[int, QueueWaitStats]:
+        """
+        How long tasks waited in the run queue before they started, for each
+        priority. Tasks started directly are not included.
+        Returns:
+            dict[int, QueueWaitStats]: Waits by priority, highest priority first
+        """
+        return dict(sorted(self._queue_waits.stats().items(), reverse=True))
+
+    @start_as_current_span(TRACER)
+    def party_shares(self) -> list[PartyShare]:
+        """
+        How much of the worker each user of each instrument session has had, for
+        every party that has run or queued a task.
+        Returns:
+            list[PartyShare]: Shares, ordered by instrument session then user
+        """
+        with self._queue_lock:
+            queued: dict[Party, int] = {}
+            for task_id in self._queue:
+                if (task := self._tasks.get(task_id)) is not None:
+                    party = _party(task)
+                    queued[party] = queued.get(party, 0) + 1
+        run_times = self._usage.run_times()
+        waits = self._party_waits.stats()
+        total = sum(run_times.values())
+        parties = sorted(
+            set(queued) | set(run_times) | set(waits),
+            key=lambda party: (party[0] or "", party[1] or ""),
+        )
+        return [
+            PartyShare(
+                instrument_session=session,
+                user=user,
+                weight=self._usage.weight(session),
+                queued=queued.get((session, user), 0),
+                run_time=run_times.get((session, user), 0.0),
+                share=run_times.get((session, user), 0.0) / total if total else 0.0,
+                waits=waits.get((session, user), QueueWaitStats(0, 0.0, 0.0)),
+            )
+            for session, user in parties
+        ]
+
+    def _dispatch_order(self) -> list[str]:
+        """
+        IDs of the queued tasks in the order they should be dispatched. Without
+        fair share this is the queue order, otherwise in each run of tasks with
+        the same priority those whose order was set explicitly come first, and
+        the rest are ordered by how much of the worker their parties have had.
+        Must be called with the queue lock held.
+        """
+        if not self._fair_share:
+            return list(self._queue)
+        order: list[str] = []
+        for _, group in itertools.groupby(self._queue, key=self._queued_priority):
+            task_ids = list(group)
+            order.extend(
+                task_id for task_id in task_ids if task_id in self._ordered_explicitly
+            )
+            order.extend(
+                self._usage.order(
+                    [
+                        (task_id, _party(task))
+                        for task_id in task_ids
+                        if task_id not in self._ordered_explicitly
+                        and (task := self._tasks.get(task_id)) is not None
+                    ]
+                )
+            )
+        return order
+
+    def _queued_priority(self, task_id: str) -> int:
+        task = self._tasks.get(task_id)
+        return task.task.priority if task is not None else 0
+
+    def _remove_from_queue(self, task_id: str) -> None:
+        self._queue.remove(task_id)
+        self._ordered_explicitly.discard(task_id)
+        self._queue_otel_contexts.pop(task_id, None)
+        self._enqueued_at.pop(task_id, None)
+
+    def _take_from_queue(self, task: TrackableTask) -> Context | None:
+        """
+        Remove a task from the queue because it is starting, recording how long
+        it waited. Returns the trace context it was queued under.
+        """
+        queued_at = self._enqueued_at.pop(task.task_id, None)
+        if queued_at is not None:
+            wait = time.monotonic() - queued_at
+            self._queue_waits.record(task.task.priority, wait)
+            self._party_waits.record(_party(task), wait)
+        self._queue.remove(task.task_id)
+        self._ordered_explicitly.discard(task.task_id)
+        return self._queue_otel_contexts.pop(task.task_id, None)
+
+    def _dispatch_next_queued_task(self) -> None:
+        """
+        Hand the task at the front of the run queue to the worker thread if the
+        worker is idle and nothing else has been handed to it yet. Safe to call
+        from any thread, including the worker thread itself.
+        """
+        with self._queue_lock:
+            if not self._queue or not self._started.is_set() or self._stopping.is_set():
+                return
+            if self._lanes:
+                self._dispatch_queued_tasks_in_parallel()
+                self._request_preemption()
+                return
+            if not self._main_run_engine_idle():
+                self._request_preemption()
+                return
+            task_id = self._dispatch_order()[0]
+            task = self._tasks.get(task_id)
+            # Clearing a task also removes it from the queue, under the same lock
+            assert task is not None, f"Queued task {task_id} is unknown"
+            if not self._hand_to_main_run_engine(task):
+                # Another task has been handed over and not yet picked up,
+                # the queue will be checked again when that task completes.
+                return
+            self._current_task_otel_context = self._take_from_queue(task)
+            LOGGER.info(f"Dispatching queued task: {task_id}")
+
+    def _dispatch_queued_tasks_in_parallel(self) -> None:
+        """
+        Hand queued tasks to the main RunEngine and any idle lanes, in queue
+        order. A task that needs a device leased to a running task is skipped
+        and left in the queue, so tasks behind it may overtake it.
+        """
+        main_idle = self._main_run_engine_idle()
+        for task_id in self._dispatch_order():
+            lane = next((lane for lane in self._lanes if not lane.busy), None)
+            if not main_idle and lane is None:
+                return
+            task = self._tasks.get(task_id)
+            assert task is not None, f"Queued task {task_id} is unknown"
+            if (devices := self._task_devices(task)) is None:
+                if main_idle and self._hand_to_main_run_engine(task):
+                    self._current_task_otel_context = self._take_from_queue(task)
+                    LOGGER.info(f"Dispatching queued task: {task_id}")
+                    main_idle = False
+                continue
+            if not self._leases.try_acquire(task_id, devices):
+                continue
+            if main_idle and self._hand_to_main_run_engine(task):
+                self._current_task_otel_context = self._take_from_queue(task)
+                LOGGER.info(f"Dispatching queued task: {task_id}")
+            elif lane is not None and lane.try_submit(task):
+                self._record_phase(task, "dispatched")
+                self._parallel_otel_contexts[task_id] = self._take_from_queue(task)
+                LOGGER.info(f"Dispatching queued task to parallel RunEngine: {task_id}")
+            else:
+                self._leases.release(task_id)
+                continue
+            # Either way the main RunEngine is no longer free for this pass
+            main_idle = False
+
+    def _hand_to_main_run_engine(self, task: TrackableTask) -> bool:
+        try:
+            self._task_channel.put_nowait(task)
+        except Full:
+            # Another task has been handed over and not yet picked up
+            return False
+        self._main_claimed = True
+        self._record_phase(task, "dispatched")
+        return True
+
+    def _request_preemption(self) -> None:
+        """
+        Ask the main RunEngine to pause at its next checkpoint if a queued task
+        has a higher priority than the one it is running.
+        """
+        current = self._current
+        if (
+            not self._preemption
+            or current is None
+            or current.is_complete
+            or self._state is not WorkerState.RUNNING
+            or self._preemption_requested.is_set()
+            or not any(
+                self._queued_priority(task_id) > current.task.priority
+                for task_id in self._queue
+            )
+        ):
+            return
+        LOGGER.info(f"Preempting task {current.task_id} at its next checkpoint")
+        self._preemption_requested.set()
+        try:
+            self._ctx.run_engine.request_pause(defer=True)
+        except TransitionError:
+            # The task has just finished or been paused by someone else
+            self._preemption_requested.clear()
+
+    def _main_run_engine_idle(self) -> bool:
+        return (
+            not self._main_claimed
+            and self._state is WorkerState.IDLE
+            and (self._current is None or self._current.is_complete)
+        )
+
+    def _task_devices(self, task: TrackableTask) -> frozenset[str] | None:
+        """
+        Names of the devices a task must lease before it can run in parallel
+        with other tasks, or None if they cannot be found, in which case it
+        may only run in the main RunEngine.
+        """
+        try:
+            params = self._prepared_params_for(task)
+        except Exception:
+            # The task will fail as soon as it starts
+            return None
+        return _devices_of(self._ctx, task.task, params)
 
     @start_as_current_span(TRACER, "task.name", "task.params")
     def submit_task(self, task: Task) -> str:
@@ -271,7 +1576,12 @@ class TaskWorker:
         Returns:
             str: A unique ID to refer to this task
         """
-        task.prepare_params(self._ctx)  # Will raise if parameters are invalid
+        submitted = time.monotonic()
+        get_current_span().add_event("task.submitted")
+        generation = self._ctx.generation
+        params = task.prepare_params(self._ctx)  # Will raise if parameters are invalid
+        validated = time.monotonic()
+        get_current_span().add_event("task.validated")
         task_id: str = str(uuid.uuid4())
         task.metadata["blueapi_task_id"] = task_id
         add_span_attributes({"TaskId": task_id})
@@ -284,8 +1594,13 @@ class TaskWorker:
             task_id=task_id,
             request_id=request_id,
             task=task,
+            timeline=TaskTimeline(submitted=submitted, validated=validated),
+            steps=[StepStatus(name=step.name) for step in task.steps],
         )
-        self._pending_tasks[task_id] = trackable_task
+        self._prepared_params[task_id] = (generation, params)
+        self._tasks.add(trackable_task)
+        if self._estimation.enabled:
+            self._estimator.submit(self._estimate, trackable_task)
         return task_id
 
     @start_as_current_span(
@@ -295,12 +1610,20 @@ class TaskWorker:
         "trackable_task.task.params",
     )
     def _submit_trackable_task(self, trackable_task: TrackableTask) -> None:
-        if self.state is not WorkerState.IDLE:
-            raise WorkerBusyError(f"Worker is in state {self.state}")
+        if self._state is not WorkerState.IDLE:
+            raise WorkerBusyError(f"Worker is in state {self._state}")
 
         if trackable_task.is_complete:
             raise ValueError("Task has already been run")
 
+        if self._lanes and (devices := self._task_devices(trackable_task)) is not None:
+            if not self._leases.try_acquire(trackable_task.task_id, devices):
+                conflicts = self._leases.conflicts(trackable_task.task_id, devices)
+                raise WorkerBusyError(
+                    f"Devices {sorted(conflicts)} are in use by tasks "
+                    f"{sorted(set(conflicts.values()))}"
+                )
+
         task_started = Event()
 
         def mark_task_as_started(event: WorkerEvent, _: str | None) -> None:
@@ -311,15 +1634,18 @@ class TaskWorker:
                 task_started.set()
 
         LOGGER.info(f"Submitting: {trackable_task}")
-        sub = self.worker_events.subscribe(mark_task_as_started)
+        sub = self.worker_events.subscribe(mark_task_as_started, synchronous=True)
         try:
             self._current_task_otel_context = get_current()
             """ Cache the current trace context as the one for this task id """
             self._task_channel.put_nowait(trackable_task)
+            self._main_claimed = True
+            self._record_phase(trackable_task, "dispatched")
             task_started.wait(timeout=5.0)
             if not task_started.is_set():
                 raise TimeoutError("Failed to start plan within timeout")
         except Full as f:
+            self._leases.release(trackable_task.task_id)
             LOGGER.error("Cannot submit task while another is running")
             raise WorkerBusyError("Cannot submit task while another is running") from f
         finally:
@@ -370,8 +1696,19 @@ class TaskWorker:
     @property
     def state(self) -> WorkerState:
         """
-        :return: state of the worker
+        :return: state of the worker, running if a task is running in any of its
+            RunEngines, otherwise paused if one is paused
         """
+        runs = list(self._parallel_runs.values())
+        if self._state not in (WorkerState.IDLE, WorkerState.PAUSED) or not runs:
+            return self._state
+        states = {
+            WorkerState.from_bluesky_state(str(run.run_engine.state)) for run in runs
+        }
+        if WorkerState.RUNNING in states:
+            return WorkerState.RUNNING
+        if WorkerState.PAUSED in states:
+            return WorkerState.PAUSED
         return self._state
 
     @start_as_current_span(TRACER)
@@ -382,16 +1719,59 @@ class TaskWorker:
         LOGGER.info("Worker starting")
         self._ctx.run_engine.state_hook = self._on_state_change  # type: ignore
         subs = self._ctx.run_engine.subscribe(self._on_document)
+        self._gc_pauses.install()
         if self._broadcast_statuses:
             self._ctx.run_engine.waiting_hook = self._waiting_hook  # type: ignore
 
+        # Lanes must be ready before anything can be dispatched to them
+        self._lanes = [
+            RunEngineLane(
+                f"run-engine-lane-{i}",
+                RunEngine(
+                    loop=self._ctx.run_engine.loop,
+                    context_managers=[],
+                    call_returns_result=True,
+                ),
+                self._run_task_in,
+                self._dispatch_next_queued_task,
+            )
+            for i in range(self._parallel_run_engines)
+        ]
+        for lane in self._lanes:
+            lane.start()
         self._stopped.clear()
         self._started.set()
+        eviction = Thread(target=self._run_eviction, name="task-eviction", daemon=True)
+        eviction.start()
+        watchdog = Thread(target=self._run_watchdog, name="stall-watchdog", daemon=True)
+        if self._watchdog.enabled:
+            self._watchdog_stopping.clear()
+            watchdog.start()
+        preemption = Thread(
+            target=self._run_preemption_checks, name="preemption-check", daemon=True
+        )
+        if self._preemption:
+            self._preemption_check.clear()
+            preemption.start()
+        # Pick up anything queued while the worker was stopped
+        self._dispatch_next_queued_task()
         while not self._stopping.is_set():
             self._cycle_with_error_handling()
+        lanes, self._lanes = self._lanes, []
+        for lane in lanes:
+            lane.stop(self._start_stop_timeout)
         self._started.clear()
+        self._eviction_requested.set()
+        eviction.join()
+        if preemption.is_alive():
+            self._preemption_check.set()
+            preemption.join()
+        if watchdog.is_alive():
+            self._watchdog_stopping.set()
+            watchdog.join()
         self._stopping.clear()
         self._stopped.set()
+        self._gc_pauses.uninstall()
         self._ctx.run_engine.unsubscribe(subs)
 
     @start_as_current_span(TRACER, "defer")
@@ -403,14 +1783,44 @@ class TaskWorker:
             defer: Optional, if true wait till next checkpoint
         """
         LOGGER.info("Requesting to pause the worker")
+        paused = False
+        for run in list(self._parallel_runs.values()):
+            # The task may have finished or been paused already
+            with suppress(TransitionError):
+                run.run_engine.request_pause(defer)
+                paused = True
+        if paused and self._state is not WorkerState.RUNNING:
+            return
         self._ctx.run_engine.request_pause(defer)
 
     @start_as_current_span(TRACER)
     def resume(self):
         """
-        Command the worker to resume
+        Command the worker to resume. A task paused to let higher priority tasks
+        run is resumed automatically once they have finished.
+        Throws:
+            TransitionError: If there is nothing to resume, including when the
+                only paused task is waiting for higher priority tasks
         """
         LOGGER.info("Requesting to resume the worker")
+        # Tasks in other RunEngines are resumed by the threads running them
+        paused = [
+            run
+            for run in list(self._parallel_runs.values())
+            if run.run_engine.state == "paused"
+        ]
+        for run in paused:
+            run.wake.set()
+        if self._preempted is not None:
+            if not paused:
+                raise TransitionError(
+                    f"Task {self._preempted.task_id} is paused for higher priority "
+                    "tasks and will resume when they finish"
+                )
+            LOGGER.info("Preempted task will resume when preempting tasks finish")
+            return
+        if paused and self._state is not WorkerState.PAUSED:
+            return
         self._ctx.run_engine.resume()
 
     @start_as_current_span(TRACER)
@@ -430,18 +1840,35 @@ class TaskWorker:
                 def process_task():
                     LOGGER.info(f"Got new task: {next_task}")
                     self._current = next_task
-                    self._current.is_pending = False
+                    self._tasks.set_status(self._current, TaskStatusEnum.RUNNING)
+                    self._run_started(self._current, self._ctx.run_engine)
+                    self._progress_sequence = 0
+                    self._published_statuses = {}
                     meta = {"task_id": self._current.task_id}
+                    merged_before = self._progress_throttle.merged_count
                     try:
-                        result = self._current.task.do_task(self._ctx)
+                        self._record_phase(self._current, "run_engine_started")
+                        result = self._run_preemptible(self._current)
                         LOGGER.info(
                             "Task ran successfully - returned: %s", result, extra=meta
                         )
-                        self._current.set_result(result)
+                        self._set_result(self._current, result)
                     except Exception as e:
                         LOGGER.error("Task failed", extra=meta)
                         self._current.set_exception(e)
                         self._report_error(e)
+                    # A pause requested too late to take effect
+                    self._preemption_requested.clear()
+                    # Progress held back by the throttle belongs to this task
+                    self._progress_throttle.flush()
+                    self._flush_event_pages(self._current)
+                    add_span_attributes(
+                        {
+                            "progress_updates_merged": (
+                                self._progress_throttle.merged_count - merged_before
+                            )
+                        }
+                    )
 
                 with plan_tag_filter_context(next_task.task.name, LOGGER):
                     if self._current_task_otel_context is not None:
@@ -473,14 +1900,382 @@ class TaskWorker:
             if self._current_task_otel_context is not None:
                 self._current_task_otel_context = None
 
-        if self._current is not None:
-            self._current.is_complete = True
-            self._pending_tasks.pop(self._current.task_id)
-            self._completed_tasks[self._current.task_id] = self._current
+        if self._current is not None and not self._current.is_complete:
+            self._run_finished(self._current)
+            self._leases.release(self._current.task_id)
+            self._record_completion(self._current)
+            self._tasks.set_status(self._current, TaskStatusEnum.COMPLETE)
+            with self._completed_lock:
+                self._completion_times[self._current.task_id] = time.monotonic()
+            self._eviction_requested.set()
         self._report_status()
         self._errors.clear()
         self._warnings.clear()
         self._completed_statuses.clear()
+        with self._queue_lock:
+            self._main_claimed = False
+        self._dispatch_next_queued_task()
+
+    def _run_preemptible(self, task: TrackableTask) -> Any:
+        """
+        Run a task in the main RunEngine. Whenever it is paused so that queued
+        tasks with a higher priority can run, run them and then resume it.
+        """
+        try:
+            return task.task.do_task(
+                self._ctx,
+                self._take_prepared_params(task),
+                on_step=partial(self._on_step, task),
+            )
+        except RunEngineInterrupted:
+            if not self._preemption_requested.is_set():
+                raise
+        while True:
+            self._preemption_requested.clear()
+            self._run_preempting_tasks(task)
+            if self._ctx.run_engine.state != "paused":
+                # Stopped or aborted while the preempting tasks ran
+                return None
+            LOGGER.info(f"Resuming preempted task {task.task_id}")
+            try:
+                result = self._ctx.run_engine.resume()
+            except RunEngineInterrupted:
+                if not self._preemption_requested.is_set():
+                    raise
+                continue
+            if isinstance(result, tuple):  # pragma: no cover
+                # this is never true if the run_engine is configured correctly
+                return None
+            return result.plan_result
+
+    def _run_preempting_tasks(self, preempted: TrackableTask) -> None:
+        self._preempted = preempted
+        try:
+            while (task := self._take_preempting_task(preempted)) is not None:
+                if self._preemption_run_engine is None:
+                    self._preemption_run_engine = RunEngine(
+                        loop=self._ctx.run_engine.loop,
+                        context_managers=[],
+                        call_returns_result=True,
+                    )
+                self._run_task_in(self._preemption_run_engine, task)
+        finally:
+            self._preempted = None
+
+    def _take_preempting_task(self, preempted: TrackableTask) -> TrackableTask | None:
+        """
+        Take the first queued task that outranks the preempted one. It may use
+        the preempted task's devices, but no others that are leased.
+        """
+        with self._queue_lock:
+            borrowed = self._leases.leases().get(preempted.task_id, frozenset())
+            for task_id in self._dispatch_order():
+                task = self._tasks.get(task_id)
+                if task is None or task.task.priority <= preempted.task.priority:
+                    continue
+                if self._lanes and (
+                    (devices := self._task_devices(task)) is None
+                    or not self._leases.try_acquire(task_id, devices - borrowed)
+                ):
+                    # Left for the main RunEngine if its devices are unknown
+                    continue
+                self._parallel_otel_contexts[task_id] = self._take_from_queue(task)
+                self._record_phase(task, "dispatched")
+                LOGGER.info(f"Running task {task_id} ahead of {preempted.task_id}")
+                return task
+            return None
+
+    def _run_task_in(self, run_engine: RunEngine, task: TrackableTask) -> None:
+        """
+        Run a task in a RunEngine other than the main one, either one of the
+        parallel RunEngines or the one used while the main RunEngine is
+        preempted. Only touches state belonging to this task.
+        """
+        LOGGER.info(f"Got new parallel task: {task}")
+        meta = {"task_id": task.task_id}
+        run = _ParallelRun(
+            task,
+            run_engine,
+            self._new_stall_watchdog(),
+            self._parallel_otel_contexts.pop(task.task_id, None),
+        )
+        self._parallel_runs[task.task_id] = run
+        # Run metadata, such as the instrument session, is shared with the main
+        # RunEngine, as is the source of scan IDs until the task is given its own
+        run_engine.md.clear()
+        run_engine.md.update(self._ctx.run_engine.md)
+        run_engine.scan_id_source = self._ctx.run_engine.scan_id_source
+        run_engine.preprocessors = list(self._ctx.run_engine.preprocessors)
+        self._tasks.set_status(task, TaskStatusEnum.RUNNING)
+        self._run_started(task, run_engine)
+        self._report_task_status(task)
+        subscription = run_engine.subscribe(partial(self._on_lane_document, run))
+        try:
+            with (
+                self._ctx.paths_from(run_engine),
+                plan_tag_filter_context(task.task.name, LOGGER),
+            ):
+                self._record_phase(task, "run_engine_started")
+                result = self._run_pausable(run, self._take_prepared_params(task))
+            LOGGER.info("Task ran successfully - returned: %s", result, extra=meta)
+            self._set_result(task, result)
+        except Exception as e:
+            LOGGER.error("Task failed", extra=meta, exc_info=True)
+            task.errors.append(str(e))
+            task.set_exception(e)
+        finally:
+            run_engine.unsubscribe(subscription)
+            self._flush_event_pages(task)
+        self._run_finished(task)
+        del self._parallel_runs[task.task_id]
+        self._leases.release(task.task_id)
+        self._record_completion(task)
+        self._tasks.set_status(task, TaskStatusEnum.COMPLETE)
+        with self._completed_lock:
+            self._completion_times[task.task_id] = time.monotonic()
+        self._eviction_requested.set()
+        self._report_task_status(task)
+
+    def _run_pausable(self, run: _ParallelRun, params: Mapping[str, Any] | None) -> Any:
+        """
+        Run a task in a RunEngine other than the main one. Whenever the
+        RunEngine is paused, wait until the worker resumes, stops or aborts it,
+        so that the task does not fail and the RunEngine is not given another
+        task while paused.
+        """
+        try:
+            return run.task.task.do_task(
+                self._ctx, params, run.run_engine, partial(self._on_step, run.task)
+            )
+        except RunEngineInterrupted:
+            pass
+        while True:
+            run.wake.wait()
+            run.wake.clear()
+            if run.run_engine.state != "paused":
+                # Stopped or aborted while paused
+                return None
+            LOGGER.info(f"Resuming parallel task {run.task.task_id}")
+            try:
+                result = run.run_engine.resume()
+            except RunEngineInterrupted:
+                continue
+            if isinstance(result, tuple):  # pragma: no cover
+                # this is never true if the run_engine is configured correctly
+                return None
+            return result.plan_result
+
+    def _set_result(self, task: TrackableTask, result: Any) -> None:
+        task.set_result(result, self._results)
+        if isinstance(task.outcome, TaskResult) and task.outcome.stored is not None:
+            with self._completed_lock:
+                self._stored_results[task.task_id] = task.outcome.stored.digest
+
+    def _on_step(
+        self, task: TrackableTask, index: int, state: StepState, error: str | None
+    ) -> None:
+        """
+        Record that a step of a bundle has started or finished, and publish the
+        task's status so that clients can look up its steps.
+        """
+        step = task.steps[index]
+        step.state = state
+        step.error = error
+        get_current_span().add_event(
+            "task.step",
+            {
+                "task_id": task.task_id,
+                "index": index,
+                "name": step.name,
+                "state": state,
+            },
+        )
+        if state is StepState.FAILED and not task.task.stop_on_failure:
+            # Otherwise the bundle fails with the step's error
+            task.errors.append(f"Step {index} ({step.name}) failed: {error}")
+        if task is self._current:
+            self._report_status()
+        else:
+            self._report_task_status(task)
+
+    def _run_started(self, task: TrackableTask, run_engine: RunEngine) -> None:
+        self._run_started_at[task.task_id] = time.monotonic()
+        self._resource_baselines[task.task_id] = take_snapshot(self._gc_pauses)
+        self._usage.started(_party(task))
+        self._ctx.use_scans_of(run_engine, task.task_id)
+        observers: list[MessageObserver] = []
+        if self._profile_messages:
+            profiler = MsgProfiler()
+            observers.append(profiler)
+            self._profilers[task.task_id] = profiler
+        if self._watchdog.enabled:
+            run = self._parallel_runs.get(task.task_id)
+            observers.append(run.watchdog if run is not None else self._stall_watchdog)
+        if self._estimation.enabled:
+            observers.append(MessageTimer(self._timing_model))
+        # The estimate is no longer updated once the task starts
+        self._dry_runs.pop(task.task_id, None)
+        if observers:
+            clock = MessageClock(observers)
+            self._message_clocks[task.task_id] = clock
+            run_engine.msg_hook = clock.on_msg  # type: ignore
+
+    def _run_finished(self, task: TrackableTask) -> None:
+        # Reserved for a run the task never opened
+        self._ctx.release_scan(task.task_id)
+        for step in task.steps:
+            # Steps a bundle did not get to, or was interrupted during
+            if step.state is StepState.PENDING:
+                step.state = StepState.SKIPPED
+            elif step.state is StepState.RUNNING:
+                step.state = StepState.FAILED
+                step.error = "Interrupted"
+        started_at = self._run_started_at.pop(task.task_id, None)
+        if started_at is not None:
+            self._usage.charge(_party(task), time.monotonic() - started_at)
+        if (baseline := self._resource_baselines.pop(task.task_id, None)) is not None:
+            now = take_snapshot(self._gc_pauses)
+            task.resources.cpu_time = now.cpu_time - baseline.cpu_time
+            task.resources.peak_rss_increase = now.peak_rss - baseline.peak_rss
+            task.resources.gc_pause_time = now.gc_pause_time - baseline.gc_pause_time
+        if (clock := self._message_clocks.pop(task.task_id, None)) is not None:
+            clock.finish()
+            if self._estimation.enabled:
+                self._update_estimates()
+        if (profiler := self._profilers.pop(task.task_id, None)) is not None:
+            with self._completed_lock:
+                self._profiles[task.task_id] = profiler.summary()
+        if (run := self._parallel_runs.get(task.task_id)) is not None:
+            run.run_engine.msg_hook = None
+        elif task is self._current:
+            self._ctx.run_engine.msg_hook = None
+            self._stall_watchdog.task_finished()
+
+    def _estimate(self, task: TrackableTask) -> None:
+        """
+        Estimate how long a pending task will take by iterating its plan without
+        a RunEngine, built against mocked devices so that no hardware is touched
+        even by plan code outside its messages. A plan that cannot be built or
+        iterated like this, such as one using devices that cannot be mocked, is
+        left without an estimate, as it may still run properly. Tasks that have
+        started or been cleared in the meantime are not estimated.
+        """
+        if not task.is_pending:
+            return
+        try:
+            dry_run = DryRun.of(
+                task.task.build_plan(self._ctx.mock_context()),
+                self._estimation.max_messages,
+            )
+        except Exception as e:
+            LOGGER.info(f"Unable to estimate duration of {task.task.name}: {e}")
+            return
+        self._dry_runs[task.task_id] = dry_run
+        # Checked after storing the dry run, as starting or clearing the task
+        # sets its status or removes it before forgetting its dry run
+        if not task.is_pending or self._tasks.get(task.task_id) is None:
+            self._dry_runs.pop(task.task_id, None)
+            return
+        task.estimate = self._timing_model.estimate(dry_run)
+
+    def _update_estimates(self) -> None:
+        """
+        Re-estimate every pending task with the timings learned so far
+        """
+        for task_id, dry_run in list(self._dry_runs.items()):
+            if (task := self._tasks.get(task_id)) is not None and task.is_pending:
+                task.estimate = self._timing_model.estimate(dry_run)
+
+    def account_published(self, task_id: str, sink: str, size: int) -> None:
+        """
+        Add to the number of bytes of a task's events that have been published
+        to a sink, such as a message bus, without keeping a completed task from
+        being evicted. Unknown tasks are ignored.
+
+        Args:
+            task_id: ID of the task the events belong to
+            sink: Name of the sink the events were published to
+            size: Number of bytes published
+        """
+        if (task := self._tasks.peek(task_id)) is not None:
+            published = task.resources.published_bytes
+            published[sink] = published.get(sink, 0) + size
+
+    def _record_phase(self, task: TrackableTask, phase: str) -> None:
+        """
+        Record that a task has just reached a phase of its timeline, both on the
+        task and as an event of the current span.
+        """
+        now = time.monotonic()
+        setattr(task.timeline, phase, now)
+        get_current_span().add_event(
+            f"task.{phase}", {"task_id": task.task_id, "monotonic_time": now}
+        )
+
+    def _record_document(self, task: TrackableTask, name: str) -> None:
+        documents = task.resources.documents
+        documents[name] = documents.get(name, 0) + 1
+        # Every document moves the last document on, so its span event is only
+        # added when the task completes
+        if task.timeline.first_document is None:
+            self._record_phase(task, "first_document")
+        task.timeline.last_document = time.monotonic()
+
+    def _record_completion(self, task: TrackableTask) -> None:
+        if (last_document := task.timeline.last_document) is not None:
+            get_current_span().add_event(
+                "task.last_document",
+                {"task_id": task.task_id, "monotonic_time": last_document},
+            )
+        self._record_phase(task, "completed")
+
+    def _on_lane_document(
+        self, run: _ParallelRun, name: str, document: Mapping[str, Any]
+    ) -> None:
+        if run.otel_context is None:
+            self._publish_document(run.task, name, document)
+        else:
+            self._trace_document(run.task, run.otel_context, name, document)
+
+    def _report_task_status(self, task: TrackableTask) -> None:
+        run = self._parallel_runs.get(task.task_id)
+        event = WorkerEvent(
+            state=self.state,
+            task_status=TaskStatus(
+                task_id=task.task_id,
+                task_complete=task.is_complete,
+                task_failed=bool(task.errors),
+                result=task.outcome,
+            ),
+            errors=list(task.errors),
+            warnings=list(run.warnings) if run is not None else [],
+        )
+        self._publish_worker_event(event, task.task_id)
+
+    def _prepared_params_for(self, task: TrackableTask) -> Mapping[str, Any]:
+        """
+        Parameters of a pending task, validated against the current state of the
+        context. They are kept so they are not validated again when it runs.
+        """
+        generation = self._ctx.generation
+        prepared = self._prepared_params.get(task.task_id)
+        if prepared is not None and prepared[0] == generation:
+            return prepared[1]
+        params = task.task.prepare_params(self._ctx)
+        self._prepared_params[task.task_id] = (generation, params)
+        return params
+
+    def _take_prepared_params(self, task: TrackableTask) -> Mapping[str, Any] | None:
+        """
+        Parameters validated when the task was submitted, or None if they need
+        validating again because plans or devices have changed since then.
+        """
+        generation, params = self._prepared_params.pop(task.task_id, (None, None))
+        if generation != self._ctx.generation:
+            if generation is not None:
+                LOGGER.info("Context changed since submission, revalidating params")
+            return None
+        return params
 
     @property
     def worker_events(self) -> EventStream[WorkerEvent, int]:
@@ -509,6 +2304,20 @@ class TaskWorker:
         """
         return self._data_events
 
+    def event_subscription_stats(self) -> dict[str, dict[int, SubscriptionStats]]:
+        """
+        Delivery statistics of the subscriptions to each of the worker's event
+        streams, only populated if events are delivered asynchronously
+        Returns:
+            dict[str, dict[int, SubscriptionStats]]: Statistics keyed by stream
+                name and then subscription token
+        """
+        return {
+            "worker": self._worker_events.subscription_stats(),
+            "progress": self._progress_events.subscription_stats(),
+            "data": self._data_events.subscription_stats(),
+        }
+
     @start_as_current_span(TRACER, "raw_new_state", "raw_old_state")
     def _on_state_change(
         self,
@@ -523,6 +2332,19 @@ class TaskWorker:
         LOGGER.debug(f"Notifying state change {old_state} -> {new_state}")
         self._state = new_state
         self._report_status()
+        if new_state is WorkerState.RUNNING and self._preemption and self._queue:
+            # Tasks queued before the plan got going could not preempt it then.
+            # Pausing waits on the event loop that calls this, so do it elsewhere.
+            self._preemption_check.set()
+
+    def _describe_stall(self, stall: Stall) -> str:
+        if stall.kind == "message":
+            what = f"RunEngine has been processing a {stall.subject} message"
+        else:
+            view = self._status_snapshot.get(stall.subject)
+            name = view.display_name if view is not None else "UNKNOWN"
+            what = f"Status {stall.subject} of {name} has been outstanding"
+        return f"{what} for {stall.elapsed:.1f}s"
 
     def _report_error(self, err: Exception) -> None:
         LOGGER.error(err, exc_info=True)
@@ -557,41 +2379,38 @@ class TaskWorker:
             correlation_id = None
 
         event = WorkerEvent(
-            state=self._state,
+            state=self.state,
             task_status=task_status,
             errors=errors,
             warnings=warnings,
         )
+        self._publish_worker_event(event, correlation_id)
+
+    def _publish_worker_event(
+        self, event: WorkerEvent, correlation_id: str | None
+    ) -> None:
+        """
+        Publish a worker event. Each stream is delivered to asynchronous
+        subscribers by threads of its own, so before saying a task is complete
+        its data and progress events are delivered first, so that subscribers
+        that stop listening once it is complete, such as the websocket, see all
+        of them.
+        """
+        if event.is_complete():
+            for stream in (self._data_events, self._progress_events):
+                if not stream.flush(_DELIVERY_TIMEOUT):
+                    LOGGER.warning(
+                        "Events of task %s not delivered before it completed",
+                        correlation_id,
+                    )
         self._worker_events.publish(event, correlation_id)
 
     def _on_document(self, name: str, document: Mapping[str, Any]) -> None:
         if self._current is not None:
             if self._current_task_otel_context is not None:
-                with TRACER.start_as_current_span(
-                    "_on_document",
-                    context=self._current_task_otel_context,
-                    kind=SpanKind.PRODUCER,
-                ):
-                    """
-                    Start a new span but inject the context cached when the current task
-                    was created. This will make the documents received part of the same
-                    trace.
-                    """
-                    add_span_attributes(
-                        {
-                            "task_id": self._current.task_id,
-                            "name": name,
-                            "document": str(document),
-                        }
-                    )
-
-                    correlation_id = self._current.request_id
-                    self._data_events.publish(
-                        DataEvent(
-                            name=name, task_id=self._current.task_id, doc=document
-                        ),
-                        correlation_id,
-                    )
+                self._trace_document(
+                    self._current, self._current_task_otel_context, name, document
+                )
             else:
                 raise ValueError(
                     "There is no context set for tracing despite the fact that a task"
@@ -603,26 +2422,114 @@ class TaskWorker:
                 "Trying to emit a document despite the fact that the RunEngine is idle"
             )
 
+    def _trace_document(
+        self,
+        task: TrackableTask,
+        otel_context: Context,
+        name: str,
+        document: Mapping[str, Any],
+    ) -> None:
+        if not self._traces_document(task, name):
+            self._publish_document(task, name, document)
+            return
+        with TRACER.start_as_current_span(
+            "_on_document",
+            context=otel_context,
+            kind=SpanKind.PRODUCER,
+        ) as span:
+            """
+            Start a new span but inject the context cached when the task was
+            created. This will make the documents received part of the same trace.
+            """
+            # Formatting large documents is expensive, only do it if the
+            # span is going somewhere
+            if span.is_recording():
+                add_span_attributes(
+                    {
+                        "task_id": task.task_id,
+                        "name": name,
+                        "document": self._document_attribute(document),
+                    }
+                )
+            self._publish_document(task, name, document)
+
+    def _publish_document(
+        self, task: TrackableTask, name: str, document: Mapping[str, Any]
+    ) -> None:
+        self._record_document(task, name)
+        if self._event_page_size is None:
+            self._publish_batched_document(task, name, document)
+            return
+        pages = self._event_pages.get(task.task_id)
+        if pages is None:
+            # Each task has its own pages, as tasks may run in parallel
+            pages = EventPageBatcher(
+                partial(self._publish_batched_document, task),
+                self._event_page_size,
+                self._event_page_max_delay,
+            )
+            self._event_pages[task.task_id] = pages
+        pages.add(name, document)
+
+    def _publish_batched_document(
+        self, task: TrackableTask, name: str, document: Mapping[str, Any]
+    ) -> None:
+        self._data_events.publish(
+            DataEvent(name=name, task_id=task.task_id, doc=document),
+            task.request_id,
+        )
+
+    def _flush_event_pages(self, task: TrackableTask) -> None:
+        if (pages := self._event_pages.pop(task.task_id, None)) is not None:
+            pages.flush()
+
+    def _traces_document(self, task: TrackableTask, name: str) -> bool:
+        match self._document_spans.mode:
+            case DocumentSpanMode.ALL:
+                return True
+            case DocumentSpanMode.OFF:
+                return False
+            case DocumentSpanMode.RUN_BOUNDARIES:
+                return name in ("start", "stop")
+            case DocumentSpanMode.SAMPLED:
+                if name != "event":
+                    return True
+                # Events the task has emitted before this one
+                count = task.resources.documents.get("event", 0)
+                return count % self._document_spans.event_sample_interval == 0
+
+    def _document_attribute(self, document: Mapping[str, Any]) -> str:
+        formatted = str(document)
+        max_length = self._document_spans.max_attribute_length
+        if max_length is not None and len(formatted) > max_length:
+            return formatted[:max_length] + "..."
+        return formatted
+
     def _waiting_hook(self, statuses: Iterable[Status] | None) -> None:
         if statuses is not None:
-            with self._status_lock:
-                for status in statuses:
-                    self._monitor_status(status)
+            for status in statuses:
+                self._monitor_status(status)
 
     def _monitor_status(self, status: Status) -> None:
         status_uuid = str(uuid.uuid4())
 
         if isinstance(status, WatchableStatus) and not status.done:
             LOGGER.info(f"Watching new status: {status_uuid}")
-            self._status_snapshot[status_uuid] = StatusView()
+            with self._status_lock:
+                self._status_snapshot[status_uuid] = StatusView()
+            self._stall_watchdog.status_started(status_uuid)
+            # Not watched while holding the lock: the callback may be called
+            # straight away, and the throttle takes its own lock before this one
             status.watch(partial(self._on_status_event, status, status_uuid))
 
             # TODO: Maybe introduce an initial event, in which case move
             # all of this code out of the if statement
             def on_complete(status: Status) -> None:
                 self._on_status_event(status, status_uuid)
-                del self._status_snapshot[status_uuid]
-                self._completed_statuses.add(status_uuid)
+                with self._status_lock:
+                    del self._status_snapshot[status_uuid]
+                    self._completed_statuses.add(status_uuid)
+                self._stall_watchdog.status_finished(status_uuid)
 
             status.add_callback(on_complete)  # type: ignore
 
@@ -657,22 +2564,49 @@ class TaskWorker:
             time_elapsed=time_elapsed,
             time_remaining=time_remaining,
         )
-        # Ensure completed statues are not re-added and published
-        if status_uuid not in self._completed_statuses:
+        with self._status_lock:
+            # Ensure completed statues are not re-added and published
+            if status_uuid in self._completed_statuses:
+                return
             self._status_snapshot[status_uuid] = view
-            self._publish_status_snapshot()
+        # Always publish the final state of a status straight away
+        self._progress_throttle.update(final=status.done)
 
     def _publish_status_snapshot(self) -> None:
-        if self._current is None:
-            raise ValueError("Got a status update without an active task!")
-        else:
-            self._progress_events.publish(
-                ProgressEvent(
-                    task_id=self._current.task_id,
-                    statuses=self._status_snapshot,
-                ),
-                self._current.task_id,
-            )
+        # Called by the throttle's timer thread as well as the worker's
+        with self._status_lock:
+            task = self._current
+            if task is None or task.is_complete:
+                # Progress held back until after its task finished is stale
+                return
+            task.resources.progress_updates += 1
+            if not self._progress_deltas:
+                event = ProgressEvent(
+                    task_id=task.task_id, statuses=dict(self._status_snapshot)
+                )
+            else:
+                event = self._next_progress_delta(task.task_id)
+        self._progress_events.publish(event, task.task_id)
+
+    def _next_progress_delta(self, task_id: str) -> ProgressEvent:
+        statuses = dict(self._status_snapshot)
+        sequence = self._progress_sequence
+        self._progress_sequence += 1
+        previous = self._published_statuses
+        self._published_statuses = statuses
+        if sequence % self._progress_snapshot_interval == 0:
+            return ProgressEvent(task_id=task_id, statuses=statuses, sequence=sequence)
+        return ProgressEvent(
+            task_id=task_id,
+            statuses={
+                status_id: view
+                for status_id, view in statuses.items()
+                if previous.get(status_id) != view
+            },
+            sequence=sequence,
+            snapshot=False,
+            removed=[status_id for status_id in previous if status_id not in statuses],
+        )
 
 
 @dataclass
@@ -0,0 +1,180 @@
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from threading import Lock
+
+from bluesky import Msg
+from opentelemetry.metrics import get_meter
+
+METER = get_meter("stall_watchdog")
+
+MESSAGE_DURATION = METER.create_histogram(
+    "blueapi.run_engine.message.duration",
+    unit="s",
+    description="Time the RunEngine spent on each message of the current task",
+)
+STATUS_DURATION = METER.create_histogram(
+    "blueapi.run_engine.status.duration",
+    unit="s",
+    description="Time each device status was outstanding",
+)
+STALLS = METER.create_counter(
+    "blueapi.run_engine.stalls",
+    description="Messages and statuses that were outstanding for too long",
+)
+
+
+@dataclass(frozen=True)
+class Stall:
+    """
+    A message or device status that has been outstanding for too long
+    """
+
+    #: Either "message" or "status"
+    kind: str
+    #: Command of the message, or ID of the status
+    subject: str
+    #: Seconds it has been outstanding
+    elapsed: float
+    #: Whether it has passed the hard limit, after which the task is aborted
+    fatal: bool
+
+
+class StallWatchdog:
+    """
+    Tracks how long the RunEngine has spent on its current message, and how long
+    each outstanding device status has been running, so that a plan stuck
+    waiting for a device that never finishes can be noticed. Each message and
+    status is reported once when it passes the warning threshold and again if
+    it passes the hard limit.
+
+    Args:
+        message_warning: Seconds a message may take before it is reported
+        status_warning: Seconds a status may be outstanding before it is reported
+        abort_after: Seconds either may take before it is reported as fatal
+        clock: Source of the current time in seconds, which must be the clock of
+            the MessageClock the watchdog observes
+    """
+
+    _message_warning: float | None
+    _status_warning: float | None
+    _abort_after: float | None
+    _clock: Callable[[], float]
+    _lock: Lock
+    # The current message, when it arrived and a number that tells it apart
+    # from earlier messages with the same command
+    _message: Msg | None
+    _message_started: float
+    _message_number: int
+    _statuses: dict[str, float]
+    _reported: dict[tuple[str, str | int], bool]
+
+    def __init__(
+        self,
+        message_warning: float | None = None,
+        status_warning: float | None = None,
+        abort_after: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._message_warning = message_warning
+        self._status_warning = status_warning
+        self._abort_after = abort_after
+        self._clock = clock
+        self._lock = Lock()
+        self._message = None
+        self._message_started = 0.0
+        self._message_number = 0
+        self._statuses = {}
+        self._reported = {}
+
+    def message_started(self, msg: Msg, now: float) -> None:
+        """
+        Note that the RunEngine has started processing a message, as an
+        observer of a MessageClock with the same clock as the watchdog.
+        """
+        with self._lock:
+            self._message = msg
+            self._message_started = now
+            self._message_number += 1
+
+    def message_finished(self, msg: Msg, started: float, now: float) -> None:
+        with self._lock:
+            self._finish_message(now)
+
+    def status_started(self, status_id: str) -> None:
+        with self._lock:
+            self._statuses[status_id] = self._clock()
+
+    def status_finished(self, status_id: str) -> None:
+        with self._lock:
+            started = self._statuses.pop(status_id, None)
+            self._reported.pop(("status", status_id), None)
+        if started is not None:
+            STATUS_DURATION.record(self._clock() - started)
+
+    def task_finished(self) -> None:
+        """
+        Forget the current message and any statuses still outstanding.
+        """
+        with self._lock:
+            self._finish_message(self._clock())
+            self._statuses.clear()
+            self._reported.clear()
+
+    def check(self) -> list[Stall]:
+        """
+        Find the message and statuses that have newly passed a threshold.
+
+        Returns:
+            list[Stall]: The current message if it has, then statuses that have,
+                oldest first
+        """
+        now = self._clock()
+        stalls = []
+        with self._lock:
+            if (msg := self._message) is not None:
+                stall = self._stall(
+                    ("message", self._message_number),
+                    Stall("message", msg.command, now - self._message_started, False),
+                    self._message_warning,
+                )
+                if stall is not None:
+                    stalls.append(stall)
+            for status_id, started in sorted(
+                self._statuses.items(), key=lambda item: item[1]
+            ):
+                stall = self._stall(
+                    ("status", status_id),
+                    Stall("status", status_id, now - started, False),
+                    self._status_warning,
+                )
+                if stall is not None:
+                    stalls.append(stall)
+        for stall in stalls:
+            STALLS.add(1, {"kind": stall.kind, "fatal": stall.fatal})
+        return stalls
+
+    def _stall(
+        self, key: tuple[str, str | int], stall: Stall, warning: float | None
+    ) -> Stall | None:
+        """
+        The stall, marked fatal if need be, if it has passed a threshold that
+        has not already been reported.
+        """
+        fatal = self._abort_after is not None and stall.elapsed >= self._abort_after
+        warned = warning is not None and stall.elapsed >= warning
+        if not (fatal or warned):
+            return None
+        reported = self._reported.get(key)
+        if reported is True or (reported is False and not fatal):
+            return None
+        self._reported[key] = fatal
+        return Stall(stall.kind, stall.subject, stall.elapsed, fatal)
+
+    def _finish_message(self, now: float) -> None:
+        if (msg := self._message) is not None:
+            MESSAGE_DURATION.record(
+                now - self._message_started, {"command": msg.command}
+            )
+            self._reported.pop(("message", self._message_number), None)
+            self._message = None
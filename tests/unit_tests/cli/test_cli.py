@@ -52,6 +52,7 @@ from blueapi.service.model import (
 )
 from blueapi.worker.event import (
     ProgressEvent,
+    StoredResult,
     TaskError,
     TaskResult,
     TaskStatus,
@@ -358,6 +359,12 @@ def test_run_plan(stomp_client: StompClient, runner: CliRunner):
             False,
             "Plan returned unserializable result of type 'CustomType'\n",
         ),
+        (
+            TaskResult(type="list", stored=StoredResult(digest="abc", size=1000)),
+            False,
+            "Plan succeeded: result of 1000 bytes stored by the server, see "
+            "/api/v1/tasks/foo_bar/result\n",
+        ),
         (
             TaskError(type="ValueError", message="Error with value"),
             True,
@@ -42,7 +42,13 @@ from blueapi.service.model import (
     WorkerTask,
 )
 from blueapi.worker import ProgressEvent, Task, TrackableTask, WorkerEvent, WorkerState
-from blueapi.worker.event import TaskError, TaskResult, TaskStatus
+from blueapi.worker.event import (
+    StatusView,
+    StoredResult,
+    TaskError,
+    TaskResult,
+    TaskStatus,
+)
 
 PLANS = PlanResponse(
     plans=[
@@ -273,6 +279,20 @@ def test_create_and_start_task_fails_if_task_start_fails(
         )
 
 
+def test_create_and_queue_task_calls_both_creating_and_queueing_endpoints(
+    client: BlueapiClient,
+    mock_rest: Mock,
+):
+    mock_rest.create_task.return_value = TaskResponse(task_id="baz")
+    mock_rest.enqueue_task.return_value = WorkerTask(task_id="baz")
+    response = client.create_and_queue_task(
+        TaskRequest(name="baz", instrument_session="cm12345-1")
+    )
+    assert response == TaskResponse(task_id="baz")
+    mock_rest.enqueue_task.assert_called_once_with(WorkerTask(task_id="baz"))
+    mock_rest.update_worker_task.assert_not_called()
+
+
 def test_environment_property(client: BlueapiClient):
     assert client.environment == ENV
 
@@ -585,6 +605,30 @@ def test_scripting_interface_returns_result():
     assert demo_plan() == 42
 
 
+def test_scripting_interface_fetches_stored_result():
+    client = Mock(spec=BlueapiClient, instrument_session="cm12345-1")
+    client.run_task.return_value = TaskStatus(
+        task_id="foobar",
+        task_complete=True,
+        task_failed=False,
+        result=TaskResult(type="list", stored=StoredResult(digest="abc", size=1000)),
+    )
+    client.get_task_result.return_value = [1, 2, 3]
+    demo_plan = Plan(
+        "demo",
+        client=client,
+        model=PlanModel(name="demo", description="Demo plan", schema={}),
+    )
+    assert demo_plan() == [1, 2, 3]
+    client.get_task_result.assert_called_once_with("foobar")
+
+
+def test_get_task_result(client, mock_rest):
+    mock_rest.get_task_result.return_value = [1, 2, 3]
+    assert client.get_task_result("foo") == [1, 2, 3]
+    mock_rest.get_task_result.assert_called_once_with("foo")
+
+
 def test_scripting_interface_raises_exceptions():
     client = Mock(spec=BlueapiClient, instrument_session="cm12345-1")
     client.run_task.return_value = TaskStatus(
@@ -1042,6 +1086,66 @@ def test_run_blocking_client_callbacks(
     callback.assert_called_once_with(event)
 
 
+DELTA_PROGRESS_EVENTS = [
+    ProgressEvent(
+        task_id="foo",
+        statuses={"a": StatusView(current=0.0), "b": StatusView(current=0.0)},
+        sequence=0,
+    ),
+    ProgressEvent(
+        task_id="foo",
+        statuses={"a": StatusView(current=1.0)},
+        sequence=1,
+        snapshot=False,
+        removed=["b"],
+    ),
+]
+
+
+def test_run_blocking_rebuilds_delta_progress(client: BlueapiClient, mock_rest: Mock):
+    callback = Mock()
+    mock_rest.run_blocking.side_effect = lambda req: [
+        *DELTA_PROGRESS_EVENTS,
+        COMPLETE_EVENT,
+    ]
+    client.run_blocking(Mock(), on_event=callback)
+
+    assert callback.mock_calls[1] == call(
+        ProgressEvent(
+            task_id="foo", statuses={"a": StatusView(current=1.0)}, sequence=1
+        )
+    )
+
+
+def test_run_task_rebuilds_delta_progress(
+    client_with_events: BlueapiClient,
+    mock_rest: Mock,
+    mock_events: MagicMock,
+):
+    mock_rest.create_task.return_value = TaskResponse(task_id="foo")
+    mock_rest.update_worker_task.return_value = TaskResponse(task_id="foo")
+    ctx = Mock()
+    ctx.correlation_id = "foo"
+
+    def callback(on_event: Callable[[AnyEvent, MessageContext], None]):
+        # The first delta is dropped as there is no snapshot to apply it to
+        for event in [DELTA_PROGRESS_EVENTS[1], *DELTA_PROGRESS_EVENTS]:
+            on_event(event, ctx)
+        on_event(COMPLETE_EVENT, ctx)
+
+    mock_events.subscribe_to_all_events = callback  # type: ignore
+
+    mock_on_event = Mock()
+    client_with_events.run_task(
+        TaskRequest(name="foo", instrument_session="cm12345-1"), on_event=mock_on_event
+    )
+
+    assert [c.args[0].statuses for c in mock_on_event.mock_calls[:-1]] == [
+        {"a": StatusView(current=0.0), "b": StatusView(current=0.0)},
+        {"a": StatusView(current=1.0)},
+    ]
+
+
 def test_run_blocking_error_if_cut_short(client: BlueapiClient, mock_rest: Mock):
     mock_rest.run_blocking.side_effect = lambda req: []
     with pytest.raises(
@@ -9,7 +9,7 @@ import requests
 import responses
 from packaging.version import Version
 from pydantic_core import PydanticSerializationError
-from responses import DELETE, GET, PUT, matchers
+from responses import DELETE, GET, POST, PUT, matchers
 from websockets import Headers, InvalidStatus, Response
 
 from blueapi import __version__
@@ -23,6 +23,7 @@ from blueapi.client.rest import (
     NotFoundError,
     ParameterError,
     ServiceUnavailableError,
+    TooManyRequestsError,
     UnauthorisedAccessError,
     UnknownPlanError,
     _create_task_exceptions,
@@ -34,12 +35,17 @@ from blueapi.service.model import (
     DeviceModel,
     EnvironmentResponse,
     PlanModel,
+    QueueResponse,
+    QueueStatsResponse,
+    SweepRequest,
+    SweepResponse,
     TaskRequest,
     TaskResponse,
     TasksListResponse,
     WorkerTask,
 )
 from blueapi.worker.event import WorkerState
+from blueapi.worker.profiling import TaskProfile
 from blueapi.worker.task import Task
 from blueapi.worker.task_worker import TrackableTask
 
@@ -161,6 +167,7 @@ def test_create_task_serialization_error():
             '{"detail": "not a list"}',
             BlueskyRequestError(422, ""),
         ),
+        (429, "", TooManyRequestsError(429, "")),
         (450, "non-standard", BlueskyRequestError(450, "non-standard")),
         (500, "internal_error", BlueskyRequestError(500, "internal_error")),
     ],
@@ -293,7 +300,7 @@ def test_parameter_error_other_string():
     "server_version,logging_warning_present",
     [(__version__, False), ("0.0.1", True), (None, False)],
 )
-@patch("blueapi.client.rest.TypeAdapter")
+@patch("blueapi.client.rest.type_adapter")
 @patch("blueapi.client.rest.requests.Session.request")
 @patch("blueapi.client.rest.LOGGER")
 def test_server_and_client_versions(
@@ -375,6 +382,76 @@ def test_server_and_client_versions(
             '{"task_id": "foo"}',
             TaskResponse(task_id="foo"),
         ),
+        (
+            "get_task_profile",
+            ("foo",),
+            GET,
+            "/api/v1/tasks/foo/profile",
+            '{"total_time": 0.0, "bucket_bounds": [], "commands": {}, "devices": []}',
+            TaskProfile(total_time=0.0, bucket_bounds=[], commands={}, devices=[]),
+        ),
+        (
+            "get_task_result",
+            ("foo",),
+            GET,
+            "/api/v1/tasks/foo/result",
+            "[1, 2, 3]",
+            [1, 2, 3],
+        ),
+        (
+            "get_queue",
+            (),
+            GET,
+            "/api/v1/queue",
+            '{"tasks": [{"task_id": "foo", "task": {"name": "bar"}}]}',
+            QueueResponse(tasks=[TrackableTask(task_id="foo", task=Task(name="bar"))]),
+        ),
+        (
+            "get_queue_stats",
+            (),
+            GET,
+            "/api/v1/queue/stats",
+            '{"priorities": [], "parties": []}',
+            QueueStatsResponse(priorities=[], parties=[]),
+        ),
+        (
+            "enqueue_task",
+            (WorkerTask(task_id="foo"),),
+            POST,
+            "/api/v1/queue",
+            '{"task_id": "foo"}',
+            WorkerTask(task_id="foo"),
+        ),
+        (
+            "submit_sweep",
+            (
+                SweepRequest(
+                    name="count",
+                    sweep={"num": [1, 2]},
+                    instrument_session="cm12345-1",
+                ),
+            ),
+            POST,
+            "/api/v1/queue/sweep",
+            '{"sweep_id": "abc", "task_ids": ["a", "b"]}',
+            SweepResponse(sweep_id="abc", task_ids=["a", "b"]),
+        ),
+        (
+            "reorder_queue",
+            (["foo"],),
+            PUT,
+            "/api/v1/queue",
+            '{"tasks": [{"task_id": "foo", "task": {"name": "bar"}}]}',
+            QueueResponse(tasks=[TrackableTask(task_id="foo", task=Task(name="bar"))]),
+        ),
+        (
+            "dequeue_task",
+            ("foo",),
+            DELETE,
+            "/api/v1/queue/foo",
+            '{"task_id": "foo"}',
+            TaskResponse(task_id="foo"),
+        ),
     ],
 )
 @responses.activate
@@ -497,6 +574,11 @@ def test_run_blocking_auth(
             "ParameterError",
         ),
         ('{"kind": "busy"}', BlueskyRemoteControlError, "Server is busy"),
+        (
+            '{"kind": "rate_limited", "reason": "user_rate", "retry_after": 2.5}',
+            TooManyRequestsError,
+            r"user_rate\), retry in 2.5s",
+        ),
         ('{"kind": "plan_not_found", "plan_name": "foo"}', UnknownPlanError, "foo"),
     ],
 )
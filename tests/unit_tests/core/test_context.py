@@ -1,10 +1,12 @@
 from __future__ import annotations
 
+from collections.abc import Callable
 from dataclasses import dataclass, field
 from pathlib import Path
+from threading import Barrier
 from types import ModuleType, NoneType
 from typing import Any, Generic, TypeVar, Union
-from unittest.mock import MagicMock, Mock, patch
+from unittest.mock import MagicMock, Mock, call, patch
 
 import pytest
 import responses
@@ -286,6 +288,20 @@ def test_add_failing_devices_from_module(
     assert len(empty_context.devices.keys()) == 0
 
 
+def test_generation_changes_on_registration(
+    empty_context: BlueskyContext, sim_motor: Motor
+):
+    generation = empty_context.generation
+    empty_context.register_device(sim_motor)
+    assert empty_context.generation > generation
+    generation = empty_context.generation
+    empty_context.register_plan(has_no_params)
+    assert empty_context.generation > generation
+    generation = empty_context.generation
+    empty_context.unregister_all_devices()
+    assert empty_context.generation > generation
+
+
 @pytest.mark.parametrize(
     "addr", ["sim", "sim_det", "sim.user_setpoint", ["sim"], ["sim", "user_setpoint"]]
 )
@@ -767,12 +783,97 @@ def test_device_manager_environment_source(empty_context: BlueskyContext):
     env = Mock(spec=EnvironmentConfig)
     env.metadata = None
     env.sources = [DeviceManagerSource(module="foo.bar", mock=True)]
+    env.concurrent_sources = 4
     with patch("blueapi.core.context.import_module") as imp_mod:
         imp_mod.side_effect = lambda mod: dev_mod if mod == "foo.bar" else None
         empty_context.with_config(env)
     assert empty_context.devices == {"foo": foo}
 
 
+@dataclass
+class SlowDeviceManager(StaticDeviceManager):
+    barrier: Barrier | None = None
+
+    def build_and_connect(
+        self,
+        *,
+        mock: bool = False,
+        timeout: float | None = None,
+        fixtures: dict[str, Any] | None = None,
+    ) -> DeviceConnectResult:
+        if self.barrier is not None:
+            self.barrier.wait()
+        return self
+
+
+def _named_device(name: str) -> Device:
+    device = Mock(spec=Device, name=name)
+    device.name = name
+    return device
+
+
+def _device_manager_modules(**managers: DeviceManager) -> Callable[[str], Any]:
+    modules = {module: Mock(devices=manager) for module, manager in managers.items()}
+    return lambda module: modules[module]
+
+
+def test_device_managers_connect_concurrently(empty_context: BlueskyContext):
+    # Neither manager can finish until both are connecting
+    barrier = Barrier(2, timeout=5)
+    first = _named_device("first")
+    second = _named_device("second")
+    env = EnvironmentConfig(
+        sources=[
+            DeviceManagerSource(module="a"),
+            DeviceManagerSource(module="b"),
+        ]
+    )
+    with patch("blueapi.core.context.import_module") as imp_mod:
+        imp_mod.side_effect = _device_manager_modules(
+            a=SlowDeviceManager(devices={"first": first}, barrier=barrier),
+            b=SlowDeviceManager(devices={"second": second}, barrier=barrier),
+        )
+        empty_context.with_config(env)
+    assert list(empty_context.devices) == ["first", "second"]
+
+
+def test_devices_registered_in_source_order(empty_context: BlueskyContext):
+    devices = {name: _named_device(name) for name in ("x", "y", "z")}
+    env = EnvironmentConfig(
+        sources=[
+            DeviceManagerSource(module="a"),
+            DeviceManagerSource(module="b"),
+        ],
+        concurrent_sources=1,
+    )
+    with patch("blueapi.core.context.import_module") as imp_mod:
+        imp_mod.side_effect = _device_manager_modules(
+            a=StaticDeviceManager(devices={"z": devices["z"], "x": devices["x"]}),
+            b=StaticDeviceManager(devices={"y": devices["y"]}),
+        )
+        empty_context.with_config(env)
+    assert list(empty_context.devices) == ["z", "x", "y"]
+
+
+def test_device_provided_by_two_sources_errors(empty_context: BlueskyContext):
+    env = EnvironmentConfig(
+        sources=[
+            DeviceManagerSource(module="a"),
+            DeviceManagerSource(module="b", name="others"),
+        ]
+    )
+    with patch("blueapi.core.context.import_module") as imp_mod:
+        modules = {
+            "a": Mock(devices=StaticDeviceManager(devices={"x": _named_device("x")})),
+            "b": Mock(others=StaticDeviceManager(devices={"x": _named_device("x")})),
+        }
+        imp_mod.side_effect = modules.__getitem__
+        with pytest.raises(
+            ValueError, match="'x' is provided by both a:devices and b:others"
+        ):
+            empty_context.with_config(env)
+
+
 def test_non_device_manager_errors(empty_context: BlueskyContext):
     dev_mod = Mock(spec=ModuleType, name="dev_mod")
     dev_mod.devices = "not-a-device-manager"
@@ -850,3 +951,36 @@ def test_token_url_set_for_tiled(
         )
     )
     assert context.tiled_conf.authentication.token_url == oidc_config.token_endpoint  # type:ignore
+
+
+def test_mock_context_builds_devices_again_mocked(
+    empty_context: BlueskyContext, sim_motor: Motor
+):
+    import tests.unit_tests.core.fake_device_module as device_module
+
+    empty_context.with_device_manager(device_module.devices)  # type: ignore - protocol uses Any to avoid dependency on dodal
+    empty_context.register_device(sim_motor)
+    empty_context.register_plan(has_no_params)
+
+    mock = empty_context.mock_context()
+
+    assert mock.plan_functions == empty_context.plan_functions
+    # Only devices built by a device manager can be built again
+    assert mock.devices.keys() == empty_context.devices.keys() - {sim_motor.name}
+    for name, device in mock.devices.items():
+        assert device is not empty_context.devices[name]
+    assert mock.run_engine is empty_context.run_engine
+    # Kept until plans or devices change
+    assert empty_context.mock_context() is mock
+    empty_context.register_plan(has_one_param)
+    assert empty_context.mock_context() is not mock
+
+
+def test_mock_context_asks_device_managers_for_mocks(empty_context: BlueskyContext):
+    sdm = Mock(wraps=StaticDeviceManager())
+    empty_context.with_device_manager(sdm)
+    empty_context.mock_context()
+    assert sdm.build_and_connect.call_args_list == [
+        call(mock=False, fixtures={}),
+        call(mock=True, fixtures={}),
+    ]
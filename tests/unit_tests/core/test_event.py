@@ -2,11 +2,13 @@ from collections.abc import Iterable
 from concurrent.futures import Future
 from dataclasses import dataclass
 from queue import Queue
+from threading import Event
 from unittest import mock
 
 import pytest
 
 from blueapi.core import EventPublisher
+from blueapi.core.event import OverflowPolicy
 
 _TIMEOUT: float = 10.0
 
@@ -93,6 +95,139 @@ def test_callback_exceptions_are_contained(publisher: EventPublisher[MyEvent]):
     handler.assert_has_calls([mock.call(event, c_id), mock.call(event, c_id)])
 
 
+def test_asynchronous_publish_does_not_wait_for_subscriber() -> None:
+    publisher: EventPublisher[MyEvent] = EventPublisher(asynchronous=True)
+    release = Event()
+    received: list[MyEvent] = []
+
+    def slow(event: MyEvent, _: str | None) -> None:
+        release.wait(timeout=_TIMEOUT)
+        received.append(event)
+
+    sub = publisher.subscribe(slow)
+    events = [MyEvent(str(i)) for i in range(3)]
+    for event in events:
+        publisher.publish(event)
+    assert received == []
+    assert publisher.subscription_stats()[sub].lag >= 2
+
+    release.set()
+    publisher.flush()
+    assert received == events
+    stats = publisher.subscription_stats()[sub]
+    assert (stats.lag, stats.dropped, stats.delivered) == (0, 0, 3)
+
+
+def test_asynchronous_drop_oldest() -> None:
+    publisher: EventPublisher[MyEvent] = EventPublisher(
+        asynchronous=True, max_queue_size=2, overflow=OverflowPolicy.DROP_OLDEST
+    )
+    started = Event()
+    release = Event()
+    received: list[MyEvent] = []
+
+    def slow(event: MyEvent, _: str | None) -> None:
+        started.set()
+        release.wait(timeout=_TIMEOUT)
+        received.append(event)
+
+    sub = publisher.subscribe(slow)
+    publisher.publish(MyEvent("0"))
+    assert started.wait(timeout=_TIMEOUT)
+    for i in range(1, 6):
+        publisher.publish(MyEvent(str(i)))
+
+    release.set()
+    publisher.flush()
+    assert received == [MyEvent("0"), MyEvent("4"), MyEvent("5")]
+    assert publisher.subscription_stats()[sub].dropped == 3
+
+
+@mock.patch("blueapi.core.event.DROPPED_EVENTS")
+@mock.patch("blueapi.core.event.QUEUED_EVENTS")
+def test_asynchronous_metrics(queued: mock.Mock, dropped: mock.Mock) -> None:
+    publisher: EventPublisher[MyEvent] = EventPublisher(
+        asynchronous=True,
+        max_queue_size=1,
+        overflow=OverflowPolicy.DROP_OLDEST,
+        name="progress",
+    )
+    started = Event()
+    release = Event()
+
+    def slow(event: MyEvent, _: str | None) -> None:
+        started.set()
+        release.wait(timeout=_TIMEOUT)
+
+    publisher.subscribe(slow)
+    publisher.publish(MyEvent("0"))
+    assert started.wait(timeout=_TIMEOUT)
+    for i in range(1, 4):
+        publisher.publish(MyEvent(str(i)))
+    release.set()
+    publisher.flush()
+
+    attributes = {"stream": "progress"}
+    dropped.add.assert_has_calls([mock.call(1, attributes)] * 2)
+    assert sum(call.args[0] for call in queued.add.call_args_list) == 0
+    assert all(call.args[1] == attributes for call in queued.add.call_args_list)
+
+
+def test_asynchronous_callback_exceptions_are_logged() -> None:
+    publisher: EventPublisher[MyEvent] = EventPublisher(asynchronous=True)
+    handler = mock.Mock(side_effect=[ValueError("Bad Event"), None])
+    sub = publisher.subscribe(handler)
+    publisher.publish(MyEvent("a"))
+    publisher.publish(MyEvent("b"))
+    publisher.flush()
+    assert handler.call_count == 2
+    assert publisher.subscription_stats()[sub].delivered == 2
+
+
+def test_synchronous_subscription_to_asynchronous_publisher() -> None:
+    publisher: EventPublisher[MyEvent] = EventPublisher(asynchronous=True)
+    handler = mock.Mock()
+    sub = publisher.subscribe(handler, synchronous=True)
+    publisher.publish(MyEvent("a"), "foo")
+    handler.assert_called_once_with(MyEvent("a"), "foo")
+    assert sub not in publisher.subscription_stats()
+
+
+def test_asynchronous_unsubscribe_delivers_queued_events() -> None:
+    publisher: EventPublisher[MyEvent] = EventPublisher(asynchronous=True)
+    q: Queue = Queue()
+    release = Event()
+
+    def slow(event: MyEvent, _: str | None) -> None:
+        release.wait(timeout=_TIMEOUT)
+        q.put(event)
+
+    sub = publisher.subscribe(slow)
+    dispatcher = publisher._dispatchers[sub]
+    publisher.publish(MyEvent("a"))
+    publisher.unsubscribe(sub)
+    publisher.publish(MyEvent("b"))
+    release.set()
+    assert dispatcher.thread is not None
+    dispatcher.thread.join(timeout=_TIMEOUT)
+    assert not dispatcher.thread.is_alive()
+    assert list(_drain(q)) == [MyEvent("a")]
+
+
 def _drain(queue: Queue) -> Iterable:
     while not queue.empty():
         yield queue.get_nowait()
+
+
+def test_asynchronous_flush_times_out() -> None:
+    publisher: EventPublisher[MyEvent] = EventPublisher(asynchronous=True)
+    release = Event()
+
+    def slow(event: MyEvent, _: str | None) -> None:
+        release.wait(timeout=_TIMEOUT)
+
+    publisher.subscribe(slow)
+    publisher.publish(MyEvent("a"))
+    assert not publisher.flush(timeout=0.01)
+    release.set()
+    assert publisher.flush(timeout=_TIMEOUT)
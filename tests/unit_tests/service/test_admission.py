@@ -0,0 +1,204 @@
+from unittest.mock import Mock
+
+import pytest
+
+from blueapi.config import AdmissionConfig
+from blueapi.service.admission import (
+    AdmissionController,
+    AdmissionRejectedError,
+    TokenBucket,
+)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+def test_token_bucket_allows_bursts_then_steady_rate():
+    bucket = TokenBucket(rate=2, burst=3, now=0)
+    assert [bucket.take(0) for _ in range(3)] == [0, 0, 0]
+    assert bucket.take(0) == pytest.approx(0.5)
+    assert bucket.take(0.5) == 0
+    # Quiet periods never refill more than the burst
+    assert [bucket.take(100) for _ in range(4)][-1] == pytest.approx(0.5)
+
+
+def test_no_limits_by_default(clock: FakeClock):
+    admission = AdmissionController(AdmissionConfig(), clock)
+    count_pending = Mock()
+    for _ in range(1000):
+        admission.admit("alice", 10, count_pending)
+    count_pending.assert_not_called()
+
+
+def test_global_rate_is_shared_between_users(clock: FakeClock):
+    admission = AdmissionController(AdmissionConfig(rate=1, burst=2), clock)
+    admission.admit("alice")
+    admission.admit("bob")
+    with pytest.raises(AdmissionRejectedError) as rejection:
+        admission.admit("carol")
+    assert rejection.value.reason == "rate"
+    assert rejection.value.retry_after == pytest.approx(1)
+    clock.now = 1
+    admission.admit("carol")
+
+
+def test_user_rate_is_per_user(clock: FakeClock):
+    admission = AdmissionController(AdmissionConfig(user_rate=0.5, burst=1), clock)
+    admission.admit("alice")
+    admission.admit("bob")
+    with pytest.raises(AdmissionRejectedError) as rejection:
+        admission.admit("alice")
+    assert rejection.value.reason == "user_rate"
+    assert rejection.value.retry_after_header == "2"
+
+
+def test_pending_limit_is_decided_locally_until_reached(clock: FakeClock):
+    admission = AdmissionController(AdmissionConfig(max_pending_per_user=3), clock)
+    count_pending = Mock(return_value=3)
+    admission.admit("alice", 2, count_pending)
+    admission.admit("alice", 1, count_pending)
+    count_pending.assert_not_called()
+
+    with pytest.raises(AdmissionRejectedError) as rejection:
+        admission.admit("alice", 1, count_pending)
+    assert rejection.value.reason == "pending"
+    count_pending.assert_called_once_with()
+
+    # Not asked again until the refresh interval has passed
+    with pytest.raises(AdmissionRejectedError):
+        admission.admit("alice", 1, count_pending)
+    count_pending.assert_called_once_with()
+    admission.admit("bob", 1, count_pending)
+
+
+def test_pending_limit_frees_up_as_tasks_start(clock: FakeClock):
+    admission = AdmissionController(
+        AdmissionConfig(max_pending_per_user=2, refresh_interval=5), clock
+    )
+    count_pending = Mock(return_value=2)
+    admission.admit("alice", 2, count_pending)
+    with pytest.raises(AdmissionRejectedError):
+        admission.admit("alice", 1, count_pending)
+
+    clock.now = 5
+    count_pending.return_value = 1
+    admission.admit("alice", 1, count_pending)
+    with pytest.raises(AdmissionRejectedError):
+        admission.admit("alice", 1, count_pending)
+    assert count_pending.call_count == 2
+
+
+def test_pending_limit_without_worker_rejects(clock: FakeClock):
+    admission = AdmissionController(AdmissionConfig(max_pending_per_user=1), clock)
+    admission.admit("alice")
+    with pytest.raises(AdmissionRejectedError, match="pending"):
+        admission.admit("alice")
+
+
+def test_token_bucket_given_back_token_can_be_taken_again():
+    bucket = TokenBucket(rate=1, burst=1, now=0)
+    assert bucket.take(0) == 0
+    bucket.give_back()
+    assert bucket.take(0) == 0
+    # Never holds more than the burst
+    bucket.give_back()
+    bucket.give_back()
+    assert bucket.take(0) == 0
+    assert bucket.take(0) == pytest.approx(1)
+
+
+def test_refund_restores_rates_and_pending(clock: FakeClock):
+    admission = AdmissionController(
+        AdmissionConfig(rate=1, user_rate=1, burst=1, max_pending_per_user=2), clock
+    )
+    count_pending = Mock()
+    admission.admit("alice", 2, count_pending)
+    admission.refund("alice", 2)
+    admission.admit("alice", 2, count_pending)
+    count_pending.assert_not_called()
+
+
+def test_refund_of_unknown_user_is_ignored(clock: FakeClock):
+    admission = AdmissionController(
+        AdmissionConfig(user_rate=1, max_pending_per_user=1), clock
+    )
+    admission.refund("alice")
+    admission.admit("alice")
+    with pytest.raises(AdmissionRejectedError, match="pending"):
+        admission.admit("alice")
+
+
+def test_idle_users_are_forgotten(clock: FakeClock):
+    admission = AdmissionController(
+        AdmissionConfig(user_rate=1, burst=1, user_expiry=10), clock
+    )
+    for user in ("alice", "bob"):
+        admission.admit(user)
+    assert set(admission._users) == {"alice", "bob"}
+
+    clock.now = 10
+    admission.admit("carol")
+    assert set(admission._users) == {"carol"}
+
+
+def test_users_forgotten_only_once_refilled(clock: FakeClock):
+    admission = AdmissionController(
+        AdmissionConfig(user_rate=0.05, burst=1, user_expiry=10), clock
+    )
+    admission.admit("alice")
+
+    clock.now = 10
+    admission.admit("bob")
+    assert set(admission._users) == {"alice", "bob"}
+    with pytest.raises(AdmissionRejectedError, match="user_rate"):
+        admission.admit("alice")
+
+
+def test_pending_counted_afresh_after_expiry(clock: FakeClock):
+    admission = AdmissionController(
+        AdmissionConfig(max_pending_per_user=1, user_expiry=10), clock
+    )
+    admission.admit("alice")
+    clock.now = 9
+    with pytest.raises(AdmissionRejectedError, match="pending"):
+        admission.admit("alice")
+
+    clock.now = 10
+    admission.admit("alice")
+    with pytest.raises(AdmissionRejectedError, match="pending"):
+        admission.admit("alice")
+
+
+def test_pending_rejection_does_not_use_up_rates(clock: FakeClock):
+    admission = AdmissionController(
+        AdmissionConfig(rate=1, user_rate=1, burst=1, max_pending_per_user=1), clock
+    )
+    admission.admit("alice")
+    clock.now = 1
+    with pytest.raises(AdmissionRejectedError, match="pending"):
+        admission.admit("alice")
+    admission.refund("alice")
+    admission.admit("alice")
+
+
+def test_user_rate_rejection_does_not_use_up_global_rate(clock: FakeClock):
+    admission = AdmissionController(
+        AdmissionConfig(rate=1, user_rate=0.5, burst=2), clock
+    )
+    admission.admit("alice")
+    admission.admit("alice")
+    # The global rate has refilled a token, but alice's has only half
+    clock.now = 1
+    with pytest.raises(AdmissionRejectedError, match="user_rate"):
+        admission.admit("alice")
+    admission.admit("bob")
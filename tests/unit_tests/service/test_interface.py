@@ -1,17 +1,21 @@
+import asyncio
 import json
+import pickle
 import uuid
+from collections.abc import Awaitable
 from dataclasses import dataclass
 from inspect import isawaitable
-from multiprocessing.connection import Connection as PipeConnection
+from multiprocessing import Pipe
 from typing import Any
 from unittest.mock import ANY, MagicMock, Mock, patch
 
 import pytest
 from bluesky.protocols import Stoppable
+from bluesky.run_engine import RunEngine
 from bluesky.utils import MsgGenerator
 from bluesky_stomp.messaging import StompClient
 from ophyd_async.epics.motor import Motor
-from pydantic import HttpUrl
+from pydantic import HttpUrl, ValidationError
 from pytest_httpx import HTTPXMock
 from stomp.connect import StompConnection11 as Connection
 
@@ -21,10 +25,12 @@ from blueapi.config import (
     MetadataConfig,
     NumtrackerConfig,
     OIDCConfig,
+    SchedulingConfig,
     ScratchConfig,
     StompConfig,
     TiledConfig,
 )
+from blueapi.core.bluesky_types import DataEvent
 from blueapi.core.context import BlueskyContext
 from blueapi.service import interface
 from blueapi.service.model import (
@@ -33,7 +39,13 @@ from blueapi.service.model import (
     PlanModel,
     ProtocolInfo,
     PythonEnvironmentResponse,
+    QueueWaitTimes,
     SourceInfo,
+    StepRequest,
+    SweepMode,
+    SweepRequest,
+    TaskField,
+    TaskQuery,
     TaskRequest,
     WorkerTask,
 )
@@ -46,6 +58,7 @@ from blueapi.worker.event import (
     WorkerEvent,
     WorkerState,
 )
+from blueapi.worker.scheduling import PartyShare, QueueWaitStats
 from blueapi.worker.task import Task
 from blueapi.worker.task_worker import TrackableTask
 
@@ -260,15 +273,117 @@ def test_subscribers_removed_when_task_not_found(
     with pytest.raises(KeyError):
         interface.begin_task(WorkerTask(task_id="missing"))
 
-    ctx.run_engine.subscribe.assert_called_once()
-    tiled_token = ctx.run_engine.subscribe()
-    ctx.run_engine.unsubscribe.assert_called_once_with(tiled_token)
+    worker.data_events.subscribe.assert_called_once()
+    tiled_token = worker.data_events.subscribe()
+    worker.data_events.unsubscribe.assert_called_once_with(tiled_token)
+    ctx.release_scan.assert_called_once_with("missing")
 
     worker.worker_events.subscribe.assert_called_once()
     remove_token = worker.worker_events.subscribe()
     worker.worker_events.unsubscribe.assert_called_once_with(remove_token)
 
 
+@patch("blueapi.service.interface._subscribe_task_sinks")
+@patch("blueapi.service.interface.worker")
+def test_enqueue_task_defers_sinks_until_task_starts(
+    worker_mock: MagicMock, subscribe_sinks: MagicMock
+):
+    task = WorkerTask(task_id="foo")
+    headers = {"a": "b"}
+
+    assert interface.enqueue_task(task, headers) == task
+    worker_mock().enqueue_task.assert_called_once_with("foo")
+    subscribe_sinks.assert_not_called()
+
+    def event(task_id: str, complete: bool) -> WorkerEvent:
+        return WorkerEvent(
+            state=WorkerState.RUNNING,
+            task_status=TaskStatus(
+                task_id=task_id,
+                task_complete=complete,
+                task_failed=False,
+                result=None,
+            ),
+        )
+
+    interface._on_queued_task_started(event("bar", False), None)
+    subscribe_sinks.assert_not_called()
+    interface._on_queued_task_started(event("foo", False), None)
+    subscribe_sinks.assert_called_once_with("foo", headers)
+    interface._on_queued_task_started(event("foo", True), None)
+    subscribe_sinks.assert_called_once()
+
+
+@patch("blueapi.service.interface.worker")
+def test_enqueue_task_failure_forgets_headers(worker_mock: MagicMock):
+    worker_mock().enqueue_task.side_effect = KeyError("foo")
+    with pytest.raises(KeyError):
+        interface.enqueue_task(WorkerTask(task_id="foo"), {"a": "b"})
+    assert "foo" not in interface._QUEUED_TASK_HEADERS
+
+
+@patch("blueapi.service.interface.worker")
+def test_dequeue_task_forgets_headers(worker_mock: MagicMock):
+    worker_mock().dequeue_task.return_value = "foo"
+    interface.enqueue_task(WorkerTask(task_id="foo"), {"a": "b"})
+    assert interface.dequeue_task("foo") == "foo"
+    assert "foo" not in interface._QUEUED_TASK_HEADERS
+
+
+@patch("blueapi.service.interface.worker")
+def test_published_bytes_accounted_to_task(worker_mock: MagicMock):
+    documents = [
+        interface._serialize_and_account(DataEvent(name=name, doc={}, task_id="foo"))
+        for name in ("start", "stop")
+    ]
+    # Only added to the task in a batch once a worker event is published
+    worker_mock().account_published.assert_not_called()
+
+    event = WorkerEvent(
+        state=WorkerState.RUNNING,
+        task_status=TaskStatus(
+            task_id="foo", task_complete=True, task_failed=False, result=None
+        ),
+    )
+    serialized = interface._serialize_and_account(event)
+    worker_mock().account_published.assert_called_once_with(
+        "foo", "stomp", sum(map(len, documents)) + len(serialized)
+    )
+
+
+@patch("blueapi.service.interface.worker")
+def test_published_bytes_without_task_not_accounted(worker_mock: MagicMock):
+    interface._serialize_and_account(
+        WorkerEvent(state=WorkerState.IDLE, task_status=None)
+    )
+    worker_mock().account_published.assert_not_called()
+
+
+@patch("blueapi.service.interface.worker")
+def test_get_queue_stats(worker_mock: MagicMock):
+    worker_mock().queue_wait_stats.return_value = {
+        1: QueueWaitStats(count=1, total=0.5, max=0.5),
+        0: QueueWaitStats(count=2, total=3.0, max=2.0),
+    }
+    worker_mock().party_shares.return_value = [
+        PartyShare(
+            instrument_session="cm12345-1",
+            user="jd1",
+            weight=2.0,
+            queued=1,
+            run_time=4.0,
+            share=1.0,
+            waits=QueueWaitStats(count=3, total=3.5, max=2.0),
+        )
+    ]
+    stats = interface.get_queue_stats()
+    assert [p.priority for p in stats.priorities] == [1, 0]
+    assert stats.priorities[1].waits == QueueWaitTimes(count=2, mean=1.5, max=2.0)
+    assert [(p.user, p.weight, p.run_time) for p in stats.parties] == [
+        ("jd1", 2.0, 4.0)
+    ]
+
+
 @patch("blueapi.service.interface.TaskWorker.get_tasks")
 def test_get_tasks(get_tasks_mock: MagicMock):
     running_task = [TrackableTask(task_id="2", task=Task(name="running_task"))]
@@ -278,7 +393,7 @@ def test_get_tasks(get_tasks_mock: MagicMock):
     ]
 
     def mock_tasks(
-        status: TaskStatusEnum | None = None,
+        status: TaskStatusEnum | None = None, *filters: str | None
     ) -> list[TrackableTask]:
         if status == TaskStatusEnum.PENDING:
             return pending_task
@@ -297,15 +412,85 @@ def test_get_tasks(get_tasks_mock: MagicMock):
     assert interface.get_tasks() == pending_task + running_task
 
 
-@patch("blueapi.service.interface.BlueskyContext.numtracker")
+@patch("blueapi.service.interface.TaskWorker.get_tasks")
+def test_get_tasks_passes_filters(get_tasks_mock: MagicMock):
+    interface.get_tasks(TaskStatusEnum.PENDING, "jd1", "sleep", "cm12345-1")
+    get_tasks_mock.assert_called_once_with(
+        TaskStatusEnum.PENDING, "jd1", "sleep", "cm12345-1"
+    )
+
+
+@patch("blueapi.service.interface.TaskWorker.get_tasks")
+def test_count_pending_tasks(get_tasks_mock: MagicMock):
+    get_tasks_mock.return_value = [
+        TrackableTask(task_id="0", task=Task(name="sleep")),
+        TrackableTask(task_id="1", task=Task(name="sleep")),
+    ]
+    assert interface.count_pending_tasks("jd1") == 2
+    get_tasks_mock.assert_called_once_with(TaskStatusEnum.PENDING, user="jd1")
+
+
+@patch("blueapi.service.interface.TaskWorker.get_task_page")
+def test_get_task_page_projects_fields(get_task_page_mock: MagicMock):
+    task = TrackableTask(
+        task_id="0",
+        task=Task(name="sleep", params={"time": 1.0}, metadata={"user": "jd1"}),
+    )
+    get_task_page_mock.return_value = ([task], 5)
+
+    page = interface.get_task_page(
+        TaskQuery(
+            user="jd1",
+            limit=1,
+            fields=[TaskField.TASK_ID, TaskField.TASK_NAME, TaskField.IS_COMPLETE],
+        )
+    )
+
+    assert page == interface.TaskPage(
+        tasks=[{"task_id": "0", "task": {"name": "sleep"}, "is_complete": False}],
+        next_cursor=5,
+    )
+    get_task_page_mock.assert_called_once_with(
+        limit=1,
+        after=None,
+        status=None,
+        user="jd1",
+        plan=None,
+        instrument_session=None,
+        submitted_after=None,
+        submitted_before=None,
+    )
+
+
+@patch("blueapi.service.interface.TaskWorker.get_task_page")
+def test_get_task_page_without_fields_returns_whole_tasks(
+    get_task_page_mock: MagicMock,
+):
+    task = TrackableTask(task_id="0", task=Task(name="sleep"))
+    get_task_page_mock.return_value = ([task], None)
+
+    page = interface.get_task_page(TaskQuery())
+
+    assert page.tasks == [task.model_dump(mode="json")]
+    assert page.next_cursor is None
+
+
+@patch("blueapi.service.interface.TaskWorker.get_task_owner")
+def test_get_task_owner(get_task_owner_mock: MagicMock):
+    get_task_owner_mock.return_value = "jd1"
+    assert interface.get_task_owner("foo") == "jd1"
+    get_task_owner_mock.assert_called_once_with("foo")
+
+
+@patch("blueapi.service.interface.BlueskyContext.set_scan_headers")
 @patch("blueapi.service.interface.TaskWorker.begin_task")
-def test_begin_task_with_headers(worker_mock: MagicMock, mock_numtracker: MagicMock):
+def test_begin_task_with_headers(worker_mock: MagicMock, set_scan_headers: MagicMock):
     uuid_value = "350043fd-597e-41a7-9a92-5d5478232cf7"
     task = WorkerTask(task_id=uuid_value)
     headers = {"a": "b"}
 
     returned_task = interface.begin_task(task, headers)
-    mock_numtracker.set_headers.assert_called_once_with(headers)
+    set_scan_headers.assert_called_once_with(uuid_value, headers)
 
     assert task == returned_task
     worker_mock.assert_called_once_with(uuid_value)
@@ -342,7 +527,7 @@ def test_cancel_active_task(cancel_active_task_mock: MagicMock):
     task_id = "789"
     cancel_active_task_mock.return_value = task_id
     assert interface.cancel_active_task(fail, reason) == task_id
-    cancel_active_task_mock.assert_called_once_with(fail, reason)
+    cancel_active_task_mock.assert_called_once_with(fail, reason, None)
 
 
 @pytest.mark.parametrize("tiled_enabled", [True, False])
@@ -358,6 +543,8 @@ def test_get_task_by_id(
         config_mock.return_value = ApplicationConfig(
             env=EnvironmentConfig(metadata=MetadataConfig(instrument="ixx"))
         )
+    else:
+        config_mock.return_value = ApplicationConfig()
     context_mock.return_value = context
 
     task_id = interface.submit_task(
@@ -391,6 +578,8 @@ def test_get_task_by_id(
         is_complete=False,
         is_pending=True,
         errors=[],
+        timeline=ANY,
+        resources=ANY,
     )
 
 
@@ -423,8 +612,247 @@ def test_submit_task_inserts_metadata(context_mock: MagicMock):
         is_complete=False,
         is_pending=True,
         errors=[],
+        timeline=ANY,
+        resources=ANY,
+    )
+
+
+@patch("blueapi.service.interface.context")
+def test_submit_bundle(context_mock: MagicMock):
+    context = BlueskyContext()
+    context.register_plan(my_plan)
+    context_mock.return_value = context
+
+    task_id = interface.submit_task(
+        TaskRequest(
+            name="align_and_collect",
+            instrument_session=FAKE_INSTRUMENT_SESSION,
+            steps=[StepRequest(name="my_plan"), StepRequest(name="my_plan")],
+            stop_on_failure=False,
+        )
+    )
+
+    task = interface.get_task_by_id(task_id)
+    assert task is not None
+    assert task.task.steps == [Task(name="my_plan"), Task(name="my_plan")]
+    assert not task.task.stop_on_failure
+    assert [step.name for step in task.steps] == ["my_plan", "my_plan"]
+
+
+@pytest.mark.parametrize(
+    "mode,expected",
+    [
+        (
+            SweepMode.CARTESIAN,
+            [
+                {"base": 0, "x": 1, "y": "a"},
+                {"base": 0, "x": 1, "y": "b"},
+                {"base": 0, "x": 2, "y": "a"},
+                {"base": 0, "x": 2, "y": "b"},
+            ],
+        ),
+        (
+            SweepMode.ZIP,
+            [{"base": 0, "x": 1, "y": "a"}, {"base": 0, "x": 2, "y": "b"}],
+        ),
+    ],
+)
+def test_sweep_points(mode: SweepMode, expected: list[dict[str, Any]]):
+    sweep = SweepRequest(
+        name="my_plan",
+        params={"base": 0, "x": 0},
+        sweep={"x": [1, 2], "y": ["a", "b"]},
+        mode=mode,
+        instrument_session=FAKE_INSTRUMENT_SESSION,
+    )
+    assert sweep.points() == expected
+
+
+@pytest.mark.parametrize(
+    "sweep,mode",
+    [
+        ({}, SweepMode.CARTESIAN),
+        ({"x": []}, SweepMode.CARTESIAN),
+        ({"x": [1, 2], "y": [1]}, SweepMode.ZIP),
+    ],
+)
+def test_invalid_sweeps_rejected(sweep: dict[str, list[Any]], mode: SweepMode):
+    with pytest.raises(ValidationError):
+        SweepRequest(
+            name="my_plan",
+            sweep=sweep,
+            mode=mode,
+            instrument_session=FAKE_INSTRUMENT_SESSION,
+        )
+
+
+@pytest.mark.parametrize(
+    "sweep,mode,num_points",
+    [
+        ({"x": [1, 2, 3], "y": ["a", "b"]}, SweepMode.CARTESIAN, 6),
+        ({"x": [1, 2, 3], "y": ["a", "b", "c"]}, SweepMode.ZIP, 3),
+    ],
+)
+def test_sweep_num_points(
+    sweep: dict[str, list[Any]], mode: SweepMode, num_points: int
+):
+    sweep_request = SweepRequest(
+        name="my_plan",
+        sweep=sweep,
+        mode=mode,
+        instrument_session=FAKE_INSTRUMENT_SESSION,
+    )
+    assert sweep_request.num_points() == num_points
+    assert len(sweep_request.points()) == num_points
+
+
+def test_sweep_with_too_many_points_rejected():
+    with pytest.raises(ValidationError, match="more than the maximum of 10000"):
+        SweepRequest(
+            name="my_plan",
+            sweep={"x": list(range(101)), "y": list(range(100))},
+            instrument_session=FAKE_INSTRUMENT_SESSION,
+        )
+
+
+@patch("blueapi.service.interface.context")
+@patch("blueapi.service.interface.worker")
+def test_submit_sweep_queues_a_task_per_point(worker: MagicMock, context: MagicMock):
+    context().tiled_conf = None
+    worker().submit_task.side_effect = ["a", "b", "c"]
+
+    response = interface.submit_sweep(
+        SweepRequest(
+            name="my_second_plan",
+            sweep={"repeats": [1, 2, 3]},
+            instrument_session=FAKE_INSTRUMENT_SESSION,
+            priority=2,
+        ),
+        {"user": "alice"},
     )
 
+    assert response.task_ids == ["a", "b", "c"]
+    tasks = [call.args[0] for call in worker().submit_task.call_args_list]
+    assert [task.params for task in tasks] == [
+        {"repeats": 1},
+        {"repeats": 2},
+        {"repeats": 3},
+    ]
+    assert [task.metadata["sweep_index"] for task in tasks] == [0, 1, 2]
+    assert {task.metadata["sweep_id"] for task in tasks} == {response.sweep_id}
+    assert all(task.metadata["user"] == "alice" for task in tasks)
+    assert all(task.priority == 2 for task in tasks)
+    assert [call.args[0] for call in worker().enqueue_task.call_args_list] == [
+        "a",
+        "b",
+        "c",
+    ]
+
+
+@patch("blueapi.service.interface.context")
+@patch("blueapi.service.interface.worker")
+def test_submit_sweep_that_cannot_be_queued_queues_nothing(
+    worker: MagicMock, context: MagicMock
+):
+    context().tiled_conf = None
+    worker().submit_task.side_effect = ["a", "b", "c"]
+    worker().enqueue_task.side_effect = [None, None, ValueError("Queue is full")]
+
+    with pytest.raises(ValueError, match="Queue is full"):
+        interface.submit_sweep(
+            SweepRequest(
+                name="my_second_plan",
+                sweep={"repeats": [1, 2, 3]},
+                instrument_session=FAKE_INSTRUMENT_SESSION,
+            )
+        )
+
+    assert [call.args[0] for call in worker().dequeue_task.call_args_list] == [
+        "a",
+        "b",
+    ]
+    assert [call.args[0] for call in worker().clear_task.call_args_list] == [
+        "a",
+        "b",
+        "c",
+    ]
+    assert interface._QUEUED_TASK_HEADERS == {}
+
+
+@patch("blueapi.service.interface.context")
+def test_submit_sweep_with_an_invalid_point_queues_nothing(context_mock: MagicMock):
+    context = BlueskyContext()
+    context.register_plan(my_second_plan)
+    context_mock.return_value = context
+    before = len(interface.get_tasks())
+
+    with pytest.raises(ValidationError):
+        interface.submit_sweep(
+            SweepRequest(
+                name="my_second_plan",
+                sweep={"repeats": [1, "many"]},
+                instrument_session=FAKE_INSTRUMENT_SESSION,
+            )
+        )
+
+    assert len(interface.get_tasks()) == before
+    assert interface.get_queue() == []
+
+
+@patch("blueapi.service.interface.TiledWriter")
+@patch("blueapi.service.interface.from_uri")
+@patch("blueapi.service.interface.context")
+@patch("blueapi.service.interface.worker")
+def test_staged_tiled_writer_used_when_task_starts(worker, context, from_uri, writer):
+    context().numtracker = None
+    context().tiled_conf = TiledConfig(authentication="foo")
+    worker().stage_next_task.return_value = TrackableTask(
+        task_id="next", task=Task(name="sleep")
+    )
+    staged, built = MagicMock(), MagicMock()
+    writer.side_effect = [staged, built]
+    headers = {"Authorization": "Bearer token"}
+    interface._QUEUED_TASK_HEADERS["next"] = headers
+
+    interface._prepare_next_task()
+    # Already staged, so not built again
+    interface._prepare_next_task()
+
+    from_uri.assert_called_once_with(
+        "http://localhost:8407/", api_key="foo", headers=headers
+    )
+    interface._subscribe_task_sinks("next", headers)
+    write = worker().data_events.subscribe.call_args.args[0]
+    write(DataEvent(name="start", task_id="next", doc={}), None)
+    staged.assert_called_once_with("start", {})
+    interface._subscribe_task_sinks("other", headers)
+    write = worker().data_events.subscribe.call_args.args[0]
+    write(DataEvent(name="start", task_id="other", doc={}), None)
+    built.assert_called_once_with("start", {})
+    interface._QUEUED_TASK_HEADERS.clear()
+
+
+@patch("blueapi.service.interface._staging_executor")
+@patch("blueapi.service.interface.worker")
+def test_next_task_staged_when_queued_if_lookahead_enabled(worker, executor):
+    interface.set_config(
+        ApplicationConfig(
+            env=EnvironmentConfig(scheduling=SchedulingConfig(lookahead=True))
+        )
+    )
+    interface.enqueue_task(WorkerTask(task_id="foo"))
+    executor().submit.assert_called_once_with(interface._prepare_next_task)
+    interface._QUEUED_TASK_HEADERS.clear()
+
+
+@patch("blueapi.service.interface._staging_executor")
+@patch("blueapi.service.interface.worker")
+def test_next_task_not_staged_without_lookahead(worker, executor):
+    interface.set_config(ApplicationConfig())
+    interface.enqueue_task(WorkerTask(task_id="foo"))
+    executor().submit.assert_not_called()
+    interface._QUEUED_TASK_HEADERS.clear()
+
 
 @patch("blueapi.service.interface.TiledWriter")
 @patch("blueapi.service.interface.from_uri")
@@ -434,13 +862,18 @@ def test_remove_tiled_subscriber(worker, context, from_uri, writer):
     task = WorkerTask(task_id="foo_bar")
     context().numtracker = None
     context().tiled_conf = TiledConfig()
-    context().run_engine.subscribe.return_value = 17
+    worker().data_events.subscribe.return_value = 17
     worker().worker_events.subscribe.return_value = 42
 
     interface.begin_task(task)
 
     writer.assert_called_once_with(from_uri(), batch_size=1)
-    context().run_engine.subscribe.assert_called_once_with(writer())
+    worker().data_events.subscribe.assert_called_once()
+    write = worker().data_events.subscribe.call_args.args[0]
+    write(DataEvent(name="start", task_id="other", doc={}), None)
+    writer().assert_not_called()
+    write(DataEvent(name="start", task_id="foo_bar", doc={}), None)
+    writer().assert_called_once_with("start", {})
     worker().worker_events.subscribe.assert_called_once()
 
     inner_callback = worker().worker_events.subscribe.call_args.args[0]
@@ -457,7 +890,7 @@ def test_remove_tiled_subscriber(worker, context, from_uri, writer):
         ),
         "c_id",
     )
-    context().run_engine.unsubscribe.assert_not_called()
+    worker().data_events.unsubscribe.assert_not_called()
     worker().worker_events.unsubscribe.assert_not_called()
 
     inner_callback(
@@ -472,7 +905,7 @@ def test_remove_tiled_subscriber(worker, context, from_uri, writer):
         ),
         "c_id",
     )
-    context().run_engine.unsubscribe.assert_called_once_with(17)
+    worker().data_events.unsubscribe.assert_called_once_with(17)
     worker().worker_events.unsubscribe.assert_called_once_with(42)
 
 
@@ -483,7 +916,7 @@ def test_get_oidc_config(oidc_config: OIDCConfig):
 
 def test_stomp_config(mock_stomp_client: StompClient):
     with patch(
-        "blueapi.service.interface.StompClient.for_broker",
+        "blueapi.service.interface.StompClient",
         return_value=mock_stomp_client,
     ):
         interface.set_config(ApplicationConfig(stomp=StompConfig(enabled=True)))
@@ -492,7 +925,7 @@ def test_stomp_config(mock_stomp_client: StompClient):
 
 def test_stomp_config_makes_no_client_when_disabled(mock_stomp_client: StompClient):
     with patch(
-        "blueapi.service.interface.StompClient.for_broker",
+        "blueapi.service.interface.StompClient",
         return_value=mock_stomp_client,
     ):
         interface.set_config(ApplicationConfig(stomp=StompConfig(enabled=False)))
@@ -573,8 +1006,11 @@ async def test_headers_are_cleared(mock_post):
     interface.set_config(conf)
     headers = {"foo": "bar"}
 
-    interface.begin_task(task=WorkerTask(task_id=None), pass_through_headers=headers)
+    with patch("blueapi.service.interface.TaskWorker.begin_task"):
+        interface.begin_task(WorkerTask(task_id="foo"), pass_through_headers=headers)
     ctx = interface.context()
+    # As the worker does when the task starts
+    ctx.use_scans_of(ctx.run_engine, "foo")
     assert ctx.run_engine.scan_id_source is not None
     scan_id = ctx.run_engine.scan_id_source(
         {"instrument_session": "cm12345-1", "instrument": "p46"}
@@ -583,7 +1019,8 @@ async def test_headers_are_cleared(mock_post):
     mock_post.assert_called_once()
     assert mock_post.call_args.kwargs["headers"] == headers
 
-    interface.begin_task(task=WorkerTask(task_id=None))
+    # As the worker does when the task finishes
+    ctx.release_scan("foo")
     scan_id = ctx.run_engine.scan_id_source(
         {"instrument_session": "cm12345-1", "instrument": "p46"}
     )
@@ -621,17 +1058,14 @@ async def test_numtracker_create_scan_called_with_arguments_from_metadata(
     interface.set_config(conf)
     ctx = interface.context()
 
-    headers = {"a": "b"}
-
     assert ctx.numtracker is not None
     assert ctx.run_engine.scan_id_source is not None
 
-    ctx.numtracker.set_headers(headers)
     ctx.run_engine.md["instrument_session"] = "ab123"
     scan_id = ctx.run_engine.scan_id_source(ctx.run_engine.md)
     assert isawaitable(scan_id) and await scan_id
 
-    mock_create_scan.assert_called_once_with("ab123", "p46")
+    mock_create_scan.assert_called_once_with("ab123", "p46", None)
 
 
 async def test_update_scan_num_side_effect_sets_data_session_directory_in_re_md(
@@ -689,10 +1123,106 @@ async def test_update_scan_num_side_effect_sets_scan_file_in_re_md(
     assert ctx.run_engine.md["scan_file"] == "p46-11"
 
 
+def test_reserved_scan_used_by_first_run_of_its_task(
+    httpx_mock: HTTPXMock, nt_query, nt_response
+):
+    nt_url = "https://numtracker-example.com/graphql"
+    httpx_mock.add_response(
+        method="POST",
+        url=nt_url,
+        match_json=nt_query,
+        json=nt_response,
+        is_reusable=True,
+    )
+    conf = ApplicationConfig(
+        env=EnvironmentConfig(metadata=MetadataConfig(instrument="p46")),
+        numtracker=NumtrackerConfig(url=HttpUrl(nt_url)),
+    )
+    interface.setup(conf)
+    ctx = interface.context()
+
+    ctx.reserve_scan("foo", "ab123", {"a": "b"})
+    # Already reserved, so not created again
+    ctx.reserve_scan("foo", "ab123", {"a": "b"})
+    [request] = httpx_mock.get_requests()
+    assert request.headers["a"] == "b"
+
+    run_engine = RunEngine(context_managers=[], call_returns_result=True)
+    run_engine.md.update(ctx.run_engine.md, instrument_session="ab123")
+    # Runs of other tasks create their own scans
+    ctx.use_scans_of(run_engine, "bar")
+    assert _next_scan_id(run_engine) == 11
+    assert len(httpx_mock.get_requests()) == 2
+
+    ctx.use_scans_of(run_engine, "foo")
+    assert _next_scan_id(run_engine) == 11
+    assert run_engine.md["scan_file"] == "p46-11"
+    assert len(httpx_mock.get_requests()) == 2
+    # Only the first run of the task uses the reservation
+    assert _next_scan_id(run_engine) == 11
+    assert len(httpx_mock.get_requests()) == 3
+
+
+def test_released_scan_not_used(httpx_mock: HTTPXMock, nt_query, nt_response):
+    nt_url = "https://numtracker-example.com/graphql"
+    httpx_mock.add_response(
+        method="POST",
+        url=nt_url,
+        match_json=nt_query,
+        json=nt_response,
+        is_reusable=True,
+    )
+    conf = ApplicationConfig(
+        env=EnvironmentConfig(metadata=MetadataConfig(instrument="p46")),
+        numtracker=NumtrackerConfig(url=HttpUrl(nt_url)),
+    )
+    interface.setup(conf)
+    ctx = interface.context()
+
+    ctx.reserve_scan("foo", "ab123")
+    ctx.release_scan("foo")
+    assert ctx._reserved_scans == {}
+
+
+def _next_scan_id(run_engine: RunEngine) -> int:
+    assert run_engine.scan_id_source is not None
+    scan_id = run_engine.scan_id_source(run_engine.md)
+    assert isawaitable(scan_id)
+    return asyncio.run(_awaited(scan_id))
+
+
+async def _awaited(awaitable: Awaitable[Any]) -> Any:
+    return await awaitable
+
+
+def test_scan_not_reserved_without_numtracker():
+    interface.set_config(ApplicationConfig())
+    ctx = interface.context()
+    ctx.reserve_scan("foo", "ab123")
+    assert ctx._reserved_scans == {}
+
+
+@patch("blueapi.service.interface.context")
+@patch("blueapi.service.interface.worker")
+def test_scan_reserved_for_session_of_next_task(worker, context):
+    context().tiled_conf = None
+    worker().stage_next_task.return_value = TrackableTask(
+        task_id="next",
+        task=Task(name="sleep", metadata={"instrument_session": "cm12345-1"}),
+    )
+    headers = {"Authorization": "Bearer token"}
+    interface._QUEUED_TASK_HEADERS["next"] = headers
+
+    interface._prepare_next_task()
+
+    context().reserve_scan.assert_called_once_with("next", "cm12345-1", headers)
+    interface._QUEUED_TASK_HEADERS.clear()
+
+
 @patch("blueapi.service.interface.worker")
 def test_pipe_events(mock_worker: Mock):
     worker = mock_worker()
-    tx = Mock(spec=PipeConnection)
+    rx, tx = Pipe(duplex=False)
 
     interface.pipe_events(tx)
 
@@ -702,24 +1232,38 @@ def test_pipe_events(mock_worker: Mock):
 
     handler = worker.worker_events.subscribe.call_args[0][0]
 
-    evt = Mock()
+    evt = DataEvent(name="start", doc={}, task_id="foo")
     handler(evt, "ignored correlation id")
-    tx.send.assert_called_once_with(evt)
+    serialized = rx.recv_bytes()
+    assert pickle.loads(serialized) == evt
+    worker.account_published.assert_not_called()
+
+    done = WorkerEvent(
+        state=WorkerState.IDLE,
+        task_status=TaskStatus(
+            task_id="foo", task_complete=True, task_failed=False, result=None
+        ),
+    )
+    handler(done, "ignored correlation id")
+    worker.account_published.assert_called_once_with(
+        "foo", "pipe", len(serialized) + len(rx.recv_bytes())
+    )
 
 
 @patch("blueapi.service.interface.worker")
 def test_pipe_events_ignores_broken_pipe(mock_worker: Mock):
     worker = mock_worker()
-    tx = Mock(spec=PipeConnection)
+    rx, tx = Pipe(duplex=False)
 
     interface.pipe_events(tx)
 
     worker.worker_events.subscribe.assert_called_once()
     handler = worker.worker_events.subscribe.call_args[0][0]
 
-    tx.send.side_effect = BrokenPipeError()
+    rx.close()
     # ensure that exceptions are not raised
-    handler(Mock(), "ignored correlation id")
+    handler(DataEvent(name="start", doc={}, task_id="foo"), "ignored correlation id")
+    worker.account_published.assert_not_called()
 
 
 @patch("blueapi.service.interface.worker")
@@ -2,8 +2,10 @@ import contextlib
 import uuid
 from collections.abc import AsyncIterator, Iterator
 from dataclasses import dataclass
+from datetime import UTC, datetime
+from pathlib import Path
 from typing import Any, cast
-from unittest.mock import MagicMock, Mock, patch
+from unittest.mock import ANY, MagicMock, Mock, patch
 
 import jwt
 import pytest
@@ -18,6 +20,7 @@ from starlette.testclient import WebSocketDenialResponse
 from starlette.types import Message, Receive, Scope, Send
 
 from blueapi.config import (
+    AdmissionConfig,
     ApplicationConfig,
     CORSConfig,
     OIDCConfig,
@@ -38,17 +41,54 @@ from blueapi.service.model import (
     DeviceModel,
     EnvironmentResponse,
     PackageInfo,
+    PartialTask,
+    PartialTrackableTask,
+    PartyQueueStats,
     PlanModel,
+    PriorityQueueStats,
     PythonEnvironmentResponse,
+    QueueStatsResponse,
+    QueueWaitTimes,
     SourceInfo,
     StateChangeRequest,
+    SweepRequest,
+    SweepResponse,
+    TaskField,
+    TaskQuery,
     TaskRequest,
     WorkerTask,
 )
 from blueapi.service.runner import WorkerDispatcher
-from blueapi.worker.event import TaskStatus, WorkerEvent, WorkerState
+from blueapi.worker.event import (
+    TaskError,
+    TaskResult,
+    TaskStatus,
+    TaskStatusEnum,
+    WorkerEvent,
+    WorkerState,
+)
+from blueapi.worker.profiling import CommandProfile, TaskProfile
 from blueapi.worker.task import Task
-from blueapi.worker.task_worker import TrackableTask
+from blueapi.worker.task_worker import TaskTimeline, TrackableTask
+
+EMPTY_TIMELINE = {
+    "submitted": None,
+    "validated": None,
+    "dispatched": None,
+    "run_engine_started": None,
+    "first_document": None,
+    "last_document": None,
+    "completed": None,
+}
+
+EMPTY_RESOURCES = {
+    "cpu_time": 0.0,
+    "peak_rss_increase": 0,
+    "gc_pause_time": 0.0,
+    "documents": {},
+    "published_bytes": {},
+    "progress_updates": 0,
+}
 
 
 class MockCountModel(BaseModel): ...
@@ -144,6 +184,17 @@ def client_with_cors(
         main.teardown_runner()
 
 
+@pytest.fixture
+def client_with_admission(mock_runner: Mock) -> Iterator[TestClient]:
+    admission = AdmissionConfig(user_rate=1 / 60, burst=2, max_pending_per_user=2)
+    with patch("blueapi.service.interface.worker"):
+        main.setup_runner(runner=mock_runner)
+        yield TestClient(
+            main.get_app(ApplicationConfig(api=RestConfig(admission=admission)))
+        )
+        main.teardown_runner()
+
+
 @dataclass
 class MinimalDevice(Stoppable):
     name: str
@@ -404,7 +455,9 @@ def test_get_tasks(mock_runner: Mock, client: TestClient) -> None:
         ),
     ]
 
-    mock_runner.run.return_value = tasks
+    mock_runner.run.return_value = interface.TaskPage(
+        tasks=[task.model_dump(mode="json") for task in tasks], next_cursor=None
+    )
 
     response = client.get("/tasks")
     assert response.status_code == status.HTTP_200_OK
@@ -420,8 +473,15 @@ def test_get_tasks(mock_runner: Mock, client: TestClient) -> None:
                     "name": "sleep",
                     "params": {"time": 0.0},
                     "metadata": {},
+                    "priority": 0,
+                    "steps": [],
+                    "stop_on_failure": True,
                 },
                 "outcome": None,
+                "timeline": EMPTY_TIMELINE,
+                "resources": EMPTY_RESOURCES,
+                "steps": [],
+                "estimate": None,
                 "task_id": "0",
             },
             {
@@ -433,70 +493,156 @@ def test_get_tasks(mock_runner: Mock, client: TestClient) -> None:
                     "name": "first_task",
                     "params": {},
                     "metadata": {},
+                    "priority": 0,
+                    "steps": [],
+                    "stop_on_failure": True,
                 },
                 "outcome": None,
+                "timeline": EMPTY_TIMELINE,
+                "resources": EMPTY_RESOURCES,
+                "steps": [],
+                "estimate": None,
                 "task_id": "1",
             },
-        ]
+        ],
+        "next_cursor": None,
     }
+    mock_runner.run.assert_called_once_with(interface.get_task_page, TaskQuery())
 
 
 def test_get_tasks_by_status(mock_runner: Mock, client: TestClient) -> None:
-    tasks = [
-        TrackableTask(
-            task_id="3",
-            task=Task(name="third_task"),
-            is_complete=True,
-            is_pending=False,
+    mock_runner.run.return_value = interface.TaskPage(tasks=[], next_cursor=None)
+
+    response = client.get("/tasks", params={"task_status": "PENDING"})
+
+    assert response.json() == {"tasks": [], "next_cursor": None}
+    mock_runner.run.assert_called_once_with(
+        interface.get_task_page, TaskQuery(task_status=TaskStatusEnum.PENDING)
+    )
+
+
+def test_get_tasks_with_filters(mock_runner: Mock, client: TestClient) -> None:
+    mock_runner.run.return_value = interface.TaskPage(tasks=[], next_cursor=None)
+
+    response = client.get(
+        "/api/v1/tasks",
+        params={
+            "plan": "sleep",
+            "instrument_session": "cm12345-1",
+            "user": "jd1",
+            "submitted_after": "2025-01-01T00:00:00",
+            "submitted_before": "2025-01-02T00:00:00+01:00",
+        },
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    mock_runner.run.assert_called_once_with(
+        interface.get_task_page,
+        TaskQuery(
+            plan="sleep",
+            instrument_session="cm12345-1",
+            user="jd1",
+            submitted_after=datetime(2025, 1, 1, tzinfo=UTC),
+            submitted_before=datetime(2025, 1, 1, 23, tzinfo=UTC),
         ),
-    ]
+    )
 
-    mock_runner.run.return_value = tasks
 
-    response = client.get("/tasks", params={"task_status": "PENDING"})
+def test_get_tasks_paginated_with_fields(mock_runner: Mock, client: TestClient) -> None:
+    mock_runner.run.return_value = interface.TaskPage(
+        tasks=[{"task_id": "0", "is_complete": True}], next_cursor=3
+    )
+
+    response = client.get(
+        "/api/v1/tasks",
+        params={"limit": 1, "after": 2, "fields": ["task_id", "is_complete"]},
+    )
+
+    assert response.status_code == status.HTTP_200_OK
     assert response.json() == {
-        "tasks": [
-            {
-                "errors": [],
-                "is_complete": True,
-                "is_pending": False,
-                "request_id": None,
-                "task": {
-                    "name": "third_task",
-                    "params": {},
-                    "metadata": {},
-                },
-                "outcome": None,
-                "task_id": "3",
-            }
-        ]
+        "tasks": [{"task_id": "0", "is_complete": True}],
+        "next_cursor": 3,
+    }
+    mock_runner.run.assert_called_once_with(
+        interface.get_task_page,
+        TaskQuery(limit=1, after=2, fields=[TaskField.TASK_ID, TaskField.IS_COMPLETE]),
+    )
+
+
+def test_get_tasks_documents_partial_tasks(client: TestClient) -> None:
+    schema = client.get("/openapi.json").json()
+    response = schema["paths"]["/api/v1/tasks"]["get"]["responses"]["200"]
+    assert response["content"]["application/json"]["schema"] == {
+        "$ref": "#/components/schemas/TaskPageResponse"
     }
+    # Any field may be left out of a projected task
+    components = schema["components"]["schemas"]
+    assert "required" not in components["PartialTrackableTask"]
+    assert "required" not in components["PartialTask"]
+
+
+@pytest.mark.parametrize("field", list(TaskField))
+def test_every_task_field_is_documented(field: TaskField) -> None:
+    name, _, nested = field.partition(".")
+    assert name in PartialTrackableTask.model_fields
+    assert not nested or nested in PartialTask.model_fields
 
 
-def test_get_tasks_by_invalid_status(client: TestClient) -> None:
-    response = client.get("/tasks", params={"task_status": "AN_INVALID_STATUS"})
+@pytest.mark.parametrize(
+    "params",
+    [
+        {"task_status": "AN_INVALID_STATUS"},
+        {"limit": 0},
+        {"fields": "not_a_field"},
+        {"submitted_after": "yesterday"},
+    ],
+)
+def test_get_tasks_with_invalid_query(
+    mock_runner: Mock, client: TestClient, params: dict[str, Any]
+) -> None:
+    response = client.get("/tasks", params=params)
     assert response.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
+    mock_runner.run.assert_not_called()
 
 
-@pytest.mark.parametrize("admin,task_ids", [(True, ["foo", "bar"]), (False, ["foo"])])
+@pytest.mark.parametrize(
+    "admin,user,expected_user",
+    [(True, None, None), (True, "jd2", "jd2"), (False, None, "jd1")],
+)
 def test_get_tasks_filters_by_user(
     mock_runner: Mock,
     client_with_opa: TestClient,
     access_token: str,
     mock_opa_client: Mock,
     admin: bool,
-    task_ids: list[str],
+    user: str | None,
+    expected_user: str | None,
 ):
-
-    mock_runner.run.return_value = [
-        TrackableTask(task_id="foo", task=Task(name="f1", metadata={"user": "jd1"})),
-        TrackableTask(task_id="bar", task=Task(name="f2", metadata={"user": "jd2"})),
-    ]
+    mock_runner.run.return_value = interface.TaskPage(tasks=[], next_cursor=None)
     mock_opa_client.admin.return_value = admin
     client_with_opa.headers["Authorization"] = f"Bearer {access_token}"
-    tasks = client_with_opa.get("/tasks").json().get("tasks")
+    params = {"user": user} if user else {}
+
+    client_with_opa.get("/tasks", params=params)
 
-    assert [t["task_id"] for t in tasks] == task_ids
+    mock_runner.run.assert_called_once_with(
+        interface.get_task_page, TaskQuery(user=expected_user)
+    )
+
+
+def test_get_other_users_tasks_returns_nothing(
+    mock_runner: Mock,
+    client_with_opa: TestClient,
+    access_token: str,
+    mock_opa_client: Mock,
+):
+    mock_opa_client.admin.return_value = False
+    client_with_opa.headers["Authorization"] = f"Bearer {access_token}"
+
+    response = client_with_opa.get("/tasks", params={"user": "jd2"})
+
+    assert response.json() == {"tasks": [], "next_cursor": None}
+    mock_runner.run.assert_not_called()
 
 
 def test_delete_submitted_task(mock_runner: Mock, client: TestClient) -> None:
@@ -514,9 +660,7 @@ def test_cant_delete_other_users_task(
 ):
     mock_opa_client.admin.return_value = False
     mock_runner.run.side_effect = lambda mth, *args: {
-        interface.get_task_by_id: TrackableTask(
-            task_id="bar", task=Task(name="t2", metadata={"user": "jd2"})
-        ),
+        interface.get_task_owner: "jd2",
     }[mth]
     client_with_opa.headers["Authorization"] = f"Bearer {access_token}"
 
@@ -593,9 +737,7 @@ def test_set_other_users_task_active(
     client_with_opa.headers["Authorization"] = f"Bearer {access_token}"
 
     mock_runner.run.side_effect = lambda mth, *a, **kw: {
-        interface.get_task_by_id: TrackableTask(
-            task_id="foo", task=Task(name="bar", metadata={"user": "jd2"})
-        ),
+        interface.get_task_owner: "jd2",
         interface.get_active_task: None,
         interface.begin_task: None,
     }[mth]
@@ -605,6 +747,282 @@ def test_set_other_users_task_active(
     assert resp.status_code == status
 
 
+def test_get_queue(mock_runner: Mock, client: TestClient) -> None:
+    mock_runner.run.return_value = [
+        TrackableTask(task_id="foo", task=Task(name="first")),
+        TrackableTask(task_id="bar", task=Task(name="second")),
+    ]
+
+    response = client.get("/api/v1/queue")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert [t["task_id"] for t in response.json()["tasks"]] == ["foo", "bar"]
+    mock_runner.run.assert_called_once_with(interface.get_queue)
+
+
+def _party_stats(user: str) -> PartyQueueStats:
+    return PartyQueueStats(
+        instrument_session="cm12345-1",
+        user=user,
+        weight=1.0,
+        queued=1,
+        run_time=2.0,
+        share=0.5,
+        waits=QueueWaitTimes(count=1, mean=3.0, max=3.0),
+    )
+
+
+def test_get_queue_stats(mock_runner: Mock, client: TestClient) -> None:
+    stats = QueueStatsResponse(
+        priorities=[
+            PriorityQueueStats(
+                priority=0, waits=QueueWaitTimes(count=2, mean=3.0, max=3.0)
+            )
+        ],
+        parties=[_party_stats("jd1"), _party_stats("jd2")],
+    )
+    mock_runner.run.return_value = stats
+
+    response = client.get("/api/v1/queue/stats")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert QueueStatsResponse.model_validate(response.json()) == stats
+    mock_runner.run.assert_called_once_with(interface.get_queue_stats)
+
+
+def test_get_queue_stats_only_shows_own_share(
+    mock_runner: Mock,
+    client_with_opa: TestClient,
+    access_token: str,
+    mock_opa_client: Mock,
+) -> None:
+    mock_opa_client.admin.return_value = False
+    mock_runner.run.return_value = QueueStatsResponse(
+        priorities=[], parties=[_party_stats("jd1"), _party_stats("jd2")]
+    )
+    client_with_opa.headers["Authorization"] = f"Bearer {access_token}"
+
+    response = client_with_opa.get("/api/v1/queue/stats")
+
+    assert [party["user"] for party in response.json()["parties"]] == ["jd1"]
+
+
+def test_enqueue_task(mock_runner: Mock, client: TestClient) -> None:
+    task = WorkerTask(task_id="foo")
+    mock_runner.run.side_effect = lambda mth, *a, **kw: {
+        interface.get_task_owner: None,
+        interface.enqueue_task: task,
+    }[mth]
+
+    response = client.post("/api/v1/queue", json=task.model_dump())
+
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    assert response.json() == {"task_id": "foo"}
+    mock_runner.run.assert_called_with(
+        interface.enqueue_task, task=task, pass_through_headers={}
+    )
+
+
+def test_enqueue_task_conflict(mock_runner: Mock, client: TestClient) -> None:
+    def run(mth, *args, **kwargs):
+        if mth is interface.enqueue_task:
+            raise ValueError("Task foo is already queued")
+        return TrackableTask(task_id="foo", task=Task(name="f"))
+
+    mock_runner.run.side_effect = run
+
+    response = client.post("/api/v1/queue", json={"task_id": "foo"})
+
+    assert response.status_code == status.HTTP_409_CONFLICT
+    assert response.json() == {"detail": "Task foo is already queued"}
+
+
+def test_submit_sweep(mock_runner: Mock, client: TestClient) -> None:
+    sweep = SweepRequest(
+        name="count",
+        params={"detectors": ["x"]},
+        sweep={"num": [1, 2]},
+        instrument_session=FAKE_INSTRUMENT_SESSION,
+    )
+    mock_runner.run.return_value = SweepResponse(sweep_id="abc", task_ids=["a", "b"])
+
+    response = client.post("/api/v1/queue/sweep", json=sweep.model_dump())
+
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    assert response.json() == {"sweep_id": "abc", "task_ids": ["a", "b"]}
+    mock_runner.run.assert_called_once_with(
+        interface.submit_sweep, sweep, {"user": None}, {}
+    )
+
+
+def test_submit_task_over_rate_limit(
+    mock_runner: Mock, client_with_admission: TestClient
+) -> None:
+    mock_runner.run.return_value = "task_id"
+    for _ in range(2):
+        response = client_with_admission.post(
+            "/api/v1/tasks", json=SUBMIT_REQUEST["task"]
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+
+    response = client_with_admission.post("/api/v1/tasks", json=SUBMIT_REQUEST["task"])
+
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert 55 <= int(response.headers["Retry-After"]) <= 60
+    assert mock_runner.run.call_count == 2
+
+
+def test_submit_task_validation_error_not_charged(
+    mock_runner: Mock, client_with_admission: TestClient
+) -> None:
+    invalid = ValidationError.from_exception_data(
+        title="ValueError",
+        line_errors=[InitErrorDetails(type="missing", loc=("id",))],  # type: ignore
+    )
+    mock_runner.run.side_effect = [invalid, invalid, "a", "b"]
+    for _ in range(2):
+        response = client_with_admission.post(
+            "/api/v1/tasks", json=SUBMIT_REQUEST["task"]
+        )
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
+
+    # Neither the rate nor the pending limit counts the invalid tasks
+    for _ in range(2):
+        response = client_with_admission.post(
+            "/api/v1/tasks", json=SUBMIT_REQUEST["task"]
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+    assert mock_runner.run.call_count == 4
+
+
+def test_submit_sweep_over_pending_limit(
+    mock_runner: Mock, client_with_admission: TestClient
+) -> None:
+    mock_runner.run.return_value = 0
+
+    response = client_with_admission.post(
+        "/api/v1/queue/sweep",
+        json={
+            "name": "count",
+            "sweep": {"num": [1, 2, 3]},
+            "instrument_session": FAKE_INSTRUMENT_SESSION,
+        },
+    )
+
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert response.headers["Retry-After"] == "1"
+    mock_runner.run.assert_called_once_with(interface.count_pending_tasks, None)
+
+
+def test_submit_sweep_with_mismatched_zip(mock_runner: Mock, client: TestClient):
+    response = client.post(
+        "/api/v1/queue/sweep",
+        json={
+            "name": "count",
+            "sweep": {"num": [1, 2], "delay": [0.1]},
+            "mode": "zip",
+            "instrument_session": FAKE_INSTRUMENT_SESSION,
+        },
+    )
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
+    mock_runner.run.assert_not_called()
+
+
+def test_submit_sweep_with_too_many_points(mock_runner: Mock, client: TestClient):
+    response = client.post(
+        "/api/v1/queue/sweep",
+        json={
+            "name": "count",
+            "sweep": {"num": list(range(1000)), "delay": list(range(1000))},
+            "instrument_session": FAKE_INSTRUMENT_SESSION,
+        },
+    )
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
+    mock_runner.run.assert_not_called()
+
+
+def test_submit_sweep_validation_error(mock_runner: Mock, client: TestClient):
+    mock_runner.run.side_effect = ValidationError.from_exception_data(
+        title="ValueError",
+        line_errors=[InitErrorDetails(type="missing", loc=("num",))],  # type: ignore
+    )
+
+    response = client.post(
+        "/api/v1/queue/sweep",
+        json={
+            "name": "count",
+            "sweep": {"delay": [0.1, 0.2]},
+            "instrument_session": FAKE_INSTRUMENT_SESSION,
+        },
+    )
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
+    assert response.json()["detail"][0]["loc"] == ["body", "params", "num"]
+
+
+def test_reorder_queue(mock_runner: Mock, client: TestClient) -> None:
+    queue = [
+        TrackableTask(task_id="bar", task=Task(name="second")),
+        TrackableTask(task_id="foo", task=Task(name="first")),
+    ]
+    mock_runner.run.side_effect = lambda mth, *a, **kw: {
+        interface.reorder_queue: ["bar", "foo"],
+        interface.get_queue: queue,
+    }[mth]
+
+    response = client.put("/api/v1/queue", json={"task_ids": ["bar", "foo"]})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert [t["task_id"] for t in response.json()["tasks"]] == ["bar", "foo"]
+    mock_runner.run.assert_any_call(interface.reorder_queue, ["bar", "foo"])
+
+
+def test_reorder_queue_invalid(mock_runner: Mock, client: TestClient) -> None:
+    mock_runner.run.side_effect = ValueError("Not a permutation")
+
+    response = client.put("/api/v1/queue", json={"task_ids": ["bar"]})
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json() == {"detail": "Not a permutation"}
+
+
+def test_reorder_queue_requires_admin(
+    mock_runner: Mock,
+    client_with_opa: TestClient,
+    access_token: str,
+    mock_opa_client: Mock,
+) -> None:
+    mock_opa_client.admin.return_value = False
+    client_with_opa.headers["Authorization"] = f"Bearer {access_token}"
+
+    response = client_with_opa.put("/api/v1/queue", json={"task_ids": []})
+
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    mock_runner.run.assert_not_called()
+
+
+def test_dequeue_task(mock_runner: Mock, client: TestClient) -> None:
+    mock_runner.run.side_effect = lambda mth, *a, **kw: {
+        interface.get_task_owner: None,
+        interface.dequeue_task: "foo",
+    }[mth]
+
+    response = client.delete("/api/v1/queue/foo")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"task_id": "foo"}
+
+
+def test_dequeue_unknown_task(mock_runner: Mock, client: TestClient) -> None:
+    mock_runner.run.side_effect = KeyError("foo")
+
+    response = client.delete("/api/v1/queue/foo")
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
 def test_get_task(mock_runner: Mock, client: TestClient):
     task_id = str(uuid.uuid4())
     task = TrackableTask(
@@ -615,6 +1033,7 @@ def test_get_task(mock_runner: Mock, client: TestClient):
                 "foo": "bar",
             },
         ),
+        timeline=TaskTimeline(submitted=10.0, validated=10.25),
     )
 
     mock_runner.run.return_value = task
@@ -631,12 +1050,151 @@ def test_get_task(mock_runner: Mock, client: TestClient):
             "metadata": {
                 "foo": "bar",
             },
+            "priority": 0,
+            "steps": [],
+            "stop_on_failure": True,
         },
         "outcome": None,
+        "timeline": EMPTY_TIMELINE | {"submitted": 10.0, "validated": 10.25},
+        "resources": EMPTY_RESOURCES,
+        "steps": [],
+        "estimate": None,
         "task_id": f"{task_id}",
     }
 
 
+def test_get_task_profile(mock_runner: Mock, client: TestClient) -> None:
+    profile = TaskProfile(
+        total_time=0.5,
+        bucket_bounds=[0.1],
+        commands={
+            "read": CommandProfile(count=1, total=0.5, max=0.5, histogram=[0, 1])
+        },
+        devices=[],
+    )
+    mock_runner.run.side_effect = lambda mth, *a, **kw: {
+        interface.get_task_owner: None,
+        interface.get_task_profile: profile,
+    }[mth]
+
+    response = client.get("/api/v1/tasks/foo/profile")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert TaskProfile.model_validate(response.json()) == profile
+    mock_runner.run.assert_called_with(interface.get_task_profile, "foo")
+
+
+@pytest.mark.parametrize(
+    "task,status_code,detail",
+    [
+        (None, status.HTTP_404_NOT_FOUND, "Item not found"),
+        (
+            TrackableTask(task_id="foo", task=Task(name="bar")),
+            status.HTTP_409_CONFLICT,
+            "Task foo has not finished, so has no profile yet",
+        ),
+        (
+            TrackableTask(task_id="foo", task=Task(name="bar"), is_complete=True),
+            status.HTTP_404_NOT_FOUND,
+            "Task foo was not profiled",
+        ),
+    ],
+)
+def test_get_task_profile_not_available(
+    mock_runner: Mock,
+    client: TestClient,
+    task: TrackableTask | None,
+    status_code: int,
+    detail: str,
+) -> None:
+    mock_runner.run.side_effect = lambda mth, *a, **kw: {
+        interface.get_task_owner: None,
+        interface.get_task_profile: None,
+        interface.get_task_by_id: task,
+    }[mth]
+
+    response = client.get("/api/v1/tasks/foo/profile")
+
+    assert response.status_code == status_code
+    assert response.json() == {"detail": detail}
+
+
+def test_get_stored_task_result(
+    mock_runner: Mock, client: TestClient, tmp_path: Path
+) -> None:
+    path = tmp_path / "result.json"
+    path.write_bytes(b"[1, 2, 3]")
+    mock_runner.run.side_effect = lambda mth, *a, **kw: {
+        interface.get_task_owner: None,
+        interface.get_stored_result: path,
+    }[mth]
+
+    response = client.get("/api/v1/tasks/foo/result")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == [1, 2, 3]
+    mock_runner.run.assert_called_with(interface.get_stored_result, "foo")
+
+
+def test_get_included_task_result(mock_runner: Mock, client: TestClient) -> None:
+    task = TrackableTask(
+        task_id="foo",
+        task=Task(name="bar"),
+        is_complete=True,
+        outcome=TaskResult(result=42, type="int"),
+    )
+    mock_runner.run.side_effect = lambda mth, *a, **kw: {
+        interface.get_task_owner: None,
+        interface.get_stored_result: None,
+        interface.get_task_by_id: task,
+    }[mth]
+
+    response = client.get("/api/v1/tasks/foo/result")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == 42
+
+
+@pytest.mark.parametrize(
+    "task,status_code,detail",
+    [
+        (None, status.HTTP_404_NOT_FOUND, "Item not found"),
+        (
+            TrackableTask(task_id="foo", task=Task(name="bar")),
+            status.HTTP_409_CONFLICT,
+            "Task foo has not finished, so has no result yet",
+        ),
+        (
+            TrackableTask(
+                task_id="foo",
+                task=Task(name="bar"),
+                is_complete=True,
+                outcome=TaskError(type="ValueError", message="Plan failed"),
+            ),
+            status.HTTP_404_NOT_FOUND,
+            "Task foo failed, so it has no result",
+        ),
+    ],
+)
+def test_get_task_result_without_success(
+    mock_runner: Mock,
+    client: TestClient,
+    task: TrackableTask | None,
+    status_code: int,
+    detail: str,
+) -> None:
+    mock_runner.run.side_effect = lambda mth, *a, **kw: {
+        interface.get_task_owner: None,
+        interface.get_stored_result: None,
+        interface.get_task_by_id: task,
+    }[mth]
+
+    response = client.get("/api/v1/tasks/foo/result")
+
+    assert response.status_code == status_code
+    assert response.json() == {"detail": detail}
+
+
 @pytest.mark.parametrize("admin,status", [(True, 200), (False, 404)])
 def test_get_other_users_task(
     mock_runner: Mock,
@@ -665,7 +1223,9 @@ def test_get_all_tasks(mock_runner: Mock, client: TestClient):
         )
     ]
 
-    mock_runner.run.return_value = tasks
+    mock_runner.run.return_value = interface.TaskPage(
+        tasks=[task.model_dump(mode="json") for task in tasks], next_cursor=None
+    )
     response = client.get("/tasks")
     assert response.status_code == status.HTTP_200_OK
     assert response.json() == {
@@ -676,14 +1236,22 @@ def test_get_all_tasks(mock_runner: Mock, client: TestClient):
                     "name": "third_task",
                     "params": {},
                     "metadata": {},
+                    "priority": 0,
+                    "steps": [],
+                    "stop_on_failure": True,
                 },
                 "is_complete": False,
                 "is_pending": True,
                 "request_id": None,
                 "outcome": None,
+                "timeline": EMPTY_TIMELINE,
+                "resources": EMPTY_RESOURCES,
+                "steps": [],
+                "estimate": None,
                 "errors": [],
             }
-        ]
+        ],
+        "next_cursor": None,
     }
 
 
@@ -825,6 +1393,27 @@ def test_set_state_transition_error(mock_runner: Mock, client: TestClient):
     }
 
 
+def test_set_state_resume_refused(mock_runner: Mock, client: TestClient):
+    mock_runner.run.side_effect = [
+        WorkerState.PAUSED,
+        TrackableTask(task_id="foobar", task=Task(name="foo")),
+        TransitionError("Task foobar is paused for higher priority tasks"),
+    ]
+
+    response = client.put(
+        "/worker/state",
+        json=StateChangeRequest(new_state=WorkerState.RUNNING).model_dump(),
+    )
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json() == {
+        "detail": (
+            f"Error while transitioning from {WorkerState.PAUSED} to "
+            f"{WorkerState.RUNNING} - Task foobar is paused for higher priority tasks"
+        )
+    }
+
+
 def test_set_state_invalid_transition(mock_runner: Mock, client: TestClient):
     current_state = WorkerState.STOPPING
     requested_state = WorkerState.PAUSED
@@ -1076,6 +1665,10 @@ async def test_websocket_run_plan(mock_runner: Mock, client: TestClient):
         assert discon.value.code == 1000
         assert discon.value.reason == ""
 
+    mock_runner.run.assert_any_call(
+        interface.account_published, "task_id", "websocket", ANY
+    )
+
 
 @pytest.mark.parametrize("req", ["not a json object", "[]", '{"invalid": "keys"}'])
 def test_websocket_run_plan_invalid_request(
@@ -1139,6 +1732,39 @@ def test_websocket_run_plan_server_busy(mock_runner: Mock, client: TestClient):
     pass
 
 
+def test_websocket_run_plan_rate_limited(
+    mock_runner: Mock, client_with_admission: TestClient
+):
+    mock_runner.run.return_value = "task_id"
+    for _ in range(2):
+        client_with_admission.post("/api/v1/tasks", json=SUBMIT_REQUEST["task"])
+    with client_with_admission.websocket_connect("/api/v2/run_plan") as ws:
+        ws.send_json(SUBMIT_REQUEST)
+        message = ws.receive_json()
+        assert message["kind"] == "rate_limited"
+        assert message["reason"] == "user_rate"
+        with pytest.raises(WebSocketDisconnect) as disco:
+            ws.receive_text()
+        assert disco.value.code == 1013
+        assert disco.value.reason == "Too many requests"
+    assert mock_runner.run.call_count == 2
+
+
+def test_websocket_run_plan_unknown_plan_not_charged(
+    mock_runner: Mock, client_with_admission: TestClient
+):
+    mock_runner.run.side_effect = [KeyError("my-plan"), KeyError("my-plan"), "a", "b"]
+    for _ in range(2):
+        with client_with_admission.websocket_connect("/api/v2/run_plan") as ws:
+            ws.send_json(SUBMIT_REQUEST)
+            assert ws.receive_json()["kind"] == "plan_not_found"
+    for _ in range(2):
+        response = client_with_admission.post(
+            "/api/v1/tasks", json=SUBMIT_REQUEST["task"]
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+
+
 def test_websocket_run_plan_unrelated_events(mock_runner: Mock, client: TestClient):
     mock_runner.run.side_effect = lambda req, *a, **kw: {
         interface.get_active_task: None,
@@ -1229,7 +1855,10 @@ def test_websocket_run_plan_client_disconnect_cancels(
     with client.websocket_connect("/api/v2/run_plan") as ws:
         ws.send_json(SUBMIT_REQUEST)
     mock_runner.run.assert_called_with(
-        interface.cancel_active_task, failure=True, reason="Client disconnected"
+        interface.cancel_active_task,
+        failure=True,
+        reason="Client disconnected",
+        task_id="task_id",
     )
 
 
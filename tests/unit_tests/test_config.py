@@ -299,10 +299,48 @@ def test_config_yaml_parsed(temp_yaml_config_file):
             "env": {
                 "events": {
                     "broadcast_status_events": True,
+                    "max_progress_rate": None,
+                    "progress_deltas": False,
+                    "progress_snapshot_interval": 10,
+                    "asynchronous_dispatch": False,
+                    "subscriber_queue_size": 1000,
+                    "drop_policy": "block",
+                    "event_page_size": None,
+                    "event_page_max_delay": 0.5,
                 },
+                "retention": {
+                    "max_count": None,
+                    "max_age": None,
+                    "max_bytes": None,
+                    "eviction_interval": 60.0,
+                },
+                "results": {"directory": None, "threshold": 65536},
+                "document_spans": {
+                    "mode": "all",
+                    "event_sample_interval": 100,
+                    "max_attribute_length": 4096,
+                },
+                "scheduling": {
+                    "preemption": False,
+                    "fair_share": False,
+                    "session_weights": {},
+                    "session_quotas": {},
+                    "quota_period": 3600.0,
+                    "lookahead": False,
+                },
+                "watchdog": {
+                    "message_warning": None,
+                    "status_warning": None,
+                    "abort_after": None,
+                    "interval": 1.0,
+                },
+                "estimation": {"enabled": False, "max_messages": 100000},
                 "metadata": {
                     "instrument": "p01",
                 },
+                "parallel_run_engines": 0,
+                "profile_messages": False,
+                "concurrent_sources": 4,
                 "sources": [
                     {"kind": "deviceManager", "module": "dodal.adsim", "mock": True},
                     {"kind": "planFunctions", "module": "dodal.plans"},
@@ -315,6 +353,14 @@ def test_config_yaml_parsed(temp_yaml_config_file):
             "api": {
                 "url": "http://0.0.0.0:8000/",
                 "cors": None,
+                "admission": {
+                    "rate": None,
+                    "user_rate": None,
+                    "burst": 10,
+                    "max_pending_per_user": None,
+                    "refresh_interval": 1.0,
+                    "user_expiry": 3600.0,
+                },
             },
             "logging": {
                 "level": "INFO",
@@ -370,10 +416,50 @@ def test_config_yaml_parsed(temp_yaml_config_file):
                         "module": "dodal.plan_stubs.wrapped",
                     },
                 ],
-                "events": {"broadcast_status_events": True},
+                "events": {
+                    "broadcast_status_events": True,
+                    "max_progress_rate": None,
+                    "progress_deltas": False,
+                    "progress_snapshot_interval": 10,
+                    "asynchronous_dispatch": False,
+                    "subscriber_queue_size": 1000,
+                    "drop_policy": "block",
+                    "event_page_size": None,
+                    "event_page_max_delay": 0.5,
+                },
+                "retention": {
+                    "max_count": None,
+                    "max_age": None,
+                    "max_bytes": None,
+                    "eviction_interval": 60.0,
+                },
+                "results": {"directory": None, "threshold": 65536},
+                "document_spans": {
+                    "mode": "all",
+                    "event_sample_interval": 100,
+                    "max_attribute_length": 4096,
+                },
+                "scheduling": {
+                    "preemption": False,
+                    "fair_share": False,
+                    "session_weights": {},
+                    "session_quotas": {},
+                    "quota_period": 3600.0,
+                    "lookahead": False,
+                },
+                "watchdog": {
+                    "message_warning": None,
+                    "status_warning": None,
+                    "abort_after": None,
+                    "interval": 1.0,
+                },
+                "estimation": {"enabled": False, "max_messages": 100000},
                 "metadata": {
                     "instrument": "p01",
                 },
+                "parallel_run_engines": 0,
+                "profile_messages": False,
+                "concurrent_sources": 4,
             },
             "logging": {
                 "level": "INFO",
@@ -385,6 +471,14 @@ def test_config_yaml_parsed(temp_yaml_config_file):
             "api": {
                 "url": "http://0.0.0.0:8001/",
                 "cors": None,
+                "admission": {
+                    "rate": None,
+                    "user_rate": None,
+                    "burst": 10,
+                    "max_pending_per_user": None,
+                    "refresh_interval": 1.0,
+                    "user_expiry": 3600.0,
+                },
             },
             "numtracker": None,
             "oidc": {
@@ -454,6 +548,8 @@ def test_config_yaml_parsed_complete(temp_yaml_config_file: dict):
                 "metadata": {
                     "instrument": "p01",
                 },
+                "parallel_run_engines": 0,
+                "profile_messages": False,
             },
             "logging": {"level": "INFO"},
             "api": {"host": "0.0.0.0", "port": 8001, "protocol": "http"},
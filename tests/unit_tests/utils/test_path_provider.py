@@ -1,6 +1,10 @@
+import asyncio
+import threading
 from pathlib import PosixPath
 
+import bluesky.plan_stubs as bps
 import pytest
+from bluesky.run_engine import RunEngine
 from event_model import RunStart, RunStop
 from ophyd_async.core import PathInfo
 
@@ -392,3 +396,40 @@ def test_error_if_template_missing(start_doc_1: RunStart):
     pp.run_start("start", start_doc_1)
     with pytest.raises(ValueError, match="detector_file_template"):
         pp("foo")
+
+
+def test_runs_of_another_run_engine_kept_apart():
+    pp = StartDocumentPathProvider()
+    main = RunEngine(context_managers=[])
+    main.subscribe(pp.run_start, "start")
+    main.subscribe(pp.run_stop, "stop")
+    lane = RunEngine(loop=main.loop, context_managers=[])
+    lane_open = threading.Event()
+    paths: dict[str, PathInfo] = {}
+
+    def plan(name: str, wait_for_lane: bool):
+        async def find_path():
+            while wait_for_lane and not lane_open.is_set():
+                await asyncio.sleep(0.01)
+            paths[name] = pp("det")
+            lane_open.set()
+
+        yield from bps.open_run(
+            {"detector_file_template": f"{name}-{{device_name}}", "scan_id": 1}
+        )
+        yield from bps.wait_for([find_path])
+        yield from bps.close_run()
+
+    def run_in_lane():
+        with pp.runs_of(lane):
+            lane(plan("lane", False))
+
+    main_thread = threading.Thread(target=main, args=(plan("main", True),))
+    main_thread.start()
+    run_in_lane()
+    main_thread.join(timeout=10)
+
+    assert paths["main"].filename == "main-det"
+    assert paths["lane"].filename == "lane-det"
+    assert pp._docs == []
+    assert not any(lane.dispatcher.cb_registry.callbacks.values())
@@ -0,0 +1,78 @@
+from typing import Annotated
+from unittest.mock import Mock, call, patch
+
+import pytest
+from pydantic import PydanticSchemaGenerationError, TypeAdapter
+
+from blueapi.utils import TYPE_ADAPTERS, TypeAdapterRegistry, type_adapter
+
+
+def test_adapter_reused_for_same_type():
+    registry = TypeAdapterRegistry()
+    adapter = registry.get(list[int])
+    assert registry.get(list[int]) is adapter
+    assert adapter.validate_python(["1", 2]) == [1, 2]
+
+    stats = registry.stats()
+    assert (stats.hits, stats.misses, stats.size) == (1, 1, 1)
+
+
+@patch("blueapi.utils.type_adapters.LOOKUPS")
+def test_lookups_exported_as_metrics(lookups: Mock):
+    registry = TypeAdapterRegistry()
+    registry.get(int)
+    registry.get(int)
+    registry.get(Annotated[int, []])
+    assert lookups.add.call_args_list == [
+        call(1, {"result": "miss"}),
+        call(1, {"result": "hit"}),
+        call(1, {"result": "miss"}),
+    ]
+
+
+def test_least_recently_used_adapter_discarded():
+    registry = TypeAdapterRegistry(max_size=2)
+    int_adapter = registry.get(int)
+    registry.get(str)
+    registry.get(int)
+    registry.get(float)
+
+    assert registry.get(int) is int_adapter
+    assert registry.stats().size == 2
+    registry.get(str)
+    assert registry.stats().misses == 4
+
+
+def test_unhashable_type_not_cached():
+    registry = TypeAdapterRegistry()
+    target = Annotated[int, []]
+    assert registry.get(target).validate_python("3") == 3
+    assert registry.stats().misses == 1
+    assert registry.stats().size == 0
+
+
+def test_clear_resets_stats():
+    registry = TypeAdapterRegistry()
+    registry.get(int)
+    registry.get(int)
+    registry.clear()
+    stats = registry.stats()
+    assert (stats.hits, stats.misses, stats.size) == (0, 0, 0)
+
+
+def test_schema_errors_propagate():
+    registry = TypeAdapterRegistry()
+
+    class NotPydantic:
+        pass
+
+    with pytest.raises(PydanticSchemaGenerationError):
+        registry.get(NotPydantic)
+    assert registry.stats().size == 0
+
+
+def test_shared_registry():
+    adapter = type_adapter(dict[str, int])
+    assert type_adapter(dict[str, int]) is adapter
+    assert isinstance(adapter, TypeAdapter)
+    assert TYPE_ADAPTERS.get(dict[str, int]) is adapter
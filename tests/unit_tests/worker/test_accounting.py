@@ -0,0 +1,39 @@
+import gc
+
+from blueapi.worker.accounting import GcPauseTimer, peak_rss, take_snapshot
+
+
+def test_gc_pauses_measured_while_installed():
+    timer = GcPauseTimer()
+    gc.collect()
+    assert timer.total == 0.0
+    timer.install()
+    try:
+        gc.collect()
+    finally:
+        timer.uninstall()
+    measured = timer.total
+    assert measured > 0.0
+    gc.collect()
+    assert timer.total == measured
+
+
+def test_install_is_idempotent():
+    timer = GcPauseTimer()
+    timer.install()
+    timer.install()
+    timer.uninstall()
+    assert timer._on_gc not in gc.callbacks
+    timer.uninstall()
+
+
+def test_peak_rss_measured():
+    assert peak_rss() > 0
+
+
+def test_snapshot_includes_gc_pauses():
+    timer = GcPauseTimer()
+    timer._total = 1.5
+    snapshot = take_snapshot(timer)
+    assert snapshot.gc_pause_time == 1.5
+    assert snapshot.cpu_time > 0.0
@@ -0,0 +1,94 @@
+from collections import Counter
+
+import bluesky.plan_stubs as bps
+import bluesky.plans as bp
+import pytest
+from bluesky import Msg
+from bluesky.utils import MsgGenerator
+from ophyd_async.sim import SimMotor
+
+from blueapi.worker.estimation import DryRun, MessageTimer, TimingModel
+from blueapi.worker.message_timing import MessageClock
+
+
+def _timer(model: TimingModel, *times: float) -> MessageClock:
+    clock = iter(times)
+    return MessageClock([MessageTimer(model)], lambda: next(clock))
+
+
+def test_dry_run_counts_messages_by_device():
+    x = SimMotor(name="x")
+    dry_run = DryRun.of(bp.scan([], x, 0, 1, 3), 1000)
+    assert dry_run.counts[("set", "x")] == 3
+    assert dry_run.counts[("wait", "x")] == 3
+    assert dry_run.counts[("open_run", None)] == 1
+    assert dry_run.sleep == 0.0
+
+
+def test_dry_run_totals_sleeps():
+    def plan() -> MsgGenerator:
+        yield from bps.sleep(1.5)
+        yield from bps.checkpoint()
+        yield from bps.sleep(2.0)
+
+    dry_run = DryRun.of(plan(), 1000)
+    assert dry_run.counts == Counter({("checkpoint", None): 1})
+    assert dry_run.sleep == 3.5
+    assert dry_run.messages == 1
+
+
+def test_dry_run_abandons_endless_plan():
+    closed = []
+
+    def plan() -> MsgGenerator:
+        try:
+            while True:
+                yield from bps.checkpoint()
+        finally:
+            closed.append(True)
+
+    with pytest.raises(ValueError, match="more than 10 messages"):
+        DryRun.of(plan(), 10)
+    assert closed == [True]
+
+
+def test_estimate_uses_learned_timings():
+    model = TimingModel()
+    model.record(("set", "x"), 1.0)
+    model.record(("set", "x"), 3.0)
+    model.record(("set", "y"), 10.0)
+    estimate = model.estimate(
+        DryRun(Counter({("set", "x"): 2, ("set", "z"): 1, ("read", "x"): 4}), 0.5)
+    )
+    # set x averages 2s, set z falls back to every set (14s / 3), read is unknown
+    assert estimate.duration == pytest.approx(0.5 + 2 * 2.0 + 14.0 / 3)
+    assert estimate.messages == 7
+    assert estimate.unmodelled == 4
+
+
+def test_timer_records_time_until_next_message():
+    model = TimingModel()
+    x = SimMotor(name="x")
+    timer = _timer(model, 0.0, 0.25, 1.25, 1.5, 2.0)
+    timer.on_msg(Msg("set", x, 1, group="a"))
+    timer.on_msg(Msg("wait", None, group="a"))
+    timer.on_msg(Msg("sleep", None, 10.0))
+    timer.on_msg(Msg("checkpoint"))
+    timer.finish()
+    estimate = model.estimate(
+        DryRun(Counter({("set", "x"): 1, ("wait", "x"): 1, ("checkpoint", None): 1}), 0)
+    )
+    assert estimate.duration == pytest.approx(0.25 + 1.0 + 0.5)
+    assert estimate.unmodelled == 0
+
+
+def test_dry_run_answers_waits_for_awaitables():
+    async def update() -> None:
+        raise AssertionError("Dry runs should not await anything")
+
+    def plan() -> MsgGenerator:
+        futures = yield from bps.wait_for([update])
+        assert futures[0].result() is None
+
+    dry_run = DryRun.of(plan(), 1000)
+    assert dry_run.counts == Counter({("wait_for", None): 1})
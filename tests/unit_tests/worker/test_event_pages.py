@@ -0,0 +1,86 @@
+from collections.abc import Iterator
+from typing import Any
+from unittest.mock import Mock, call, patch
+
+import pytest
+
+from blueapi.worker.event_pages import EventPageBatcher
+
+
+def _event(seq_num: int, descriptor: str = "primary") -> dict[str, Any]:
+    return {
+        "descriptor": descriptor,
+        "uid": f"{descriptor}-{seq_num}",
+        "seq_num": seq_num,
+        "time": float(seq_num),
+        "data": {"x": seq_num},
+        "timestamps": {"x": float(seq_num)},
+    }
+
+
+@pytest.fixture
+def timers() -> Iterator[Mock]:
+    with patch("blueapi.worker.event_pages.Timer") as timers:
+        yield timers
+
+
+def test_events_packed_into_pages_when_full() -> None:
+    publish = Mock()
+    batcher = EventPageBatcher(publish, max_events=3)
+    for seq_num in range(1, 8):
+        batcher.add("event", _event(seq_num))
+
+    assert [c.args[0] for c in publish.mock_calls] == ["event_page", "event_page"]
+    assert publish.mock_calls[0].args[1]["seq_num"] == [1, 2, 3]
+    assert publish.mock_calls[1].args[1]["data"] == {"x": [4, 5, 6]}
+
+    batcher.flush()
+    assert publish.mock_calls[-1] == call("event", _event(7))
+
+
+def test_other_documents_flush_page_first() -> None:
+    publish = Mock()
+    batcher = EventPageBatcher(publish, max_events=10)
+    batcher.add("start", {"uid": "run"})
+    batcher.add("event", _event(1))
+    batcher.add("event", _event(2))
+    batcher.add("stop", {"uid": "stop"})
+
+    assert [c.args[0] for c in publish.mock_calls] == ["start", "event_page", "stop"]
+    assert publish.mock_calls[1].args[1]["uid"] == ["primary-1", "primary-2"]
+
+
+def test_new_descriptor_starts_new_page() -> None:
+    publish = Mock()
+    batcher = EventPageBatcher(publish, max_events=10)
+    batcher.add("event", _event(1, "primary"))
+    batcher.add("event", _event(2, "primary"))
+    batcher.add("event", _event(1, "baseline"))
+    batcher.flush()
+
+    assert publish.mock_calls[0].args[1]["descriptor"] == "primary"
+    assert publish.mock_calls[1] == call("event", _event(1, "baseline"))
+
+
+def test_page_published_after_max_delay(timers: Mock) -> None:
+    publish = Mock()
+    batcher = EventPageBatcher(publish, max_events=10, max_delay=0.5)
+    batcher.add("event", _event(1))
+    batcher.add("event", _event(2))
+
+    timers.assert_called_once_with(0.5, batcher.flush)
+    publish.assert_not_called()
+    timers.call_args.args[1]()
+    assert publish.mock_calls[0].args[1]["seq_num"] == [1, 2]
+
+
+def test_no_timer_without_max_delay(timers: Mock) -> None:
+    batcher = EventPageBatcher(Mock(), max_events=10)
+    batcher.add("event", _event(1))
+    timers.assert_not_called()
+
+
+def test_flush_without_events_publishes_nothing() -> None:
+    publish = Mock()
+    EventPageBatcher(publish, max_events=10).flush()
+    publish.assert_not_called()
@@ -0,0 +1,137 @@
+import dataclasses
+from typing import Any
+
+import bluesky.plan_stubs as bps
+import pytest
+from bluesky.protocols import Movable
+from bluesky.utils import MsgGenerator
+from dodal.common import inject
+from ophyd_async.sim import SimMotor
+
+from blueapi.core import BlueskyContext
+from blueapi.worker.leases import DeviceLeaseManager, devices_in_params, devices_of_plan
+from blueapi.worker.task import Task
+
+MODULE_MOTOR = SimMotor(name="module_motor")
+
+
+@pytest.fixture
+def leases() -> DeviceLeaseManager:
+    return DeviceLeaseManager()
+
+
+@pytest.fixture
+def context() -> BlueskyContext:
+    ctx = BlueskyContext()
+    ctx.register_device(SimMotor(name="x"))
+    ctx.register_device(SimMotor(name="y"))
+    ctx.register_device(SimMotor(name="z"))
+    return ctx
+
+
+def test_acquire_free_devices(leases: DeviceLeaseManager):
+    assert leases.try_acquire("a", ["x", "y"])
+    assert leases.leases() == {"a": frozenset({"x", "y"})}
+
+
+def test_acquire_is_all_or_nothing(leases: DeviceLeaseManager):
+    assert leases.try_acquire("a", ["x"])
+    assert not leases.try_acquire("b", ["y", "x"])
+    assert leases.leases() == {"a": frozenset({"x"})}
+    assert leases.try_acquire("b", ["y"])
+
+
+def test_task_may_extend_its_own_lease(leases: DeviceLeaseManager):
+    assert leases.try_acquire("a", ["x"])
+    assert leases.try_acquire("a", ["x", "y"])
+    assert leases.leases() == {"a": frozenset({"x", "y"})}
+
+
+def test_release_frees_devices(leases: DeviceLeaseManager):
+    leases.try_acquire("a", ["x"])
+    leases.release("a")
+    assert leases.leases() == {}
+    assert leases.try_acquire("b", ["x"])
+
+
+def test_release_unknown_task_does_nothing(leases: DeviceLeaseManager):
+    leases.release("a")
+    assert leases.leases() == {}
+
+
+def test_conflicts(leases: DeviceLeaseManager):
+    leases.try_acquire("a", ["x"])
+    leases.try_acquire("b", ["y"])
+    assert leases.conflicts("b", ["x", "y", "z"]) == {"x": "a"}
+
+
+def test_devices_in_params(context: BlueskyContext):
+    x, y = context.devices["x"], context.devices["y"]
+    assert devices_in_params(context, {"motor": x, "count": 3, "label": "y"}) == {"x"}
+    assert devices_in_params(context, {"motors": [x, y]}) == {"x", "y"}
+    assert devices_in_params(context, {"motors": {"fast": y}}) == {"y"}
+
+
+def test_device_children_resolve_to_parent(context: BlueskyContext):
+    x = context.devices["x"]
+    assert devices_in_params(context, {"signal": x.user_readback}) == {"x"}  # type: ignore
+
+
+def test_devices_in_dataclass_params(context: BlueskyContext):
+    @dataclasses.dataclass
+    class Composite:
+        motor: SimMotor
+        offset: float
+
+    composite = Composite(context.devices["z"], 1.0)  # type: ignore
+    assert devices_in_params(context, {"composite": composite}) == {"z"}
+
+
+def test_unregistered_devices_ignored(context: BlueskyContext):
+    assert devices_in_params(context, {"motor": SimMotor(name="x")}) == frozenset()
+
+
+class _Unwalkable(list):
+    def __iter__(self):
+        raise AssertionError("Walked")
+
+    def __array__(self):
+        raise AssertionError("Converted")
+
+
+def test_arrays_not_walked(context: BlueskyContext):
+    assert devices_in_params(context, {"positions": _Unwalkable()}) == frozenset()
+
+
+def _devices_of(context: BlueskyContext, task: Task) -> frozenset[str]:
+    return devices_of_plan(context, task.name, task.prepare_params(context))
+
+
+def test_injected_defaults_leased(context: BlueskyContext):
+    def move_default(
+        motor: Movable = inject("x"), other: Any = inject("y")
+    ) -> MsgGenerator:
+        yield from bps.mv(motor, 1)
+
+    context.register_plan(move_default)
+    assert _devices_of(context, Task(name="move_default")) == {"x", "y"}
+    passed = Task(name="move_default", params={"motor": "z", "other": "z"})
+    assert _devices_of(context, passed) == {"z"}
+
+
+def test_module_devices_leased(context: BlueskyContext):
+    def move_module_motor() -> MsgGenerator:
+        yield from bps.mv(MODULE_MOTOR, 1)
+
+    context.register_device(MODULE_MOTOR)
+    context.register_plan(move_module_motor)
+    assert _devices_of(context, Task(name="move_module_motor")) == {"module_motor"}
+
+
+def test_params_that_cannot_hold_devices_not_walked(context: BlueskyContext):
+    def move_through(motor: Movable, positions: list[float]) -> MsgGenerator:
+        yield from bps.mv(motor, positions[0])
+
+    context.register_plan(move_through)
+    params = {"motor": context.devices["x"], "positions": _Unwalkable()}
+    assert devices_of_plan(context, "move_through", params) == {"x"}
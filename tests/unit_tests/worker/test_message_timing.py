@@ -0,0 +1,58 @@
+from unittest.mock import Mock, call
+
+from bluesky import Msg
+from ophyd_async.sim import SimMotor
+
+from blueapi.worker.message_timing import DeviceGroups, MessageClock, device_name
+
+
+def test_observers_told_when_each_message_starts_and_finishes():
+    observer = Mock()
+    times = iter([0.0, 0.5, 2.0])
+    clock = MessageClock([observer], lambda: next(times))
+    first, second = Msg("checkpoint"), Msg("sleep", None, 1.5)
+
+    clock.on_msg(first)
+    clock.on_msg(second)
+    clock.finish()
+    # Already finished
+    clock.finish()
+
+    assert observer.mock_calls == [
+        call.message_started(first, 0.0),
+        call.message_finished(first, 0.0, 0.5),
+        call.message_started(second, 0.5),
+        call.message_finished(second, 0.5, 2.0),
+    ]
+
+
+def test_every_observer_told_in_order():
+    observers = Mock()
+    clock = MessageClock([observers.first, observers.second], lambda: 1.0)
+    msg = Msg("checkpoint")
+
+    clock.on_msg(msg)
+
+    assert observers.mock_calls == [
+        call.first.message_started(msg, 1.0),
+        call.second.message_started(msg, 1.0),
+    ]
+
+
+def test_device_groups_remember_devices_started_in_each_group():
+    x, y, z = SimMotor(name="x"), SimMotor(name="y"), SimMotor(name="z")
+    groups = DeviceGroups()
+    groups.add(Msg("set", x, 1, group="a"))
+    groups.add(Msg("set", y, 1, group="a"))
+    groups.add(Msg("set", z, 1, group="b"))
+    groups.add(Msg("set", z, 1))
+
+    assert groups.waited_for(Msg("wait", None, group="a")) == {"x", "y"}
+    # Forgotten once waited for
+    assert groups.waited_for(Msg("wait", None, group="a")) == set()
+    assert groups.waited_for(Msg("wait", None, group="b")) == {"z"}
+
+
+def test_device_name():
+    assert device_name(Msg("set", SimMotor(name="x"), 1)) == "x"
+    assert device_name(Msg("checkpoint")) is None
@@ -0,0 +1,60 @@
+from bluesky import Msg
+from ophyd_async.sim import SimMotor
+
+from blueapi.worker.message_timing import MessageClock
+from blueapi.worker.profiling import LATENCY_BUCKETS, MsgProfiler
+
+
+def _profiler(*times: float) -> tuple[MessageClock, MsgProfiler]:
+    clock = iter(times)
+    profiler = MsgProfiler()
+    return MessageClock([profiler], lambda: next(clock)), profiler
+
+
+def test_messages_last_until_the_next_one():
+    messages, profiler = _profiler(0.0, 0.5, 0.75, 2.75)
+    messages.on_msg(Msg("checkpoint"))
+    messages.on_msg(Msg("checkpoint"))
+    messages.on_msg(Msg("sleep", None, 2.0))
+    messages.finish()
+    profile = profiler.summary()
+    assert profile.total_time == 2.75
+    assert profile.commands["checkpoint"].count == 2
+    assert profile.commands["checkpoint"].total == 0.75
+    assert profile.commands["checkpoint"].max == 0.5
+    assert profile.commands["sleep"].total == 2.0
+
+
+def test_latency_histogram():
+    messages, profiler = _profiler(0.0, 0.0005, 0.5505, 20.5505)
+    for _ in range(3):
+        messages.on_msg(Msg("read"))
+    messages.finish()
+    histogram = profiler.summary().commands["read"].histogram
+    assert len(histogram) == len(LATENCY_BUCKETS) + 1
+    assert histogram == [1, 0, 0, 1, 0, 1]
+
+
+def test_wait_time_charged_to_devices_in_group():
+    x, y, z = SimMotor(name="x"), SimMotor(name="y"), SimMotor(name="z")
+    messages, profiler = _profiler(0.0, 0.25, 0.5, 0.75, 3.75, 4.0, 5.0)
+    messages.on_msg(Msg("set", x, 1, group="a"))
+    messages.on_msg(Msg("set", y, 1, group="a"))
+    messages.on_msg(Msg("set", z, 1, group="b"))
+    messages.on_msg(Msg("wait", None, group="a"))
+    messages.on_msg(Msg("trigger", z, group="b"))
+    messages.on_msg(Msg("wait", None, group="b"))
+    messages.finish()
+    profile = profiler.summary()
+    assert [(d.name, d.messages, d.wait_time) for d in profile.devices] == [
+        ("x", 1, 3.0),
+        ("y", 1, 3.0),
+        ("z", 2, 1.0),
+    ]
+
+
+def test_empty_profile():
+    profile = MsgProfiler().summary()
+    assert profile.total_time == 0.0
+    assert profile.commands == {}
+    assert profile.devices == []
@@ -0,0 +1,179 @@
+import threading
+from collections.abc import Iterator
+from unittest.mock import Mock, patch
+
+import pytest
+
+from blueapi.worker.event import ProgressEvent, StatusView
+from blueapi.worker.progress import ProgressThrottle, ProgressView
+
+
+@pytest.fixture
+def clock() -> Iterator[Mock]:
+    clock = Mock(return_value=100.0)
+    with patch("blueapi.worker.progress.time.monotonic", clock):
+        yield clock
+
+
+@pytest.fixture
+def timers() -> Iterator[Mock]:
+    with patch("blueapi.worker.progress.Timer") as timers:
+        yield timers
+
+
+def test_unthrottled_publishes_every_update(clock: Mock) -> None:
+    publish = Mock()
+    throttle = ProgressThrottle(publish)
+    for _ in range(5):
+        throttle.update()
+    assert publish.call_count == 5
+    assert throttle.merged_count == 0
+
+
+def test_first_update_published_immediately(clock: Mock, timers: Mock) -> None:
+    publish = Mock()
+    ProgressThrottle(publish, max_rate=10.0).update()
+    publish.assert_called_once()
+    timers.assert_not_called()
+
+
+def test_updates_within_interval_are_merged(clock: Mock, timers: Mock) -> None:
+    publish = Mock()
+    throttle = ProgressThrottle(publish, max_rate=10.0)
+    throttle.update()
+    clock.return_value = 100.02
+    for _ in range(3):
+        throttle.update()
+
+    assert publish.call_count == 1
+    timers.assert_called_once_with(pytest.approx(0.08), throttle._publish_pending)
+
+    throttle._publish_pending()
+    assert publish.call_count == 2
+    assert throttle.merged_count == 2
+    assert throttle.published_count == 2
+
+
+def test_final_update_published_immediately(clock: Mock, timers: Mock) -> None:
+    publish = Mock()
+    throttle = ProgressThrottle(publish, max_rate=10.0)
+    throttle.update()
+    clock.return_value = 100.01
+    throttle.update()
+    throttle.update(final=True)
+
+    assert publish.call_count == 2
+    assert throttle.merged_count == 1
+    timers.return_value.cancel.assert_called_once()
+    throttle._publish_pending()
+    assert publish.call_count == 2
+
+
+def test_update_after_interval_published_immediately(clock: Mock, timers: Mock) -> None:
+    publish = Mock()
+    throttle = ProgressThrottle(publish, max_rate=10.0)
+    throttle.update()
+    clock.return_value = 100.2
+    throttle.update()
+    assert publish.call_count == 2
+    timers.assert_not_called()
+
+
+def test_flush_publishes_pending_update(clock: Mock, timers: Mock) -> None:
+    publish = Mock()
+    throttle = ProgressThrottle(publish, max_rate=10.0)
+    throttle.flush()
+    publish.assert_not_called()
+
+    throttle.update()
+    throttle.update()
+    throttle.flush()
+    assert publish.call_count == 2
+    throttle.flush()
+    assert publish.call_count == 2
+
+
+def test_pending_update_published_after_interval() -> None:
+    published = threading.Event()
+    throttle = ProgressThrottle(Mock(), max_rate=50.0)
+    throttle.update()
+    throttle._publish = published.set
+    throttle.update()
+    assert published.wait(timeout=1.0)
+
+
+def test_publish_errors_are_logged(clock: Mock) -> None:
+    throttle = ProgressThrottle(Mock(side_effect=ValueError("No task")))
+    with patch("blueapi.worker.progress.LOGGER") as logger:
+        throttle.update()
+    logger.exception.assert_called_once()
+    assert throttle.published_count == 1
+
+
+def _delta(sequence: int, removed: list[str] | None = None, **statuses: float):
+    return ProgressEvent(
+        task_id="foo",
+        statuses={name: StatusView(current=value) for name, value in statuses.items()},
+        sequence=sequence,
+        snapshot=False,
+        removed=removed or [],
+    )
+
+
+def test_delta_fields_only_serialized_when_delta_encoded() -> None:
+    assert ProgressEvent(task_id="0").model_dump() == {"task_id": "0", "statuses": {}}
+    delta = ProgressEvent(task_id="0", sequence=1, snapshot=False, removed=["a"])
+    assert ProgressEvent.model_validate_json(delta.model_dump_json()) == delta
+
+
+def test_progress_view_passes_through_snapshots() -> None:
+    view = ProgressView()
+    event = ProgressEvent(task_id="foo", statuses={"a": StatusView(current=1.0)})
+    assert view.apply(event) == event
+    assert view.statuses("foo") == {"a": StatusView(current=1.0)}
+
+
+def test_progress_view_applies_deltas() -> None:
+    view = ProgressView()
+    view.apply(
+        ProgressEvent(
+            task_id="foo",
+            statuses={"a": StatusView(current=1.0), "b": StatusView(current=2.0)},
+            sequence=0,
+        )
+    )
+    view.apply(_delta(1, a=3.0, c=4.0))
+    full = view.apply(_delta(2, removed=["b"]))
+    assert full is not None
+    assert full.snapshot
+    assert full.sequence == 2
+    assert full.statuses == {"a": StatusView(current=3.0), "c": StatusView(current=4.0)}
+
+
+@pytest.mark.parametrize("sequences", [[1], [0, 2], [0, 1, 1]])
+def test_progress_view_resynchronises_after_missed_delta(
+    sequences: list[int],
+) -> None:
+    view = ProgressView()
+    if sequences[0] == 0:
+        view.apply(ProgressEvent(task_id="foo", statuses={}, sequence=0))
+    for sequence in sequences[1:-1]:
+        assert view.apply(_delta(sequence, a=float(sequence))) is not None
+    assert view.apply(_delta(sequences[-1], a=9.0)) is None
+    assert view.apply(_delta(sequences[-1] + 1, a=10.0)) is None
+
+    snapshot = ProgressEvent(
+        task_id="foo", statuses={"a": StatusView(current=11.0)}, sequence=10
+    )
+    assert view.apply(snapshot) == snapshot
+    assert view.apply(_delta(11, b=1.0)) is not None
+    assert set(view.statuses("foo")) == {"a", "b"}
+
+
+def test_progress_view_tracks_tasks_separately() -> None:
+    view = ProgressView()
+    view.apply(ProgressEvent(task_id="foo", statuses={"a": StatusView()}))
+    view.apply(ProgressEvent(task_id="bar", statuses={"b": StatusView()}))
+    view.forget("foo")
+    assert view.statuses("foo") == {}
+    assert set(view.statuses("bar")) == {"b"}
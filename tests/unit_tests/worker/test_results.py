@@ -0,0 +1,73 @@
+import hashlib
+from pathlib import Path
+
+from blueapi.worker.event import StoredResult, TaskResult
+from blueapi.worker.results import SUBDIRECTORY, ResultStore
+
+
+def test_result_stored_under_its_hash(tmp_path: Path):
+    store = ResultStore(tmp_path, 0)
+    digest = store.put(b"[1, 2, 3]")
+    assert digest == hashlib.sha256(b"[1, 2, 3]").hexdigest()
+    assert store.path(digest).read_bytes() == b"[1, 2, 3]"
+    assert store.path(digest) == tmp_path / SUBDIRECTORY / f"{digest}.json"
+    assert [path.name for path in (tmp_path / SUBDIRECTORY).iterdir()] == [
+        f"{digest}.json"
+    ]
+
+
+def test_identical_results_stored_once(tmp_path: Path):
+    store = ResultStore(tmp_path, 0)
+    assert store.put(b"[1]") == store.put(b"[1]")
+    assert len(list((tmp_path / SUBDIRECTORY).iterdir())) == 1
+
+
+def test_remove(tmp_path: Path):
+    store = ResultStore(tmp_path, 0)
+    digest = store.put(b"[1]")
+    store.remove(digest)
+    assert not store.path(digest).exists()
+    store.remove(digest)
+
+
+def test_previous_results_removed(tmp_path: Path):
+    store = ResultStore(tmp_path, 0)
+    path = store.path(store.put(b"[1]"))
+    ResultStore(tmp_path, 0)
+    assert not path.exists()
+
+
+def test_files_outside_store_kept(tmp_path: Path):
+    # Named like a stored result, but not written by the store
+    unowned = tmp_path / f"{hashlib.sha256(b'[1]').hexdigest()}.json"
+    unowned.write_text("[1]")
+    ResultStore(tmp_path, 0)
+    assert unowned.read_text() == "[1]"
+
+
+def test_large_result_stored(tmp_path: Path):
+    store = ResultStore(tmp_path, 8)
+    result = TaskResult.from_result(list(range(10)), store)
+    data = b"[0,1,2,3,4,5,6,7,8,9]"
+    assert result == TaskResult(
+        type="list",
+        stored=StoredResult(digest=hashlib.sha256(data).hexdigest(), size=len(data)),
+    )
+
+
+def test_small_result_included(tmp_path: Path):
+    store = ResultStore(tmp_path, 8)
+    assert TaskResult.from_result([1, 2], store) == TaskResult(
+        result=[1, 2], type="list"
+    )
+    assert list((tmp_path / SUBDIRECTORY).iterdir()) == []
+
+
+def test_unserializable_result_not_stored(tmp_path: Path):
+    class Unserializable: ...
+
+    store = ResultStore(tmp_path, 0)
+    assert TaskResult.from_result(Unserializable(), store) == TaskResult(
+        type="Unserializable"
+    )
+    assert list((tmp_path / SUBDIRECTORY).iterdir()) == []
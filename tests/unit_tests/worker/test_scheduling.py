@@ -0,0 +1,138 @@
+import pytest
+
+from blueapi.worker.scheduling import (
+    FairShareScheduler,
+    QueueWaitRecorder,
+    QueueWaitStats,
+    queue_position,
+)
+
+
+@pytest.mark.parametrize(
+    "priorities,priority,expected",
+    [
+        ([], 0, 0),
+        ([0, 0], 0, 2),
+        ([0, 0], 1, 0),
+        ([2, 1, 1, 0], 1, 3),
+        ([2, 1, 0], -1, 3),
+        ([2, 1, 0], 3, 0),
+    ],
+)
+def test_queue_position(priorities: list[int], priority: int, expected: int):
+    assert queue_position(priorities, priority) == expected
+
+
+def test_queue_waits_recorded_by_key():
+    recorder = QueueWaitRecorder()
+    recorder.record(0, 2.0)
+    recorder.record(5, 0.5)
+    recorder.record(0, 4.0)
+    assert recorder.stats() == {
+        5: QueueWaitStats(count=1, total=0.5, max=0.5),
+        0: QueueWaitStats(count=2, total=6.0, max=4.0),
+    }
+    assert recorder.stats()[0].mean == 3.0
+
+
+def test_mean_of_no_waits():
+    assert QueueWaitStats(count=0, total=0.0, max=0.0).mean == 0.0
+
+
+def test_fair_share_alternates_between_sessions():
+    scheduler = FairShareScheduler()
+    tasks = [
+        ("a1", ("a", "x")),
+        ("a2", ("a", "x")),
+        ("a3", ("a", "x")),
+        ("b1", ("b", "y")),
+        ("b2", ("b", "y")),
+    ]
+    assert scheduler.order(tasks) == ["a1", "b1", "a2", "b2", "a3"]
+
+
+def test_fair_share_alternates_between_users_of_a_session():
+    scheduler = FairShareScheduler()
+    tasks = [
+        ("x1", ("a", "x")),
+        ("x2", ("a", "x")),
+        ("y1", ("a", "y")),
+        ("z1", ("b", "z")),
+    ]
+    assert scheduler.order(tasks) == ["x1", "z1", "y1", "x2"]
+
+
+def test_fair_share_favours_sessions_that_have_run_less():
+    scheduler = FairShareScheduler()
+    scheduler.started(("a", "x"))
+    scheduler.charge(("a", "x"), 3.0)
+    tasks = [("a1", ("a", "x")), ("b1", ("b", "y")), ("b2", ("b", "y"))]
+    assert scheduler.order(tasks) == ["b1", "a1", "b2"]
+
+
+def test_fair_share_weights_sessions():
+    scheduler = FairShareScheduler({"a": 2.0})
+    assert scheduler.weight("a") == 2.0
+    assert scheduler.weight("b") == 1.0
+    tasks = [(f"a{i}", ("a", "x")) for i in range(4)] + [
+        (f"b{i}", ("b", "y")) for i in range(2)
+    ]
+    assert scheduler.order(tasks) == ["a0", "b0", "a1", "a2", "b1", "a3"]
+
+
+def test_idle_session_cannot_catch_up():
+    scheduler = FairShareScheduler()
+    for _ in range(5):
+        scheduler.started(("a", "x"))
+        scheduler.charge(("a", "x"), 1.0)
+    scheduler.started(("b", "y"))
+    tasks = [("a1", ("a", "x")), ("b1", ("b", "y")), ("b2", ("b", "y"))]
+    assert scheduler.order(tasks) == ["b1", "a1", "b2"]
+
+
+def test_run_times_recorded_per_party():
+    scheduler = FairShareScheduler()
+    scheduler.charge(("a", "x"), 1.0)
+    scheduler.charge(("a", "x"), 2.0)
+    scheduler.charge((None, None), 0.5)
+    assert scheduler.run_times() == {("a", "x"): 3.0, (None, None): 0.5}
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_session_over_quota_goes_last():
+    clock = FakeClock()
+    scheduler = FairShareScheduler(
+        {"a": 4.0}, session_quotas={"a": 2.0}, quota_period=60.0, clock=clock
+    )
+    assert scheduler.remaining_quota("a") == 2.0
+    assert scheduler.remaining_quota("b") is None
+    for party in (("a", "x"), ("b", "y")):
+        scheduler.started(party)
+        scheduler.charge(party, 3.0)
+    assert scheduler.remaining_quota("a") == -1.0
+
+    tasks = [("a1", ("a", "x")), ("a2", ("a", "x")), ("b1", ("b", "y"))]
+    assert scheduler.order(tasks) == ["b1", "a1", "a2"]
+
+    clock.now = 61.0
+    assert scheduler.remaining_quota("a") == 2.0
+    # Its tasks take 3 seconds each, so a is over quota again after one
+    assert scheduler.order(tasks) == ["a1", "b1", "a2"]
+
+
+def test_quota_used_up_while_ordering():
+    tasks = [(f"a{i}", ("a", "x")) for i in range(4)] + [
+        (f"b{i}", ("b", "y")) for i in range(2)
+    ]
+    unlimited = FairShareScheduler({"a": 4.0})
+    assert unlimited.order(tasks) == ["a0", "b0", "a1", "a2", "a3", "b1"]
+    # Each task is assumed to take a second, so a is over quota after two
+    limited = FairShareScheduler({"a": 4.0}, session_quotas={"a": 2.0})
+    assert limited.order(tasks) == ["a0", "b0", "a1", "b1", "a2", "a3"]
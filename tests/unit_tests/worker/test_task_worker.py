@@ -1,15 +1,21 @@
+import asyncio
 import dataclasses
 import itertools
+import json
 import threading
+import time
 from collections.abc import Callable, Iterable
-from concurrent.futures import Future
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import UTC, datetime
 from pathlib import Path
 from queue import Full
 from typing import Any, TypeVar
 from unittest.mock import ANY, MagicMock, Mock, patch
 
+import bluesky.plan_stubs as bps
 import pydantic
 import pytest
+from bluesky._vendor.super_state_machine.errors import TransitionError
 from bluesky.protocols import Movable, Readable, Status
 from bluesky.utils import MsgGenerator
 from dodal.common import inject
@@ -18,14 +24,30 @@ from observability_utils.tracing import (
     JsonObjectSpanExporter,
     asserting_span_exporter,
 )
+from opentelemetry.context import get_current
 from ophyd_async.core import AsyncStatus
 
-from blueapi.config import DeviceManagerSource, EnvironmentConfig, PlanSource
+from blueapi.config import (
+    DeviceManagerSource,
+    DocumentSpanConfig,
+    DocumentSpanMode,
+    EnvironmentConfig,
+    EstimationConfig,
+    EventDropPolicy,
+    PlanSource,
+    ResultStoreConfig,
+    TaskRetentionConfig,
+    WatchdogConfig,
+)
 from blueapi.core import BlueskyContext, EventStream
 from blueapi.core.bluesky_types import DataEvent
+from blueapi.core.event import OverflowPolicy
 from blueapi.service.model import PlanModel
 from blueapi.utils.base_model import BlueapiBaseModel
+from blueapi.utils.path_provider import StartDocumentPathProvider
 from blueapi.worker import (
+    ProgressEvent,
+    ProgressView,
     Task,
     TaskStatus,
     TaskWorker,
@@ -35,7 +57,10 @@ from blueapi.worker import (
     WorkerEvent,
     WorkerState,
 )
-from blueapi.worker.event import TaskResult, TaskStatusEnum
+from blueapi.worker.estimation import DryRun
+from blueapi.worker.event import TaskError, TaskResult, TaskStatusEnum
+from blueapi.worker.task import StepState
+from blueapi.worker.task_worker import TaskStore
 
 _SIMPLE_TASK = Task(name="sleep", params={"time": 0.0})
 _LONG_TASK = Task(name="sleep", params={"time": 1.0})
@@ -75,10 +100,29 @@ class FakeDevice(Movable[float]):
         return stat
 
 
+class PollingFakeDevice(FakeDevice):
+    """Waits for its event without blocking the event loop"""
+
+    def set(self, value: float) -> Status:
+        async def wait_for_event():
+            while not self.event.is_set():
+                await asyncio.sleep(0.01)
+            self.event.clear()
+
+        return AsyncStatus(wait_for_event())
+
+
 def failing_plan() -> MsgGenerator:
     raise KeyError("I failed")
 
 
+def checkpointed_plan(steps: int = 10, delay: float = 0.1) -> MsgGenerator[int]:
+    for _ in range(steps):
+        yield from bps.checkpoint()
+        yield from bps.sleep(delay)
+    return steps
+
+
 @dataclasses.dataclass
 class ComplexReturn:
     foo: int
@@ -149,6 +193,17 @@ def worker(inert_worker: TaskWorker) -> Iterable[TaskWorker]:
     inert_worker.stop()
 
 
+def _get_task(worker: TaskWorker, task_id: str) -> TrackableTask:
+    task = worker.get_task_by_id(task_id)
+    assert task is not None
+    return task
+
+
+def _wait_for_estimates(worker: TaskWorker) -> None:
+    # Tasks are estimated in order on a single thread
+    worker._estimator.submit(lambda: None).result(timeout=5.0)
+
+
 def test_stop_doesnt_hang(inert_worker: TaskWorker) -> None:
     inert_worker.start()
     inert_worker.stop()
@@ -185,7 +240,11 @@ def test_submit_task(
     task_id = worker.submit_task(_SIMPLE_TASK)
     assert worker.get_tasks() == [
         TrackableTask.model_construct(
-            task_id=task_id, request_id=ANY, task=_SIMPLE_TASK
+            task_id=task_id,
+            request_id=ANY,
+            task=_SIMPLE_TASK,
+            timeline=ANY,
+            resources=ANY,
         )
     ]
 
@@ -195,16 +254,28 @@ def test_submit_multiple_tasks(worker: TaskWorker) -> None:
     task_id_1 = worker.submit_task(_SIMPLE_TASK)
     assert worker.get_tasks() == [
         TrackableTask.model_construct(
-            task_id=task_id_1, request_id=ANY, task=_SIMPLE_TASK
+            task_id=task_id_1,
+            request_id=ANY,
+            task=_SIMPLE_TASK,
+            timeline=ANY,
+            resources=ANY,
         )
     ]
     task_id_2 = worker.submit_task(_LONG_TASK)
     assert worker.get_tasks() == [
         TrackableTask.model_construct(
-            task_id=task_id_1, request_id=ANY, task=_SIMPLE_TASK
+            task_id=task_id_1,
+            request_id=ANY,
+            task=_SIMPLE_TASK,
+            timeline=ANY,
+            resources=ANY,
         ),
         TrackableTask.model_construct(
-            task_id=task_id_2, request_id=ANY, task=_LONG_TASK
+            task_id=task_id_2,
+            request_id=ANY,
+            task=_LONG_TASK,
+            timeline=ANY,
+            resources=ANY,
         ),
     ]
 
@@ -219,14 +290,22 @@ def test_restart_leaves_task_pending(worker: TaskWorker) -> None:
     task_id = worker.submit_task(_SIMPLE_TASK)
     assert worker.get_tasks() == [
         TrackableTask.model_construct(
-            task_id=task_id, request_id=ANY, task=_SIMPLE_TASK
+            task_id=task_id,
+            request_id=ANY,
+            task=_SIMPLE_TASK,
+            timeline=ANY,
+            resources=ANY,
         )
     ]
     worker.stop()
     worker.start()
     assert worker.get_tasks() == [
         TrackableTask.model_construct(
-            task_id=task_id, request_id=ANY, task=_SIMPLE_TASK
+            task_id=task_id,
+            request_id=ANY,
+            task=_SIMPLE_TASK,
+            timeline=ANY,
+            resources=ANY,
         )
     ]
 
@@ -236,13 +315,21 @@ def test_submit_before_start_pending(inert_worker: TaskWorker) -> None:
     inert_worker.start()
     assert inert_worker.get_tasks() == [
         TrackableTask.model_construct(
-            task_id=task_id, request_id=ANY, task=_SIMPLE_TASK
+            task_id=task_id,
+            request_id=ANY,
+            task=_SIMPLE_TASK,
+            timeline=ANY,
+            resources=ANY,
         )
     ]
     inert_worker.stop()
     assert inert_worker.get_tasks() == [
         TrackableTask.model_construct(
-            task_id=task_id, request_id=ANY, task=_SIMPLE_TASK
+            task_id=task_id,
+            request_id=ANY,
+            task=_SIMPLE_TASK,
+            timeline=ANY,
+            resources=ANY,
         )
     ]
 
@@ -251,7 +338,11 @@ def test_clear_task(worker: TaskWorker) -> None:
     task_id = worker.submit_task(_SIMPLE_TASK)
     assert worker.get_tasks() == [
         TrackableTask.model_construct(
-            task_id=task_id, request_id=ANY, task=_SIMPLE_TASK
+            task_id=task_id,
+            request_id=ANY,
+            task=_SIMPLE_TASK,
+            timeline=ANY,
+            resources=ANY,
         )
     ]
     assert worker.clear_task(task_id)
@@ -329,9 +420,128 @@ def test_plan_result_serialized(
         "outcome": "success",
         "result": serial,
         "type": type_name,
+        "stored": None,
     }
 
 
+def test_large_plan_result_stored(context: BlueskyContext, tmp_path: Path) -> None:
+    def result_plan(size: int) -> MsgGenerator:
+        yield from []
+        return list(range(size))
+
+    context.register_plan(result_plan)
+    worker = TaskWorker(
+        context, results=ResultStoreConfig(directory=tmp_path, threshold=20)
+    )
+    worker.start()
+    try:
+        small = worker.submit_task(Task(name="result_plan", params={"size": 3}))
+        begin_task_and_wait_until_complete(worker, small)
+        large = worker.submit_task(Task(name="result_plan", params={"size": 20}))
+        events = begin_task_and_wait_until_complete(worker, large)
+    finally:
+        worker.stop()
+
+    assert _get_task(worker, small).outcome == TaskResult(result=[0, 1, 2], type="list")
+    assert worker.get_stored_result(small) is None
+    ts = events[-1].task_status
+    assert ts is not None and isinstance(ts.result, TaskResult)
+    assert ts.result.result is None
+    assert ts.result.stored is not None
+    path = worker.get_stored_result(large)
+    assert path is not None
+    assert json.loads(path.read_bytes()) == list(range(20))
+    assert ts.result.stored.size == path.stat().st_size
+
+    worker.clear_task(large)
+    assert not path.exists()
+
+
+def _bundle(*steps: Task, stop_on_failure: bool = True) -> Task:
+    return Task(name="bundle", steps=list(steps), stop_on_failure=stop_on_failure)
+
+
+def test_bundle_runs_steps_without_becoming_idle(worker: TaskWorker) -> None:
+    task_id = worker.submit_task(_bundle(_SIMPLE_TASK, _SIMPLE_TASK, _SIMPLE_TASK))
+    events = begin_task_and_wait_until_complete(worker, task_id)
+
+    # Idle only once every step has finished
+    states = [event.state for event in events]
+    assert states == [WorkerState.RUNNING] * (len(events) - 2) + [WorkerState.IDLE] * 2
+    task = _get_task(worker, task_id)
+    assert task.outcome == TaskResult(result=[None, None, None], type="list")
+    assert [step.state for step in task.steps] == [StepState.SUCCEEDED] * 3
+
+
+def test_bundle_publishes_status_of_each_step(worker: TaskWorker) -> None:
+    task_id = worker.submit_task(_bundle(_SIMPLE_TASK, _SIMPLE_TASK))
+    states: list[list[StepState]] = []
+    worker.worker_events.subscribe(
+        lambda _, __: states.append(
+            [step.state for step in _get_task(worker, task_id).steps]
+        )
+    )
+    begin_task_and_wait_until_complete(worker, task_id)
+
+    for progress in (
+        [StepState.RUNNING, StepState.PENDING],
+        [StepState.SUCCEEDED, StepState.PENDING],
+        [StepState.SUCCEEDED, StepState.RUNNING],
+        [StepState.SUCCEEDED, StepState.SUCCEEDED],
+    ):
+        assert progress in states
+
+
+def test_bundle_stops_on_failure(worker: TaskWorker) -> None:
+    task_id = worker.submit_task(_bundle(_SIMPLE_TASK, _FAILING_TASK, _SIMPLE_TASK))
+    events = begin_task_and_wait_until_complete(worker, task_id)
+
+    assert events[-1].is_error()
+    task = _get_task(worker, task_id)
+    assert isinstance(task.outcome, TaskError)
+    assert task.errors == ["'I failed'"]
+    assert [(step.state, step.error) for step in task.steps] == [
+        (StepState.SUCCEEDED, None),
+        (StepState.FAILED, "'I failed'"),
+        (StepState.SKIPPED, None),
+    ]
+
+
+def test_bundle_continues_after_failure(worker: TaskWorker) -> None:
+    task_id = worker.submit_task(
+        _bundle(_FAILING_TASK, _SIMPLE_TASK, stop_on_failure=False)
+    )
+    events = begin_task_and_wait_until_complete(worker, task_id)
+
+    assert events[-1].is_error()
+    task = _get_task(worker, task_id)
+    assert task.outcome == TaskResult(result=[None, None], type="list")
+    assert task.errors == ["Step 0 (failing_plan) failed: 'I failed'"]
+    assert [step.state for step in task.steps] == [
+        StepState.FAILED,
+        StepState.SUCCEEDED,
+    ]
+
+
+def test_bundle_steps_validated_on_submission(worker: TaskWorker) -> None:
+    with pytest.raises(pydantic.ValidationError):
+        worker.submit_task(
+            _bundle(_SIMPLE_TASK, Task(name="sleep", params={"time": "never"}))
+        )
+
+
+@pytest.mark.parametrize(
+    "bundle",
+    [
+        {"name": "bundle", "params": {"time": 0.0}, "steps": [{"name": "sleep"}]},
+        {"name": "bundle", "steps": [{"name": "b", "steps": [{"name": "sleep"}]}]},
+    ],
+)
+def test_invalid_bundles_rejected(bundle: dict[str, Any]) -> None:
+    with pytest.raises(pydantic.ValidationError):
+        Task.model_validate(bundle)
+
+
 def test_plan_failure_recorded_in_active_task(worker: TaskWorker) -> None:
     task_id = worker.submit_task(_FAILING_TASK)
     events_future: Future[list[WorkerEvent]] = take_events(
@@ -420,6 +630,913 @@ def test_full_queue_raises(put_nowait: MagicMock, worker: TaskWorker):
         worker.begin_task(task)
 
 
+def test_queued_tasks_run_in_order(worker: TaskWorker) -> None:
+    task_ids = [worker.submit_task(_SIMPLE_TASK) for _ in range(3)]
+    events: Future[list[WorkerEvent]] = take_events(
+        worker.worker_events,
+        lambda event: event.is_complete() and event.task_id == task_ids[-1],
+    )
+    for task_id in task_ids:
+        worker.enqueue_task(task_id)
+
+    completed = [
+        event.task_id for event in events.result(timeout=5.0) if event.is_complete()
+    ]
+    assert completed == task_ids
+    assert worker.get_queue() == []
+    assert worker.get_tasks(TaskStatusEnum.COMPLETE) == [
+        worker.get_task_by_id(task_id) for task_id in task_ids
+    ]
+
+
+def test_queued_task_waits_for_running_task(
+    worker: TaskWorker, fake_device: FakeDevice
+) -> None:
+    running = worker.submit_task(_INDEFINITE_TASK)
+    queued = worker.submit_task(_SIMPLE_TASK)
+    worker.begin_task(running)
+    worker.enqueue_task(queued)
+
+    assert [task.task_id for task in worker.get_queue()] == [queued]
+    events: Future[list[WorkerEvent]] = take_events(
+        worker.worker_events,
+        lambda event: event.is_complete() and event.task_id == queued,
+    )
+    fake_device.event.set()
+    events.result(timeout=5.0)
+    assert worker.get_queue() == []
+
+
+def test_enqueue_before_start_runs_on_start(inert_worker: TaskWorker) -> None:
+    task_id = inert_worker.submit_task(_SIMPLE_TASK)
+    inert_worker.enqueue_task(task_id)
+    events: Future[list[WorkerEvent]] = take_events(
+        inert_worker.worker_events, lambda event: event.is_complete()
+    )
+    inert_worker.start()
+    try:
+        assert events.result(timeout=5.0)[-1].task_id == task_id
+    finally:
+        inert_worker.stop()
+
+
+def test_enqueue_unknown_task_fails(inert_worker: TaskWorker) -> None:
+    with pytest.raises(KeyError):
+        inert_worker.enqueue_task("foo")
+
+
+def test_enqueue_task_twice_fails(inert_worker: TaskWorker) -> None:
+    task_id = inert_worker.submit_task(_SIMPLE_TASK)
+    inert_worker.enqueue_task(task_id)
+    with pytest.raises(ValueError, match="already queued"):
+        inert_worker.enqueue_task(task_id)
+
+
+def test_reorder_queue(inert_worker: TaskWorker) -> None:
+    task_ids = [inert_worker.submit_task(_SIMPLE_TASK) for _ in range(3)]
+    for task_id in task_ids:
+        inert_worker.enqueue_task(task_id)
+
+    new_order = list(reversed(task_ids))
+    assert inert_worker.reorder_queue(new_order) == new_order
+    assert [task.task_id for task in inert_worker.get_queue()] == new_order
+
+
+def test_reorder_queue_keeps_priority_order(inert_worker: TaskWorker) -> None:
+    high = inert_worker.submit_task(
+        Task(name="sleep", params={"time": 0.0}, priority=1)
+    )
+    low = inert_worker.submit_task(_SIMPLE_TASK)
+    inert_worker.enqueue_task(low)
+    inert_worker.enqueue_task(high)
+    with pytest.raises(ValueError, match="higher priority"):
+        inert_worker.reorder_queue([low, high])
+    assert [task.task_id for task in inert_worker.get_queue()] == [high, low]
+
+
+def test_explicit_order_kept_under_fair_share(context: BlueskyContext) -> None:
+    worker = TaskWorker(context, fair_share=True)
+    first = [worker.submit_task(_sleep_for("cm1", "jd1")) for _ in range(2)]
+    for task_id in first:
+        worker.enqueue_task(task_id)
+    worker.reorder_queue(first)
+    later = worker.submit_task(_sleep_for("cm2", "jd2"))
+    worker.enqueue_task(later)
+    # Without the explicit order, fair share would put cm2 second
+    assert [task.task_id for task in worker.get_queue()] == [*first, later]
+
+    worker.dequeue_task(first[0])
+    again = worker.submit_task(_sleep_for("cm1", "jd1"))
+    worker.enqueue_task(again)
+    assert [task.task_id for task in worker.get_queue()] == [first[1], later, again]
+
+
+@pytest.mark.parametrize(
+    "new_order", [[], ["0"], ["0", "2"], ["0", "1", "1"], ["0", "1", "2"]]
+)
+def test_reorder_queue_must_be_permutation(
+    inert_worker: TaskWorker, new_order: list[str]
+) -> None:
+    for task_id in ("0", "1", "2"):
+        inert_worker._tasks.add(TrackableTask(task_id=task_id, task=_SIMPLE_TASK))
+    inert_worker.enqueue_task("0")
+    inert_worker.enqueue_task("1")
+    with pytest.raises(ValueError):
+        inert_worker.reorder_queue(new_order)
+    assert [task.task_id for task in inert_worker.get_queue()] == ["0", "1"]
+
+
+def test_dequeue_task_leaves_task_pending(inert_worker: TaskWorker) -> None:
+    task_id = inert_worker.submit_task(_SIMPLE_TASK)
+    inert_worker.enqueue_task(task_id)
+    assert inert_worker.dequeue_task(task_id) == task_id
+    assert inert_worker.get_queue() == []
+    assert inert_worker.get_tasks(TaskStatusEnum.PENDING) == [
+        inert_worker.get_task_by_id(task_id)
+    ]
+    with pytest.raises(KeyError):
+        inert_worker.dequeue_task(task_id)
+
+
+def test_clear_task_removes_it_from_queue(inert_worker: TaskWorker) -> None:
+    task_id = inert_worker.submit_task(_SIMPLE_TASK)
+    inert_worker.enqueue_task(task_id)
+    inert_worker.clear_task(task_id)
+    assert inert_worker.get_queue() == []
+
+
+def test_begin_queued_task_keeps_place_if_busy(
+    worker: TaskWorker, fake_device: FakeDevice
+) -> None:
+    running = worker.submit_task(_INDEFINITE_TASK)
+    queued = [worker.submit_task(_SIMPLE_TASK) for _ in range(2)]
+    worker.begin_task(running)
+    for task_id in queued:
+        worker.enqueue_task(task_id)
+    with pytest.raises(WorkerBusyError):
+        worker.begin_task(queued[1])
+    assert [task.task_id for task in worker.get_queue()] == queued
+    fake_device.event.set()
+
+
+def test_queue_ordered_by_priority(inert_worker: TaskWorker) -> None:
+    low = inert_worker.submit_task(_SIMPLE_TASK)
+    high = inert_worker.submit_task(
+        Task(name="sleep", params={"time": 0.0}, priority=5)
+    )
+    mid = inert_worker.submit_task(Task(name="sleep", params={"time": 0.0}, priority=1))
+    later_low = inert_worker.submit_task(_SIMPLE_TASK)
+    for task_id in (low, high, mid, later_low):
+        inert_worker.enqueue_task(task_id)
+    assert [task.task_id for task in inert_worker.get_queue()] == [
+        high,
+        mid,
+        low,
+        later_low,
+    ]
+
+
+def _sleep_for(session: str, user: str) -> Task:
+    return Task(
+        name="sleep",
+        params={"time": 0.0},
+        metadata={"instrument_session": session, "user": user},
+    )
+
+
+def test_fair_share_interleaves_sessions_and_users(context: BlueskyContext) -> None:
+    worker = TaskWorker(context, start_stop_timeout=2.0, fair_share=True)
+    flood = [worker.submit_task(_sleep_for("cm1", "jd1")) for _ in range(3)]
+    other_user = worker.submit_task(_sleep_for("cm1", "jd2"))
+    other_session = worker.submit_task(_sleep_for("cm2", "jd3"))
+    for task_id in [*flood, other_user, other_session]:
+        worker.enqueue_task(task_id)
+
+    assert [task.task_id for task in worker.get_queue()] == [
+        flood[0],
+        other_session,
+        other_user,
+        flood[1],
+        flood[2],
+    ]
+
+    events: Future[list[WorkerEvent]] = take_events(
+        worker.worker_events,
+        lambda event: event.is_complete() and worker.get_queue() == [],
+    )
+    worker.start()
+    try:
+        events.result(timeout=5.0)
+    finally:
+        worker.stop()
+    shares = {(s.instrument_session, s.user): s for s in worker.party_shares()}
+    assert set(shares) == {("cm1", "jd1"), ("cm1", "jd2"), ("cm2", "jd3")}
+    assert shares[("cm1", "jd1")].waits.count == 3
+    assert sum(share.share for share in shares.values()) == pytest.approx(1.0)
+    assert all(share.queued == 0 for share in shares.values())
+
+
+def test_queue_order_kept_without_fair_share(inert_worker: TaskWorker) -> None:
+    task_ids = [
+        inert_worker.submit_task(_sleep_for(session, "jd1"))
+        for session in ("cm1", "cm1", "cm2")
+    ]
+    for task_id in task_ids:
+        inert_worker.enqueue_task(task_id)
+    assert [task.task_id for task in inert_worker.get_queue()] == task_ids
+    assert [share.queued for share in inert_worker.party_shares()] == [2, 1]
+
+
+@pytest.fixture
+def preempting_worker(context: BlueskyContext) -> Iterable[TaskWorker]:
+    context.register_plan(checkpointed_plan)
+    worker = TaskWorker(context, start_stop_timeout=2.0, preemption=True)
+    worker.start()
+    yield worker
+    worker.stop()
+
+
+def test_higher_priority_task_preempts_running_task(
+    preempting_worker: TaskWorker,
+) -> None:
+    low = preempting_worker.submit_task(
+        Task(name="checkpointed_plan", params={"steps": 20, "delay": 0.1})
+    )
+    high = preempting_worker.submit_task(
+        Task(name="sleep", params={"time": 0.0}, priority=1)
+    )
+    events: Future[list[WorkerEvent]] = take_events(
+        preempting_worker.worker_events,
+        lambda event: event.is_complete() and event.task_id == low,
+    )
+    preempting_worker.enqueue_task(low)
+    _wait_for_status(preempting_worker, low, TaskStatusEnum.RUNNING)
+    preempting_worker.enqueue_task(high)
+
+    completed = [
+        event.task_id for event in events.result(timeout=10.0) if event.is_complete()
+    ]
+    assert completed == [high, low]
+    assert _get_task(preempting_worker, low).outcome == TaskResult(
+        result=20, type="int"
+    )
+    assert not _get_task(preempting_worker, high).errors
+    assert list(preempting_worker.queue_wait_stats()) == [1, 0]
+
+
+def test_no_preemption_by_default(worker: TaskWorker, context: BlueskyContext) -> None:
+    context.register_plan(checkpointed_plan)
+    low = worker.submit_task(
+        Task(name="checkpointed_plan", params={"steps": 10, "delay": 0.05})
+    )
+    high = worker.submit_task(Task(name="sleep", params={"time": 0.0}, priority=1))
+    events: Future[list[WorkerEvent]] = take_events(
+        worker.worker_events,
+        lambda event: event.is_complete() and event.task_id == high,
+    )
+    worker.enqueue_task(low)
+    _wait_for_status(worker, low, TaskStatusEnum.RUNNING)
+    worker.enqueue_task(high)
+
+    completed = [
+        event.task_id for event in events.result(timeout=10.0) if event.is_complete()
+    ]
+    assert completed == [low, high]
+
+
+def test_resume_refused_while_preempted(inert_worker: TaskWorker) -> None:
+    inert_worker._preempted = TrackableTask(task_id="0", task=_SIMPLE_TASK)
+    with patch.object(inert_worker._ctx.run_engine, "resume") as resume:
+        with pytest.raises(TransitionError, match="higher priority"):
+            inert_worker.resume()
+    resume.assert_not_called()
+
+
+def test_preemption_checked_on_a_single_thread(
+    preempting_worker: TaskWorker,
+) -> None:
+    preempting_worker._queue.append("queued")
+    threads = threading.active_count()
+    with patch.object(preempting_worker, "_dispatch_next_queued_task") as dispatch:
+        for _ in range(3):
+            preempting_worker._on_state_change("running", "idle")
+        deadline = time.monotonic() + 5.0
+        while not dispatch.called:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+    preempting_worker._queue.clear()
+    assert threading.active_count() == threads
+
+
+@pytest.fixture
+def polling_devices(context: BlueskyContext) -> list[PollingFakeDevice]:
+    devices = [PollingFakeDevice("polling_a"), PollingFakeDevice("polling_b")]
+    for device in devices:
+        context.register_device(device)
+    return devices
+
+
+@pytest.fixture
+def parallel_worker(
+    context: BlueskyContext, polling_devices: list[PollingFakeDevice]
+) -> Iterable[TaskWorker]:
+    worker = TaskWorker(context, start_stop_timeout=2.0, parallel_run_engines=1)
+    worker.start()
+    yield worker
+    for device in polling_devices:
+        device.event.set()
+    worker.stop()
+
+
+def _move(device: str) -> Task:
+    return Task(name="set_absolute", params={"movable": device, "value": 1.0})
+
+
+def _wait_for_status(
+    worker: TaskWorker, task_id: str, status: TaskStatusEnum, timeout: float = 5.0
+) -> None:
+    deadline = time.monotonic() + timeout
+    while _get_task(worker, task_id).status is not status:
+        assert time.monotonic() < deadline, f"Task {task_id} never became {status}"
+        time.sleep(0.01)
+
+
+def test_tasks_on_different_devices_run_in_parallel(
+    parallel_worker: TaskWorker, polling_devices: list[PollingFakeDevice]
+) -> None:
+    first = parallel_worker.submit_task(_move("polling_a"))
+    second = parallel_worker.submit_task(_move("polling_b"))
+    parallel_worker.enqueue_task(first)
+    parallel_worker.enqueue_task(second)
+
+    _wait_for_status(parallel_worker, first, TaskStatusEnum.RUNNING)
+    _wait_for_status(parallel_worker, second, TaskStatusEnum.RUNNING)
+    assert parallel_worker._leases.leases() == {
+        first: frozenset({"polling_a"}),
+        second: frozenset({"polling_b"}),
+    }
+    for device in polling_devices:
+        device.event.set()
+    _wait_for_status(parallel_worker, first, TaskStatusEnum.COMPLETE)
+    _wait_for_status(parallel_worker, second, TaskStatusEnum.COMPLETE)
+    assert parallel_worker._leases.leases() == {}
+    assert not _get_task(parallel_worker, second).errors
+
+
+def test_tasks_sharing_a_device_do_not_run_in_parallel(
+    parallel_worker: TaskWorker, polling_devices: list[PollingFakeDevice]
+) -> None:
+    device = polling_devices[0]
+    first = parallel_worker.submit_task(_move("polling_a"))
+    second = parallel_worker.submit_task(_move("polling_a"))
+    parallel_worker.enqueue_task(first)
+    parallel_worker.enqueue_task(second)
+
+    _wait_for_status(parallel_worker, first, TaskStatusEnum.RUNNING)
+    time.sleep(0.2)
+    assert _get_task(parallel_worker, second).status is TaskStatusEnum.PENDING
+    assert [task.task_id for task in parallel_worker.get_queue()] == [second]
+    device.event.set()
+    _wait_for_status(parallel_worker, second, TaskStatusEnum.RUNNING)
+    device.event.set()
+    _wait_for_status(parallel_worker, second, TaskStatusEnum.COMPLETE)
+
+
+def test_task_with_unknown_devices_waits_for_main_run_engine(
+    parallel_worker: TaskWorker, polling_devices: list[PollingFakeDevice]
+) -> None:
+    main = parallel_worker.submit_task(_move("polling_a"))
+    parallel_worker.enqueue_task(main)
+    _wait_for_status(parallel_worker, main, TaskStatusEnum.RUNNING)
+    unknown = parallel_worker.submit_task(_move("polling_b"))
+    with patch.object(
+        parallel_worker, "_prepared_params_for", side_effect=ValueError("Invalid")
+    ):
+        parallel_worker.enqueue_task(unknown)
+        time.sleep(0.2)
+        # Not given to the idle parallel RunEngine
+        assert _get_task(parallel_worker, unknown).status is TaskStatusEnum.PENDING
+        polling_devices[0].event.set()
+        _wait_for_status(parallel_worker, unknown, TaskStatusEnum.RUNNING)
+    polling_devices[1].event.set()
+    _wait_for_status(parallel_worker, unknown, TaskStatusEnum.COMPLETE)
+
+
+def test_begin_task_fails_if_device_leased(
+    parallel_worker: TaskWorker, polling_devices: list[PollingFakeDevice]
+) -> None:
+    main = parallel_worker.submit_task(_move("polling_a"))
+    lane = parallel_worker.submit_task(_move("polling_b"))
+    parallel_worker.enqueue_task(main)
+    parallel_worker.enqueue_task(lane)
+    _wait_for_status(parallel_worker, lane, TaskStatusEnum.RUNNING)
+    polling_devices[0].event.set()
+    _wait_for_status(parallel_worker, main, TaskStatusEnum.COMPLETE)
+
+    conflicting = parallel_worker.submit_task(_move("polling_b"))
+    with pytest.raises(WorkerBusyError, match="polling_b"):
+        parallel_worker.begin_task(conflicting)
+    free = parallel_worker.submit_task(_move("polling_a"))
+    parallel_worker.begin_task(free)
+    assert parallel_worker.get_active_task() == parallel_worker.get_task_by_id(free)
+
+
+def _leave_running_in_lane(
+    worker: TaskWorker, polling_devices: list[PollingFakeDevice], task: Task
+) -> str:
+    """Run a task in a parallel RunEngine, returning once the main one is idle"""
+    main = worker.submit_task(_move("polling_a"))
+    lane = worker.submit_task(task)
+    worker.enqueue_task(main)
+    worker.enqueue_task(lane)
+    _wait_for_status(worker, lane, TaskStatusEnum.RUNNING)
+    polling_devices[0].event.set()
+    _wait_for_status(worker, main, TaskStatusEnum.COMPLETE)
+    return lane
+
+
+def test_parallel_task_paths_from_its_own_runs(
+    parallel_worker: TaskWorker,
+    context: BlueskyContext,
+    polling_devices: list[PollingFakeDevice],
+) -> None:
+    path_provider = StartDocumentPathProvider()
+    context.run_engine.subscribe(path_provider.run_start, "start")
+    context.run_engine.subscribe(path_provider.run_stop, "stop")
+    context.path_provider = path_provider
+    filenames = []
+
+    def path_plan() -> MsgGenerator:
+        async def find_path():
+            filenames.append(path_provider("det").filename)
+
+        yield from bps.open_run({"detector_file_template": "lane-{device_name}"})
+        yield from bps.wait_for([find_path])
+        yield from bps.close_run()
+
+    context.register_plan(path_plan)
+    main = parallel_worker.submit_task(_move("polling_a"))
+    lane = parallel_worker.submit_task(Task(name="path_plan"))
+    parallel_worker.enqueue_task(main)
+    parallel_worker.enqueue_task(lane)
+    # Completes while the main RunEngine is still busy
+    _wait_for_status(parallel_worker, lane, TaskStatusEnum.COMPLETE)
+    polling_devices[0].event.set()
+
+    assert not _get_task(parallel_worker, lane).errors
+    assert filenames == ["lane-det"]
+
+
+def _wait_for_state(worker: TaskWorker, state: WorkerState) -> None:
+    deadline = time.monotonic() + 5.0
+    while worker.state is not state:
+        assert time.monotonic() < deadline, f"Worker never became {state}"
+        time.sleep(0.01)
+
+
+def test_parallel_task_paused_and_resumed(
+    context: BlueskyContext,
+    parallel_worker: TaskWorker,
+    polling_devices: list[PollingFakeDevice],
+) -> None:
+    context.register_plan(checkpointed_plan)
+    lane = _leave_running_in_lane(
+        parallel_worker,
+        polling_devices,
+        Task(name="checkpointed_plan", params={"steps": 20, "delay": 0.05}),
+    )
+    assert parallel_worker.state is WorkerState.RUNNING
+
+    parallel_worker.pause()
+    _wait_for_state(parallel_worker, WorkerState.PAUSED)
+    time.sleep(0.2)
+    assert _get_task(parallel_worker, lane).status is TaskStatusEnum.RUNNING
+
+    parallel_worker.resume()
+    _wait_for_status(parallel_worker, lane, TaskStatusEnum.COMPLETE)
+    task = _get_task(parallel_worker, lane)
+    assert not task.errors
+    assert task.outcome == TaskResult(result=20, type="int")
+    assert parallel_worker.state is WorkerState.IDLE
+
+
+def test_cancel_stops_tasks_in_every_run_engine(
+    parallel_worker: TaskWorker,
+) -> None:
+    main = parallel_worker.submit_task(_move("polling_a"))
+    lane = parallel_worker.submit_task(_move("polling_b"))
+    parallel_worker.enqueue_task(main)
+    parallel_worker.enqueue_task(lane)
+    _wait_for_status(parallel_worker, main, TaskStatusEnum.RUNNING)
+    _wait_for_status(parallel_worker, lane, TaskStatusEnum.RUNNING)
+
+    assert parallel_worker.cancel_active_task(failure=True, reason="Test") == main
+    _wait_for_status(parallel_worker, main, TaskStatusEnum.COMPLETE)
+    _wait_for_status(parallel_worker, lane, TaskStatusEnum.COMPLETE)
+
+
+def test_cancel_only_given_task(
+    parallel_worker: TaskWorker, polling_devices: list[PollingFakeDevice]
+) -> None:
+    main = parallel_worker.submit_task(_move("polling_a"))
+    lane = parallel_worker.submit_task(_move("polling_b"))
+    parallel_worker.enqueue_task(main)
+    parallel_worker.enqueue_task(lane)
+    _wait_for_status(parallel_worker, lane, TaskStatusEnum.RUNNING)
+
+    assert parallel_worker.cancel_active_task(task_id=lane) == lane
+    _wait_for_status(parallel_worker, lane, TaskStatusEnum.COMPLETE)
+    assert _get_task(parallel_worker, main).status is TaskStatusEnum.RUNNING
+    polling_devices[0].event.set()
+    _wait_for_status(parallel_worker, main, TaskStatusEnum.COMPLETE)
+    assert not _get_task(parallel_worker, main).errors
+
+
+def test_cancel_without_running_tasks_fails(parallel_worker: TaskWorker) -> None:
+    with pytest.raises(TransitionError):
+        parallel_worker.cancel_active_task()
+
+
+def test_watchdog_aborts_stalled_parallel_task(
+    context: BlueskyContext, polling_devices: list[PollingFakeDevice]
+) -> None:
+    worker = TaskWorker(
+        context,
+        start_stop_timeout=2.0,
+        parallel_run_engines=1,
+        watchdog=WatchdogConfig(message_warning=0.1, abort_after=0.3, interval=0.02),
+    )
+    events: list[WorkerEvent] = []
+    worker.worker_events.subscribe(lambda event, _: events.append(event))
+    worker.start()
+    try:
+        lane = _leave_running_in_lane(worker, polling_devices, _move("polling_b"))
+        _wait_for_status(worker, lane, TaskStatusEnum.COMPLETE)
+    finally:
+        for device in polling_devices:
+            device.event.set()
+        worker.stop()
+
+    lane_events = [
+        event
+        for event in events
+        if event.task_status is not None and event.task_status.task_id == lane
+    ]
+    warnings = max((event.warnings for event in lane_events), key=len)
+    assert len(warnings) == 2
+    assert all(
+        warning.startswith("RunEngine has been processing a wait message")
+        for warning in warnings
+    )
+
+
+def test_parallel_task_documents_batched_into_event_pages(
+    context: BlueskyContext, polling_devices: list[PollingFakeDevice], path_provider
+) -> None:
+    worker = TaskWorker(
+        context, start_stop_timeout=2.0, parallel_run_engines=1, event_page_size=10
+    )
+    data_events: list[DataEvent] = []
+    worker.data_events.subscribe(lambda event, _: data_events.append(event))
+    worker.start()
+    try:
+        main = worker.submit_task(_move("polling_a"))
+        lane = worker.submit_task(
+            Task(name="count", params={"detectors": ["motor"], "num": 3})
+        )
+        worker.enqueue_task(main)
+        worker.enqueue_task(lane)
+        _wait_for_status(worker, lane, TaskStatusEnum.COMPLETE)
+    finally:
+        for device in polling_devices:
+            device.event.set()
+        worker.stop()
+
+    lane_events = [event for event in data_events if event.task_id == lane]
+    assert [event.name for event in lane_events] == [
+        "start",
+        "descriptor",
+        "event_page",
+        "stop",
+    ]
+
+
+def test_status_updates_are_throttled(context: BlueskyContext) -> None:
+    worker = TaskWorker(context, max_progress_rate=1.0)
+    worker._current = TrackableTask(task_id="0", task=_SIMPLE_TASK)
+    events: list[ProgressEvent] = []
+    worker.progress_events.subscribe(lambda event, _: events.append(event))
+    status = Mock(done=False)
+
+    for value in range(10):
+        worker._on_status_event(status, "status", current=float(value))
+    status.done = True
+    worker._on_status_event(status, "status", current=10.0)
+
+    assert [event.statuses["status"].current for event in events] == [0.0, 10.0]
+    assert events[-1].statuses["status"].done
+    assert worker.progress_events_published == 2
+    assert worker.progress_updates_merged == 9
+    assert worker._current.resources.progress_updates == 2
+
+
+def test_held_back_status_update_dropped_once_task_finished(
+    context: BlueskyContext,
+) -> None:
+    worker = TaskWorker(context, max_progress_rate=1.0)
+    task = TrackableTask(task_id="0", task=_SIMPLE_TASK)
+    worker._current = task
+    events: list[ProgressEvent] = []
+    worker.progress_events.subscribe(lambda event, _: events.append(event))
+
+    worker._on_status_event(Mock(done=False), "status", current=0.0)
+    worker._on_status_event(Mock(done=False), "status", current=1.0)
+    task.is_complete = True
+    # As the throttle's timer would once the interval has passed
+    worker._progress_throttle._publish_pending()
+
+    assert [event.statuses["status"].current for event in events] == [0.0]
+    assert task.resources.progress_updates == 1
+
+
+def test_status_snapshot_without_task_ignored(inert_worker: TaskWorker) -> None:
+    events: list[ProgressEvent] = []
+    inert_worker.progress_events.subscribe(lambda event, _: events.append(event))
+    inert_worker._publish_status_snapshot()
+    assert events == []
+
+
+def test_status_updates_unthrottled_by_default(inert_worker: TaskWorker) -> None:
+    inert_worker._current = TrackableTask(task_id="0", task=_SIMPLE_TASK)
+    events: list[ProgressEvent] = []
+    inert_worker.progress_events.subscribe(lambda event, _: events.append(event))
+
+    for value in range(3):
+        inert_worker._on_status_event(Mock(done=False), "status", current=value)
+
+    assert [event.statuses["status"].current for event in events] == [0, 1, 2]
+    assert inert_worker.progress_updates_merged == 0
+
+
+def test_status_updates_delta_encoded(context: BlueskyContext) -> None:
+    worker = TaskWorker(context, progress_deltas=True, progress_snapshot_interval=3)
+    worker._current = TrackableTask(task_id="0", task=_SIMPLE_TASK)
+    events: list[ProgressEvent] = []
+    worker.progress_events.subscribe(lambda event, _: events.append(event))
+    first, second = Mock(done=False), Mock(done=False)
+
+    worker._on_status_event(first, "first", current=0.0)
+    worker._on_status_event(second, "second", current=0.0)
+    worker._on_status_event(first, "first", current=1.0)
+    del worker._status_snapshot["second"]
+    worker._on_status_event(first, "first", current=2.0)
+
+    assert [event.sequence for event in events] == [0, 1, 2, 3]
+    assert [event.snapshot for event in events] == [True, False, False, True]
+    assert [set(event.statuses) for event in events] == [
+        {"first"},
+        {"second"},
+        {"first"},
+        {"first"},
+    ]
+    assert events[2].removed == []
+
+    view = ProgressView()
+    rebuilt = [view.apply(event) for event in events[:3]]
+    assert rebuilt[-1] is not None
+    assert {name: status.current for name, status in rebuilt[-1].statuses.items()} == {
+        "first": 1.0,
+        "second": 0.0,
+    }
+
+
+def test_status_delta_lists_removed_statuses(context: BlueskyContext) -> None:
+    worker = TaskWorker(context, progress_deltas=True)
+    worker._current = TrackableTask(task_id="0", task=_SIMPLE_TASK)
+    events: list[ProgressEvent] = []
+    worker.progress_events.subscribe(lambda event, _: events.append(event))
+
+    worker._on_status_event(Mock(done=False), "first", current=0.0)
+    worker._on_status_event(Mock(done=False), "second", current=0.0)
+    del worker._status_snapshot["first"]
+    worker._on_status_event(Mock(done=False), "second", current=1.0)
+
+    assert events[-1].removed == ["first"]
+    assert not events[-1].snapshot
+
+
+def test_status_updates_not_delta_encoded_by_default(
+    inert_worker: TaskWorker,
+) -> None:
+    inert_worker._current = TrackableTask(task_id="0", task=_SIMPLE_TASK)
+    events: list[ProgressEvent] = []
+    inert_worker.progress_events.subscribe(lambda event, _: events.append(event))
+
+    inert_worker._on_status_event(Mock(done=False), "first", current=0.0)
+    inert_worker._on_status_event(Mock(done=False), "second", current=0.0)
+
+    assert all(event.snapshot and event.sequence is None for event in events)
+    assert set(events[-1].statuses) == {"first", "second"}
+
+
+@pytest.mark.parametrize(
+    "policy,progress_overflow,other_overflow",
+    [
+        (EventDropPolicy.BLOCK, OverflowPolicy.BLOCK, OverflowPolicy.BLOCK),
+        (
+            EventDropPolicy.DROP_PROGRESS,
+            OverflowPolicy.DROP_OLDEST,
+            OverflowPolicy.BLOCK,
+        ),
+        (
+            EventDropPolicy.DROP_OLDEST,
+            OverflowPolicy.DROP_OLDEST,
+            OverflowPolicy.DROP_OLDEST,
+        ),
+    ],
+)
+def test_event_drop_policy(
+    context: BlueskyContext,
+    policy: EventDropPolicy,
+    progress_overflow: OverflowPolicy,
+    other_overflow: OverflowPolicy,
+) -> None:
+    worker = TaskWorker(
+        context, asynchronous_events=True, event_queue_size=5, event_drop_policy=policy
+    )
+    assert worker._progress_events._overflow is progress_overflow
+    assert worker._worker_events._overflow is other_overflow
+    assert worker._data_events._overflow is other_overflow
+    assert worker._data_events._max_queue_size == 5
+
+
+def test_asynchronous_events_delivered(context: BlueskyContext) -> None:
+    worker = TaskWorker(context, asynchronous_events=True)
+    worker._current = TrackableTask(task_id="0", task=_SIMPLE_TASK)
+    events: list[ProgressEvent] = []
+    worker.progress_events.subscribe(lambda event, _: events.append(event))
+
+    for value in range(3):
+        worker._on_status_event(Mock(done=False), "status", current=value)
+    worker._progress_events.flush()
+
+    assert [event.statuses["status"].current for event in events] == [0, 1, 2]
+    stats = worker.event_subscription_stats()
+    assert [(s.lag, s.dropped, s.delivered) for s in stats["progress"].values()] == [
+        (0, 0, 3)
+    ]
+    assert stats["worker"] == stats["data"] == {}
+
+
+def test_asynchronous_documents_delivered_before_completion(
+    context: BlueskyContext,
+) -> None:
+    worker = TaskWorker(context, asynchronous_events=True)
+    received: list[Any] = []
+
+    def slow(event: Any, _: str | None) -> None:
+        # Data is delivered by a thread of its own, which falls behind
+        time.sleep(0.05)
+        received.append(event)
+
+    worker.data_events.subscribe(slow)
+    worker.worker_events.subscribe(lambda event, _: received.append(event))
+    worker.start()
+    try:
+        task_id = worker.submit_task(
+            Task(name="count", params={"detectors": ["motor"], "num": 1})
+        )
+        worker.begin_task(task_id)
+        _wait_until(lambda: any(_is_completion(event) for event in received))
+    finally:
+        worker.stop()
+
+    completion = next(i for i, event in enumerate(received) if _is_completion(event))
+    stops = [
+        i
+        for i, event in enumerate(received)
+        if isinstance(event, DataEvent) and event.name == "stop"
+    ]
+    assert stops and stops[0] < completion
+
+
+def _is_completion(event: Any) -> bool:
+    return isinstance(event, WorkerEvent) and event.is_complete()
+
+
+def _wait_until(condition: Callable[[], bool], timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def _complete_tasks(worker: TaskWorker, *task_ids: str, age: float = 0.0) -> None:
+    for task_id in task_ids:
+        worker._tasks.add(
+            TrackableTask(
+                task_id=task_id, task=_SIMPLE_TASK, is_complete=True, is_pending=False
+            )
+        )
+        worker._completion_times[task_id] = time.monotonic() - age
+
+
+def test_completed_tasks_retained_by_default(inert_worker: TaskWorker) -> None:
+    _complete_tasks(inert_worker, "0", "1", "2", age=1e6)
+    assert inert_worker.evict_completed_tasks() == []
+    assert inert_worker.retained_task_count == 3
+    assert inert_worker.evicted_task_count == 0
+
+
+def test_evict_tasks_beyond_max_count(context: BlueskyContext) -> None:
+    worker = TaskWorker(context, retention=TaskRetentionConfig(max_count=2))
+    _complete_tasks(worker, "0", "1", "2")
+    assert worker.evict_completed_tasks() == ["0"]
+    assert worker.retained_task_count == 2
+    assert worker.evicted_task_count == 1
+
+
+@patch("blueapi.worker.task_worker.RETAINED_TASKS")
+@patch("blueapi.worker.task_worker.EVICTED_TASKS")
+def test_eviction_metrics(
+    evicted: Mock, retained: Mock, context: BlueskyContext
+) -> None:
+    worker = TaskWorker(context, retention=TaskRetentionConfig(max_count=1))
+    _complete_tasks(worker, "0", "1", "2")
+    worker.evict_completed_tasks()
+    evicted.add.assert_called_once_with(2)
+    retained.set.assert_called_once_with(1)
+
+    worker.evict_completed_tasks()
+    evicted.add.assert_called_once_with(2)
+    retained.set.assert_called_with(1)
+
+
+def test_evict_least_recently_used_task_first(context: BlueskyContext) -> None:
+    worker = TaskWorker(context, retention=TaskRetentionConfig(max_count=2))
+    _complete_tasks(worker, "0", "1", "2")
+    worker.get_task_by_id("0")
+    assert worker.evict_completed_tasks() == ["1"]
+    assert [task.task_id for task in worker.get_tasks(TaskStatusEnum.COMPLETE)] == [
+        "2",
+        "0",
+    ]
+
+
+def test_evict_expired_tasks(context: BlueskyContext) -> None:
+    worker = TaskWorker(context, retention=TaskRetentionConfig(max_age=60.0))
+    _complete_tasks(worker, "0", age=120.0)
+    _complete_tasks(worker, "1")
+    assert worker.evict_completed_tasks() == ["0"]
+    assert [task.task_id for task in worker.get_tasks()] == ["1"]
+
+
+def test_evict_tasks_beyond_max_bytes(context: BlueskyContext) -> None:
+    task_size = len(
+        TrackableTask(
+            task_id="0", task=_SIMPLE_TASK, is_complete=True, is_pending=False
+        ).model_dump_json()
+    )
+    worker = TaskWorker(context, retention=TaskRetentionConfig(max_bytes=2 * task_size))
+    _complete_tasks(worker, "0", "1", "2")
+    assert worker.evict_completed_tasks() == ["0"]
+    assert worker.evicted_task_count == 1
+
+
+def test_clear_task_forgets_retention_data(context: BlueskyContext) -> None:
+    worker = TaskWorker(context, retention=TaskRetentionConfig(max_count=1))
+    _complete_tasks(worker, "0")
+    worker.clear_task("0")
+    assert worker._completion_times == {}
+    assert worker.evict_completed_tasks() == []
+
+
+def test_completed_tasks_evicted_off_worker_thread(context: BlueskyContext) -> None:
+    worker = TaskWorker(
+        context, start_stop_timeout=2.0, retention=TaskRetentionConfig(max_count=1)
+    )
+    evicting_threads: list[str] = []
+    evict = worker.evict_completed_tasks
+
+    def record_thread() -> list[str]:
+        evicting_threads.append(threading.current_thread().name)
+        return evict()
+
+    worker.evict_completed_tasks = record_thread  # type: ignore
+    worker.start()
+    try:
+        for _ in range(2):
+            begin_task_and_wait_until_complete(worker, worker.submit_task(_SIMPLE_TASK))
+        deadline = time.monotonic() + 5.0
+        while worker.evicted_task_count < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        worker.stop()
+    assert worker.evicted_task_count == 1
+    assert worker.retained_task_count == 1
+    assert set(evicting_threads) == {"task-eviction"}
+
+
 def test_metadata_passed_to_context(context: BlueskyContext):
     context.run_engine = Mock()
     context.run_engine.md = {}
@@ -428,6 +1545,102 @@ def test_metadata_passed_to_context(context: BlueskyContext):
         assert metadata in context.run_engine.md.items()
 
 
+def test_params_validated_once_per_task(worker: TaskWorker) -> None:
+    task_id = worker.submit_task(_SIMPLE_TASK)
+    with patch.object(Task, "prepare_params") as prepare_params:
+        events = begin_task_and_wait_until_complete(worker, task_id)
+    prepare_params.assert_not_called()
+    assert not events[-1].is_error()
+    assert task_id not in worker._prepared_params
+
+
+def test_params_revalidated_if_context_changed(
+    worker: TaskWorker, context: BlueskyContext
+) -> None:
+    task_id = worker.submit_task(_SIMPLE_TASK)
+    context.register_device(FakeDevice("late_device"))
+    with patch.object(
+        Task, "prepare_params", return_value={"time": 0.0}
+    ) as prepare_params:
+        begin_task_and_wait_until_complete(worker, task_id)
+    prepare_params.assert_called_once_with(context)
+
+
+def test_stage_next_task_revalidates_if_context_changed(
+    inert_worker: TaskWorker, context: BlueskyContext
+) -> None:
+    task_ids = [inert_worker.submit_task(_SIMPLE_TASK) for _ in range(2)]
+    for task_id in task_ids:
+        inert_worker.enqueue_task(task_id)
+    context.register_device(FakeDevice("late_device"))
+
+    staged = inert_worker.stage_next_task()
+
+    assert staged is not None and staged.task_id == task_ids[0]
+    assert inert_worker._prepared_params[task_ids[0]][0] == context.generation
+    assert inert_worker._prepared_params[task_ids[1]][0] != context.generation
+    with patch.object(Task, "prepare_params") as prepare_params:
+        inert_worker.stage_next_task()
+    prepare_params.assert_not_called()
+
+
+def test_stage_next_task_with_empty_queue(inert_worker: TaskWorker) -> None:
+    assert inert_worker.stage_next_task() is None
+
+
+def test_stage_next_task_with_invalid_params(
+    inert_worker: TaskWorker, context: BlueskyContext
+) -> None:
+    task_id = inert_worker.submit_task(_SIMPLE_TASK)
+    inert_worker.enqueue_task(task_id)
+    context.register_device(FakeDevice("late_device"))
+    with patch.object(Task, "prepare_params", side_effect=ValueError("bad")):
+        staged = inert_worker.stage_next_task()
+    assert staged is not None and staged.task_id == task_id
+
+
+def test_stage_next_task_validates_without_holding_queue(
+    inert_worker: TaskWorker, context: BlueskyContext
+) -> None:
+    task_id = inert_worker.submit_task(_SIMPLE_TASK)
+    inert_worker.enqueue_task(task_id)
+    context.register_device(FakeDevice("late_device"))
+
+    def prepare_params(ctx: BlueskyContext) -> dict[str, Any]:
+        # The queue can still be used from other threads meanwhile
+        with ThreadPoolExecutor(1) as executor:
+            assert executor.submit(inert_worker.get_queue).result(timeout=5)
+        return {"time": 0.0}
+
+    with patch.object(Task, "prepare_params", side_effect=prepare_params):
+        staged = inert_worker.stage_next_task()
+    assert staged is not None and staged.task_id == task_id
+
+
+def test_stage_next_task_dispatched_while_validating(
+    inert_worker: TaskWorker, context: BlueskyContext
+) -> None:
+    task_id = inert_worker.submit_task(_SIMPLE_TASK)
+    inert_worker.enqueue_task(task_id)
+    context.register_device(FakeDevice("late_device"))
+    task = _get_task(inert_worker, task_id)
+
+    def prepare_params(ctx: BlueskyContext) -> dict[str, Any]:
+        inert_worker._tasks.set_status(task, TaskStatusEnum.RUNNING)
+        return {"time": 0.0}
+
+    with patch.object(Task, "prepare_params", side_effect=prepare_params):
+        inert_worker.stage_next_task()
+    assert task_id not in inert_worker._prepared_params
+
+
+def test_prepared_params_forgotten_when_task_cleared(inert_worker: TaskWorker) -> None:
+    task_id = inert_worker.submit_task(_SIMPLE_TASK)
+    assert task_id in inert_worker._prepared_params
+    inert_worker.clear_task(task_id)
+    assert task_id not in inert_worker._prepared_params
+
+
 #
 # Worker helpers
 #
@@ -516,6 +1729,295 @@ def test_worker_and_data_events_produce_in_order(
     )
 
 
+def test_data_events_batched_into_event_pages(
+    context: BlueskyContext, path_provider
+) -> None:
+    worker = TaskWorker(context, event_page_size=10)
+    data_events: list[DataEvent] = []
+    worker.data_events.subscribe(lambda event, _: data_events.append(event))
+    worker.start()
+    try:
+        task_id = worker.submit_task(
+            Task(name="count", params={"detectors": ["motor"], "num": 3})
+        )
+        begin_task_and_wait_until_complete(worker, task_id)
+    finally:
+        worker.stop()
+
+    assert [event.name for event in data_events] == [
+        "start",
+        "descriptor",
+        "event_page",
+        "stop",
+    ]
+    assert data_events[2].doc["seq_num"] == [1, 2, 3]
+    assert {event.task_id for event in data_events} == {task_id}
+
+
+def test_timeline_records_each_phase(context: BlueskyContext, path_provider) -> None:
+    worker = TaskWorker(context)
+    worker.start()
+    try:
+        task_id = worker.submit_task(
+            Task(name="count", params={"detectors": ["motor"], "num": 3})
+        )
+        begin_task_and_wait_until_complete(worker, task_id)
+    finally:
+        worker.stop()
+
+    timeline = _get_task(worker, task_id).timeline
+    phases = [
+        timeline.submitted,
+        timeline.validated,
+        timeline.dispatched,
+        timeline.run_engine_started,
+        timeline.first_document,
+        timeline.last_document,
+        timeline.completed,
+    ]
+    assert None not in phases
+    assert phases == sorted(phases)  # type: ignore
+
+
+def test_timeline_without_documents(worker: TaskWorker) -> None:
+    task_id = worker.submit_task(_SIMPLE_TASK)
+    worker.enqueue_task(task_id)
+    _wait_for_status(worker, task_id, TaskStatusEnum.COMPLETE)
+    timeline = _get_task(worker, task_id).timeline
+    assert timeline.dispatched is not None
+    assert timeline.completed is not None
+    assert timeline.first_document is None
+    assert timeline.last_document is None
+
+
+def test_resources_attached_to_task(context: BlueskyContext, path_provider) -> None:
+    worker = TaskWorker(context)
+    worker.start()
+    try:
+        task_id = worker.submit_task(
+            Task(name="count", params={"detectors": ["motor"], "num": 3})
+        )
+        begin_task_and_wait_until_complete(worker, task_id)
+    finally:
+        worker.stop()
+
+    resources = _get_task(worker, task_id).resources
+    assert resources.documents == {"start": 1, "descriptor": 1, "event": 3, "stop": 1}
+    assert resources.cpu_time > 0.0
+    assert resources.peak_rss_increase >= 0
+    assert resources.gc_pause_time >= 0.0
+
+
+def test_messages_profiled(context: BlueskyContext, path_provider) -> None:
+    worker = TaskWorker(context, profile_messages=True)
+    worker.start()
+    try:
+        task_id = worker.submit_task(
+            Task(name="count", params={"detectors": ["motor"], "num": 2})
+        )
+        begin_task_and_wait_until_complete(worker, task_id)
+    finally:
+        worker.stop()
+
+    profile = worker.get_task_profile(task_id)
+    assert profile is not None
+    assert profile.commands["read"].count == 2
+    assert profile.commands["open_run"].count == 1
+    assert "motor" in [device.name for device in profile.devices]
+    assert context.run_engine.msg_hook is None
+    worker.clear_task(task_id)
+    assert worker.get_task_profile(task_id) is None
+
+
+def test_messages_not_profiled_by_default(worker: TaskWorker) -> None:
+    task_id = worker.submit_task(_SIMPLE_TASK)
+    begin_task_and_wait_until_complete(worker, task_id)
+    assert worker.get_task_profile(task_id) is None
+
+
+def test_pending_tasks_estimated_from_earlier_runs(
+    context: BlueskyContext, path_provider
+) -> None:
+    worker = TaskWorker(context, estimation=EstimationConfig(enabled=True))
+    count = Task(name="count", params={"detectors": ["motor"], "num": 2})
+    first = worker.submit_task(count)
+    pending = worker.submit_task(count)
+    _wait_for_estimates(worker)
+
+    estimate = _get_task(worker, first).estimate
+    assert estimate is not None
+    assert estimate.messages > 0
+    assert estimate.unmodelled == estimate.messages
+    assert estimate.duration == 0.0
+
+    worker.start()
+    try:
+        begin_task_and_wait_until_complete(worker, first)
+    finally:
+        worker.stop()
+
+    estimate = _get_task(worker, pending).estimate
+    assert estimate is not None
+    assert estimate.unmodelled == 0
+    assert estimate.duration > 0.0
+    assert context.run_engine.msg_hook is None
+    assert pending in worker._dry_runs
+    assert first not in worker._dry_runs
+
+
+def test_sleeps_estimated_without_earlier_runs(inert_worker: TaskWorker) -> None:
+    worker = TaskWorker(inert_worker._ctx, estimation=EstimationConfig(enabled=True))
+    task_id = worker.submit_task(_LONG_TASK)
+    _wait_for_estimates(worker)
+    estimate = _get_task(worker, task_id).estimate
+    assert estimate is not None
+    assert estimate.duration == 1.0
+    worker.clear_task(task_id)
+    assert task_id not in worker._dry_runs
+
+
+def test_submission_does_not_wait_for_estimate(inert_worker: TaskWorker) -> None:
+    worker = TaskWorker(inert_worker._ctx, estimation=EstimationConfig(enabled=True))
+    release = threading.Event()
+    dry_run = DryRun.of
+
+    def slow_dry_run(*args: Any) -> DryRun:
+        release.wait(timeout=5.0)
+        return dry_run(*args)
+
+    with patch.object(DryRun, "of", side_effect=slow_dry_run):
+        task_id = worker.submit_task(_LONG_TASK)
+        assert _get_task(worker, task_id).estimate is None
+        release.set()
+        _wait_for_estimates(worker)
+    assert _get_task(worker, task_id).estimate is not None
+
+
+def test_task_cleared_before_estimate_not_estimated(inert_worker: TaskWorker) -> None:
+    worker = TaskWorker(inert_worker._ctx, estimation=EstimationConfig(enabled=True))
+    release = threading.Event()
+    dry_run = DryRun.of
+
+    def slow_dry_run(*args: Any) -> DryRun:
+        release.wait(timeout=5.0)
+        return dry_run(*args)
+
+    with patch.object(DryRun, "of", side_effect=slow_dry_run):
+        task_id = worker.submit_task(_LONG_TASK)
+        worker.clear_task(task_id)
+        release.set()
+        _wait_for_estimates(worker)
+    assert worker._dry_runs == {}
+
+
+def test_task_estimated_with_mocked_devices(context: BlueskyContext) -> None:
+    built_with: list[Any] = []
+
+    def touching_plan(motor: Movable) -> MsgGenerator:
+        # Stands in for plan code that acts on a device outside its messages
+        built_with.append(motor)
+        yield from []
+
+    context.register_plan(touching_plan)
+    worker = TaskWorker(context, estimation=EstimationConfig(enabled=True))
+    task_id = worker.submit_task(Task(name="touching_plan", params={"motor": "motor"}))
+    _wait_for_estimates(worker)
+
+    assert _get_task(worker, task_id).estimate is not None
+    [device] = built_with
+    assert device is not context.devices["motor"]
+    assert device is context.mock_context().devices["motor"]
+
+
+def test_task_left_unestimated_if_dry_run_fails(context: BlueskyContext) -> None:
+    worker = TaskWorker(context, estimation=EstimationConfig(enabled=True))
+    with patch.object(Task, "build_plan", side_effect=RuntimeError("no")):
+        task_id = worker.submit_task(_SIMPLE_TASK)
+        _wait_for_estimates(worker)
+    assert _get_task(worker, task_id).estimate is None
+
+
+def test_tasks_not_estimated_by_default(inert_worker: TaskWorker) -> None:
+    task_id = inert_worker.submit_task(_LONG_TASK)
+    assert _get_task(inert_worker, task_id).estimate is None
+
+
+def test_watchdog_warns_then_aborts_stalled_task(context: BlueskyContext) -> None:
+    context.register_device(PollingFakeDevice("stuck_device"))
+    worker = TaskWorker(
+        context,
+        watchdog=WatchdogConfig(message_warning=0.1, abort_after=0.3, interval=0.02),
+    )
+    worker.start()
+    try:
+        task_id = worker.submit_task(
+            Task(name="set_absolute", params={"movable": "stuck_device", "value": 1})
+        )
+        events = begin_task_and_wait_until_complete(worker, task_id)
+    finally:
+        worker.stop()
+
+    warnings = events[-1].warnings
+    assert len(warnings) == 2
+    assert all(
+        warning.startswith("RunEngine has been processing a wait message")
+        for warning in warnings
+    )
+    assert events[-1].is_error()
+    assert context.run_engine.msg_hook is None
+
+
+def test_watchdog_leaves_healthy_task_alone(context: BlueskyContext) -> None:
+    worker = TaskWorker(
+        context, watchdog=WatchdogConfig(abort_after=5.0, interval=0.01)
+    )
+    worker.start()
+    try:
+        task_id = worker.submit_task(_SIMPLE_TASK)
+        events = begin_task_and_wait_until_complete(worker, task_id)
+    finally:
+        worker.stop()
+
+    assert events[-1].warnings == []
+    assert not events[-1].is_error()
+
+
+def test_account_published(inert_worker: TaskWorker) -> None:
+    task_id = inert_worker.submit_task(_SIMPLE_TASK)
+    inert_worker.account_published(task_id, "stomp", 10)
+    inert_worker.account_published(task_id, "stomp", 5)
+    inert_worker.account_published(task_id, "tiled", 7)
+    inert_worker.account_published("unknown", "stomp", 1)
+    assert _get_task(inert_worker, task_id).resources.published_bytes == {
+        "stomp": 15,
+        "tiled": 7,
+    }
+
+
+def test_account_published_does_not_keep_task(inert_worker: TaskWorker) -> None:
+    tasks = inert_worker._tasks
+    old, new = (
+        TrackableTask(task_id=task_id, task=_SIMPLE_TASK, is_complete=True)
+        for task_id in ("old", "new")
+    )
+    tasks.add(old)
+    tasks.add(new)
+    inert_worker.account_published("old", "stomp", 1)
+    assert [task.task_id for task in tasks.find(TaskStatusEnum.COMPLETE)] == [
+        "old",
+        "new",
+    ]
+
+
+def test_timeline_phases_added_as_span_events(inert_worker: TaskWorker) -> None:
+    with patch("blueapi.worker.task_worker.get_current_span") as get_current_span:
+        inert_worker.submit_task(_SIMPLE_TASK)
+    assert [call.args[0] for call in get_current_span().add_event.call_args_list] == [
+        "task.submitted",
+        "task.validated",
+    ]
+
+
 def assert_running_count_plan_produces_ordered_worker_and_data_events(
     expected_events: list[WorkerEvent | DataEvent],
     worker: TaskWorker,
@@ -629,8 +2131,8 @@ def take_events_from_streams(
     ],
 )
 def test_get_tasks(worker: TaskWorker, status, expected_task_ids):
-    worker._pending_tasks = {
-        "task1": TrackableTask(
+    for task in (
+        TrackableTask(
             task_id="task1",
             task=Task(
                 name="set_absolute", params={"movable": "fake_device", "value": 4.0}
@@ -638,7 +2140,7 @@ def test_get_tasks(worker: TaskWorker, status, expected_task_ids):
             is_complete=False,
             is_pending=False,
         ),
-        "task2": TrackableTask(
+        TrackableTask(
             task_id="task2",
             task=Task(
                 name="set_absolute", params={"movable": "fake_device", "value": 4.0}
@@ -646,9 +2148,7 @@ def test_get_tasks(worker: TaskWorker, status, expected_task_ids):
             is_complete=False,
             is_pending=True,
         ),
-    }
-    worker._completed_tasks = {
-        "task3": TrackableTask(
+        TrackableTask(
             task_id="task3",
             task=Task(
                 name="set_absolute", params={"movable": "fake_device", "value": 4.0}
@@ -656,7 +2156,8 @@ def test_get_tasks(worker: TaskWorker, status, expected_task_ids):
             is_complete=True,
             is_pending=False,
         ),
-    }
+    ):
+        worker._tasks.add(task)
 
     result = worker.get_tasks(status)
     result_ids = [task.task_id for task in result]
@@ -664,6 +2165,106 @@ def test_get_tasks(worker: TaskWorker, status, expected_task_ids):
     assert result_ids == expected_task_ids
 
 
+def _task_for(task_id: str, plan: str, user: str, session: str) -> TrackableTask:
+    return TrackableTask(
+        task_id=task_id,
+        task=Task(name=plan, metadata={"user": user, "instrument_session": session}),
+    )
+
+
+@pytest.mark.parametrize(
+    "filters, expected_task_ids",
+    [
+        ({}, ["0", "1", "2", "3"]),
+        ({"user": "jd1"}, ["0", "2"]),
+        ({"plan": "sleep"}, ["0", "1", "3"]),
+        ({"instrument_session": "cm12345-1"}, ["0", "1"]),
+        ({"user": "jd1", "plan": "sleep"}, ["0"]),
+        ({"user": "jd2", "instrument_session": "cm12345-2"}, ["3"]),
+        ({"status": TaskStatusEnum.PENDING, "user": "jd2"}, ["1", "3"]),
+        ({"user": "nobody"}, []),
+        ({"status": TaskStatusEnum.ERROR}, []),
+    ],
+)
+def test_task_store_find(filters: dict[str, Any], expected_task_ids: list[str]):
+    store = TaskStore()
+    store.add(_task_for("0", "sleep", "jd1", "cm12345-1"))
+    store.add(_task_for("1", "sleep", "jd2", "cm12345-1"))
+    store.add(_task_for("2", "count", "jd1", "cm12345-2"))
+    store.add(_task_for("3", "sleep", "jd2", "cm12345-2"))
+
+    assert [task.task_id for task in store.find(**filters)] == expected_task_ids
+
+
+def test_task_store_reindexes_on_status_change():
+    store = TaskStore()
+    task = _task_for("0", "sleep", "jd1", "cm12345-1")
+    store.add(task)
+
+    store.set_status(task, TaskStatusEnum.RUNNING)
+    assert not task.is_pending and not task.is_complete
+    assert store.find(TaskStatusEnum.PENDING) == []
+    assert store.find(TaskStatusEnum.RUNNING, user="jd1") == [task]
+
+    store.set_status(task, TaskStatusEnum.COMPLETE)
+    assert task.is_complete
+    assert store.find(TaskStatusEnum.RUNNING) == []
+    assert store.find(TaskStatusEnum.COMPLETE, plan="sleep") == [task]
+    assert store.count(TaskStatusEnum.COMPLETE) == 1
+
+
+def test_task_store_remove_drops_indexes():
+    store = TaskStore()
+    store.add(_task_for("0", "sleep", "jd1", "cm12345-1"))
+    store.remove("0")
+
+    assert "0" not in store
+    assert store.find(user="jd1") == []
+    assert store._by_user == store._by_plan == store._by_instrument_session == {}
+    with pytest.raises(KeyError):
+        store.remove("0")
+
+
+def test_task_store_pages_in_submission_order():
+    store = TaskStore()
+    tasks = [_task_for(task_id, "sleep", "jd1", "cm12345-1") for task_id in "0123"]
+    for task in tasks:
+        store.add(task)
+    store.set_status(tasks[1], TaskStatusEnum.COMPLETE)
+    store.set_status(tasks[0], TaskStatusEnum.COMPLETE)
+
+    first_page, cursor = store.page(limit=3, user="jd1")
+    assert first_page == tasks[:3]
+    assert cursor is not None
+    assert store.page(limit=3, after=cursor, user="jd1") == (tasks[3:], None)
+
+
+def test_task_store_filters_by_submission_time():
+    store = TaskStore()
+    for task_id in "012":
+        store.add(_task_for(task_id, "sleep", "jd1", "cm12345-1"))
+        store._submitted_at[task_id] = datetime(2025, 1, int(task_id) + 1, tzinfo=UTC)
+
+    tasks = store.find(
+        submitted_after=datetime(2025, 1, 1, tzinfo=UTC),
+        submitted_before=datetime(2025, 1, 3, tzinfo=UTC),
+    )
+    assert [task.task_id for task in tasks] == ["1"]
+
+
+def test_get_tasks_filters_by_metadata(inert_worker: TaskWorker) -> None:
+    task_id = inert_worker.submit_task(
+        Task(name="sleep", params={"time": 0.0}, metadata={"user": "jd1"})
+    )
+    inert_worker.submit_task(_SIMPLE_TASK)
+
+    assert [task.task_id for task in inert_worker.get_tasks(user="jd1")] == [task_id]
+    assert len(inert_worker.get_tasks(TaskStatusEnum.PENDING, plan="sleep")) == 2
+    assert inert_worker.get_task_owner(task_id) == "jd1"
+    with pytest.raises(KeyError):
+        inert_worker.get_task_owner("foo")
+
+
 def test_submitting_completed_task_fails(worker: TaskWorker):
     with pytest.raises(ValueError):
         worker._submit_trackable_task(
@@ -727,6 +2328,85 @@ def test_begin_task_span_ok(
         worker.begin_task(task_id)
 
 
+@pytest.mark.parametrize(
+    "mode,traced",
+    [
+        (
+            DocumentSpanMode.ALL,
+            ["start", "descriptor", "event", "event", "event", "event", "stop"],
+        ),
+        (DocumentSpanMode.RUN_BOUNDARIES, ["start", "stop"]),
+        (DocumentSpanMode.SAMPLED, ["start", "descriptor", "event", "event", "stop"]),
+        (DocumentSpanMode.OFF, []),
+    ],
+)
+def test_document_span_sampling(
+    context: BlueskyContext, mode: DocumentSpanMode, traced: list[str]
+) -> None:
+    worker = TaskWorker(
+        context,
+        document_spans=DocumentSpanConfig(mode=mode, event_sample_interval=3),
+    )
+    task = TrackableTask(task_id="0", task=_SIMPLE_TASK)
+    names = ["start", "descriptor", "event", "event", "event", "event", "stop"]
+    sampled = []
+    for name in names:
+        if worker._traces_document(task, name):
+            sampled.append(name)
+        worker._record_document(task, name)
+    assert sampled == traced
+
+
+@patch("blueapi.worker.task_worker.TRACER")
+def test_untraced_documents_still_published(
+    tracer: Mock, context: BlueskyContext
+) -> None:
+    worker = TaskWorker(
+        context, document_spans=DocumentSpanConfig(mode=DocumentSpanMode.OFF)
+    )
+    worker._current = TrackableTask(task_id="0", task=_SIMPLE_TASK)
+    worker._current_task_otel_context = get_current()
+    events: list[DataEvent] = []
+    worker.data_events.subscribe(lambda event, _: events.append(event))
+
+    worker._on_document("start", {"uid": "foo"})
+
+    tracer.start_as_current_span.assert_not_called()
+    assert events == [DataEvent(name="start", doc={"uid": "foo"}, task_id="0")]
+
+
+@patch("blueapi.worker.task_worker.add_span_attributes")
+@patch("blueapi.worker.task_worker.TRACER")
+def test_document_not_formatted_for_unrecorded_span(
+    tracer: Mock, add_span_attributes: Mock, inert_worker: TaskWorker
+) -> None:
+    span = tracer.start_as_current_span.return_value.__enter__.return_value
+    span.is_recording.return_value = False
+    inert_worker._current = TrackableTask(task_id="0", task=_SIMPLE_TASK)
+    inert_worker._current_task_otel_context = get_current()
+
+    with patch.object(inert_worker, "_document_attribute") as document_attribute:
+        inert_worker._on_document("event", {"data": {}})
+
+    add_span_attributes.assert_not_called()
+    document_attribute.assert_not_called()
+
+
+def test_document_attribute_truncated(context: BlueskyContext) -> None:
+    worker = TaskWorker(
+        context, document_spans=DocumentSpanConfig(max_attribute_length=10)
+    )
+    assert worker._document_attribute({"a": 1}) == "{'a': 1}"
+    assert worker._document_attribute({"data": "x" * 100}) == "{'data': '..."
+
+
+def test_document_attribute_unlimited(context: BlueskyContext) -> None:
+    worker = TaskWorker(
+        context, document_spans=DocumentSpanConfig(max_attribute_length=None)
+    )
+    assert worker._document_attribute({"data": "x" * 10000}).endswith("'}")
+
+
 def test_injected_devices_are_found(
     fake_device: FakeDevice,
     context: BlueskyContext,
@@ -789,7 +2469,7 @@ def test_worker_uses_plan_tag_filter_context(
 ):
     task = TrackableTask(task_id="0", task=_SIMPLE_TASK)
     inert_worker._task_channel.put_nowait(task)
-    inert_worker._pending_tasks["0"] = task
+    inert_worker._tasks.add(task)
     mock_context.assert_not_called()
     inert_worker._cycle()
     mock_context.assert_called_once()
@@ -799,7 +2479,7 @@ def test_worker_uses_plan_tag_filter_context(
 def test_cycle_without_otel_context(mock_logger: Mock, inert_worker: TaskWorker):
     task = TrackableTask(task_id="0", task=_SIMPLE_TASK)
     inert_worker._task_channel.put_nowait(task)
-    inert_worker._pending_tasks["0"] = task
+    inert_worker._tasks.add(task)
 
     inert_worker._cycle()
     assert inert_worker._current_task_otel_context is None
@@ -0,0 +1,91 @@
+from bluesky import Msg
+
+from blueapi.worker.message_timing import MessageClock
+from blueapi.worker.watchdog import Stall, StallWatchdog
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _watchdog(
+    clock: FakeClock, **thresholds: float
+) -> tuple[MessageClock, StallWatchdog]:
+    watchdog = StallWatchdog(clock=clock, **thresholds)
+    return MessageClock([watchdog], clock), watchdog
+
+
+def test_nothing_reported_below_thresholds():
+    clock = FakeClock()
+    messages, watchdog = _watchdog(clock, message_warning=1.0, status_warning=1.0)
+    messages.on_msg(Msg("wait"))
+    watchdog.status_started("foo")
+    clock.now = 0.5
+    assert watchdog.check() == []
+
+
+def test_stalled_message_reported_once_then_when_fatal():
+    clock = FakeClock()
+    messages, watchdog = _watchdog(clock, message_warning=1.0, abort_after=5.0)
+    messages.on_msg(Msg("wait"))
+    clock.now = 2.0
+    assert watchdog.check() == [Stall("message", "wait", 2.0, False)]
+    clock.now = 3.0
+    assert watchdog.check() == []
+    clock.now = 6.0
+    assert watchdog.check() == [Stall("message", "wait", 6.0, True)]
+    clock.now = 7.0
+    assert watchdog.check() == []
+
+
+def test_next_message_starts_afresh():
+    clock = FakeClock()
+    messages, watchdog = _watchdog(clock, message_warning=1.0)
+    messages.on_msg(Msg("wait"))
+    clock.now = 2.0
+    assert watchdog.check() == [Stall("message", "wait", 2.0, False)]
+    messages.on_msg(Msg("wait"))
+    assert watchdog.check() == []
+    clock.now = 3.5
+    assert watchdog.check() == [Stall("message", "wait", 1.5, False)]
+
+
+def test_statuses_reported_oldest_first():
+    clock = FakeClock()
+    messages, watchdog = _watchdog(clock, status_warning=1.0)
+    watchdog.status_started("foo")
+    clock.now = 1.0
+    watchdog.status_started("bar")
+    watchdog.status_started("baz")
+    watchdog.status_finished("baz")
+    clock.now = 2.5
+    assert watchdog.check() == [
+        Stall("status", "foo", 2.5, False),
+        Stall("status", "bar", 1.5, False),
+    ]
+
+
+def test_abort_applies_without_warning_thresholds():
+    clock = FakeClock()
+    messages, watchdog = _watchdog(clock, abort_after=1.0)
+    messages.on_msg(Msg("wait"))
+    watchdog.status_started("foo")
+    clock.now = 1.0
+    assert watchdog.check() == [
+        Stall("message", "wait", 1.0, True),
+        Stall("status", "foo", 1.0, True),
+    ]
+
+
+def test_task_finished_forgets_message_and_statuses():
+    clock = FakeClock()
+    messages, watchdog = _watchdog(clock, message_warning=1.0, status_warning=1.0)
+    messages.on_msg(Msg("wait"))
+    watchdog.status_started("foo")
+    watchdog.task_finished()
+    clock.now = 2.0
+    assert watchdog.check() == []